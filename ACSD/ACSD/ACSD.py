@@ -7,10 +7,12 @@ This program, the Access Cambridge Structural Database program, will look throug
 import os, sys
 import warnings
 warnings.filterwarnings('ignore')
-from ACSD.ACSD.get_crystals_from_CSD import get_crystals_from_CSD
-from ACSD.ACSD.get_isotope_data      import get_isotope_data
-from ACSD.ACSD.utilities             import get_paths_to_identifiers, get_list_of_identifiers, get_list_of_crystals_to_exclude, get_identifiers_from_txt_file
-isotopes = get_isotope_data()
+from ACSD.ACSD.utilities             import get_paths_to_identifiers, get_list_of_identifiers, get_list_of_crystals_to_exclude
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader import default_CSD_reader_factory
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore     import ResultsStore, results_store_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_query        import get_identifiers_from_query, merge_identifiers, default_CSD_query_backend_factory
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout import crystal_locations_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.RunSettings             import RunSettings, get_run_settings
 
 class CLICommand:
 	"""Collect crystal structures from the Cambridge Structural Database.
@@ -18,57 +20,50 @@ class CLICommand:
 
 	@staticmethod
 	def add_arguments(parser):
-		parser.add_argument('paths_to_identifiers',  nargs='+', help='Add all the paths to the identifier list you want to examine, or just the name of the folder that contains all the gcd files you want to process.')
+		parser.add_argument('paths_to_identifiers',  nargs='*', help='Add all the paths to the identifier list you want to examine, or just the name of the folder that contains all the gcd files you want to process.')
+		parser.add_argument('--query',               nargs=1,   help='This is the path to a query file. The crystals in the CSD that match this query are processed, as well as any identifiers in the given gcd files.', default=[None])
 		parser.add_argument('--overwrite',           nargs=1,   help='Indicates if you want to overwrite crystal files that have already been included in the crystal database folder.', default=['True'])
 		parser.add_argument('--crystals_to_exclude', nargs=1,   help='Exclude the crystal if given in these files.', default=[None])
 		parser.add_argument('--no_cpus',             nargs=1,   help='This is the number of cpus to use to process the ACSD.', default=['1'])
+		parser.add_argument('--chunksize',           nargs=1,   help='This is the number of identifiers given to a cpu at a time. If "auto", this is chosen based on the number of identifiers and cpus.', default=['auto'])
+		parser.add_argument('--cost_estimator',      nargs=1,   help='If given, the cost of each identifier is estimated and the most costly identifiers are processed first. This can be "atoms", "components" or "symmetry" (estimated from the formula, Z and symmetry of each entry, which adds one CSD lookup per identifier), or "previous" (the time each identifier took in a previous run, with no CSD lookups).', default=[None])
+		parser.add_argument('--ordered',             nargs=1,   help='Indicates if results should be recorded in the order the identifiers were given (True), or as soon as they are finished (False).', default=['False'])
+		parser.add_argument('--cache_dir',           nargs=1,   help='This is the folder to store converted crystals in, so they do not need to be converted again. This folder can be shared between crystal database folders.', default=[None])
+		parser.add_argument('--reject_elements',     nargs=1,   help='These are the elements (separated by spaces or commas) that you do not want crystals to contain. Crystals containing these elements are rejected.', default=[None])
+		parser.add_argument('--output_format',       nargs=1,   help='This is the format to write crystals in. This is either "xyz" (an xyz file for each crystal), "npz" (binary shards that can be memory-mapped) or "both".', default=['xyz'])
+		parser.add_argument('--crystals_per_shard',  nargs=1,   help='This is the number of crystals to write to each binary shard, if --output_format is "npz" or "both".', default=['1000'])
+		parser.add_argument('--layout',              nargs=1,   help='This is where xyz files are placed in the crystal database folder. This is either "flat" (all xyz files in the crystal database folder) or "hashed" (xyz files in hashed sub-folders, for crystal database folders with hundreds of thousands of crystals).', default=['flat'])
+		parser.add_argument('--writer_threads',      nargs=1,   help='This is the number of threads that write xyz files, so the cpus converting crystals never wait for the disk.', default=['4'])
+		parser.add_argument('--write_queue_size',    nargs=1,   help='This is the largest number of crystals that can wait to be written. If the disk can not keep up, no more crystals are converted until crystals have been written.', default=['1000'])
+		parser.add_argument('--profile',             nargs=1,   help='These are the identifiers (separated by spaces or commas) to profile with cProfile. The profile of each identifier is written to the profiles folder in the crystal database folder.', default=[None])
+		parser.add_argument('--log_level',           nargs=1,   help='Only messages at or above this level are written to the log file. This is either "DEBUG", "INFO", "WARNING" or "ERROR". "DEBUG" includes a banner for every crystal.', default=['DEBUG'])
+		parser.add_argument('--log_format',          nargs=1,   help='This is the format to write the log file in. This is either "text" (ACSD_logfile.log) or "json" (ACSD_logfile.jsonl, one JSON object for each message).', default=['text'])
+		parser.add_argument('--max_log_size',        nargs=1,   help='This is the largest size of the log file (in MB) before it is compressed and a new log file is started. If not given, the log file is never rotated.', default=[None])
+		parser.add_argument('--log_backups',         nargs=1,   help='This is the number of compressed log files to keep when the log file is rotated.', default=['5'])
+		parser.add_argument('--status_interval',     nargs=1,   help='If given, the status of the run (processed per second, the estimated time until the run is finished, the number of crystals given each status, and the crystals being converted) is written to ACSD_status.json in the crystal database folder every this many seconds.', default=[None])
+		parser.add_argument('--timeout',             nargs=1,   help='If given, this is the longest time (in seconds) to spend converting one identifier. The process converting an identifier that takes longer than this is stopped and replaced with a new process, and the identifier is recorded with the status "timeout" along with the stage it was in.', default=[None])
+		parser.add_argument('--retry',               nargs=1,   help='These are the statuses (separated by spaces or commas) of crystals that were not written in a previous run to convert again when resuming with --overwrite False. This can include "not_found", "no_coordinates", "rejected", "timeout" and "failed", or be "None" to not convert any of these crystals again.', default=[None])
+		parser.add_argument('--max_cache_size',      nargs=1,   help='This is the maximum size of the cache folder (in GB). The least recently used crystals are removed when the cache becomes larger than this.', default=['10'])
 
 	@staticmethod
 	def run(arguments):
 
 		# First, obtain the path to the file that contains all the idenitifiers, or the folder to all the gcd files that you want to read in.
 		paths_to_identifiers = arguments.paths_to_identifiers
-		
-		# Second, give an error if no input was given
-		if (paths_to_identifiers is None) or (len(paths_to_identifiers) == 0):
-			raise Exception('Error: Paths to Identifiers must be given as arguments to this program')
-
-		# Fourth, determine if you want to overwrite existing crystal files in the crystal database folder.
-		overwrite_existing_crystal_files = arguments.overwrite
-		if len(overwrite_existing_crystal_files) != 1:
-			raise Exception('Error: overwrite has more than one input')
-		overwrite_existing_crystal_files = overwrite_existing_crystal_files[0]
-		if   overwrite_existing_crystal_files.lower() in ['t', 'true']:
-			overwrite_existing_crystal_files = True
-		elif overwrite_existing_crystal_files.lower() in ['f', 'false']:
-			overwrite_existing_crystal_files = False
-		else:
-			to_string  = 'Error: your "overwrite" input must be either True or False.\n'
-			to_string += f'Your "overwrite" input: {overwrite_existing_crystal_files}\n'
-			to_string += 'Check this.'
-			raise Exception(to_string)
-
-		# Third, indicate the file you want to read in to indicate which idenitifiers you dont want to include. This is usually used for debugging
-		crystals_to_exclude_filename = arguments.crystals_to_exclude
-		if len(crystals_to_exclude_filename) != 1:
-			raise Exception('Error: crystals_to_exclude has more than one input')
-		crystals_to_exclude_filename = crystals_to_exclude_filename[0]
-
-		# Fifth, determine the number of cpus to use for processing the crystals in the ACSD.
-		no_cpus = arguments.no_cpus
-		if len(no_cpus) != 1:
-			raise Exception('Error: overwrite has more than one input')
-		no_cpus = no_cpus[0]
-		if not no_cpus.isdigit():
-			raise Exception('Error: no_cpus is not a digit. no_cpus = '+str(no_cpus))
-		no_cpus = int(no_cpus)
-
-		# Fifth, run the ACSD program
-		run_ACSD(paths_to_identifiers, overwrite_existing_crystal_files=overwrite_existing_crystal_files, crystals_to_exclude_filename=crystals_to_exclude_filename, no_cpus=no_cpus) 
+
+		# Second, read the settings of this run from the arguments. Every setting is checked here, once (see RunSettings.py).
+		settings = RunSettings.from_arguments(arguments)
+
+		# 2.1: Give an error if no input was given
+		if ((paths_to_identifiers is None) or (len(paths_to_identifiers) == 0)) and (settings.path_to_query is None):
+			raise Exception('Error: Paths to Identifiers (or a query file using --query) must be given as arguments to this program')
+
+		# Third, run the ACSD program
+		run_ACSD(paths_to_identifiers, settings=settings)
 
 # ------------------------------------------------------------------------------------------------------------
 
-def run_ACSD(paths_to_identifiers, overwrite_existing_crystal_files=True, crystals_to_exclude_filename=None, no_cpus=1):
+def run_ACSD(paths_to_identifiers, settings=None, reader_factory=default_CSD_reader_factory, query_backend_factory=default_CSD_query_backend_factory, **options):
 	"""
 	This method will look through the Cambridge Structural Database for the crystal files you would like to obtain.
 
@@ -76,14 +71,24 @@ def run_ACSD(paths_to_identifiers, overwrite_existing_crystal_files=True, crysta
 	----------
 	paths_to_identifiers : list of strings
 		These are the paths to the lists of identifiers to process.
-	overwrite_existing_crystal_files : bool.
-		This boolean indicate if you want to overwrite already existing crystal files in the crystal database folder. Default: True.
-	crystals_to_exclude_filename : str. or None
-		The is the path to the file that contain CCDC identifiers you do not want to include in this run. If None, don't exclude any CCDC IDs. Default: None
-	no_cpus : int
-		This is the number of cpus you would like to use to process the ACSD. 
+	settings : RunSettings or None
+		These are the settings of this run (see RunSettings.py). If None, the settings are made from options. Default: None
+	reader_factory : callable
+		This method returns the reader to obtain entries from. This can be changed to read from a local copy of the CSD. Default: default_CSD_reader_factory
+	query_backend_factory : callable
+		This method returns the backend to search the CSD with when path_to_query is given. This can be changed to search without the CSD (for example, for testing). Default: default_CSD_query_backend_factory
+	options : dict.
+		These are the options of this run (like no_cpus, ordered or timeout), which are used instead of those in settings. See RunSettings.py for the options that can be given.
 	"""
 
+	# Import the method for obtaining crystals from the CSD here rather than at the top of this file, as it imports ase, networkx
+	# and SUMELF, which are slow to import. This means that commands like "ACSD --help" do not need to import them.
+	from ACSD.ACSD.get_crystals_from_CSD                      import get_crystals_from_CSD
+	from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings import get_stage_timing_report_lines, profiles_foldername
+
+	# Obtain the settings of this run. These are only checked again if options are given (see RunSettings.py).
+	settings = get_run_settings(settings, **options)
+
 	# First, get the list of identifers from the arguments
 	no_of_lines = 40
 	print('#'*no_of_lines)
@@ -100,58 +105,64 @@ def run_ACSD(paths_to_identifiers, overwrite_existing_crystal_files=True, crysta
 	# Fourth, get the identifiers from the gcd files that contain the identifiers to obtain.
 	identifiers = get_list_of_identifiers(paths_to_identifiers)
 
+	# 4.1: If a query file is given, add the identifiers of the entries in the CSD that match the query.
+	#      * Entries that would be rejected (for example, for being polymeric or containing a metal) are removed by the search, so they are never obtained by the processes.
+	if settings.path_to_query is not None:
+		print('Obtaining identifiers of crystals in the CSD that match the query in: '+str(settings.path_to_query))
+		query_identifiers = get_identifiers_from_query(settings.path_to_query, query_backend_factory=query_backend_factory)
+		identifiers, no_of_query_identifiers = merge_identifiers(identifiers, query_identifiers)
+		print('Number of crystals in the CSD that match the query: '+str(no_of_query_identifiers))
+
 	# Fifth, obtain a list of the identifiers to exclude if they are in identifiers
-	identifiers_to_exclude = get_list_of_crystals_to_exclude(crystals_to_exclude_filename)
+	identifiers_to_exclude = get_list_of_crystals_to_exclude(settings.crystals_to_exclude_filename)
 
 	# Fifth, add identifers to exclude from the crystals_not_written.txt file. 
 	#        * The ACSD did try to create these crystal files, but did not for some reason.
+	#        * Crystals that were given one of the statuses in retry_statuses (like 'timeout') are not excluded, so they are converted again.
 	path_to_crystals_not_written_TXT_file = crystals_database_folder_name+'/'+'crystals_not_written.txt'
 	if os.path.exists(path_to_crystals_not_written_TXT_file):
-		identifiers_to_exclude += get_list_of_crystals_to_exclude(path_to_crystals_not_written_TXT_file)
+		identifiers_to_exclude |= get_list_of_crystals_to_exclude(path_to_crystals_not_written_TXT_file) - get_identifiers_to_retry(crystals_database_folder_name, settings.retry_statuses)
 
 	# Fifth, remove excluded crystal from the crystals_to_exclude from all_identifiers
-	#        * Removed idenifiers are replaced with None.
-	identifiers = sorted(set(identifiers))
-	identifiers_to_exclude = sorted(set(identifiers_to_exclude))
-	for index in range(len(identifiers)):
-		identifier = identifiers[index]
-		if identifier in identifiers_to_exclude:
-			identifiers[index] = '#'+identifiers[index]
-			identifiers_to_exclude.remove(identifier)
+	#        * Removed idenifiers are given as "#identifier".
+	#        * identifiers_to_exclude is a set, so checking each identifier takes the same time however many identifiers are excluded.
+	identifiers = [('#'+identifier if (identifier in identifiers_to_exclude) else identifier) for identifier in identifiers]
 
 	# Sixth, get the crystals for the identifers from the CSD database.
+	#        * stage_timing_report records how long each stage of converting crystals took (see stage_timings.py).
 	print('Saving Data to: '+str(crystals_database_folder_name))
-	no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals = get_crystals_from_CSD(identifiers, crystals_database_folder_name, overwrite_existing_crystal_files, no_cpus)
-
-	# Seventh, obtain the list of crystals that do not contain any coordinates
-	no_coordinates_given_filepath = crystals_database_folder_name+'/'+'no_coordinates_given.txt'
-	if os.path.exists(no_coordinates_given_filepath):
-		list_of_crystals_with_no_coordinates_given = get_identifiers_from_txt_file(no_coordinates_given_filepath)
-	else:
-		list_of_crystals_with_no_coordinates_given = []
-
-	# Eighth, obtain the list of crystals that were rejected for some reason (for example, contained a metal, was not organic, was a polymer, etc).
-	rejected_crystals_filepath = crystals_database_folder_name+'/'+'rejected_crystals.txt'
-	if os.path.exists(rejected_crystals_filepath):
-		list_of_rejected_crystals = get_identifiers_from_txt_file(rejected_crystals_filepath)
-	else:
-		list_of_rejected_crystals = []
-
-	# Ninth, obtain the list of identifiers that could not be found in the CCDC database. 
-	could_not_find_identifiers_filepath = crystals_database_folder_name+'/'+'could_not_find_identifiers.txt'
-	if os.path.exists(could_not_find_identifiers_filepath):
-		list_of_identifiers_that_could_not_be_found = get_identifiers_from_txt_file(could_not_find_identifiers_filepath)
-	else:
-		list_of_identifiers_that_could_not_be_found = []
-
-	# Tenth, print results from reading and recording crystals from the CSD database.
+	stage_timing_report = {}
+	no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals = get_crystals_from_CSD(identifiers, crystals_database_folder_name, settings=settings, reader_factory=reader_factory, stage_timing_report=stage_timing_report)
+
+	# Seventh, obtain the lists of crystals that do not contain any coordinates, that were rejected for some reason (for example, contained
+	#          a metal, was not organic, was a polymer, etc), and that could not be found in the CCDC database, from the results store.
+	#          * The number of xyz files in the crystal database folder is also obtained from the results store, so the crystal database folder is not listed.
+	results_store = ResultsStore(crystals_database_folder_name+'/'+results_store_filename)
+	try:
+		list_of_crystals_with_no_coordinates_given  = results_store.query(status='no_coordinates')
+		list_of_rejected_crystals                   = results_store.query(status='rejected')
+		list_of_identifiers_that_could_not_be_found = results_store.query(status='not_found')
+		list_of_timed_out_crystals                  = results_store.query(status='timeout')
+		list_of_failed_crystals                     = results_store.query(status='failed')
+		no_of_crystal_files_in_database             = len(results_store.get_crystal_locations())
+	finally:
+		results_store.close()
+
+	# Eighth, print results from reading and recording crystals from the CSD database.
 	print('Obtained crystals from the CSD for identifiers in: '+str(crystals_database_folder_name))
 	print('Number of crystals obtained from the database: '+str(no_of_crystals_recorded))
 	print('  -> Number of crystals already recorded in previous ACSD runs: '+str(no_of_already_processed_crystals))
 	print('  -> Number of crystals excluded from the ACSD run for some reason (for example, contained a metal, was not organic, was a polymer, etc): '+str(no_of_excluded_crystals))
+	print('Number of xyz files in '+str(crystals_database_folder_name)+' ('+str(settings.layout)+' layout): '+str(no_of_crystal_files_in_database))
+	if settings.layout == 'hashed':
+		print('  -> The location of each xyz file is given in '+str(crystals_database_folder_name)+'/'+str(crystal_locations_filename))
 	print('-'*no_of_lines)
 	print('Number of crystals with no coordinates given: '+str(len(list_of_crystals_with_no_coordinates_given)))
 	print('Number of crystals rejected: '+str(len(list_of_rejected_crystals)))
+	if len(list_of_timed_out_crystals) > 0:
+		print('Number of crystals that took longer than the timeout to convert: '+str(len(list_of_timed_out_crystals))+' (see timed_out_crystals.txt)')
+	if len(list_of_failed_crystals) > 0:
+		print('Number of crystals whose process ended unexpectedly while converting them: '+str(len(list_of_failed_crystals))+' (see failed_crystals.txt)')
 	print('-'*no_of_lines)
 	if len(list_of_identifiers_that_could_not_be_found) > 0:
 		print('No of crystals not found in the database: '+str(len(list_of_identifiers_that_could_not_be_found)))
@@ -162,8 +173,43 @@ def run_ACSD(paths_to_identifiers, overwrite_existing_crystal_files=True, crysta
 			print(identifier)
 		print()
 		print('-'*no_of_lines)
+	stage_timing_report_lines = get_stage_timing_report_lines(stage_timing_report)
+	if len(stage_timing_report_lines) > 0:
+		print('Time spent on each stage of converting crystals:')
+		print()
+		for line in stage_timing_report_lines:
+			print(line)
+		print()
+		if len(settings.profile_identifiers) > 0:
+			print('Profiles of '+', '.join(settings.profile_identifiers)+' are given in '+str(crystals_database_folder_name)+'/'+str(profiles_foldername)+' (view with "python -m pstats <profile>")')
+		print('-'*no_of_lines)
 	print('-'*no_of_lines)
 
 # ------------------------------------------------------------------------------------------------------------
 
+def get_identifiers_to_retry(crystals_database_folder_name, retry_statuses):
+	"""
+	This method will obtain the identifiers that were given one of the statuses in retry_statuses in a previous run, from the results store.
 
+	Parameters
+	----------
+	crystals_database_folder_name : str.
+		This is the path to the crystal database folder.
+	retry_statuses : list of str.
+		These are the statuses of the identifiers to convert again (see RunSettings.py).
+
+	Returns
+	-------
+	identifiers_to_retry : set of str.
+		These are the identifiers to convert again.
+	"""
+	path_to_results_store = crystals_database_folder_name+'/'+results_store_filename
+	if (len(retry_statuses) == 0) or (not os.path.exists(path_to_results_store)):
+		return set()
+	results_store = ResultsStore(path_to_results_store)
+	try:
+		return set(results_store.query(status=tuple(retry_statuses)))
+	finally:
+		results_store.close()
+
+# ------------------------------------------------------------------------------------------------------------
@@ -61,6 +61,29 @@ def check_crystal_quality(crystal, molecules, molecule_graphs, entry_object):
 	# Sixth, return results.
 	return [has_disorder, crystal_different_to_user, is_charge_zero, is_mult_one, crystal_same_as_SMILES]
 
+def get_flag_values(flags):
+	"""
+	This method will obtain the value of each crystal quality flag from the flags given by check_crystal_quality.
+
+	The values are only bools and strings, so they can be stored in the conversion cache as JSON (see ConversionCache.py)
+	and recorded in the results store (see ResultsStore.py).
+
+	Parameters
+	----------
+	flags : list
+		These are the crystal quality flags given by check_crystal_quality.
+
+	Returns
+	-------
+	flag_values : dict.
+		These are the values of each flag, as well as 'SMILES_difference', which describes how the crystal differs from its SMILES code (None if it does not differ).
+	"""
+	has_disorder, (different_to_user_with_H, different_to_user_without_H), is_charge_zero, is_mult_one, SMILES_comparison_data = flags
+	flag_values = {'has_disorder': has_disorder, 'different_to_user_with_H': different_to_user_with_H, 'different_to_user_without_H': different_to_user_without_H, 'is_charge_zero': is_charge_zero, 'is_mult_one': is_mult_one, 'same_as_SMILES': SMILES_comparison_data[0]}
+	flag_values = {flag: bool(value) for flag, value in flag_values.items()}
+	flag_values['SMILES_difference'] = None if flag_values['same_as_SMILES'] else str(SMILES_comparison_data[1:])
+	return flag_values
+
 # ---------------------------------------------------------------------------------------------------------------------------
 
 def get_chemical_formula(formula):
@@ -192,56 +215,49 @@ flag_filename = 'crystal_quality_information.csv'
 smiles_filenameGCD = 'different_to_smiles.gcd'
 smiles_filenameTXT = 'different_to_smiles.txt'
 headers = ['Identifier', 'Has Disorder', 'Crystal different to Crystallographer Drawing (including Hydrogens)', 'Crystal different to Crystallographer Drawing (excluding Hydrogens)', 'Is Total Charge 0', 'Is Total Multiplicity 1']
-def save_flags_to_disk(identifier, flags, save_to_filepath, crystal_quality_information_lock):
+def save_flags_to_disk(results, save_to_filepath):
 	"""
-	This method will save the flags about this crystal to disk
+	This method will save the flags about the recorded crystals to disk.
+
+	This is only performed by the main process, so no lock is needed for writing to these files.
 
 	Parameters
 	----------
-	identifier : str.
-		This is the identifier for the crystal
-	flags : list of bool.
-		These are the booleans that indicate statements about the crystal.
+	results : list of dict.
+		These are the results of the recorded crystals from the results store (see ResultsStore.get_results).
 	save_to_filepath : str.
 		This is the path to save flags to.
-	crystal_quality_information_lock : FileLock.lock
-		This is the lock for recording crystal quality information
 	"""
 
-	# First, pop the end of the flags list that indicates if the crystal has the same configuration as the SMILES code. 
-	smiles_comparison_data = flags.pop(-1)
-
-	# Second, check if the flag_filename already exists
-	flag_file_exists = os.path.exists(save_to_filepath+'/'+flag_filename)
-
-	# Third, lock the disk writing at this point. 
-	with crystal_quality_information_lock:
-
-		# Fourth, save the flags to file.
-		with open(save_to_filepath+'/'+flag_filename, 'a') as flagCSV:
-
-			# 4.1: create the csv writer for the csv file.
-			csvwriter = csv.writer(flagCSV)
-
-			# 4.2: If the csv file does not exist, write a header for the csv file
-			if not flag_file_exists:
-				csvwriter.writerow(headers)
-
-			# 4.3: Obtain the components that were examined from the flags list
-			has_disorder, crystal_different_to_user, is_charge_zero, is_mult_one = flags
-
-			# 4.4: Determine if the crystal have the same number of atoms, include and excluding Hydrogen atoms. 
-			crystal_different_to_user_with_H, crystal_different_to_user_without_H = crystal_different_to_user
-
-			# 4.5: Write the information about the crystal to the csv file
-			csvwriter.writerow([str(identifier), has_disorder, crystal_different_to_user_with_H, crystal_different_to_user_without_H, is_charge_zero, is_mult_one])
-
-		# Fifth, if the crystal is different to it's SMILES code, write this to a gcd file and a txt file that indicates the differences between the crystal make-up and the SMILES code. 
-		if not smiles_comparison_data[0]:
-			with open(save_to_filepath+'/'+smiles_filenameGCD, 'a') as flagTXT:
-				flagTXT.write(str(identifier)+'\n')
-			with open(save_to_filepath+'/'+smiles_filenameTXT, 'a') as flagTXT:
-				flagTXT.write(str(identifier)+'\t'+str(smiles_comparison_data[1:])+'\n')
+	# First, save the flags to file.
+	with open(save_to_filepath+'/'+flag_filename, 'w') as flagCSV:
+
+		# 1.1: create the csv writer for the csv file.
+		csvwriter = csv.writer(flagCSV)
+
+		# 1.2: Write a header for the csv file
+		csvwriter.writerow(headers)
+
+		# 1.3: Write the information about each crystal to the csv file.
+		#      * Crystals that were recorded before the results store was used do not have flags, so are not written.
+		for result in results:
+			if result['has_disorder'] is None:
+				continue
+			csvwriter.writerow([str(result['identifier'])] + [bool(result[flag]) for flag in ('has_disorder', 'different_to_user_with_H', 'different_to_user_without_H', 'is_charge_zero', 'is_mult_one')])
+
+	# Second, if any crystals are different to their SMILES code, write these to a gcd file and a txt file that indicates the differences between the crystal make-up and the SMILES code. 
+	different_to_smiles = [result for result in results if (result['same_as_SMILES'] is not None) and (not result['same_as_SMILES'])]
+	if len(different_to_smiles) > 0:
+		with open(save_to_filepath+'/'+smiles_filenameGCD, 'w') as flagTXT:
+			for result in different_to_smiles:
+				flagTXT.write(str(result['identifier'])+'\n')
+		with open(save_to_filepath+'/'+smiles_filenameTXT, 'w') as flagTXT:
+			for result in different_to_smiles:
+				flagTXT.write(str(result['identifier'])+'\t'+str(result['SMILES_difference'])+'\n')
+	else:
+		for smiles_filename in (smiles_filenameGCD, smiles_filenameTXT):
+			if os.path.exists(save_to_filepath+'/'+smiles_filename):
+				os.remove(save_to_filepath+'/'+smiles_filename)
 
 # ---------------------------------------------------------------------------------------------------------------------------
 
@@ -4,13 +4,12 @@ create_ASE_molecule_and_graph_from_CSD_molecule.py, Geoffrey Weal, 22/6/2022
 This script will convert the molecules in the crystal from CSD objects into ASE objects, and also creates molecule graphs of these molecules. 
 """
 
+import numpy as np
 from copy                       import deepcopy
-from ase                        import Atom, Atoms
+from ase                        import Atoms
 from itertools                  import permutations
 from networkx                   import Graph, relabel_nodes
 from SUMELF                     import get_hybridisation_from_CSD, get_bond_type_from_CSD
-from ACSD.ACSD.get_isotope_data import get_isotope_data
-isotopes = get_isotope_data()
 
 def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 	"""
@@ -57,24 +56,29 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 		CSD_atoms = component.atoms
 		CSD_bonds = component.bonds
 
-		# 5.3: Setup the ASE object for the molecule
-		ASE_molecule = Atoms()
+		# 5.3: Setup the arrays to record the elements, positions and charges of the atoms in the molecule.
+		#      * The ASE object for the molecule is created from these arrays once all the atoms have been obtained, rather than appending
+		#        each atom to the ASE object (which copies all the arrays in the ASE object every time an atom is appended).
+		symbols   = []
+		positions = np.empty((len(CSD_atoms), 3))
+		charges   = np.empty(len(CSD_atoms))
 
 		# 5.4: Initalise the graph for this molecule.
 		molecule_graph = Graph()
 
-		# 5.5: Initialise a list that indicates what H atoms in the molecules have not been given positions
-		non_coordinated_hydrogens = []
+		# 5.5: Initialise a set that indicates what H atoms in the molecules have not been given positions
+		non_coordinated_hydrogens = set()
 
 		# -----------------------------------------------------------------------------
 
 		# 5.6: Add the atoms to the molecule graph.
 		#      NOTE: all atom indices are related the index of the atom in the CSD object
-		atom_indices_for_graph = []
+		#      * recorded_atom_indices is a set of the atom indices in atom_indices_for_graph, so checking for double recorded atoms does not need to search through atom_indices_for_graph.
+		atom_indices_for_graph = []; recorded_atom_indices = set()
 		for atom in CSD_atoms:
 
 			# 3.6.1: Make sure the atom has not been double recorded in the atom_indices_for_graph list.
-			if atom.index in [index for (index, attr) in atom_indices_for_graph]:
+			if atom.index in recorded_atom_indices:
 				raise Exception('huh?')
 
 			# 3.6.2: Check if this atom has coordinates. If it does not, move on.
@@ -83,7 +87,7 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 			has_coord               = (atom.coordinates is not None)
 			if (not has_coord):
 				if element in ['H', 'D', 'T']:
-					non_coordinated_hydrogens.append(atom.index)
+					non_coordinated_hydrogens.add(atom.index)
 				continue
 
 			# 3.6.3: Collect all the information about this atom
@@ -96,14 +100,17 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 			hybridisation           = get_hybridisation_from_CSD(atom)
 			atom_information        = {'E': str(element), 'is_H_donor': is_H_donor, 'is_H_acceptor': is_H_acceptor, 'is_spiro_atom': is_spiro_atom, 'involved_in_no_of_rings': involved_in_no_of_rings, 'hybridisation': hybridisation, 'added_or_modified': False}
 
-			# 3.6.4: Create the ASE atom object for this atom
-			ase_atom = get_atom(element, position, charge, logger=logger)
+			# 3.6.4: Record the element, position and charge of this atom for the ASE object.
+			positions[len(symbols)] = position
+			charges  [len(symbols)] = charge
+			symbols.append(get_ASE_symbol(element, logger=logger))
 
-			# 3.6.5: Add the ASE atom object for this atom.
-			ASE_molecule.append(ase_atom)
-
-			# 3.6.6: Record the atom into the atom_indices_for_graph
+			# 3.6.5: Record the atom into the atom_indices_for_graph
 			atom_indices_for_graph.append((atom.index, atom_information))
+			recorded_atom_indices.add(atom.index)
+
+		# 3.6.6: Create the ASE object for the molecule from all its atoms at once.
+		ASE_molecule = Atoms(symbols=symbols, positions=positions[:len(symbols)], charges=charges[:len(symbols)])
 
 		# 3.7: Add the atoms from the molecule as nodes in the graph.
 		molecule_graph.add_nodes_from(atom_indices_for_graph)
@@ -112,7 +119,7 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 
 		# 3.8: Add the bonds to the molecule graph.
 		#      NOTE: all atom indices are related the index of the atom in the CSD object
-		bond_indices = []; bond_indices_for_graph = []
+		bond_indices = set(); bond_indices_for_graph = []
 		for bond in CSD_bonds:
 
 			# 3.8.1: Obtain the atoms involved in this bond. 
@@ -130,7 +137,7 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 			# 3.8.4: Check that this bond has not already been recorded.
 			if atoms_in_bond in bond_indices:
 				raise Exception('huh?')
-			bond_indices.append(atoms_in_bond)
+			bond_indices.add(atoms_in_bond)
 
 			# 3.8.5: Check that both atoms in the bond contain coordinates.
 			if all([(atom_index in non_coordinated_hydrogens) for atom_index in atoms_in_bond]):
@@ -214,59 +221,43 @@ def create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecule, logger=None):
 
 # =====================================================================================================================
 
-def get_atom(symbol, position, charge, logger=None):
+def get_ASE_symbol(symbol, logger=None):
 	"""
-	This method is designed to convert the input variable into an ASE atom object
+	This method is designed to convert the element of an atom from the CSD into the symbol to give to ASE.
+
+	Deuterium and Tritium atoms are given to ASE as hydrogen atoms. The mass of these atoms is not changed, so they are
+	given the mass of hydrogen (as was done when ASE atoms were created one at a time).
 
 	Parameters
 	----------
 	symbol : str.
 		This is the element of the atom
-	position: tuple of floats
-		This is the position of the atom
-	charge : float
-		This is the formal charge of the atom
 	logger : 
 		This is the log for recording what has been happening.
 
 	Returns
 	-------
-	ASE_molecules : ase.Atoms
-		This is the convert ASE object of the molecules of interest
-
+	symbol : str.
+		This is the symbol of the atom to give to ASE.
 	"""
 
-	# First, make a note of what hydrogen isotopes have been recorded in the long.
-	does_contain_deuterium = False
-	does_contain_tritium = False
-
-	# Second, if the atom is a Deuterium or Tritium atom, change the symbol to H (for hydrogen).
+	# First, if the atom is a Deuterium or Tritium atom, change the symbol to H (for hydrogen).
 	if   symbol == 'D':
 
-		# 2.1: This is a deuterium atom, set this as a hydrogen atom.
-		if (logger is not None) and (not does_contain_deuterium):
-			does_contain_deuterium = True
+		# 1.1: This is a deuterium atom, set this as a hydrogen atom.
+		if (logger is not None):
 			logger.info('This molecule contains Deuterium')
 		symbol = 'H'
-		mass = isotopes[1][2]['mass']
 
 	elif symbol == 'T':
 
-		# 2.2: This is a tritium atom, set this as a hydrogen atom.
-		if (logger is not None) and (not does_contain_tritium):
-			does_contain_tritium = True
+		# 1.2: This is a tritium atom, set this as a hydrogen atom.
+		if (logger is not None):
 			logger.info('This molecule contains Tritium')
 		symbol = 'H'
-		mass = isotopes[1][3]['mass']
-
-	# Third, create the ASE atom object
-	if symbol in ['D', 'T']:
-		ase_atom = Atom(symbol=symbol, position=position, charge=charge, mass=mass)
-	else:
-		ase_atom = Atom(symbol=symbol, position=position, charge=charge)
 
-	# Fourth, return ase_atom
-	return ase_atom
+	# Second, return the symbol
+	return symbol
 
 # =====================================================================================================================
 
@@ -3,44 +3,75 @@ get_crystals_from_CSD.py, 16/4/24
 
 This method will obtain the crystals associated with the given identifiers from the Cambridge Structral Database.
 """
-import os, sys
-from tqdm     import tqdm
-from shutil   import rmtree
-from filelock import FileLock
-
-import multiprocessing as mp
-from tqdm.contrib.concurrent import process_map
+import os, sys, math, signal
+from tqdm      import tqdm
+from shutil    import rmtree
+from functools import partial
 
 from ACSD.ACSD.get_crystals_from_CSD_methods.get_inputs                          import get_inputs
 from ACSD.ACSD.get_crystals_from_CSD_methods.get_crystal_from_CSD_single_process import get_crystal_from_CSD_single_process
-from ACSD.ACSD.get_crystals_from_CSD_methods.Integer                             import Integer
-from ACSD.ACSD.get_crystals_from_CSD_methods.CustomParallelLogger                import CustomParallelLogger
-
-def get_crystals_from_CSD(identifiers, save_crystals_to, overwrite_existing_crystal_files=True, no_of_cpus=1):
+from ACSD.ACSD.get_crystals_from_CSD_methods.record_result                       import record_result
+from ACSD.ACSD.get_crystals_from_CSD_methods.CustomParallelLogger                import CustomParallelLogger, get_log_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader                    import default_CSD_reader_factory, close_CSD_reader, read_CSD_reader_timings
+from ACSD.ACSD.get_crystals_from_CSD_methods.initialise_process                  import initialise_process
+from ACSD.ACSD.get_crystals_from_CSD_methods.filter_identifiers                  import filter_identifiers
+from ACSD.ACSD.get_crystals_from_CSD_methods.estimate_cost                       import estimate_cost, sort_identifiers_by_cost, read_processing_times
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore                        import ResultsStore, results_store_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file                  import remove_temporary_files
+from ACSD.ACSD.get_crystals_from_CSD_methods.ConversionCache                     import evict_from_conversion_cache
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_side_files                    import write_side_files, import_side_files
+from ACSD.ACSD.get_crystals_from_CSD_methods.prefilter_entry                     import get_filter_stage_report_lines
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalShards                       import CrystalShardWriter
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout             import check_layout
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultWriter                        import ResultWriter
+from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings                       import get_stage_timing_report_lines
+from ACSD.ACSD.get_crystals_from_CSD_methods.worker_status                       import create_worker_status_board, get_worker_status
+from ACSD.ACSD.get_crystals_from_CSD_methods.StatusReporter                      import StatusReporter, status_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.RecyclingPool                       import RecyclingPool, get_pool_context
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalResult                       import CrystalResult
+from ACSD.ACSD.get_crystals_from_CSD_methods.RunSettings                         import get_run_settings
+
+def get_crystals_from_CSD(identifiers, save_crystals_to, settings=None, reader_factory=default_CSD_reader_factory, stage_timing_report=None, **options):
 	"""
 	This method will obtain the crystals associated with the given identifiers from the Cambridge Structral Database.
-	
+
+	Each identifier is processed by get_crystal_from_CSD_single_process, which returns a CrystalResult.
+	The main process then uses these results to write the xyz files and to update the counts, the results store and the log file
+	on background threads (see ResultWriter.py), so processes do not need to share any counters or locks, and do not wait for the disk.
+
 	Parameters
 	----------
 	identifiers : list of str.
-		This is a list of the identifiers to obtain crystal files for. 
+		This is a list of the identifiers to obtain crystal files for.
 	save_crystals_to : str.
 		This is the folder to save crystal files to.
-	overwrite_existing_crystal_files : bool.
-		This boolean indicate if you want to overwrite already existing crystal files in the crystal database folder. Default: True.
-	no_cpus : int
-		This is the number of cpus you would like to use to process the ACSD. 
-		
+	settings : RunSettings or None
+		These are the settings of this run, like the number of cpus to use and the format to write crystals in (see RunSettings.py). If None, the settings are made from options. Default: None
+	reader_factory : callable
+		This method returns the reader to obtain entries from. One reader is opened per process and reused for every identifier. Default: default_CSD_reader_factory
+	stage_timing_report : dict. or None
+		If given, the timings of each stage of converting identifiers into crystals are recorded in this dictionary (see stage_timings.py), so they can be reported once the run has finished. Default: None
+	options : dict.
+		These are the options of this run, which are used instead of those in settings. See RunSettings.py for the options that can be given.
+
 	Return
 	------
 	no_of_crystals_recorded : int
 		This is the number of crystals that have been written to disk
-	flags : dit.
-		This dictionary contains all the information about flags to consider if a user is using this data.
+	no_of_excluded_crystals : int
+		This is the number of crystals that were excluded from being processed.
+	no_of_already_processed_crystals : int
+		This is the number of crystals that were skipped as they have already been recorded.
 	"""
 
-	# First, make a folder that contains the crystals that were found that contain segments from the segments list.
-	if overwrite_existing_crystal_files:
+	# First, obtain the settings of this run (these are only checked again if options are given), and obtain the processing
+	#        times from previous runs (before the crystal database folder is possibly removed).
+	settings = get_run_settings(settings, **options)
+	no_of_cpus = settings.no_cpus
+	previous_processing_times = read_processing_times(save_crystals_to) if (settings.cost_estimator == 'previous') else {}
+
+	# Second, make a folder that contains the crystals that were found that contain segments from the segments list.
+	if settings.overwrite_existing_crystal_files:
 		if os.path.exists(save_crystals_to):
 			rmtree(save_crystals_to)
 		os.makedirs(save_crystals_to)
@@ -48,174 +79,412 @@ def get_crystals_from_CSD(identifiers, save_crystals_to, overwrite_existing_crys
 		if not os.path.exists(save_crystals_to):
 			os.makedirs(save_crystals_to)
 
-	# Second, get the path to the crystals_not_written.txt to write identifiers to that the ACSD program attempted to 
-	#         write the crystal file for, but did not for some reason
-	path_to_crystals_not_written_TXT_file = save_crystals_to+'/'+'crystals_not_written.txt'
-
-	# Third, create the logger for recording messages about about programs run to the logfile.
-	'''
-	import logging
-	Log_Format = "%(levelname)s %(asctime)s - %(message)s"
-	filemode = 'w' if overwrite_existing_crystal_files else 'a'
-	logging.basicConfig(filename="ACSD_logfile.log",filemode=filemode,format=Log_Format,level=logging.NOTSET)
-	logger = logging.getLogger()
-	logger.info("==========================================================")
-	logger.info('Running ACSD Program'.upper())
-	'''
-	filemode = 'w' if overwrite_existing_crystal_files else 'a'
-	instant_write = True if (no_of_cpus == 1) else False
-	logger = CustomParallelLogger(filename="ACSD_logfile.log", filemode=filemode, instant_write=instant_write)
+	# Third, get the path to the file that each process records the timings of its CSD reader to.
+	path_to_CSD_reader_timings_file = save_crystals_to+'/'+'CSD_reader_timings.txt'
+	if os.path.exists(path_to_CSD_reader_timings_file):
+		os.remove(path_to_CSD_reader_timings_file)
+
+	# 3.1: Open the results store that records the result of every identifier, so this run can be resumed if it is stopped.
+	#      * Remove any temporary xyz files left by a previous run that was stopped while writing them.
+	results_store = ResultsStore(save_crystals_to+'/'+results_store_filename)
+	remove_temporary_files(save_crystals_to)
+
+	# 3.2: If the crystal database folder was made before the results store was used, record the results given in its side files in the results store.
+	if not results_store.existed:
+		import_side_files(results_store, save_crystals_to)
+
+	# 3.3: Make sure the crystal database folder has not been written using a different layout, and record the layout used in the results store.
+	try:
+		check_layout(results_store, settings.layout)
+	except Exception:
+		results_store.close()
+		raise
+
+	# 3.4: If crystals are to be written to binary shards, create the writer for the shards.
+	shard_writer = CrystalShardWriter(save_crystals_to, settings.crystals_per_shard) if (settings.output_format in ('npz', 'both')) else None
+
+	# Fourth, create the logger for recording messages about about programs run to the logfile.
+	#        * Only the main process writes to the log file. This is written by one thread, which opens the log file once (see CustomParallelLogger.py).
+	filemode = 'w' if settings.overwrite_existing_crystal_files else 'a'
+	try:
+		logger = CustomParallelLogger(filename=get_log_filename(settings.log_format), filemode=filemode, instant_write=False, level=settings.log_level, log_format=settings.log_format, max_log_size=settings.max_log_size, no_of_log_backups=settings.no_of_log_backups)
+	except Exception:
+		results_store.close()
+		raise
 	logger.info("==========================================================")
 	logger.info('Running ACSD Program'.upper())
 	logger.write()
 
-	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
-	# Fourth, obtain the crystals of interest from the CCDC. 
-
-	if no_of_cpus == 1: # If the user only wants to use 1 cpu, perform tasks without using multiprocessing
-
-		# 4.1.1: Make a record of the number of crystals that have been recorded.
-		no_of_crystals_recorded = Integer(0)
-
-		# 4.1.2: Make a record of the number of crystals that have been excluded from being processed.
-		no_of_excluded_crystals = Integer(0)
-
-		# 4.1.3: Make a record of the number of crystals that have been skipped as they have already been recorded. 
-		no_of_already_processed_crystals = Integer(0)
-
-		# 4.1.4: Set this lock to None, we dont need to use it for single cpu processes. 
-		crystals_not_written_lock = Empty_With()
-
-		# 4.1.5: Set this lock to None, we dont need to use it for single cpu processes. 
-		could_not_find_identifiers_lock = Empty_With()
-
-		# 4.1.6: Set this lock to None, we dont need to use it for single cpu processes. 
-		no_coordinates_given_lock = Empty_With()
-
-		# 4.1.7: Set this lock to None, we dont need to use it for single cpu processes. 
-		rejected_crystals_lock = Empty_With()
-
-		# 4.1.8: Set this lock to None, we dont need to use it for single cpu processes. 
-		crystal_quality_information_lock = Empty_With()
-
-		# 4.1.9: Set this lock to None, we dont need to use it for single cpu processes. 
-		logger_lock = Empty_With()
-
-		# 4.1.10: Get the input generator.
-		inputs = get_inputs(identifiers, overwrite_existing_crystal_files, no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals, save_crystals_to, crystals_not_written_lock, could_not_find_identifiers_lock, no_coordinates_given_lock, rejected_crystals_lock, crystal_quality_information_lock, logger, logger_lock, False)
-
-		# 4.1.11: Create a progress bar for running this task.
-		with tqdm(inputs, total=len(identifiers), unit='identifier', desc='Obtaining Crystals from CCDC') as pbar:
-
-			# 4.1.11.1: For each comparison of molecules.
-			for input_data in pbar:
-
-				# 4.1.11.2: Get the identifier from input_data.
-				identifier = input_data[0]
-
-				# 4.1.11.3: If identifier startswith #, make a note and remove the #.
-				move_on_tag = identifier.startswith('#')
-				if move_on_tag:
-					identifier = identifier[1:]
-
-				# 4.1.11.4: Update the progress bar.
-				description = 'Processing: '+str(identifier)
-				pbar.set_description(description)
-
-				# 4.1.11.5: If move_on_tag is true, move on
-				if move_on_tag:
-					no_of_excluded_crystals.value += 1
-					no_of_crystals_recorded.value += 1
-					continue
-
-				# 4.1.11.6: If you have chosen not to override the files in save_crystals_to, and you can find identifier.xyz in save_crystals_to, move on
-				if (not overwrite_existing_crystal_files) and (identifier+'.xyz' in os.listdir(save_crystals_to)):
-					pbar.set_description(f'Found {identifier}.xyz. Continuing on to the next identifier.')
-					no_of_already_processed_crystals += 1
-					no_of_crystals_recorded.value    += 1
-					continue
-
-				# 4.1.11.7: Obtain the crystal from the CCDC database. 
-				get_crystal_from_CSD_single_process(input_data)
-
-		# 4.1.12: Convert "no_of_crystals_recorded" from a mp.Value object to a int variable.
-		no_of_crystals_recorded = int(no_of_crystals_recorded.value)
-
-		# 4.1.13: Convert "no_of_excluded_crystals" from a mp.Value object to a int variable.
-		no_of_excluded_crystals = int(no_of_excluded_crystals.value)
-
-		# 4.1.14: Convert "no_of_already_processed_crystals" from a mp.Value object to a int variable.
-		no_of_already_processed_crystals = int(no_of_already_processed_crystals.value)
-
+	# Fifth, make a record of the number of identifiers that have been given each status (see CrystalResult.py), the
+	#        number of entries checked and rejected, and the time taken, by each stage of checks (see prefilter_entry.py),
+	#        and the timings of each stage of converting identifiers into crystals (see stage_timings.py).
+	counts = {}
+	filter_stage_report = {}
+	stage_timing_report = {} if (stage_timing_report is None) else stage_timing_report
+
+	# Sixth, remove the identifiers that have been excluded or (if not overwriting) already processed, and record these as skipped.
+	#        * The identifiers already processed are obtained from the results store once here, so skipped identifiers are not given to the processes.
+	#        * Identifiers given one of the statuses in retry_statuses in a previous run (like 'timeout') are processed again.
+	identifiers, skipped_results = filter_identifiers(identifiers, save_crystals_to, settings.overwrite_existing_crystal_files, results_store, retry_statuses=settings.retry_statuses)
+	for result in skipped_results:
+		record_result(result, counts, logger, results_store)
+	if len(skipped_results) > 0:
+		print(f'Skipping {len(skipped_results)} identifiers that have been excluded or already processed', file=sys.stderr)
+
+	# Seventh, obtain the settings that are the same for every identifier, if these are to be given once to each process.
+	process_settings = (save_crystals_to, settings.path_to_cache, settings.elements_to_reject, settings.output_format, settings.profile_identifiers, settings.log_level) if settings.settings_given_to_processes else None
+
+	# 7.1: Start the threads that write the xyz files and record the results of identifiers in the main process.
+	#      * If results are to be recorded in the order the identifiers were given, only one thread is used.
+	record = partial(record_result, counts=counts, logger=logger, results_store=results_store, filter_stage_report=filter_stage_report, shard_writer=shard_writer, stage_timing_report=stage_timing_report)
+	result_writer = ResultWriter(record, save_crystals_to, settings.layout, max_queue_size=settings.write_queue_size, no_of_threads=(1 if settings.ordered else settings.no_of_writer_threads))
+
+	# 7.2: Create the worker status board, where each process records the identifier it is converting and the stage it is in (see worker_status.py).
+	#      * This has more slots than processes, so processes that replace processes that have ended can also claim a slot.
+	#      * This is made using the same multiprocessing context that starts the processes in the pool (see RecyclingPool.get_pool_context).
+	pool_context = get_pool_context()
+	worker_status_board = create_worker_status_board(2 * no_of_cpus, context=pool_context)
+
+	# 7.3: If desired, start the thread that writes the status of this run to the status file every status_interval seconds.
+	if settings.status_interval is not None:
+		status_reporter = StatusReporter(save_crystals_to+'/'+status_filename, len(identifiers), counts, result_writer.record_lock, status_interval=settings.status_interval, result_writer=result_writer, worker_status_board=worker_status_board, filter_stage_report=filter_stage_report, stage_timing_report=stage_timing_report)
+		status_reporter.start()
 	else:
+		status_reporter = None
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+	# Eighth, obtain the crystals of interest from the CCDC.
+	#         * The results store is closed (and the side files written) even if the ACSD program is stopped, so the run can be resumed from where it stopped.
+	try:
+
+		if (no_of_cpus == 1) and (settings.timeout is None): # If the user only wants to use 1 cpu, perform tasks without using multiprocessing
+			#                                         * The order that identifiers are processed in does not matter for one cpu, so the cost of identifiers is not estimated.
+			#                                         * If a timeout is given, a pool with one process is used, so an identifier that takes too long can be stopped.
+
+			# 8.1.1: Get the input generator.
+			inputs = get_inputs(identifiers, save_crystals_to, settings.path_to_cache, settings.settings_given_to_processes, settings.elements_to_reject, settings.output_format, settings.profile_identifiers, settings.log_level)
+
+			# 8.1.2: Open the CSD reader for this process, and give it the settings that are the same for every identifier.
+			initialise_process(reader_factory, path_to_CSD_reader_timings_file, process_settings, worker_status_board)
+
+			# 8.1.3: Create a progress bar for running this task.
+			with tqdm(inputs, total=len(identifiers), unit='identifier', desc='Obtaining Crystals from CCDC') as pbar:
+
+				# 8.1.3.1: For each identifier.
+				for input_data in pbar:
+
+					# 8.1.3.2: Update the progress bar.
+					identifier  = input_data if settings.settings_given_to_processes else input_data[0]
+					description = 'Processing: '+str(identifier)
+					pbar.set_description(description)
+
+					# 8.1.3.3: Obtain the crystal from the CCDC database.
+					result = get_crystal_from_CSD_single_process(input_data)
+
+					# 8.1.3.4: Give the result for this identifier to the writer threads, and show the number of results waiting to be written.
+					result_writer.put(result)
+					pbar.set_postfix(write_queue=result_writer.qsize(), refresh=False)
+
+			# 8.1.4: Close the CSD reader for this process.
+			close_CSD_reader()
+
+		else:
+
+			# 8.2.1: Determine the number of identifiers to give to a process at a time.
+			#        * If the most costly identifiers are given first, give identifiers to processes one at a time (unless told otherwise),
+			#          so that the most costly identifiers are spread across all the processes.
+			chunksize = settings.chunksize
+			if (settings.cost_estimator is not None) and (chunksize == 'auto'):
+				chunksize = 1
+			chunksize = get_chunksize(chunksize, len(identifiers), no_of_cpus)
+
+			# 8.2.2: Create the pool.
+			#        * Each process in the pool opens its own CSD reader once (using initialise_process) and reuses it for every identifier it is given.
+			#        * If settings_given_to_processes is True, the settings that are the same for every identifier are also only given once to each process.
+			#        * If a timeout is given, a process that takes longer than timeout seconds to convert an identifier is stopped and replaced with a
+			#          new process, and the identifier is recorded with the status 'timeout' (see RecyclingPool.py). The other processes carry on converting identifiers.
+			#        * If a process ends unexpectedly (for example, if it runs out of memory or crashes), it is replaced with a new process, and the
+			#          identifier it was converting is recorded with the status 'failed'. The other processes carry on converting identifiers.
+			#        * Processes are started by a forkserver rather than forked from the main process, as new processes are started while the
+			#          writer, logger and status threads of the main process are running (see RecyclingPool.get_pool_context).
+			initargs = (reader_factory, path_to_CSD_reader_timings_file, process_settings, worker_status_board)
+			pool = RecyclingPool(no_of_cpus, initializer=initialise_process, initargs=initargs, timeout=settings.timeout, context=pool_context)
+			result_options = {'settings_given_to_processes': settings.settings_given_to_processes, 'worker_status_board': worker_status_board, 'log_level': settings.log_level}
+			pool_options = {'on_timeout': partial(get_timeout_result, timeout=settings.timeout, **result_options), 'on_failure': partial(get_failed_result, **result_options)}
+			try:
+
+				# 8.2.3: If desired, estimate the cost of each identifier and sort the identifiers so that the most costly identifiers are processed first.
+				#        * This keeps all the processes busy until the end, rather than ending with one process working on a very large crystal.
+				if settings.cost_estimator is not None:
+					if settings.cost_estimator == 'previous':
+						costs = previous_processing_times
+					else:
+						estimate_inputs = ((identifier, settings.cost_estimator) for identifier in identifiers)
+						estimate_options = {'on_timeout': get_cost_of_timed_out_estimate, 'on_failure': get_cost_of_failed_estimate}
+						costs = dict(tqdm(pool.imap_unordered(estimate_cost, estimate_inputs, chunksize=get_chunksize('auto', len(identifiers), no_of_cpus), **estimate_options), total=len(identifiers), unit='identifier', desc='Estimating cost of identifiers'))
+					identifiers = sort_identifiers_by_cost(identifiers, costs)
+
+				# 8.2.4: Get the input generator.
+				#        * Identifiers are only given to the pool while fewer than max_in_flight identifiers are waiting to be converted or written,
+				#          so processes do not convert crystals much faster than they can be written. This is always larger than the number of
+				#          identifiers given to each process at a time, so every process can always be given identifiers.
+				inputs = get_inputs(identifiers, save_crystals_to, settings.path_to_cache, settings.settings_given_to_processes, settings.elements_to_reject, settings.output_format, settings.profile_identifiers, settings.log_level)
+				max_in_flight = settings.write_queue_size + 2 * chunksize * no_of_cpus
+				inputs = result_writer.throttle(inputs, max_in_flight)
+
+				# 8.2.5: Obtain the crystal from the CCDC database, giving the result of each identifier to the writer threads as it is returned from the pool.
+				#        * If ordered is False, results are recorded as soon as they are finished, so a slow identifier does not hold up the results of others.
+				#        * The number of results waiting to be written is shown in the progress bar.
+				print(f'Obtaining Crystal xyz files from the CCDC using {no_of_cpus} cpus (chunksize = {chunksize})', file=sys.stderr)
+				pool_imap = pool.imap if settings.ordered else pool.imap_unordered
+				with tqdm(total=len(identifiers), unit='identifier', desc='Obtaining Crystals from CCDC') as pbar:
+					for result in pool_imap(get_crystal_from_CSD_single_process, inputs, chunksize=chunksize, **pool_options):
+						result_writer.put(result)
+						pbar.set_postfix(write_queue=result_writer.qsize(), refresh=False)
+						pbar.update()
+
+				# 8.2.6: Use close and join (rather than terminate) so that each process closes its CSD reader as it exits.
+				pool.close()
+				pool.join()
+
+				# 8.2.7: Record the number of processes that were replaced after taking longer than timeout seconds to convert an identifier, or after ending unexpectedly.
+				if settings.timeout is not None:
+					logger.info(f'{pool.no_of_processes_timed_out} processes were stopped and replaced after taking longer than {settings.timeout} s to convert an identifier')
+				if pool.no_of_processes_ended > 0:
+					logger.warning(f'{pool.no_of_processes_ended} processes ended unexpectedly and were replaced')
+
+			except BaseException:
+				pool.terminate()
+				raise
+
+	finally:
+
+		# 8.3: Wait for the writer threads to write and record the results that are waiting to be written.
+		try:
+			result_writer.close()
+
+		# 8.4: Write the remaining crystals to a binary shard, commit the remaining results to the results store, write the side files from the results store, and close the results store.
+		finally:
+			if shard_writer is not None:
+				shard_writer.flush()
+			results_store.commit()
+			if settings.write_side_files_to_disk:
+				write_side_files(results_store, save_crystals_to)
+			results_store.close()
+
+			# 8.5: Write the final status of this run to the status file.
+			if status_reporter is not None:
+				status_reporter.close('stopped' if (sys.exc_info()[0] is not None) else 'finished')
+
+			# 8.6: If the ACSD program was stopped, write the remaining log information to the log file and close it.
+			if sys.exc_info()[0] is not None:
+				logger.close()
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	# Ninth, obtain the number of crystals that were recorded, excluded, and already processed.
+	#          * no_of_crystals_recorded also includes the excluded and already processed crystals.
+	no_of_excluded_crystals          = counts.get('excluded', 0)
+	no_of_already_processed_crystals = counts.get('already_processed', 0)
+	no_of_crystals_recorded          = counts.get('recorded', 0) + no_of_excluded_crystals + no_of_already_processed_crystals
+
+	# Tenth, write the timings of the CSD readers for each process to the log file.
+	for timings in read_CSD_reader_timings(path_to_CSD_reader_timings_file):
+		logger.info(f"CSD reader (pid {timings['pid']}): opened in {timings['open_time']:.3f} s, {timings['no_of_lookups']} lookups taking {timings['lookup_time']:.3f} s in total")
+
+	# 10.1: Report the number of entries checked and rejected, and the time taken, by each stage of checks.
+	for line in get_filter_stage_report_lines(filter_stage_report):
+		logger.info(line)
+		print(line, file=sys.stderr)
+
+	# 10.2: Write the timings of each stage of converting identifiers into crystals, and the slowest identifiers, to the log file.
+	for line in get_stage_timing_report_lines(stage_timing_report):
+		logger.info(line)
+
+	# 10.3: If a conversion cache was used, record how many crystals were obtained from it, and remove the least recently used crystals if the cache is too large.
+	if settings.path_to_cache is not None:
+		logger.info(f"Conversion cache: {counts.get('from_cache', 0)} of {counts.get('recorded', 0)} recorded crystals were obtained from {settings.path_to_cache}")
+		if settings.max_cache_size is not None:
+			no_of_files_removed = evict_from_conversion_cache(settings.path_to_cache, settings.max_cache_size)
+			logger.info(f"Conversion cache: removed {no_of_files_removed} least recently used crystals to keep the cache below {settings.max_cache_size} bytes")
+
+	# Eleventh, write the ending message to the log file
+	logger.info("==========================================================")
+	logger.info('Ended ACSD Program'.upper())
+	logger.info("==========================================================")
+	logger.close()
 
-		# 4.2.1: Create the manager to save lists to.
-		with mp.Manager() as manager:
+	# Twelfth, return the number of crystals that were recorded
+	return no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals
 
-			# 4.2.2: Make a record of the number of crystals that have been recorded.
-			no_of_crystals_recorded = manager.Value('i', 0)
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------
 
-			# 4.2.3: Make a record of the number of crystals that have been excluded from being processed.
-			no_of_excluded_crystals = Integer(0)
+def get_chunksize(chunksize, no_of_identifiers, no_of_cpus):
+	"""
+	This method will determine the number of identifiers to give to a process at a time.
 
-			# 4.2.4: Make a record of the number of crystals that have been skipped as they have already been recorded. 
-			no_of_already_processed_crystals = manager.Value('i', 0)
+	Parameters
+	----------
+	chunksize : int or 'auto'
+		This is the chunksize requested by the user. If 'auto', the chunksize is chosen so that each cpu is given about four chunks (as is done by multiprocessing.Pool.map).
+	no_of_identifiers : int
+		This is the number of identifiers to process.
+	no_of_cpus : int
+		This is the number of cpus to use.
+
+	Returns
+	-------
+	chunksize : int
+		This is the number of identifiers to give to a process at a time.
+	"""
+	if chunksize == 'auto':
+		chunksize = math.ceil(no_of_identifiers / (4 * no_of_cpus))
+	return max(1, int(chunksize))
 
-			# 4.2.5: Create a lock for writing information to "crystals_not_written.txt"
-			crystals_not_written_lock = manager.Lock()
+def get_timeout_result(input_data, elapsed_time, pid, timeout, settings_given_to_processes, worker_status_board, log_level):
+	"""
+	This method will give the result for an identifier that took longer than timeout seconds to convert (see RecyclingPool.py).
 
-			# 4.2.6: Create a lock for writing information to "could_not_find_identifiers.txt"
-			could_not_find_identifiers_lock = manager.Lock()
+	This is run by the main process before the process converting the identifier is stopped, so the stage that
+	the process was in can still be obtained from the worker status board (see worker_status.py).
 
-			# 4.2.7: Create a lock for writing information to "no_coordinates_given.txt"
-			no_coordinates_given_lock = manager.Lock()
+	Parameters
+	----------
+	input_data : str. or tuple
+		This is the input that was given to the process for this identifier (see get_inputs.py).
+	elapsed_time : float
+		This is the time (in seconds) that the process has spent converting this identifier.
+	pid : int
+		This is the id of the process converting this identifier.
+	timeout : float
+		This is the longest time (in seconds) to spend converting one identifier.
+	settings_given_to_processes : bool.
+		If True, input_data is the identifier. If False, the identifier is the first item of input_data.
+	worker_status_board : multiprocessing.Array
+		This is the worker status board.
+	log_level : str.
+		Only log events at or above this level are written to the log file (see CustomParallelLogger.py).
+
+	Returns
+	-------
+	result : CrystalResult
+		This is the result for this identifier, with the status 'timeout'.
+	"""
 
-			# 4.2.8: Create a lock for writing information to "rejected_crystals.txt"
-			rejected_crystals_lock = manager.Lock()
+	# First, obtain the identifier, and the stage the process was in.
+	identifier     = input_data if settings_given_to_processes else input_data[0]
+	process_status = get_worker_status(worker_status_board, pid)
+	stage          = process_status['stage'] if (process_status is not None) else None
 
-			# 4.2.9: Create a lock for writing information to crystal_quality_information files
-			crystal_quality_information_lock = manager.Lock()
+	# Second, record why this identifier was not converted in the log file.
+	#         * The events the process recorded for this identifier are lost when the process is stopped, so only this event is written to the log file.
+	reason = f'Took longer than {timeout} s to convert (stopped after {elapsed_time:.1f} s in stage {stage})'
+	logger = CustomParallelLogger(instant_write=False, identifier=identifier, level=log_level)
+	logger.pid = pid
+	logger.error(reason, stage=stage, duration=elapsed_time)
 
-			# 4.2.10: Create a lock for when the lower runs.
-			logger_lock = manager.Lock()
+	# Third, return the result for this identifier.
+	return CrystalResult(identifier, status='timeout', reason=reason, log_lines=logger.temp_information, timings={'total': elapsed_time})
 
-			# 4.2.11: Get the input generator.
-			inputs = get_inputs(identifiers, overwrite_existing_crystal_files, no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals, save_crystals_to, crystals_not_written_lock, could_not_find_identifiers_lock, no_coordinates_given_lock, rejected_crystals_lock, crystal_quality_information_lock, logger, logger_lock, True)
+def get_failed_result(input_data, elapsed_time, pid, exitcode, settings_given_to_processes, worker_status_board, log_level):
+	"""
+	This method will give the result for an identifier whose process ended unexpectedly while converting it (see RecyclingPool.py).
+
+	This is run by the main process before the process that ended is replaced, so the stage that the process was in can
+	still be obtained from the worker status board (see worker_status.py).
 
-			# 4.2.12: Obtain the crystal from the CCDC database.
-			print(f'Obtaining Crystal xyz files from the CCDC using {no_of_cpus} cpus', file=sys.stderr)
-			process_map(get_crystal_from_CSD_single_process, inputs, total=len(identifiers), unit='identifier', desc='Obtaining Crystals from CCDC', max_workers=no_of_cpus)
-			# = mp.Pool(processes=no_of_cpus)
-			#pool.map_async(get_crystal_from_CSD_single_process, tqdm(inputs, total=len(identifiers), unit='identifier', desc='Obtaining Crystals from CCDC'))
-			#pool.close()
-			#pool.join()
+	Parameters
+	----------
+	input_data : str. or tuple
+		This is the input that was given to the process for this identifier (see get_inputs.py).
+	elapsed_time : float
+		This is the time (in seconds) that the process spent converting this identifier before it ended.
+	pid : int
+		This is the id of the process that was converting this identifier.
+	exitcode : int or None
+		This is the exitcode of the process. This is negative if the process was ended by a signal (for example, -9 if it was killed for running out of memory).
+	settings_given_to_processes : bool.
+		If True, input_data is the identifier. If False, the identifier is the first item of input_data.
+	worker_status_board : multiprocessing.Array
+		This is the worker status board.
+	log_level : str.
+		Only log events at or above this level are written to the log file (see CustomParallelLogger.py).
+
+	Returns
+	-------
+	result : CrystalResult
+		This is the result for this identifier, with the status 'failed'.
+	"""
 
-			# 4.2.13: Convert "no_of_crystals_recorded" from a mp.Value object to a int variable.
-			no_of_crystals_recorded = int(no_of_crystals_recorded.value)
+	# First, obtain the identifier, the stage the process was in, and the signal that ended the process (if it was ended by a signal).
+	identifier     = input_data if settings_given_to_processes else input_data[0]
+	process_status = get_worker_status(worker_status_board, pid)
+	stage          = process_status['stage'] if (process_status is not None) else None
+	exit_reason    = f'exitcode {exitcode}'
+	if (exitcode is not None) and (exitcode < 0):
+		try:
+			exit_reason += f', {signal.Signals(-exitcode).name}'
+		except ValueError:
+			pass
+
+	# Second, record why this identifier was not converted in the log file.
+	#         * The events the process recorded for this identifier are lost when the process ends, so only this event is written to the log file.
+	reason = f'The process converting this identifier ended unexpectedly ({exit_reason}) after {elapsed_time:.1f} s in stage {stage}'
+	logger = CustomParallelLogger(instant_write=False, identifier=identifier, level=log_level)
+	logger.pid = pid
+	logger.error(reason, stage=stage, duration=elapsed_time)
+
+	# Third, return the result for this identifier.
+	return CrystalResult(identifier, status='failed', reason=reason, log_lines=logger.temp_information, timings={'total': elapsed_time})
+
+def get_cost_of_timed_out_estimate(input_data, elapsed_time, pid):
+	"""
+	This method will give the cost of an identifier whose cost took longer than the timeout to estimate (see estimate_cost.py).
 
-			# 4.2.14: Convert "no_of_excluded_crystals" from a mp.Value object to a int variable.
-			no_of_excluded_crystals = int(no_of_excluded_crystals.value)
+	This identifier is given a cost of 0, so it is converted last.
 
-			# 4.2.15: Convert "no_of_already_processed_crystals" from a mp.Value object to a int variable.
-			no_of_already_processed_crystals = int(no_of_already_processed_crystals.value)
+	Parameters
+	----------
+	input_data : tuple
+		This is the identifier and the cost estimator that were given to the process.
+	elapsed_time : float
+		This is the time (in seconds) that the process spent estimating the cost of this identifier.
+	pid : int
+		This is the id of the process that was estimating the cost of this identifier.
+
+	Returns
+	-------
+	identifier : str.
+		This is the identifier.
+	cost : float
+		This is the cost of this identifier.
+	"""
+	return input_data[0], 0.0
 
-	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
+def get_cost_of_failed_estimate(input_data, elapsed_time, pid, exitcode):
+	"""
+	This method will give the cost of an identifier whose process ended unexpectedly while estimating its cost (see estimate_cost.py).
 
-	# Fifth, write the ending message to the log file
-	logger.info("==========================================================")
-	logger.info('Ended ACSD Program'.upper())
-	logger.info("==========================================================")
-	logger.write()
+	This identifier is given a cost of 0, so it is converted last.
 
-	# Sixth, return the number of crystals that were recorded
-	return int(no_of_crystals_recorded), int(no_of_excluded_crystals), int(no_of_already_processed_crystals) #, flags
+	Parameters
+	----------
+	input_data : tuple
+		This is the identifier and the cost estimator that were given to the process.
+	elapsed_time : float
+		This is the time (in seconds) that the process spent estimating the cost of this identifier before it ended.
+	pid : int
+		This is the id of the process that was estimating the cost of this identifier.
+	exitcode : int or None
+		This is the exitcode of the process.
+
+	Returns
+	-------
+	identifier : str.
+		This is the identifier.
+	cost : float
+		This is the cost of this identifier.
+	"""
+	return input_data[0], 0.0
 
 # ---------------------------------------------------------------------------------------------------------------------------------------------------------
-
-class Empty_With():
-    def __init__(self):
-    	pass
-    def __enter__(self):
-        return self
-    def __exit__(self, exception_type, exception_value, exception_traceback):
-    	pass
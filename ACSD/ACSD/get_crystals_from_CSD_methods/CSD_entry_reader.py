@@ -0,0 +1,178 @@
+"""
+CSD_entry_reader.py, Geoffrey Weal, 17/10/26
+
+This script holds the CSD entry reader that each process uses to obtain entries from the Cambridge Structural Database.
+
+The reader is opened once per process (by initialise_CSD_reader, which is given as the initializer of the process pool)
+and is reused for every identifier that process handles, rather than opening the CSD for every identifier.
+"""
+import os, time
+from multiprocessing.util import Finalize
+
+# These are the reader and the timing information for the reader of this process.
+_CSD_reader           = None
+_CSD_reader_timings   = None
+_path_to_timings_file = None
+
+def default_CSD_reader_factory():
+	"""
+	This method will open the CSD using the CCDC entry reader.
+
+	Returns
+	-------
+	csd_reader : ccdc.io.EntryReader
+		This is the reader for obtaining entries from the CSD.
+	"""
+	from ccdc.io import EntryReader
+	return EntryReader('CSD')
+
+def initialise_CSD_reader(reader_factory=default_CSD_reader_factory, path_to_timings_file=None):
+	"""
+	This method will open the reader for this process. This method is designed to be given as the initializer of a process pool.
+
+	Parameters
+	----------
+	reader_factory : callable
+		This method returns the reader to obtain entries from. The reader must have an "entry(identifier)" method. Default: default_CSD_reader_factory
+	path_to_timings_file : str. or None
+		This is the path to the file to record the timings for this reader to when the reader is closed. If None, timings are not written to disk. Default: None
+	"""
+	global _CSD_reader, _CSD_reader_timings, _path_to_timings_file
+
+	# First, close any reader that is already open in this process.
+	if _CSD_reader is not None:
+		close_CSD_reader()
+
+	# Second, open the reader, recording how long it took to open.
+	start_time  = time.perf_counter()
+	_CSD_reader = reader_factory()
+	open_time   = time.perf_counter() - start_time
+
+	# Third, initialise the timings for this reader.
+	_CSD_reader_timings   = {'pid': os.getpid(), 'open_time': open_time, 'no_of_lookups': 0, 'lookup_time': 0.0}
+	_path_to_timings_file = path_to_timings_file
+
+	# Fourth, make sure the reader is closed when this process exits.
+	#         * Pool workers do not run atexit handlers, but they do run multiprocessing finalizers.
+	Finalize(None, close_CSD_reader, exitpriority=10)
+
+def get_CSD_reader():
+	"""
+	This method will return the reader for this process, opening it with the default reader factory if it has not been opened yet.
+
+	Returns
+	-------
+	csd_reader : ccdc.io.EntryReader
+		This is the reader for obtaining entries from the CSD.
+	"""
+	if _CSD_reader is None:
+		initialise_CSD_reader()
+	return _CSD_reader
+
+def get_entry_from_CSD(identifier):
+	"""
+	This method will obtain the entry for the identifier from the reader for this process.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier of the entry to obtain from the CSD.
+
+	Returns
+	-------
+	entry_object : ccdc.entry.Entry
+		This is the entry for the identifier.
+	"""
+
+	# First, get the reader for this process.
+	csd_reader = get_CSD_reader()
+
+	# Second, obtain the entry, recording how long the lookup took (even if the lookup fails).
+	start_time = time.perf_counter()
+	try:
+		entry_object = csd_reader.entry(identifier)
+	finally:
+		_CSD_reader_timings['no_of_lookups'] += 1
+		_CSD_reader_timings['lookup_time']   += time.perf_counter() - start_time
+
+	# Third, return the entry.
+	return entry_object
+
+def get_CSD_reader_timings():
+	"""
+	This method will return the timings for the reader of this process.
+
+	Returns
+	-------
+	timings : dict. or None
+		This dictionary contains the process id, the time taken to open the reader, the number of lookups and the total time taken for lookups. None if no reader has been opened.
+	"""
+	if _CSD_reader_timings is None:
+		return None
+	return dict(_CSD_reader_timings)
+
+def close_CSD_reader():
+	"""
+	This method will close the reader for this process, and write its timings to disk if desired.
+	"""
+	global _CSD_reader, _CSD_reader_timings, _path_to_timings_file
+
+	# First, if there is no reader open, there is nothing to do.
+	if _CSD_reader is None:
+		return
+
+	# Second, close the reader if it can be closed.
+	if hasattr(_CSD_reader, 'close'):
+		_CSD_reader.close()
+
+	# Third, write the timings for this reader to disk.
+	if _path_to_timings_file is not None:
+		write_CSD_reader_timings(_path_to_timings_file, _CSD_reader_timings)
+
+	# Fourth, reset the reader for this process.
+	_CSD_reader           = None
+	_CSD_reader_timings   = None
+	_path_to_timings_file = None
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def write_CSD_reader_timings(path_to_timings_file, timings):
+	"""
+	This method will append the timings of a reader to the timings file.
+
+	Parameters
+	----------
+	path_to_timings_file : str.
+		This is the path to the timings file.
+	timings : dict.
+		These are the timings for the reader.
+	"""
+	# Each line is short and written in a single append, so lines from different processes do not interleave.
+	line = '\t'.join([str(timings['pid']), f"{timings['open_time']:.6f}", str(timings['no_of_lookups']), f"{timings['lookup_time']:.6f}"])+'\n'
+	with open(path_to_timings_file, 'a') as timingsTXT:
+		timingsTXT.write(line)
+
+def read_CSD_reader_timings(path_to_timings_file):
+	"""
+	This method will read the timings of all the readers from the timings file.
+
+	Parameters
+	----------
+	path_to_timings_file : str.
+		This is the path to the timings file.
+
+	Returns
+	-------
+	all_timings : list of dict.
+		These are the timings for each reader recorded in the timings file.
+	"""
+	all_timings = []
+	if not os.path.exists(path_to_timings_file):
+		return all_timings
+	with open(path_to_timings_file, 'r') as timingsTXT:
+		for line in timingsTXT:
+			pid, open_time, no_of_lookups, lookup_time = line.rstrip().split('\t')
+			all_timings.append({'pid': int(pid), 'open_time': float(open_time), 'no_of_lookups': int(no_of_lookups), 'lookup_time': float(lookup_time)})
+	return all_timings
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
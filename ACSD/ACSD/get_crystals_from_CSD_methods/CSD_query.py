@@ -0,0 +1,263 @@
+"""
+CSD_query.py, Geoffrey Weal, 17/10/26
+
+These methods will obtain the identifiers of the entries in the Cambridge Structural Database that match a query, rather than reading identifiers from gcd files.
+
+A query is given as a text file, where each line is given as "setting: value". Lines that start with "#" are ignored. For example:
+
+	# Crystals containing a carboxylic acid, with no disorder and an R-factor below 5%.
+	SMARTS: C(=O)[OH]
+	no_disorder: True
+	max_R_factor: 5.0
+	must_not_have_elements: Br I
+
+The settings that can be given are:
+
+	* SMARTS:                 Only obtain entries that contain this substructure. Default: None (do not search for a substructure)
+	* formula:                Only obtain entries with this chemical formula (as given by the CSD, for example "C6 H6"). Default: None
+	* must_have_elements:     Only obtain entries that contain all of these elements (separated by spaces). Default: None
+	* must_not_have_elements: Only obtain entries that do not contain any of these elements (separated by spaces). Default: None
+	* only_organic:           Only obtain entries that are organic, not polymeric, and do not contain any metals. Default: True
+	* no_disorder:            Only obtain entries that do not contain disorder. Default: False
+	* max_R_factor:           Only obtain entries with an R-factor (in %) below this. Default: None
+	* has_3d_coordinates:     Only obtain entries that have 3D coordinates. Default: True
+
+The "only_organic" and "has_3d_coordinates" settings are given to the CSD search, so entries that would be rejected by
+get_crystal_from_CSD_single_process (for being polymeric, organometallic, containing a metal or not being organic, or
+for having no coordinates) are never given to the processes.
+"""
+
+# These are the settings that can be given in a query, and their default values.
+default_query = {'SMARTS': None, 'formula': None, 'must_have_elements': None, 'must_not_have_elements': None, 'only_organic': True, 'no_disorder': False, 'max_R_factor': None, 'has_3d_coordinates': True}
+
+# These are the types of each setting that can be given in a query.
+query_setting_types = {'SMARTS': str, 'formula': str, 'must_have_elements': list, 'must_not_have_elements': list, 'only_organic': bool, 'no_disorder': bool, 'max_R_factor': float, 'has_3d_coordinates': bool}
+
+def read_query(path_to_query):
+	"""
+	This method will read the query from a query file.
+
+	Parameters
+	----------
+	path_to_query : str.
+		This is the path to the query file.
+
+	Returns
+	-------
+	query : dict.
+		These are the settings of the query. Settings not given in the query file are given their default values.
+	"""
+
+	# First, initialise the query with the default settings.
+	query = dict(default_query)
+
+	# Second, read each setting from the query file.
+	with open(path_to_query, 'r') as queryTXT:
+		for line in queryTXT:
+
+			# 2.1: If line starts with # or is empty, do not read the line.
+			line = line.strip()
+			if (len(line) == 0) or line.startswith('#'):
+				continue
+
+			# 2.2: Obtain the setting and its value.
+			setting, _, value = line.partition(':')
+			setting = setting.strip(); value = value.strip()
+			if setting not in query_setting_types:
+				raise Exception('Error: '+str(setting)+' is not a query setting. Query settings are: '+str(list(query_setting_types.keys()))+'. Check '+str(path_to_query))
+
+			# 2.3: Convert the value into the type of this setting.
+			query[setting] = get_query_value(setting, value, path_to_query)
+
+	# Third, return the query.
+	return query
+
+def get_query_value(setting, value, path_to_query):
+	"""
+	This method will convert the value of a setting in a query file into the type of this setting.
+
+	Parameters
+	----------
+	setting : str.
+		This is the name of the setting.
+	value : str.
+		This is the value of the setting given in the query file.
+	path_to_query : str.
+		This is the path to the query file.
+
+	Returns
+	-------
+	value : str., list of str., bool., float or None
+		This is the value of the setting.
+	"""
+	setting_type = query_setting_types[setting]
+	if value.lower() == 'none':
+		return None
+	elif setting_type == bool:
+		if   value.lower() in ['t', 'true']:
+			return True
+		elif value.lower() in ['f', 'false']:
+			return False
+		raise Exception('Error: '+str(setting)+' must be either True or False. '+str(setting)+' = '+str(value)+'. Check '+str(path_to_query))
+	elif setting_type == float:
+		try:
+			return float(value)
+		except ValueError:
+			raise Exception('Error: '+str(setting)+' must be a number. '+str(setting)+' = '+str(value)+'. Check '+str(path_to_query))
+	elif setting_type == list:
+		return value.split()
+	return value
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+class CSDQueryBackend:
+	"""
+	This class obtains the identifiers of the entries in the Cambridge Structural Database that match a query, using the CCDC search API.
+
+	Other backends (for example, for testing without the CSD) can be used instead of this class. These only need
+	a "search(query)" method that yields the identifiers of the entries that match the query.
+	"""
+
+	def search(self, query):
+		"""
+		This method will yield the identifiers of the entries in the CSD that match the query.
+
+		Parameters
+		----------
+		query : dict.
+			These are the settings of the query (see read_query).
+
+		Yields
+		------
+		identifier : str.
+			This is the identifier of an entry that matches the query.
+		"""
+
+		# First, if a substructure is given, search the CSD for entries that contain this substructure.
+		#        * Only one hit is obtained for each entry, and hits are streamed as the search finds them.
+		if query['SMARTS'] is not None:
+			from ccdc.search import SubstructureSearch, SMARTSSubstructure
+			searcher = SubstructureSearch()
+			searcher.add_substructure(SMARTSSubstructure(query['SMARTS']))
+			self.apply_settings(searcher.settings, query)
+			for hit in searcher.search(max_hits_per_structure=1):
+				if self.has_formula(hit.entry, query):
+					yield hit.identifier
+
+		# Second, otherwise, go through every entry in the CSD, and yield those that pass the settings of the query.
+		#         * Settings.test only looks at the information stored for each entry in the CSD, so the crystal of each entry is not made.
+		else:
+			from ccdc.io     import EntryReader
+			from ccdc.search import Search
+			settings = Search.Settings()
+			self.apply_settings(settings, query)
+			for entry in EntryReader('CSD'):
+				if settings.test(entry) and self.has_formula(entry, query):
+					yield entry.identifier
+
+	def apply_settings(self, settings, query):
+		"""
+		This method will give the settings of the query to the settings of a CCDC search.
+
+		Parameters
+		----------
+		settings : ccdc.search.Search.Settings
+			These are the settings of the CCDC search.
+		query : dict.
+			These are the settings of the query (see read_query).
+		"""
+		settings.has_3d_coordinates = query['has_3d_coordinates']
+		settings.no_disorder        = query['no_disorder']
+		if query['only_organic']:
+			settings.only_organic  = True
+			settings.not_polymeric = True
+			settings.no_metals     = True
+		if query['max_R_factor'] is not None:
+			settings.max_r_factor = query['max_R_factor']
+		if query['must_have_elements'] is not None:
+			settings.must_have_elements = query['must_have_elements']
+		if query['must_not_have_elements'] is not None:
+			settings.must_not_have_elements = query['must_not_have_elements']
+
+	def has_formula(self, entry, query):
+		"""
+		This method will check if the entry has the formula given in the query.
+
+		Parameters
+		----------
+		entry : ccdc.entry.Entry
+			This is the entry from the CSD.
+		query : dict.
+			These are the settings of the query (see read_query).
+
+		Returns
+		-------
+		has_formula : bool.
+			True if no formula is given in the query, or if the entry has the formula given in the query.
+		"""
+		if query['formula'] is None:
+			return True
+		return sorted(entry.formula.split()) == sorted(query['formula'].split())
+
+def default_CSD_query_backend_factory():
+	"""
+	This method will return the backend for searching the CSD using the CCDC search API.
+
+	Returns
+	-------
+	query_backend : CSDQueryBackend
+		This is the backend for obtaining the identifiers of entries that match a query.
+	"""
+	return CSDQueryBackend()
+
+def get_identifiers_from_query(path_to_query, query_backend_factory=default_CSD_query_backend_factory):
+	"""
+	This method will yield the identifiers of the entries in the CSD that match the query in the query file, as the search finds them.
+
+	Parameters
+	----------
+	path_to_query : str.
+		This is the path to the query file.
+	query_backend_factory : callable
+		This method returns the backend to search the CSD with. The backend must have a "search(query)" method. Default: default_CSD_query_backend_factory
+
+	Yields
+	------
+	identifier : str.
+		This is the identifier of an entry that matches the query.
+	"""
+	query = read_query(path_to_query)
+	yield from query_backend_factory().search(query)
+
+def merge_identifiers(identifiers, query_identifiers):
+	"""
+	This method will add the identifiers that match a query to the identifiers given in the gcd files.
+
+	The identifiers that match the query are read one at a time as the search finds them, and are only added if they are not
+	already given, so the identifiers that match the query are never held in memory more than once.
+
+	Parameters
+	----------
+	identifiers : list of str.
+		These are the identifiers given in the gcd files. This list is extended with the identifiers that match the query.
+	query_identifiers : iterable of str.
+		These are the identifiers that match the query (see get_identifiers_from_query).
+
+	Returns
+	-------
+	identifiers : list of str.
+		These are the identifiers given in the gcd files and the identifiers that match the query, sorted and given once each.
+	no_of_query_identifiers : int
+		This is the number of identifiers that matched the query.
+	"""
+	given_identifiers = set(identifiers)
+	no_of_query_identifiers = 0
+	for identifier in query_identifiers:
+		no_of_query_identifiers += 1
+		if identifier not in given_identifiers:
+			given_identifiers.add(identifier)
+			identifiers.append(identifier)
+	identifiers.sort()
+	return identifiers, no_of_query_identifiers
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -0,0 +1,313 @@
+"""
+ConversionCache.py, Geoffrey Weal, 17/10/26
+
+This class stores crystals that have been converted from CSD entries, so they do not need to be converted again in later ACSD runs.
+"""
+import os, json
+import numpy as np
+from io      import BytesIO
+from hashlib import sha256
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file import write_file_atomically
+
+# These are the conversion caches that have been opened by this process, given as {path_to_cache: ConversionCache}.
+_conversion_caches = {}
+
+# This is the version of the format that crystals are stored in. This is included in the key of every crystal, so
+# crystals stored in an older format are never read. Change this whenever the contents of a cached crystal change.
+cache_format_version = 2
+
+class ConversionCache:
+	"""
+	This class stores crystals that have been converted from CSD entries, so they do not need to be converted again in later ACSD runs.
+
+	Each crystal is stored in its own npz file, named by a key made from the identifier, a hash of the CSD entry, the
+	version of the CSD, the version of the cache format, and the versions and a hash of the source code of ACSD and SUMELF.
+	This means that a crystal is only reused if neither the entry nor the code that converted it have changed, even if the
+	code was changed without changing its version. As each crystal is written to its own file (and renamed into place once
+	it has been completely written), the same cache folder can be shared by many processes and many crystal database folders.
+
+	Crystals are stored as numpy arrays and JSON (see save), and are read without allowing pickled objects (see load), so
+	reading a file placed in a shared cache folder by someone else can not run code.
+
+	The cache is kept below a maximum size by evict_from_conversion_cache, which removes the least recently used crystals.
+	"""
+
+	file_extension = '.npz'
+
+	def __init__(self, path_to_cache):
+		"""
+		Parameters
+		----------
+		path_to_cache : str.
+			This is the path to the folder to store the cache in.
+		"""
+		self.path_to_cache = path_to_cache
+		os.makedirs(path_to_cache, exist_ok=True)
+		self.versions = get_versions()
+
+	def get_key(self, identifier, entry_object):
+		"""
+		This method will return the key for the crystal of this entry.
+
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier of the crystal.
+		entry_object : ccdc.entry.Entry
+			This is the entry for the identifier from the CSD.
+
+		Returns
+		-------
+		key : str. or None
+			This is the key for the crystal in the cache. None if the entry could not be hashed, in which case the cache is not used for this entry.
+		"""
+		try:
+			entry_hash = sha256(entry_object.to_string('cif').encode()).hexdigest()
+		except Exception:
+			return None
+		return sha256(repr((identifier, entry_hash)+self.versions).encode()).hexdigest()
+
+	def get_path(self, key):
+		"""
+		This method will return the path to the file for this key.
+
+		Files are placed in sub-folders named by the first two characters of the key, so no folder contains too many files.
+
+		Parameters
+		----------
+		key : str.
+			This is the key for the crystal in the cache.
+
+		Returns
+		-------
+		path_to_file : str.
+			This is the path to the file for this key.
+		"""
+		return self.path_to_cache+'/'+key[:2]+'/'+key+self.file_extension
+
+	def load(self, key):
+		"""
+		This method will load the crystal for this key from the cache.
+
+		Parameters
+		----------
+		key : str.
+			This is the key for the crystal in the cache.
+
+		Returns
+		-------
+		cached_crystal : dict. or None
+			This is the crystal stored in the cache for this key. None if this key is not in the cache.
+		"""
+
+		# First, load the crystal from the cache.
+		#        * allow_pickle=False means only arrays can be read from the file, so no code is run when it is loaded.
+		path_to_file = self.get_path(key)
+		try:
+			with np.load(path_to_file, allow_pickle=False) as cached_arrays:
+				cached_crystal = get_cached_crystal(cached_arrays)
+		except FileNotFoundError:
+			return None
+		except Exception:
+			# The file can not be read (for example, it was only partly written by a process that was killed), so remove it.
+			remove_file(path_to_file)
+			return None
+
+		# Second, update the modified time of the file, so this crystal is seen as recently used when the cache is evicted.
+		try:
+			os.utime(path_to_file)
+		except OSError:
+			pass
+
+		# Third, return the crystal.
+		return cached_crystal
+
+	def save(self, key, cached_crystal):
+		"""
+		This method will save the crystal for this key to the cache.
+
+		Parameters
+		----------
+		key : str.
+			This is the key for the crystal in the cache.
+		cached_crystal : dict.
+			This is the crystal to store in the cache.
+		"""
+		path_to_file = self.get_path(key)
+		os.makedirs(os.path.dirname(path_to_file), exist_ok=True)
+		data = BytesIO()
+		np.savez(data, **get_cached_arrays(cached_crystal))
+		# The temporary file includes the process id, so processes saving the same crystal do not write to the same temporary file.
+		write_file_atomically(path_to_file, data.getvalue(), path_to_temporary_file=path_to_file+'.'+str(os.getpid())+'.tmp')
+
+def get_cached_arrays(cached_crystal):
+	"""
+	This method will convert a crystal into the arrays that are stored in its file in the cache.
+
+	* The xyz data and the JSON information (the flags and log events) are stored as arrays of bytes.
+	* The arrays of the crystal (see CrystalShards.get_crystal_arrays) are stored with "crystal_arrays." at the start of their names.
+
+	Parameters
+	----------
+	cached_crystal : dict.
+		This is the crystal to store in the cache. This contains 'xyz_data', 'crystal_arrays', 'flags' and 'log_lines'.
+
+	Returns
+	-------
+	cached_arrays : dict. of numpy.ndarray
+		These are the arrays to store in the file of the crystal.
+	"""
+	information = {'flags': cached_crystal['flags'], 'log_lines': cached_crystal['log_lines']}
+	cached_arrays = {'information': np.frombuffer(json.dumps(information).encode(), dtype=np.uint8)}
+	if cached_crystal['xyz_data'] is not None:
+		cached_arrays['xyz_data'] = np.frombuffer(cached_crystal['xyz_data'], dtype=np.uint8)
+	if cached_crystal['crystal_arrays'] is not None:
+		for name, array in cached_crystal['crystal_arrays'].items():
+			cached_arrays['crystal_arrays.'+name] = np.asarray(array)
+	return cached_arrays
+
+def get_cached_crystal(cached_arrays):
+	"""
+	This method will convert the arrays stored in the file of a crystal in the cache back into the crystal (see get_cached_arrays).
+
+	Parameters
+	----------
+	cached_arrays : numpy.lib.npyio.NpzFile
+		These are the arrays stored in the file of the crystal.
+
+	Returns
+	-------
+	cached_crystal : dict.
+		This is the crystal stored in the cache. This contains 'xyz_data', and 'flags' and 'log_lines', and 'crystal_arrays' if these were stored.
+	"""
+	information    = json.loads(cached_arrays['information'].tobytes().decode())
+	cached_crystal = {'flags': information['flags'], 'log_lines': [tuple(event) for event in information['log_lines']]}
+	cached_crystal['xyz_data'] = cached_arrays['xyz_data'].tobytes() if ('xyz_data' in cached_arrays.files) else None
+	crystal_array_names = [name for name in cached_arrays.files if name.startswith('crystal_arrays.')]
+	if len(crystal_array_names) > 0:
+		cached_crystal['crystal_arrays'] = {name[len('crystal_arrays.'):]: cached_arrays[name] for name in crystal_array_names}
+	return cached_crystal
+
+def get_conversion_cache(path_to_cache):
+	"""
+	This method will return the conversion cache for this path, opening it if it has not been opened by this process yet.
+
+	Parameters
+	----------
+	path_to_cache : str. or None
+		This is the path to the folder of the cache. If None, no cache is used.
+
+	Returns
+	-------
+	conversion_cache : ConversionCache or None
+		This is the conversion cache. None if path_to_cache is None.
+	"""
+	if path_to_cache is None:
+		return None
+	if path_to_cache not in _conversion_caches:
+		_conversion_caches[path_to_cache] = ConversionCache(path_to_cache)
+	return _conversion_caches[path_to_cache]
+
+def get_versions():
+	"""
+	This method will obtain the versions of the cache format, the CSD, ACSD and SUMELF, as well as hashes of the source code
+	of ACSD and SUMELF. These are included in the key of every crystal in the cache.
+
+	Returns
+	-------
+	versions : tuple of str.
+		These are the versions of the cache format, the CSD, ACSD and SUMELF, and the hashes of the source code of ACSD and SUMELF.
+	"""
+	from ACSD import __version__ as ACSD_version
+	import SUMELF
+	try:
+		from ccdc.io import csd_version
+		CSD_version = str(csd_version())
+	except Exception:
+		CSD_version = None
+	ACSD_code_hash   = get_code_hash(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	SUMELF_code_hash = get_code_hash(os.path.dirname(os.path.abspath(SUMELF.__file__)))
+	return (str(cache_format_version), CSD_version, ACSD_version, ACSD_code_hash, getattr(SUMELF, '__version__', None), SUMELF_code_hash)
+
+def get_code_hash(path_to_package):
+	"""
+	This method will obtain a hash of the source code of a package, so crystals converted before the code was changed are not reused.
+
+	Parameters
+	----------
+	path_to_package : str.
+		This is the path to the folder of the package.
+
+	Returns
+	-------
+	code_hash : str.
+		This is the sha256 hash of the names and contents of every python file in the package.
+	"""
+	code_hash = sha256()
+	for dirpath, dirnames, filenames in os.walk(path_to_package):
+		dirnames.sort()
+		for filename in sorted(filenames):
+			if filename.endswith('.py'):
+				path_to_file = os.path.join(dirpath, filename)
+				code_hash.update(os.path.relpath(path_to_file, path_to_package).encode())
+				with open(path_to_file, 'rb') as FILE:
+					code_hash.update(FILE.read())
+	return code_hash.hexdigest()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def evict_from_conversion_cache(path_to_cache, max_cache_size):
+	"""
+	This method will remove the least recently used crystals from the cache until the cache is smaller than max_cache_size.
+
+	Parameters
+	----------
+	path_to_cache : str.
+		This is the path to the folder of the cache.
+	max_cache_size : int
+		This is the maximum size of the cache (in bytes).
+
+	Returns
+	-------
+	no_of_files_removed : int
+		This is the number of crystals that were removed from the cache.
+	"""
+
+	# First, obtain the size and the last time each crystal in the cache was used.
+	cached_files = []
+	for sub_folder in os.scandir(path_to_cache):
+		if not sub_folder.is_dir():
+			continue
+		for entry in os.scandir(sub_folder.path):
+			if entry.name.endswith(ConversionCache.file_extension):
+				stat = entry.stat()
+				cached_files.append((stat.st_mtime, stat.st_size, entry.path))
+
+	# Second, remove the least recently used crystals until the cache is smaller than max_cache_size.
+	cache_size = sum(size for _, size, _ in cached_files)
+	no_of_files_removed = 0
+	for _, size, path_to_file in sorted(cached_files):
+		if cache_size <= max_cache_size:
+			break
+		remove_file(path_to_file)
+		cache_size -= size
+		no_of_files_removed += 1
+
+	# Third, return the number of crystals removed from the cache.
+	return no_of_files_removed
+
+def remove_file(path_to_file):
+	"""
+	This method will remove a file, if it has not already been removed by another process.
+
+	Parameters
+	----------
+	path_to_file : str.
+		This is the path to the file to remove.
+	"""
+	try:
+		os.remove(path_to_file)
+	except FileNotFoundError:
+		pass
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
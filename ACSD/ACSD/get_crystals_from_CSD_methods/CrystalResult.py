@@ -0,0 +1,73 @@
+"""
+CrystalResult.py, Geoffrey Weal, 17/10/26
+
+This class records the outcome of processing an identifier, so that it can be returned from a process back to the main process.
+"""
+import os
+
+class CrystalResult:
+	"""
+	This class records the outcome of processing an identifier.
+
+	The main process uses this record to update the counts of crystals and to write information to the side files
+	(like crystals_not_written.txt and rejected_crystals.txt), so that processes do not need to share counters or locks.
+
+	Status can be one of:
+
+	* 'recorded':          The xyz file of the crystal was written to disk.
+	* 'excluded':          The identifier was excluded from this run.
+	* 'already_processed': The xyz file of the crystal had already been written in a previous run.
+	* 'not_found':         The identifier could not be found in the CSD.
+	* 'no_coordinates':    The crystal does not contain any coordinates.
+	* 'rejected':          The crystal is polymeric, organometallic, contains a metal, or is not organic.
+	* 'timeout':           The crystal took longer than the timeout to convert, so the process converting it was stopped (see RecyclingPool.py).
+	* 'failed':            The process converting the crystal ended unexpectedly (for example, it ran out of memory or crashed), so the process was replaced (see RecyclingPool.py).
+	"""
+
+	statuses = ('recorded', 'excluded', 'already_processed', 'not_found', 'no_coordinates', 'rejected', 'timeout', 'failed')
+
+	def __init__(self, identifier, status=None, reason=None, flags=None, checksum=None, from_cache=False, log_lines=None, timings=None, rejected_by=None, crystal_arrays=None, location=None, xyz_data=None):
+		"""
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier that was processed.
+		status : str. or None
+			This is the outcome of processing the identifier.
+		reason : str. or None
+			This is the message that explains why the crystal was not recorded. None if the crystal was recorded.
+		flags : dict. or None
+			These are the values of the crystal quality flags (see check_crystal_quality.get_flag_values). None if the crystal was not recorded.
+		checksum : str. or None
+			This is the sha256 checksum of the xyz file written for this crystal. None if the crystal was not recorded.
+		from_cache : bool.
+			This indicates if the crystal was obtained from the conversion cache. Default: False
+		log_lines : list of tuple or None
+			These are the log events to write to the log file for this identifier (see CustomParallelLogger.py).
+		timings : dict. or None
+			These are the timings (in seconds) for processing this identifier.
+		rejected_by : str. or None
+			This is the stage of checks that rejected the crystal (see prefilter_entry.py). None if the crystal was not rejected.
+		crystal_arrays : dict. or None
+			These are the arrays of the crystal to write to a binary shard (see CrystalShards.py). None if the crystal is not being written to a shard.
+		location : str. or None
+			This is the path to the xyz file written for this crystal, relative to the crystal database folder (see crystal_database_layout.py). None if no xyz file was written.
+		xyz_data : bytes or None
+			These are the contents of the xyz file of the crystal, to be written by the main process (see ResultWriter.py). This is set to None once the xyz file has been written.
+		"""
+		self.identifier = identifier
+		self.status     = status
+		self.reason     = reason
+		self.flags      = flags
+		self.checksum   = checksum
+		self.from_cache = from_cache
+		self.log_lines  = [] if (log_lines is None) else log_lines
+		self.timings    = {} if (timings   is None) else timings
+		self.rejected_by = rejected_by
+		self.crystal_arrays = crystal_arrays
+		self.location   = location
+		self.xyz_data   = xyz_data
+		self.pid        = os.getpid()
+
+	def __repr__(self):
+		return f'CrystalResult({self.identifier}, {self.status})'
@@ -0,0 +1,279 @@
+"""
+CrystalShards.py, Geoffrey Weal, 17/10/26
+
+These classes write crystals to (and read crystals from) binary shards, as a compact alternative to writing an xyz file for every crystal.
+
+Each shard is a folder (crystal_shards/shard_00000, crystal_shards/shard_00001, ...) that contains many crystals. The
+crystals in a shard are stored in .npy files, so they can be memory-mapped and any crystal can be read without reading the others:
+
+	* identifiers.npy:  The identifier of each crystal in the shard.
+	* atom_offsets.npy: The atoms of crystal i are atoms atom_offsets[i] to atom_offsets[i+1] in the arrays below.
+	* numbers.npy:      The atomic number of each atom.
+	* positions.npy:    The position of each atom.
+	* charges.npy:      The charge of each atom.
+	* cells.npy:        The unit cell of each crystal (a 3x3 matrix).
+	* pbcs.npy:         The periodic boundary conditions of each crystal.
+	* bond_indptr.npy:  The bond graph of all the atoms in the shard, as the index pointer of a compressed sparse row (CSR) matrix.
+	* bond_indices.npy: The bond graph of all the atoms in the shard, as the indices of a CSR matrix. Indices are given
+	                    relative to the first atom of each crystal.
+"""
+import os, shutil
+import numpy as np
+
+# This is the name of the folder in the crystal database folder that contains the shards.
+shards_foldername = 'crystal_shards'
+
+# These are the output formats that crystals can be written in.
+#   * 'xyz':  An extended xyz file is written for each crystal.
+#   * 'npz':  Crystals are written to binary shards (see CrystalShardWriter).
+#   * 'both': An extended xyz file is written for each crystal, and crystals are also written to binary shards.
+output_formats = ('xyz', 'npz', 'both')
+
+# These are the names of the arrays stored in each shard.
+shard_array_names = ('identifiers', 'atom_offsets', 'numbers', 'positions', 'charges', 'cells', 'pbcs', 'bond_indptr', 'bond_indices')
+
+def get_crystal_arrays(crystal, crystal_graph):
+	"""
+	This method will obtain the arrays to store in a shard for a crystal.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal.
+	crystal_graph : networkx.Graph
+		This is the graph of the crystal. Nodes are given as the indices of atoms in the crystal.
+
+	Returns
+	-------
+	crystal_arrays : dict. of numpy.ndarray
+		These are the numbers, positions, charges, cell, pbc and bond graph (as CSR index pointer and indices arrays) of the crystal.
+	"""
+
+	# First, obtain the neighbours of each atom in the crystal, in order of atom index.
+	no_of_atoms  = len(crystal)
+	bond_indptr  = np.zeros(no_of_atoms+1, dtype=np.int64)
+	bond_indices = []
+	for atom_index in range(no_of_atoms):
+		neighbours = sorted(crystal_graph.neighbors(atom_index)) if crystal_graph.has_node(atom_index) else []
+		bond_indices += neighbours
+		bond_indptr[atom_index+1] = len(bond_indices)
+
+	# Second, return the arrays of the crystal.
+	return {'numbers': crystal.get_atomic_numbers().astype(np.int16), 'positions': crystal.get_positions(), 'charges': crystal.get_initial_charges(), 'cell': crystal.cell.array.copy(), 'pbc': crystal.pbc.copy(), 'bond_indptr': bond_indptr, 'bond_indices': np.array(bond_indices, dtype=np.int32)}
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+class CrystalShardWriter:
+	"""
+	This class collects crystals and writes them to a new shard once crystals_per_shard crystals have been collected.
+
+	Each shard is written to a temporary folder and then renamed, so a half-written shard is never left if the ACSD program is killed.
+	Only the main process writes shards.
+	"""
+
+	def __init__(self, save_crystals_to, crystals_per_shard=1000):
+		"""
+		Parameters
+		----------
+		save_crystals_to : str.
+			This is the path to the crystal database folder.
+		crystals_per_shard : int
+			This is the number of crystals to write to each shard. Default: 1000
+		"""
+		self.path_to_shards     = save_crystals_to+'/'+shards_foldername
+		self.crystals_per_shard = crystals_per_shard
+		self.crystals_to_write  = []
+
+		# First, make the shards folder, and remove any temporary shards left by a previous run that was stopped while writing them.
+		os.makedirs(self.path_to_shards, exist_ok=True)
+		for name in os.listdir(self.path_to_shards):
+			if name.endswith('.tmp'):
+				shutil.rmtree(self.path_to_shards+'/'+name)
+
+		# Second, obtain the number to give the next shard, so shards from previous runs are not overwritten.
+		self.shard_number = len(get_shard_names(self.path_to_shards))
+
+	def add(self, identifier, crystal_arrays):
+		"""
+		This method will add a crystal to be written to the next shard.
+
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier of the crystal.
+		crystal_arrays : dict. of numpy.ndarray
+			These are the arrays of the crystal (see get_crystal_arrays).
+		"""
+		self.crystals_to_write.append((identifier, crystal_arrays))
+
+	def is_full(self):
+		"""
+		This method will indicate if enough crystals have been collected to write a shard.
+
+		Returns
+		-------
+		is_full : bool.
+			True if crystals_per_shard crystals have been collected.
+		"""
+		return len(self.crystals_to_write) >= self.crystals_per_shard
+
+	def flush(self):
+		"""
+		This method will write the crystals that have been collected to a new shard.
+		"""
+
+		# First, if there are no crystals to write, there is nothing to do.
+		if len(self.crystals_to_write) == 0:
+			return
+
+		# Second, join the arrays of all the crystals together.
+		#         * The bond index pointers of each crystal are shifted so they follow on from the bonds of the previous crystals.
+		identifiers, all_crystal_arrays = zip(*self.crystals_to_write)
+		no_of_atoms  = [len(crystal_arrays['numbers']) for crystal_arrays in all_crystal_arrays]
+		no_of_bonds  = np.cumsum([0] + [len(crystal_arrays['bond_indices']) for crystal_arrays in all_crystal_arrays])
+		shard_arrays = {
+			'identifiers':  np.array(identifiers, dtype=str),
+			'atom_offsets': np.cumsum([0] + no_of_atoms).astype(np.int64),
+			'numbers':      np.concatenate([crystal_arrays['numbers']   for crystal_arrays in all_crystal_arrays]),
+			'positions':    np.concatenate([crystal_arrays['positions'] for crystal_arrays in all_crystal_arrays]).reshape(-1, 3),
+			'charges':      np.concatenate([crystal_arrays['charges']   for crystal_arrays in all_crystal_arrays]),
+			'cells':        np.array([crystal_arrays['cell'] for crystal_arrays in all_crystal_arrays]).reshape(-1, 3, 3),
+			'pbcs':         np.array([crystal_arrays['pbc']  for crystal_arrays in all_crystal_arrays]).reshape(-1, 3),
+			'bond_indptr':  np.concatenate([[0]] + [crystal_arrays['bond_indptr'][1:] + offset for crystal_arrays, offset in zip(all_crystal_arrays, no_of_bonds)]).astype(np.int64),
+			'bond_indices': np.concatenate([crystal_arrays['bond_indices'] for crystal_arrays in all_crystal_arrays]).astype(np.int32),
+		}
+
+		# Third, write the arrays to a temporary folder, and then rename this folder to the name of the shard.
+		path_to_shard = self.path_to_shards+'/'+get_shard_name(self.shard_number)
+		path_to_temporary_shard = path_to_shard+'.tmp'
+		os.makedirs(path_to_temporary_shard)
+		for name, array in shard_arrays.items():
+			with open(path_to_temporary_shard+'/'+name+'.npy', 'wb') as FILE:
+				np.save(FILE, array, allow_pickle=False)
+				FILE.flush()
+				os.fsync(FILE.fileno())
+		os.rename(path_to_temporary_shard, path_to_shard)
+
+		# Fourth, reset the crystals to write, and move on to the next shard.
+		self.crystals_to_write = []
+		self.shard_number += 1
+
+def get_shard_name(shard_number):
+	"""
+	This method will give the name of a shard.
+
+	Parameters
+	----------
+	shard_number : int
+		This is the number of the shard.
+
+	Returns
+	-------
+	shard_name : str.
+		This is the name of the shard.
+	"""
+	return f'shard_{shard_number:05d}'
+
+def get_shard_names(path_to_shards):
+	"""
+	This method will give the names of all the shards that have been written, in the order they were written.
+
+	Parameters
+	----------
+	path_to_shards : str.
+		This is the path to the shards folder.
+
+	Returns
+	-------
+	shard_names : list of str.
+		These are the names of the shards.
+	"""
+	if not os.path.exists(path_to_shards):
+		return []
+	return sorted(name for name in os.listdir(path_to_shards) if name.startswith('shard_') and (not name.endswith('.tmp')))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+class CrystalShardReader:
+	"""
+	This class reads crystals from the shards of a crystal database folder.
+
+	The arrays of each shard are memory-mapped, so only the parts of the shards that are used are read from disk.
+	If a crystal is in more than one shard (because it was processed in more than one run), the crystal from the latest shard is given.
+
+	Example:
+
+		shards = CrystalShardReader('crystal_database')
+		crystal_arrays = shards['ABALIZ']     # The arrays of the crystal, as a dict.
+		crystal        = shards.get_atoms('ABALIZ')  # The crystal, as an ase.Atoms object.
+	"""
+
+	def __init__(self, save_crystals_to):
+		"""
+		Parameters
+		----------
+		save_crystals_to : str.
+			This is the path to the crystal database folder.
+		"""
+
+		# First, memory-map the arrays of each shard.
+		path_to_shards = save_crystals_to+'/'+shards_foldername
+		self.shards = []
+		for shard_name in get_shard_names(path_to_shards):
+			self.shards.append({name: np.load(path_to_shards+'/'+shard_name+'/'+name+'.npy', mmap_mode='r') for name in shard_array_names})
+
+		# Second, obtain the shard and position in that shard of each crystal.
+		self.index = {}
+		for shard_number, shard in enumerate(self.shards):
+			for position, identifier in enumerate(shard['identifiers'].tolist()):
+				self.index[identifier] = (shard_number, position)
+
+	def __len__(self):
+		return len(self.index)
+
+	def __contains__(self, identifier):
+		return identifier in self.index
+
+	def __iter__(self):
+		return iter(self.index)
+
+	def __getitem__(self, identifier):
+		"""
+		This method will give the arrays of a crystal.
+
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier of the crystal.
+
+		Returns
+		-------
+		crystal_arrays : dict. of numpy.ndarray
+			These are the numbers, positions, charges, cell, pbc and bond graph (as CSR index pointer and indices arrays) of the crystal.
+			The arrays are read-only views of the memory-mapped shard.
+		"""
+		shard_number, position = self.index[identifier]
+		shard = self.shards[shard_number]
+		start_atom, end_atom = shard['atom_offsets'][position:position+2]
+		bond_indptr = shard['bond_indptr'][start_atom:end_atom+1]
+		return {'numbers': shard['numbers'][start_atom:end_atom], 'positions': shard['positions'][start_atom:end_atom], 'charges': shard['charges'][start_atom:end_atom], 'cell': shard['cells'][position], 'pbc': shard['pbcs'][position], 'bond_indptr': bond_indptr - bond_indptr[0], 'bond_indices': shard['bond_indices'][bond_indptr[0]:bond_indptr[-1]]}
+
+	def get_atoms(self, identifier):
+		"""
+		This method will give a crystal as an ASE object.
+
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier of the crystal.
+
+		Returns
+		-------
+		crystal : ase.Atoms
+			This is the crystal.
+		"""
+		from ase import Atoms
+		crystal_arrays = self[identifier]
+		return Atoms(numbers=crystal_arrays['numbers'], positions=crystal_arrays['positions'], charges=crystal_arrays['charges'], cell=crystal_arrays['cell'], pbc=crystal_arrays['pbc'])
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
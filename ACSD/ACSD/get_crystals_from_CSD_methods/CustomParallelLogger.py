@@ -2,64 +2,385 @@
 CustomParallelLogger.py, Geoffrey Weal, 27/4/24
 
 This is designed to write the log file for parallel processes.
+
+Each message given to the logger is recorded as an event, which is the tuple (time, level, identifier, pid, stage, duration, message).
+The log file can be written as text (ACSD_logfile.log), or as JSON lines (ACSD_logfile.jsonl), where each line is one event as a JSON object.
 """
-import os
+import os, glob, gzip, json, time, queue, shutil, logging, threading
 from datetime import datetime
 
+# These are the levels that can be given to events. Only events at or above the level given to the logger are recorded.
+log_levels = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+
+# These are the formats that the log file can be written in, and the name of the log file for each format.
+log_filenames = {'text': 'ACSD_logfile.log', 'json': 'ACSD_logfile.jsonl'}
+log_formats   = tuple(log_filenames.keys())
+
+def get_log_filename(log_format='text'):
+	"""
+	This method will give the name of the log file for a format.
+
+	Parameters
+	----------
+	log_format : str.
+		This is the format to write the log file in. This is either 'text' or 'json'. Default: 'text'
+
+	Returns
+	-------
+	log_filename : str.
+		This is the name of the log file.
+	"""
+	if log_format not in log_filenames:
+		raise Exception('Error: log_format must be one of '+str(log_formats)+'. log_format = '+str(log_format))
+	return log_filenames[log_format]
+
 class CustomParallelLogger:
 	"""
-	This is designed to at as an in memory logger for multiprocessing proposes. 
+	This is designed to at as an in memory logger for multiprocessing proposes.
+
+	This have been created to allow ACSD to provide all its logging information for a crystal together.
 
-	This have been created to allow ACSD to provide all its logging information for a crystal together. 
+	* Each process creates a logger (with no filename) for each identifier it is given. This holds the events for the
+	  identifier in memory, with each event tagged with the identifier and the process id. These are returned to the main
+	  process in the CrystalResult of the identifier, so processes never open the log file or need a lock.
+	* The main process has the only logger with a filename. This gives events to a LogSink, where one thread writes the log file.
+	* Events below the level of the logger are not recorded, so banners like "Processing: ABALIZ" (given at the 'DEBUG' level)
+	  cost nothing if the level is 'INFO'.
 	"""
-	def __init__(self, filename="ACSD_logfile.log", filemode='w', instant_write=False):
+	def __init__(self, filename=None, filemode='w', instant_write=False, identifier=None, level='DEBUG', log_format='text', max_log_size=None, no_of_log_backups=5):
+		"""
+		Parameters
+		----------
+		filename : str. or None
+			This is the path to the log file. If None, events are only held in memory. Default: None
+		filemode : str.
+			This is 'w' to start a new log file, or 'a' to add to the end of an existing log file. Default: 'w'
+		instant_write : bool.
+			If True, events are written to the log file as soon as they are given. Default: False
+		identifier : str. or None
+			This is the identifier that events given to this logger are about. None for the logger of the main process. Default: None
+		level : str.
+			Only events at or above this level are recorded. This is either 'DEBUG', 'INFO', 'WARNING' or 'ERROR'. Default: 'DEBUG'
+		log_format : str.
+			This is the format to write the log file in. This is either 'text' or 'json'. Default: 'text'
+		max_log_size : int or None
+			This is the largest size of the log file (in bytes) before it is compressed and a new log file is started. If None, the log file is never rotated. Default: None
+		no_of_log_backups : int
+			This is the number of compressed log files to keep when the log file is rotated. Default: 5
+		"""
+		if level not in log_levels:
+			raise Exception('Error: level must be one of '+str(tuple(log_levels.keys()))+'. level = '+str(level))
 		self.filename         = filename
 		self.filemode         = filemode
 		self.instant_write    = instant_write
+		self.identifier       = identifier
+		self.level            = log_levels[level]
+		self.pid              = os.getpid()
 		self.temp_information = []
-		if (filemode == 'w') and os.path.exists(filename):
-			os.remove(filename)
 
-	def info(self, message):
+		# First, if a filename is given, create the log sink that writes to the log file.
+		self.log_sink = None if (filename is None) else LogSink(filename, filemode, log_format=log_format, max_log_size=max_log_size, no_of_log_backups=no_of_log_backups)
+
+	def is_enabled_for(self, level):
+		"""
+		This method will indicate if events at this level are recorded by this logger.
+
+		Parameters
+		----------
+		level : int
+			This is the level of the event (see log_levels).
+
+		Returns
+		-------
+		is_enabled_for : bool.
+			True if events at this level are recorded.
 		"""
-		This method will add information to the log, in this case to the temp_information list.
+		return level >= self.level
+
+	def log(self, level, message, stage=None, duration=None):
+		"""
+		This method will add an event to the log, in this case to the temp_information list.
 
 		Parameters
 		----------
+		level : int
+			This is the level of the event (see log_levels).
 		message : str.
 			This is the message you would like to add onto the temp_information stack.
+		stage : str. or None
+			This is the stage of converting the crystal that this event is about (see stage_timings.pipeline_stages). Default: None
+		duration : float or None
+			This is the time (in seconds) that this event is about. Default: None
 		"""
 
-		# First, obtain the current date and time.
-		now = datetime.now()
+		# First, if events at this level are not recorded, end here.
+		if level < self.level:
+			return
 
-		# Second, separate the message into its components, and append each line to the temp_information stack.
-		for segment in message.split('\n'):
-			self.temp_information.append(str(now)+' - '+str(segment))
+		# Second, append the event to the temp_information stack.
+		self.temp_information.append((time.time(), level, self.identifier, self.pid, stage, duration, str(message)))
 
 		# Third, write the stack to file if desired to do it instantly.
 		if self.instant_write:
 			self.write()
 
-	def warning(self, message):
+	def debug(self, message, stage=None, duration=None):
+		"""
+		This method will add an event at the 'DEBUG' level to the log (see log).
+		"""
+		self.log(logging.DEBUG, message, stage=stage, duration=duration)
+
+	def info(self, message, stage=None, duration=None):
 		"""
-		
+		This method will add an event at the 'INFO' level to the log (see log).
 		"""
-		self.info('WARNING: '+str(message))
+		self.log(logging.INFO, message, stage=stage, duration=duration)
 
-	def write(self):
+	def warning(self, message, stage=None, duration=None):
 		"""
-		Write all the log information from the temp_information to the actual log file.
+		This method will add an event at the 'WARNING' level to the log (see log).
 		"""
+		self.log(logging.WARNING, message, stage=stage, duration=duration)
 
-		# First, if there is nothing in the stack, end recording here
-		if self.temp_information == []:
+	def error(self, message, stage=None, duration=None):
+		"""
+		This method will add an event at the 'ERROR' level to the log (see log).
+		"""
+		self.log(logging.ERROR, message, stage=stage, duration=duration)
+
+	def add_events(self, events):
+		"""
+		This method will add events made by another logger (for example, events saved in the conversion cache) to temp_information.
+
+		Events below the level of this logger are not added.
+
+		Parameters
+		----------
+		events : list of tuple
+			These are the events to add.
+		"""
+		self.temp_information += [event for event in events if event[1] >= self.level]
+
+	def write(self, events=None):
+		"""
+		Write all the events from the temp_information (or the events given) to the actual log file.
+
+		If this logger has no filename, the events are kept in temp_information.
+
+		Parameters
+		----------
+		events : list of tuple or None
+			These are events that have already been made by another logger (for example, the events of an identifier
+			returned by a process). If None, the events in temp_information are written. Default: None
+		"""
+
+		# First, if this logger does not write to a log file, keep the events in memory.
+		if self.log_sink is None:
 			return
-		
-		# Second, write all the data from temp_information to the log file on disk
-		with open(self.filename, 'a') as LOGFILE:
-			for segment in self.temp_information:
-				LOGFILE.write(segment+'\n')
 
-		# Third, reset the temp_information list.
-		self.temp_information = []
+		# Second, obtain the events to write, and reset the temp_information list if these are being written.
+		if events is None:
+			events, self.temp_information = self.temp_information, []
+
+		# Third, if there is nothing to write, end recording here
+		if len(events) == 0:
+			return
+
+		# Fourth, give the events to the log sink, which writes them to the log file on disk.
+		self.log_sink.put(events)
+
+	def close(self):
+		"""
+		This method will write any remaining events to the log file, and then close the log file.
+		"""
+		if self.log_sink is None:
+			return
+		self.write()
+		self.log_sink.close()
+		self.log_sink = None
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def format_event_as_text(event):
+	"""
+	This method will give an event as lines of text, such as "2024-04-27 10:31:02.112233 - ABALIZ (pid 41211) - Processing: ABALIZ".
+
+	Parameters
+	----------
+	event : tuple
+		This is the event, given as (time, level, identifier, pid, stage, duration, message).
+
+	Returns
+	-------
+	text : str.
+		These are the lines of text for the event.
+	"""
+	created, level, identifier, pid, stage, duration, message = event
+	prefix = str(datetime.fromtimestamp(created))+' - '
+	if identifier is not None:
+		prefix += str(identifier)+' (pid '+str(pid)+') - '
+	if level >= logging.WARNING:
+		prefix += logging.getLevelName(level)+': '
+	return '\n'.join(prefix+segment for segment in message.split('\n'))
+
+def format_event_as_json(event):
+	"""
+	This method will give an event as a JSON object on one line.
+
+	Parameters
+	----------
+	event : tuple
+		This is the event, given as (time, level, identifier, pid, stage, duration, message).
+
+	Returns
+	-------
+	text : str.
+		This is the JSON object for the event.
+	"""
+	created, level, identifier, pid, stage, duration, message = event
+	return json.dumps({'time': datetime.fromtimestamp(created).isoformat(), 'level': logging.getLevelName(level), 'identifier': identifier, 'pid': pid, 'stage': stage, 'duration': duration, 'message': message})
+
+# These are the methods used to write events in each format.
+event_formatters = {'text': format_event_as_text, 'json': format_event_as_json}
+
+class LogSink:
+	"""
+	This class writes the log file on one thread of the main process.
+
+	Events are given to this class using put, which places them in a queue and returns straight away. A single thread takes
+	events from this queue, formats them, and writes them to the log file, which is only opened once. The log file is buffered,
+	and the buffer is written to disk at least every flush_interval seconds (so the log file can be followed while the ACSD
+	program runs), and when the log sink is closed.
+
+	If max_log_size is given, the log file is rotated once it becomes larger than max_log_size: the log file is compressed to
+	"<filename>.1.gz" (moving older compressed log files to "<filename>.2.gz", and so on, keeping no_of_log_backups of these),
+	and a new log file is started.
+	"""
+
+	def __init__(self, filename, filemode='w', log_format='text', max_log_size=None, no_of_log_backups=5, flush_interval=1.0, buffer_size=2**20):
+		"""
+		Parameters
+		----------
+		filename : str.
+			This is the path to the log file.
+		filemode : str.
+			This is 'w' to start a new log file (removing any compressed log files from earlier runs), or 'a' to add to the end of an existing log file. Default: 'w'
+		log_format : str.
+			This is the format to write the log file in. This is either 'text' or 'json'. Default: 'text'
+		max_log_size : int or None
+			This is the largest size of the log file (in bytes) before it is rotated. If None, the log file is never rotated. Default: None
+		no_of_log_backups : int
+			This is the number of compressed log files to keep. Default: 5
+		flush_interval : float
+			This is the longest time (in seconds) that events wait in the buffer before being written to disk. Default: 1.0
+		buffer_size : int
+			This is the size of the buffer for the log file (in bytes). Default: 1 MB
+		"""
+		if log_format not in event_formatters:
+			raise Exception('Error: log_format must be one of '+str(log_formats)+'. log_format = '+str(log_format))
+		self.filename          = filename
+		self.format_event      = event_formatters[log_format]
+		self.max_log_size      = max_log_size
+		self.no_of_log_backups = no_of_log_backups
+		self.flush_interval    = flush_interval
+		self.buffer_size       = buffer_size
+
+		# First, if a new log file is being started, remove the compressed log files from earlier runs.
+		if filemode == 'w':
+			for path_to_backup in glob.glob(glob.escape(filename)+'.*.gz'):
+				os.remove(path_to_backup)
+
+		# Second, open the log file.
+		#         * The log file is written in bytes, so the size of the log file is known without asking the file system.
+		self.file     = open(filename, filemode+'b', buffering=buffer_size)
+		self.log_size = self.file.tell()
+
+		# Third, start the thread that writes the log file.
+		self.queue  = queue.SimpleQueue()
+		self.error  = None
+		self.thread = threading.Thread(target=self.run, name='ACSD-log-sink', daemon=True)
+		self.thread.start()
+
+	def put(self, events):
+		"""
+		This method will give events to be written to the log file.
+
+		Parameters
+		----------
+		events : list of tuple
+			These are the events to write to the log file.
+		"""
+		self.raise_error()
+		self.queue.put(events)
+
+	def run(self):
+		"""
+		This method is run by the log sink thread. It writes events to the log file until it is given None.
+		"""
+		last_flush_time = time.monotonic()
+		while True:
+
+			# First, obtain the next events to write. If no events are given within flush_interval, write the buffer to disk.
+			try:
+				events = self.queue.get(timeout=self.flush_interval)
+			except queue.Empty:
+				events = []
+			if events is None:
+				break
+
+			# Second, write the events to the log file, rotate the log file if it is too large, and write the buffer to disk if it has not been written for flush_interval.
+			try:
+				if self.error is None:
+					if len(events) > 0:
+						data = ('\n'.join(self.format_event(event) for event in events)+'\n').encode()
+						self.file.write(data)
+						self.log_size += len(data)
+					if (self.max_log_size is not None) and (self.log_size >= self.max_log_size):
+						self.rotate()
+					if time.monotonic() - last_flush_time >= self.flush_interval:
+						self.file.flush()
+						last_flush_time = time.monotonic()
+			except BaseException as exception:
+				self.error = exception
+
+	def rotate(self):
+		"""
+		This method will compress the log file to "<filename>.1.gz", and start a new log file.
+		"""
+
+		# First, close the log file.
+		self.file.close()
+
+		# Second, move each compressed log file along by one, removing the oldest.
+		for index in range(self.no_of_log_backups-1, 0, -1):
+			path_to_backup = self.filename+'.'+str(index)+'.gz'
+			if os.path.exists(path_to_backup):
+				os.replace(path_to_backup, self.filename+'.'+str(index+1)+'.gz')
+
+		# Third, compress the log file.
+		#        * The log file is compressed to a temporary file first, so a compressed log file is never only partially written.
+		if self.no_of_log_backups > 0:
+			path_to_temporary_file = self.filename+'.1.gz.tmp'
+			with open(self.filename, 'rb') as LOGFILE, gzip.open(path_to_temporary_file, 'wb') as BACKUPFILE:
+				shutil.copyfileobj(LOGFILE, BACKUPFILE)
+			os.replace(path_to_temporary_file, self.filename+'.1.gz')
+
+		# Fourth, start a new log file.
+		self.file     = open(self.filename, 'wb', buffering=self.buffer_size)
+		self.log_size = 0
+
+	def raise_error(self):
+		"""
+		This method will raise the error given by the log sink thread, if the log sink thread has failed.
+		"""
+		if self.error is not None:
+			raise Exception('Error: The log sink thread failed while writing the log file: '+repr(self.error)) from self.error
+
+	def close(self):
+		"""
+		This method will wait until every event in the queue has been written, and then close the log file.
+		"""
+		self.queue.put(None)
+		self.thread.join()
+		self.file.close()
+		self.raise_error()
@@ -0,0 +1,448 @@
+"""
+RecyclingPool.py, Geoffrey Weal, 17/10/26
+
+This class is a pool of processes that stops any process that takes too long to process one input, and replaces it with a new process.
+"""
+import time, queue, threading
+import multiprocessing as mp
+from collections                import deque
+from multiprocessing.connection import wait
+
+# These are the modules that the forkserver imports before it starts any processes, so each process does not need to import them again (see get_pool_context).
+forkserver_preload = ['ACSD.ACSD.get_crystals_from_CSD_methods.get_crystal_from_CSD_single_process', 'ACSD.ACSD.get_crystals_from_CSD_methods.estimate_cost']
+
+def get_pool_context():
+	"""
+	This method will give the multiprocessing context used to start the processes of a RecyclingPool.
+
+	Processes are started by a forkserver (or spawned, if forkserver is not available), rather than forked from the main process.
+	The pool starts new processes while the run is going (to replace processes that are stopped or have ended), when the main
+	process is already running other threads (like the threads of ResultWriter, CustomParallelLogger and StatusReporter).
+	Forking a process while other threads are running can copy locks that are held by these threads, which may never be released
+	in the new process. The forkserver is a separate process without these threads, which forks each new process instead.
+
+	Returns
+	-------
+	context : multiprocessing.context.BaseContext
+		This is the multiprocessing context to use.
+	"""
+	if 'forkserver' not in mp.get_all_start_methods():
+		return mp.get_context('spawn')
+	context = mp.get_context('forkserver')
+	context.set_forkserver_preload(forkserver_preload)
+	return context
+
+
+class RecyclingPool:
+	"""
+	This class is a pool of processes that stops any process that takes longer than timeout seconds to process one input, and replaces it with a new process.
+
+	multiprocessing.Pool can not do this: if one of its processes is stopped, the inputs it was given are never returned, so
+	imap never finishes. Here, each process is given its inputs through its own pipe, and returns the result of each input as
+	soon as it is finished. The main process therefore knows which input each process is working on, and for how long:
+
+	* If a process takes longer than timeout seconds for one input, the process is stopped and replaced with a new process
+	  (which is initialised using initializer, as for multiprocessing.Pool). The result of this input is obtained from
+	  on_timeout, and the inputs the process had not started are given to the other processes.
+	* If a process ends by itself while processing an input (for example, if it ran out of memory or crashed), the process is
+	  replaced with a new process. The result of this input is obtained from on_failure, and the inputs the process had not
+	  started are given to the other processes.
+	* The time taken to initialise a process is not counted, as a process is only given inputs once it has been initialised.
+
+	Processes are not forked from the main process (see get_pool_context), so func, initializer and initargs must be able to be pickled.
+
+	This pool only provides the methods of multiprocessing.Pool used by the ACSD program (imap, imap_unordered, close, join and terminate).
+	"""
+
+	def __init__(self, processes, initializer=None, initargs=(), timeout=None, context=None):
+		"""
+		Parameters
+		----------
+		processes : int
+			This is the number of processes in the pool.
+		initializer : callable or None
+			If given, this is run with initargs in each process before it is given any inputs. Default: None
+		initargs : tuple
+			These are the arguments to give to initializer. Default: ()
+		timeout : float or None
+			This is the longest time (in seconds) a process can take to process one input before it is stopped. If None, processes are never stopped. Default: None
+		context : multiprocessing.context.BaseContext or None
+			This is the multiprocessing context used to start processes. If None, this is given by get_pool_context. Default: None
+		"""
+		self.initializer = initializer
+		self.initargs    = initargs
+		self.timeout     = timeout
+		self.context     = get_pool_context() if (context is None) else context
+
+		# First, record the number of processes that have been replaced, after taking longer than timeout or after ending by themselves.
+		self.no_of_processes_replaced  = 0
+		self.no_of_processes_timed_out = 0
+		self.no_of_processes_ended     = 0
+
+		# Second, start the processes.
+		self.processes = [self.start_process() for _ in range(processes)]
+
+	def start_process(self):
+		"""
+		This method will start a new process for the pool.
+
+		Returns
+		-------
+		pool_process : PoolProcess
+			This is the new process.
+		"""
+		connection, process_connection = self.context.Pipe()
+		process = self.context.Process(target=run_pool_process, args=(process_connection, self.initializer, self.initargs), daemon=True)
+		process.start()
+		process_connection.close()
+		return PoolProcess(process, connection)
+
+	def replace_process(self, pool_process):
+		"""
+		This method will stop a process, and replace it with a new process.
+
+		Parameters
+		----------
+		pool_process : PoolProcess
+			This is the process to stop.
+		"""
+		pool_process.stop()
+		self.processes[self.processes.index(pool_process)] = self.start_process()
+		self.no_of_processes_replaced += 1
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	def imap(self, func, iterable, chunksize=1, on_timeout=None, on_failure=None):
+		"""
+		This generator will give the result of func for each input in iterable, in the same order as iterable.
+
+		Parameters
+		----------
+		func : callable
+			This is the method to give each input to.
+		iterable : iterable
+			These are the inputs to give to func.
+		chunksize : int
+			This is the number of inputs given to a process at a time. Default: 1
+		on_timeout : callable or None
+			This is given the input, the time taken (in seconds) and the id of the process when a process takes longer than timeout
+			seconds for an input, and returns the result to give for this input. If None, an exception is raised instead. Default: None
+		on_failure : callable or None
+			This is given the input, the time taken (in seconds), the id of the process and the exitcode of the process when a process
+			ends by itself while processing an input, and returns the result to give for this input. If None, an exception is raised instead. Default: None
+
+		Yields
+		------
+		result : object
+			This is the result of func for each input.
+		"""
+		return self.get_results(func, iterable, chunksize, on_timeout, on_failure, ordered=True)
+
+	def imap_unordered(self, func, iterable, chunksize=1, on_timeout=None, on_failure=None):
+		"""
+		This generator will give the result of func for each input in iterable, as soon as each is finished (see imap).
+		"""
+		return self.get_results(func, iterable, chunksize, on_timeout, on_failure, ordered=False)
+
+	def get_results(self, func, iterable, chunksize, on_timeout, on_failure, ordered):
+		"""
+		This generator will give the inputs in iterable to the processes, and give the result of func for each input.
+
+		Parameters
+		----------
+		func : callable
+			This is the method to give each input to.
+		iterable : iterable
+			These are the inputs to give to func.
+		chunksize : int
+			This is the number of inputs given to a process at a time.
+		on_timeout : callable or None
+			This gives the result for an input that took longer than timeout seconds (see imap).
+		on_failure : callable or None
+			This gives the result for an input whose process ended by itself while processing it (see imap).
+		ordered : bool.
+			If True, results are given in the same order as iterable. If False, results are given as soon as they are finished.
+
+		Yields
+		------
+		result : object
+			This is the result of func for each input.
+		"""
+
+		# First, take inputs from iterable on a thread, so the processes can still be given inputs and return results while iterable is waiting (see ResultWriter.throttle).
+		chunks = queue.Queue(maxsize=2*len(self.processes))
+		feeder = threading.Thread(target=feed_chunks, args=(iterable, chunksize, chunks), name='ACSD-pool-feeder', daemon=True)
+		feeder.start()
+
+		# Second, set up the inputs of stopped processes that still need to be given to processes, and the results waiting to be given in order.
+		chunks_to_retry  = deque()
+		results_in_order = {}
+		next_index       = 0
+		no_more_chunks   = False
+
+		while True:
+
+			# Third, give a chunk of inputs to each process that has been initialised and has no inputs to process.
+			for pool_process in self.processes:
+				if (not pool_process.is_ready) or pool_process.is_busy():
+					continue
+				if len(chunks_to_retry) > 0:
+					chunk = chunks_to_retry.popleft()
+				elif no_more_chunks:
+					break
+				else:
+					try:
+						chunk = chunks.get_nowait()
+					except queue.Empty:
+						break
+					if chunk is None:
+						no_more_chunks = True
+						break
+					if isinstance(chunk, BaseException):
+						raise chunk
+				pool_process.give(func, chunk)
+
+			# Fourth, end once every input has been given to a process, and every result has been given.
+			busy_processes = [pool_process for pool_process in self.processes if pool_process.is_busy()]
+			if no_more_chunks and (len(chunks_to_retry) == 0) and (len(busy_processes) == 0):
+				break
+
+			# Fifth, wait until a process has returned a result or ended, until a process has taken longer than timeout, or
+			#        (if some processes have no inputs) until more inputs may have been taken from iterable.
+			wait_time = None
+			if (not no_more_chunks) and (len(busy_processes) < len(self.processes)):
+				wait_time = 0.05
+			if (self.timeout is not None) and (len(busy_processes) > 0):
+				time_until_timeout = max(min(pool_process.started for pool_process in busy_processes) + self.timeout - time.monotonic(), 0.0)
+				wait_time = time_until_timeout if (wait_time is None) else min(wait_time, time_until_timeout)
+			wait([pool_process.connection for pool_process in self.processes] + [pool_process.process.sentinel for pool_process in self.processes], wait_time)
+
+			# Sixth, obtain the results that have been returned, and replace any process that has ended or has taken longer than timeout.
+			for pool_process in list(self.processes):
+
+				# 6.1: Obtain the results this process has returned.
+				#      * If the process has ended, this also obtains the results it returned just before it ended.
+				has_ended = not pool_process.process.is_alive()
+				for index, result in pool_process.get_results():
+					results_in_order[index] = result
+
+				# 6.2: If the process has taken longer than timeout for its current input, obtain the result for this input
+				#      using on_timeout (before the process is stopped), and give the inputs it had not started to other processes.
+				if pool_process.is_busy() and (not has_ended) and (self.timeout is not None) and (time.monotonic() - pool_process.started > self.timeout):
+					index, input_data = pool_process.chunk.popleft()
+					if on_timeout is None:
+						raise Exception('Error: an input took longer than '+str(self.timeout)+' s to process. input = '+str(input_data))
+					results_in_order[index] = on_timeout(input_data, time.monotonic() - pool_process.started, pool_process.process.pid)
+					if len(pool_process.chunk) > 0:
+						chunks_to_retry.append(list(pool_process.chunk))
+					self.replace_process(pool_process)
+					self.no_of_processes_timed_out += 1
+
+				# 6.3: If the process ended by itself (for example, if it ran out of memory or crashed), obtain the result for the input it was
+				#      processing using on_failure, give the inputs it had not started to other processes, and replace it with a new process.
+				#      * If the process ended before it was initialised, a new process would most likely end in the same way, so stop here.
+				elif has_ended:
+					exitcode = pool_process.process.exitcode
+					if not pool_process.is_ready:
+						raise Exception('Error: a process in the pool ended before it was initialised (exitcode = '+str(exitcode)+')')
+					if pool_process.is_busy():
+						index, input_data = pool_process.chunk.popleft()
+						if on_failure is None:
+							raise Exception('Error: a process in the pool ended unexpectedly (exitcode = '+str(exitcode)+') while processing '+str(input_data))
+						results_in_order[index] = on_failure(input_data, time.monotonic() - pool_process.started, pool_process.process.pid, exitcode)
+						if len(pool_process.chunk) > 0:
+							chunks_to_retry.append(list(pool_process.chunk))
+					self.replace_process(pool_process)
+					self.no_of_processes_ended += 1
+
+			# Seventh, give the results that are ready.
+			if ordered:
+				while next_index in results_in_order:
+					yield results_in_order.pop(next_index)
+					next_index += 1
+			else:
+				for index in list(results_in_order):
+					yield results_in_order.pop(index)
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	def close(self):
+		"""
+		This method will tell each process to end once it has processed the inputs it has been given.
+		"""
+		for pool_process in self.processes:
+			try:
+				pool_process.connection.send(None)
+			except OSError:
+				pass
+
+	def join(self):
+		"""
+		This method will wait for each process to end.
+		"""
+		for pool_process in self.processes:
+			pool_process.process.join()
+			pool_process.connection.close()
+
+	def terminate(self):
+		"""
+		This method will stop each process straight away.
+		"""
+		for pool_process in self.processes:
+			pool_process.stop()
+
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------
+
+class PoolProcess:
+	"""
+	This class records a process of a RecyclingPool, along with the inputs it has been given that it has not returned the results of.
+	"""
+
+	def __init__(self, process, connection):
+		"""
+		Parameters
+		----------
+		process : multiprocessing.Process
+			This is the process.
+		connection : multiprocessing.connection.Connection
+			This is the pipe used to give inputs to the process and obtain results from it.
+		"""
+		self.process    = process
+		self.connection = connection
+		self.is_ready   = False
+		self.chunk      = deque()
+		self.started    = None
+
+	def is_busy(self):
+		"""
+		This method will indicate if this process has inputs it has not returned the results of.
+		"""
+		return len(self.chunk) > 0
+
+	def give(self, func, chunk):
+		"""
+		This method will give a chunk of inputs to this process.
+
+		Parameters
+		----------
+		func : callable
+			This is the method to give each input to.
+		chunk : list of (int, object)
+			These are the inputs to give to the process, along with the position of each in the iterable given to the pool.
+		"""
+		self.chunk.extend(chunk)
+		self.started = time.monotonic()
+		self.connection.send((func, [input_data for _, input_data in chunk]))
+
+	def get_results(self):
+		"""
+		This generator will give the results this process has returned. The time this process started its current input is updated as each result is returned.
+
+		Yields
+		------
+		index : int
+			This is the position of the input in the iterable given to the pool.
+		result : object
+			This is the result for this input.
+		"""
+		while self.process_has_returned():
+			try:
+				message_type, value = self.connection.recv()
+			except EOFError:
+				return
+			if message_type == 'ready':
+				self.is_ready = True
+			elif message_type == 'error':
+				raise value
+			else:
+				index, _ = self.chunk.popleft()
+				self.started = time.monotonic()
+				yield index, value
+
+	def process_has_returned(self):
+		"""
+		This method will indicate if this process has returned a message that has not been read.
+		"""
+		try:
+			return self.connection.poll()
+		except OSError:
+			return False
+
+	def stop(self):
+		"""
+		This method will stop this process.
+		"""
+		if self.process.is_alive():
+			self.process.kill()
+		self.process.join()
+		self.connection.close()
+
+# ---------------------------------------------------------------------------------------------------------------------------------------------------------
+
+def feed_chunks(iterable, chunksize, chunks):
+	"""
+	This method is run by the feeder thread of a RecyclingPool. It gives chunks of inputs from iterable to chunks, followed by None.
+
+	Parameters
+	----------
+	iterable : iterable
+		These are the inputs to give to the processes.
+	chunksize : int
+		This is the number of inputs in each chunk.
+	chunks : queue.Queue
+		This is given each chunk, as a list of (position in iterable, input). If iterable raises an exception, this is given the exception.
+	"""
+	try:
+		chunk = []
+		for index, input_data in enumerate(iterable):
+			chunk.append((index, input_data))
+			if len(chunk) == chunksize:
+				chunks.put(chunk)
+				chunk = []
+		if len(chunk) > 0:
+			chunks.put(chunk)
+	except BaseException as exception:
+		chunks.put(exception)
+	chunks.put(None)
+
+def run_pool_process(connection, initializer, initargs):
+	"""
+	This method is run by each process of a RecyclingPool. It returns the result of each input it is given as soon as it is finished, until it is given None.
+
+	Parameters
+	----------
+	connection : multiprocessing.connection.Connection
+		This is the pipe used to obtain inputs from the main process and return results to it.
+	initializer : callable or None
+		If given, this is run with initargs before any inputs are processed.
+	initargs : tuple
+		These are the arguments to give to initializer.
+	"""
+
+	# First, initialise this process, and tell the main process that it can be given inputs.
+	try:
+		if initializer is not None:
+			initializer(*initargs)
+	except Exception as exception:
+		connection.send(('error', exception))
+		return
+	connection.send(('ready', None))
+
+	# Second, process each chunk of inputs given by the main process.
+	while True:
+		try:
+			task = connection.recv()
+		except EOFError:
+			return
+		if task is None:
+			return
+		func, chunk = task
+		for input_data in chunk:
+			try:
+				message = ('result', func(input_data))
+			except Exception as exception:
+				message = ('error', exception)
+			try:
+				connection.send(message)
+			except Exception as exception:
+				connection.send(('error', Exception('Error: the result of '+str(input_data)+' could not be returned to the main process: '+repr(exception))))
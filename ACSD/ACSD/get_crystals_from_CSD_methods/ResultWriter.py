@@ -0,0 +1,173 @@
+"""
+ResultWriter.py, Geoffrey Weal, 17/10/26
+
+This class writes the xyz files of crystals and records their results on background threads of the main process, so the processes converting crystals never wait for the disk.
+"""
+import time, queue, threading
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file import write_xyz_data_to_crystal_database
+from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings      import time_stage
+
+class ResultWriter:
+	"""
+	This class writes the xyz files of crystals and records their results on background threads of the main process.
+
+	Processes return the contents of the xyz file of each crystal in its CrystalResult, rather than writing it themselves. The
+	main process gives each result to this class, which places it in a queue. Writer threads take results from this queue,
+	write the xyz file of the crystal (to its location in the crystal database folder), and then record the result (which
+	updates the counts, the log file, the binary shards and the results store).
+
+	* Writing xyz files releases the GIL, so more than one writer thread can write xyz files at the same time. This is useful
+	  on shared file systems (like Lustre and NFS), where each write can take a long time.
+	* Results are recorded one at a time (using record_lock), so the counts, log file, binary shards and results store are
+	  only ever changed by one thread at a time. A result is only recorded once its xyz file has been written, so the results
+	  store never records a crystal whose xyz file is not on disk.
+	* The queue holds at most max_queue_size results. If the disk can not keep up, the main process waits when giving this
+	  class a result, and (using throttle) no more identifiers are given to the processes until results have been written.
+	"""
+
+	def __init__(self, record, save_crystals_to, layout='flat', max_queue_size=1000, no_of_threads=1):
+		"""
+		Parameters
+		----------
+		record : callable
+			This method records a result once its xyz file has been written (see record_result.py).
+		save_crystals_to : str.
+			This is the path to the crystal database folder.
+		layout : str.
+			This is the layout of the crystal database folder (see crystal_database_layout.py). Default: 'flat'
+		max_queue_size : int
+			This is the largest number of results that can wait to be written. Default: 1000
+		no_of_threads : int
+			This is the number of writer threads. If results must be recorded in the order they are given, this must be 1. Default: 1
+		"""
+		self.record           = record
+		self.save_crystals_to = save_crystals_to
+		self.layout           = layout
+		self.queue            = queue.Queue(maxsize=max_queue_size)
+		self.record_lock      = threading.Lock()
+		self.in_flight        = None
+		self.error            = None
+
+		# First, create the writer threads.
+		#        * These are only started when the first result is given (see put), which is after the pool of processes has been created.
+		#        * Processes that replace processes of the pool while these threads are running are started by a forkserver, rather than
+		#          forked from the main process, so these threads are never copied into a new process (see RecyclingPool.get_pool_context).
+		self.threads = [threading.Thread(target=self.run, name='ACSD-result-writer-'+str(index), daemon=True) for index in range(no_of_threads)]
+		self.started = False
+
+	def put(self, result):
+		"""
+		This method will give a result to be written. If the queue is full, this waits until there is space in the queue.
+
+		Parameters
+		----------
+		result : CrystalResult
+			This is the result of processing an identifier.
+		"""
+		if not self.started:
+			for thread in self.threads:
+				thread.start()
+			self.started = True
+		while True:
+			self.raise_error()
+			try:
+				self.queue.put(result, timeout=0.1)
+				return
+			except queue.Full:
+				pass
+
+	def qsize(self):
+		"""
+		This method will give the number of results waiting to be written.
+
+		Returns
+		-------
+		qsize : int
+			This is the number of results in the queue.
+		"""
+		return self.queue.qsize()
+
+	def throttle(self, inputs, max_in_flight):
+		"""
+		This generator will yield the inputs for the processes, but will wait before yielding an input if max_in_flight
+		identifiers have been given to the processes whose results have not yet been written.
+
+		This stops the processes converting crystals much faster than they can be written, which would otherwise fill
+		the memory of the main process with results waiting to be written.
+
+		Parameters
+		----------
+		inputs : iterable
+			These are the inputs for the processes (see get_inputs.py).
+		max_in_flight : int
+			This is the largest number of identifiers that can be given to the processes whose results have not yet been written.
+			This must be larger than the number of identifiers given to a process at a time (the chunksize).
+
+		Yields
+		------
+		input_data : str. or tuple
+			This is the input for a process.
+		"""
+		self.in_flight = threading.Semaphore(max_in_flight)
+		for input_data in inputs:
+			while not self.in_flight.acquire(timeout=0.1):
+				self.raise_error()
+			yield input_data
+
+	def run(self):
+		"""
+		This method is run by each writer thread. It writes and records results until it is given None.
+		"""
+		while True:
+			result = self.queue.get()
+			if result is None:
+				return
+			try:
+				if self.error is None:
+					self.write(result)
+			except BaseException as exception:
+				self.error = exception
+			finally:
+				if self.in_flight is not None:
+					self.in_flight.release()
+
+	def write(self, result):
+		"""
+		This method will write the xyz file of a crystal (if it has one), and then record its result.
+
+		Parameters
+		----------
+		result : CrystalResult
+			This is the result of processing an identifier.
+		"""
+
+		# First, write the xyz file of the crystal, and record its checksum and location in the result.
+		#        * The contents of the xyz file are then removed from the result, as they are no longer needed.
+		#        * The time taken to write the xyz file is added to the timings of the result (using the cpu time of this thread only).
+		if result.xyz_data is not None:
+			with time_stage('write_xyz', result.timings, cpu_clock=time.thread_time, report_stage=False):
+				result.checksum, result.location = write_xyz_data_to_crystal_database(result.xyz_data, self.save_crystals_to, result.identifier, self.layout)
+			result.xyz_data = None
+
+		# Second, record the result.
+		with self.record_lock:
+			self.record(result)
+
+	def raise_error(self):
+		"""
+		This method will raise the error given by a writer thread, if a writer thread has failed.
+		"""
+		if self.error is not None:
+			raise Exception('Error: A result writer thread failed while writing crystals: '+repr(self.error)) from self.error
+
+	def close(self):
+		"""
+		This method will wait until every result in the queue has been written, and then stop the writer threads.
+		"""
+		if not self.started:
+			return
+		for thread in self.threads:
+			self.queue.put(None)
+		for thread in self.threads:
+			thread.join()
+		self.raise_error()
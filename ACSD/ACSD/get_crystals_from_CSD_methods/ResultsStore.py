@@ -0,0 +1,263 @@
+"""
+ResultsStore.py, Geoffrey Weal, 17/10/26
+
+This class records the outcome, crystal quality flags and SMILES comparison of every identifier processed in the crystal database folder.
+"""
+import os, time, sqlite3
+from datetime import datetime
+
+# This is the name of the results store in the crystal database folder.
+results_store_filename = 'ACSD_results.db'
+
+class ResultsStore:
+	"""
+	This class records the outcome, crystal quality flags and SMILES comparison of every identifier processed in the crystal database folder.
+
+	The results store is a SQLite database with one row per identifier. It is used to resume a run from where it stopped,
+	and can be queried for crystals of interest (for example, all crystals with disorder that are charged). The side files
+	(like crystals_not_written.txt and crystal_quality_information.csv) are written from the results store (see write_side_files.py).
+
+	Results are held in memory and committed to disk in batches, once commit_every results have been recorded or commit_interval
+	seconds have passed, and when the results store is closed. If the ACSD program is killed, any identifiers whose results were not
+	committed are processed again when the run is resumed. Only the main process writes to the results store.
+	"""
+
+	# These are the statuses that are recorded in the results store. Excluded and already processed identifiers are not recorded.
+	statuses_to_record = ('recorded', 'not_found', 'no_coordinates', 'rejected', 'timeout', 'failed')
+
+	# These are the crystal quality flags that are recorded for each crystal that was recorded (see check_crystal_quality.py).
+	flag_columns = ('has_disorder', 'different_to_user_with_H', 'different_to_user_without_H', 'is_charge_zero', 'is_mult_one', 'same_as_SMILES')
+
+	# These are all the columns in the results store.
+	columns = ('identifier', 'status', 'reason', 'checksum', 'location', 'processing_time') + flag_columns + ('SMILES_difference', 'finished_at')
+
+	def __init__(self, path_to_results_store, commit_every=1000, commit_interval=5.0):
+		"""
+		Parameters
+		----------
+		path_to_results_store : str.
+			This is the path to the results store database.
+		commit_every : int
+			This is the number of results to hold in memory before committing them to disk. Default: 1000
+		commit_interval : float
+			This is the longest time (in seconds) to hold results in memory before committing them to disk. Default: 5.0
+		"""
+		self.path_to_results_store = path_to_results_store
+		self.existed               = os.path.exists(path_to_results_store)
+		self.commit_every          = commit_every
+		self.commit_interval       = commit_interval
+		self.results_to_commit     = []
+		self.last_commit_time      = time.monotonic()
+
+		# First, open the results store.
+		#        * WAL mode means each commit only appends to the write-ahead log, so committing often is cheap.
+		#        * The results store is used by the writer threads of the main process (see ResultWriter.py). These only use it one at a time, so it does not need to be checked that it is used by the thread that opened it.
+		self.connection = sqlite3.connect(path_to_results_store, check_same_thread=False)
+		self.connection.execute('PRAGMA journal_mode=WAL')
+		self.connection.execute('PRAGMA synchronous=NORMAL')
+
+		# Second, create the tables and the indices for filtering crystals, if they do not already exist.
+		#         * The settings table records settings that must be the same for every run in the crystal database folder (like its layout, see crystal_database_layout.py).
+		flag_definitions = ', '.join(flag_column+' INTEGER' for flag_column in self.flag_columns)
+		self.connection.execute(f'CREATE TABLE IF NOT EXISTS crystals (identifier TEXT PRIMARY KEY, status TEXT NOT NULL, reason TEXT, checksum TEXT, location TEXT, processing_time REAL, {flag_definitions}, SMILES_difference TEXT, finished_at TEXT)')
+		self.connection.execute('CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS crystals_status ON crystals (status)')
+		for flag_column in self.flag_columns:
+			self.connection.execute(f'CREATE INDEX IF NOT EXISTS crystals_{flag_column} ON crystals ({flag_column})')
+		self.connection.commit()
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	def record(self, result):
+		"""
+		This method will record the result of an identifier. This is written to disk when commit is called.
+
+		Parameters
+		----------
+		result : CrystalResult
+			This is the result of processing an identifier.
+		"""
+
+		# First, only record identifiers that were processed in this run.
+		if result.status not in self.statuses_to_record:
+			return
+
+		# Second, obtain the crystal quality flags and the SMILES comparison data for this crystal (see check_crystal_quality.get_flag_values).
+		if result.flags is not None:
+			flags = [result.flags[flag_column] for flag_column in self.flag_columns]
+			SMILES_difference = result.flags['SMILES_difference']
+		else:
+			flags = [None] * len(self.flag_columns)
+			SMILES_difference = None
+
+		# Third, add this result to the results to commit.
+		processing_time = result.timings.get('total', None)
+		self.results_to_commit.append((result.identifier, result.status, result.reason, result.checksum, result.location, processing_time, *flags, SMILES_difference, str(datetime.now())))
+
+	def commit(self):
+		"""
+		This method will write all the results that have been recorded since the last commit to disk.
+		"""
+		if len(self.results_to_commit) > 0:
+			with self.connection:
+				self.connection.executemany(f"INSERT OR REPLACE INTO crystals ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})", self.results_to_commit)
+			self.results_to_commit = []
+		self.last_commit_time = time.monotonic()
+
+	def commit_if_needed(self):
+		"""
+		This method will commit the results to disk if enough results have been recorded, or if enough time has passed since the last commit.
+		"""
+		if (len(self.results_to_commit) >= self.commit_every) or (time.monotonic() - self.last_commit_time >= self.commit_interval):
+			self.commit()
+
+	def import_results(self, results):
+		"""
+		This method will record results that were written to the crystal database folder before the results store was created (see write_side_files.py).
+
+		Results that are already in the results store are not changed.
+
+		Parameters
+		----------
+		results : list of dict.
+			These are the results to record. Any columns that are not given are recorded as None.
+		"""
+		with self.connection:
+			self.connection.executemany(f"INSERT OR IGNORE INTO crystals ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})", ([result.get(column, None) for column in self.columns] for result in results))
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	def get_results(self, status=None, **flags):
+		"""
+		This method will return the results of the identifiers with the given status and crystal quality flags.
+
+		For example, get_results(status='recorded', has_disorder=True, is_charge_zero=False) will return all the recorded crystals that contain disorder and are charged.
+
+		Parameters
+		----------
+		status : str., list of str. or None
+			Only return results with this status (or one of these statuses). If None, results with any status are returned. Default: None
+		flags : bool.
+			Only return results with these crystal quality flags. These can be any of ResultsStore.flag_columns.
+
+		Returns
+		-------
+		results : list of dict.
+			These are the results, in the order they finished being processed.
+		"""
+
+		# First, obtain the conditions to filter the results by.
+		conditions = []; values = []
+		if status is not None:
+			statuses = [status] if isinstance(status, str) else list(status)
+			conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+			values += statuses
+		for flag_column, value in flags.items():
+			if flag_column not in self.flag_columns:
+				raise Exception('Error: '+str(flag_column)+' is not a crystal quality flag. Crystal quality flags are: '+str(self.flag_columns))
+			conditions.append(f'{flag_column} = ?')
+			values.append(bool(value))
+
+		# Second, obtain the results that satisfy these conditions.
+		where  = (' WHERE '+' AND '.join(conditions)) if (len(conditions) > 0) else ''
+		cursor = self.connection.execute(f"SELECT {', '.join(self.columns)} FROM crystals{where} ORDER BY finished_at, rowid", values)
+		return [dict(zip(self.columns, row)) for row in cursor]
+
+	def query(self, status=None, **flags):
+		"""
+		This method will return the identifiers with the given status and crystal quality flags (see get_results).
+
+		Returns
+		-------
+		identifiers : list of str.
+			These are the identifiers, in the order they finished being processed.
+		"""
+		return [result['identifier'] for result in self.get_results(status, **flags)]
+
+	def get_finished_identifiers(self):
+		"""
+		This method will return the status of every identifier that has finished being processed.
+
+		Returns
+		-------
+		finished_identifiers : dict. of {str: str}
+			This is the status of each identifier recorded in the results store.
+		"""
+		return dict(self.connection.execute('SELECT identifier, status FROM crystals'))
+
+	def get_processing_times(self):
+		"""
+		This method will return how long each identifier took to process.
+
+		Returns
+		-------
+		processing_times : dict. of {str: float}
+			This is how long each identifier took to process.
+		"""
+		return dict(self.connection.execute('SELECT identifier, processing_time FROM crystals WHERE processing_time IS NOT NULL'))
+
+	def get_crystal_locations(self):
+		"""
+		This method will return the location of the xyz file of every recorded crystal (see crystal_database_layout.py).
+
+		Returns
+		-------
+		locations : dict. of {str: str}
+			This is the path to the xyz file of each recorded crystal, relative to the crystal database folder. Crystals that were only written to binary shards are not included.
+		"""
+		return dict(self.connection.execute("SELECT identifier, location FROM crystals WHERE status = 'recorded' AND location IS NOT NULL"))
+
+	def get_setting(self, name):
+		"""
+		This method will return a setting recorded for the crystal database folder.
+
+		Parameters
+		----------
+		name : str.
+			This is the name of the setting.
+
+		Returns
+		-------
+		value : str. or None
+			This is the value of the setting. None if this setting has not been recorded.
+		"""
+		row = self.connection.execute('SELECT value FROM settings WHERE name = ?', (name,)).fetchone()
+		return None if (row is None) else row[0]
+
+	def set_setting(self, name, value):
+		"""
+		This method will record a setting for the crystal database folder.
+
+		Parameters
+		----------
+		name : str.
+			This is the name of the setting.
+		value : str.
+			This is the value of the setting.
+		"""
+		with self.connection:
+			self.connection.execute('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', (name, value))
+
+	def get_checksum(self, identifier):
+		"""
+		This method will return the checksum of the xyz file recorded for an identifier.
+
+		Parameters
+		----------
+		identifier : str.
+			This is the identifier of the crystal.
+
+		Returns
+		-------
+		checksum : str. or None
+			This is the sha256 checksum of the xyz file for this identifier. None if no xyz file was recorded for this identifier.
+		"""
+		row = self.connection.execute('SELECT checksum FROM crystals WHERE identifier = ?', (identifier,)).fetchone()
+		return None if (row is None) else row[0]
+
+	def close(self):
+		"""
+		This method will commit any remaining results, and close the results store.
+		"""
+		self.commit()
+		self.connection.close()
@@ -0,0 +1,307 @@
+"""
+RunSettings.py, Geoffrey Weal, 17/10/26
+
+This script holds the settings of an ACSD run, so that every option is read from the command line and checked in one place.
+
+Each option is given once in run_options, along with the name of its command line argument, its default value, how to read it from the
+command line, and what values it can be given. RunSettings checks every option when it is made, so the methods that are given a
+RunSettings object (like run_ACSD and get_crystals_from_CSD) do not need to check them again.
+"""
+from ACSD.ACSD.get_crystals_from_CSD_methods.estimate_cost           import cost_estimators
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout import layouts
+from ACSD.ACSD.get_crystals_from_CSD_methods.CustomParallelLogger    import log_levels, log_formats
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore            import ResultsStore
+
+# These are the statuses of identifiers that were not written, which can be processed again when resuming a run (see filter_identifiers.py).
+retryable_statuses = tuple(status for status in ResultsStore.statuses_to_record if (status != 'recorded'))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# These methods read the value of an option from the string given on the command line.
+# A ValueError is raised if the string can not be read.
+
+def read_str(value):
+	return value
+
+def read_lower(value):
+	return value.lower()
+
+def read_upper(value):
+	return value.upper()
+
+def read_bool(value):
+	if value.lower() in ['t', 'true']:
+		return True
+	elif value.lower() in ['f', 'false']:
+		return False
+	raise ValueError(value)
+
+def read_int(value):
+	return int(value)
+
+def read_int_or_auto(value):
+	return 'auto' if (value.lower() == 'auto') else int(value)
+
+def read_float(value):
+	return float(value)
+
+def read_optional_str(value):
+	return None if (value.lower() == 'none') else value
+
+def read_gigabytes(value):
+	return int(float(value) * 1e9)
+
+def read_megabytes(value):
+	return int(float(value) * 1e6)
+
+def read_list(value):
+	return tuple(value.replace(',', ' ').split())
+
+def read_optional_list(value):
+	return () if (value.lower() == 'none') else read_list(value)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# These methods check the value of an option.
+
+def is_bool(value):
+	return isinstance(value, bool)
+
+def is_positive_int(value):
+	return isinstance(value, int) and (not isinstance(value, bool)) and (value > 0)
+
+def is_non_negative_int(value):
+	return isinstance(value, int) and (not isinstance(value, bool)) and (value >= 0)
+
+def is_auto_or_positive_int(value):
+	return (value == 'auto') or is_positive_int(value)
+
+def is_positive_number(value):
+	return isinstance(value, (int, float)) and (not isinstance(value, bool)) and (value > 0)
+
+def is_optional_str(value):
+	return (value is None) or isinstance(value, str)
+
+def is_list_of_str(value):
+	return isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value)
+
+def is_list_of(values):
+	return lambda value: is_list_of_str(value) and all((item in values) for item in value)
+
+def is_optional(is_valid):
+	return lambda value: (value is None) or is_valid(value)
+
+def is_one_of(values):
+	return lambda value: value in values
+
+def is_output_format(value):
+	# CrystalShards.py imports numpy, which is slow to import, so it is only imported once the settings are checked (see Benchmarks/benchmark_import_time.py).
+	from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalShards import output_formats
+	return value in output_formats
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+# These are the options of an ACSD run. Each option is given as:
+#    name: (command line argument, default, method to read it from the command line, method to check it, what values the option can be given)
+# * Options with no command line argument can only be given when running the ACSD from python.
+run_options = {
+	'overwrite_existing_crystal_files': ('overwrite',           True,    read_bool,         is_bool,                         'either True or False'),
+	'crystals_to_exclude_filename':     ('crystals_to_exclude', None,    read_str,          is_optional_str,                 'the path to a file or None'),
+	'no_cpus':                          ('no_cpus',             1,       read_int,          is_positive_int,                 'a positive integer'),
+	'chunksize':                        ('chunksize',           'auto',  read_int_or_auto,  is_auto_or_positive_int,         'either "auto" or a positive integer'),
+	'ordered':                          ('ordered',             False,   read_bool,         is_bool,                         'either True or False'),
+	'cost_estimator':                   ('cost_estimator',      None,    read_optional_str, is_one_of(cost_estimators+(None,)), 'one of '+str(cost_estimators)+' or None'),
+	'path_to_cache':                    ('cache_dir',           None,    read_str,          is_optional_str,                 'the path to a folder or None'),
+	'max_cache_size':                   ('max_cache_size',      None,    read_gigabytes,    is_optional(is_positive_number), 'a positive number (in GB) or None'),
+	'path_to_query':                    ('query',               None,    read_str,          is_optional_str,                 'the path to a query file or None'),
+	'elements_to_reject':               ('reject_elements',     (),      read_list,         is_list_of_str,                  'a list of elements'),
+	'output_format':                    ('output_format',       'xyz',   read_lower,        is_output_format,                'one of (\'xyz\', \'npz\', \'both\')'),
+	'crystals_per_shard':               ('crystals_per_shard',  1000,    read_int,          is_positive_int,                 'a positive integer'),
+	'layout':                           ('layout',              'flat',  read_lower,        is_one_of(layouts),              'one of '+str(layouts)),
+	'no_of_writer_threads':             ('writer_threads',      4,       read_int,          is_positive_int,                 'a positive integer'),
+	'write_queue_size':                 ('write_queue_size',    1000,    read_int,          is_positive_int,                 'a positive integer'),
+	'profile_identifiers':              ('profile',             (),      read_list,         is_list_of_str,                  'a list of identifiers'),
+	'log_level':                        ('log_level',           'DEBUG', read_upper,        is_one_of(tuple(log_levels)),    'one of '+str(tuple(log_levels))),
+	'log_format':                       ('log_format',          'text',  read_lower,        is_one_of(log_formats),          'one of '+str(log_formats)),
+	'max_log_size':                     ('max_log_size',        None,    read_megabytes,    is_optional(is_positive_number), 'a positive number (in MB) or None'),
+	'no_of_log_backups':                ('log_backups',         5,       read_int,          is_non_negative_int,             'a positive integer or 0'),
+	'status_interval':                  ('status_interval',     None,    read_float,        is_optional(is_positive_number), 'a number greater than 0 (in seconds) or None'),
+	'timeout':                          ('timeout',             None,    read_float,        is_optional(is_positive_number), 'a number greater than 0 (in seconds) or None'),
+	'retry_statuses':                   ('retry',               ('timeout', 'failed'), read_optional_list, is_list_of(retryable_statuses), 'a list of statuses from '+str(retryable_statuses)+' or None'),
+	'settings_given_to_processes':      (None,                  True,    None,              is_bool,                         'either True or False'),
+	'write_side_files_to_disk':         (None,                  True,    None,              is_bool,                         'either True or False'),
+}
+
+class RunSettings:
+	"""
+	This class holds the settings of an ACSD run. Each option in run_options is an attribute of this object.
+
+	Parameters
+	----------
+	options : dict.
+		These are the options to give this run. Options that are not given are given their default values (see run_options).
+
+	Attributes
+	----------
+	overwrite_existing_crystal_files : bool.
+		This boolean indicate if you want to overwrite already existing crystal files in the crystal database folder. Default: True.
+	crystals_to_exclude_filename : str. or None
+		The is the path to the file that contain CCDC identifiers you do not want to include in this run. If None, don't exclude any CCDC IDs. Default: None
+	no_cpus : int
+		This is the number of cpus you would like to use to process the ACSD. 
+	chunksize : int or 'auto'
+		This is the number of identifiers given to a cpu at a time. If 'auto', this is chosen based on the number of identifiers and cpus. Default: 'auto'
+	ordered : bool.
+		If True, results are recorded in the order the identifiers were given. If False, results are recorded as soon as they are finished. Default: False
+	cost_estimator : str. or None
+		If given, the cost of each identifier is estimated and the most costly identifiers are processed first. Either 'atoms', 'components', 'symmetry' or 'previous'. Default: None
+	path_to_cache : str. or None
+		This is the path to the folder to store converted crystals in, so they do not need to be converted again. This folder can be shared between crystal database folders. If None, no cache is used. Default: None
+	max_cache_size : int or None
+		This is the maximum size of the cache folder (in bytes). If None, the cache is not limited in size. Default: None
+	path_to_query : str. or None
+		This is the path to a query file (see CSD_query.py). The identifiers of the entries in the CSD that match this query are processed, as well as the identifiers in paths_to_identifiers. If None, no query is made. Default: None
+	elements_to_reject : list of str.
+		These are the elements that you do not want crystals to contain. Crystals containing these elements are rejected. Default: ()
+	output_format : str.
+		This is the format to write crystals in. This is either 'xyz' (an xyz file for each crystal), 'npz' (binary shards, see CrystalShards.py) or 'both'. Default: 'xyz'
+	crystals_per_shard : int
+		This is the number of crystals to write to each binary shard, if output_format is 'npz' or 'both'. Default: 1000
+	layout : str.
+		This is where xyz files are placed in the crystal database folder. This is either 'flat' or 'hashed' (see crystal_database_layout.py). Default: 'flat'
+	no_of_writer_threads : int
+		This is the number of threads in the main process that write xyz files, so the cpus converting crystals never wait for the disk (see ResultWriter.py). Default: 4
+	write_queue_size : int
+		This is the largest number of crystals that can wait to be written. If the disk can not keep up, no more crystals are converted until crystals have been written. Default: 1000
+	profile_identifiers : list of str.
+		These are the identifiers to profile with cProfile. The profile of each identifier is written to the profiles folder in the crystal database folder (see stage_timings.py). Default: ()
+	log_level : str.
+		Only messages at or above this level are written to the log file. This is either 'DEBUG', 'INFO', 'WARNING' or 'ERROR'. Default: 'DEBUG'
+	log_format : str.
+		This is the format to write the log file in. This is either 'text' (ACSD_logfile.log) or 'json' (ACSD_logfile.jsonl). Default: 'text'
+	max_log_size : int or None
+		This is the largest size of the log file (in bytes) before it is compressed and a new log file is started. If None, the log file is never rotated. Default: None
+	no_of_log_backups : int
+		This is the number of compressed log files to keep when the log file is rotated. Default: 5
+	status_interval : float or None
+		If given, the status of the run is written to ACSD_status.json in the crystal database folder every status_interval seconds (see StatusReporter.py). If None, no status file is written. Default: None
+	timeout : float or None
+		If given, this is the longest time (in seconds) to spend converting one identifier. The process converting an identifier that takes longer than this is stopped and replaced with a new process, and the identifier is recorded with the status 'timeout' (see RecyclingPool.py). If None, identifiers can take any time. Default: None
+	retry_statuses : list of str.
+		If overwrite_existing_crystal_files is False, the identifiers that were given one of these statuses in a previous run are processed again, rather than being excluded. These can be 'not_found', 'no_coordinates', 'rejected', 'timeout' or 'failed'. Default: ('timeout', 'failed')
+	settings_given_to_processes : bool.
+		If True, the settings that are the same for every identifier are given once to each process, rather than with every identifier. Default: True
+	write_side_files_to_disk : bool.
+		If True, the side files (like crystals_not_written.txt and crystal_quality_information.csv) are written from the results store at the end of the run. Default: True
+	"""
+	def __init__(self, **options):
+
+		# First, make sure only options of an ACSD run have been given.
+		unknown_options = [name for name in options.keys() if (name not in run_options)]
+		if len(unknown_options) > 0:
+			raise Exception('Error: '+str(unknown_options)+' are not options of an ACSD run. Options are: '+str(list(run_options.keys())))
+
+		# Second, give each option its value, or its default value if it was not given.
+		for name, (argument, default, read_argument, is_valid, requirement) in run_options.items():
+			setattr(self, name, options.get(name, default))
+
+		# Third, check the value of every option.
+		self.check()
+
+	@classmethod
+	def from_arguments(cls, arguments):
+		"""
+		This method will read the settings of an ACSD run from the arguments given on the command line.
+
+		Parameters
+		----------
+		arguments : argparse.Namespace
+			These are the arguments given on the command line (see ACSD.py).
+
+		Returns
+		-------
+		settings : RunSettings
+			These are the settings of this ACSD run.
+		"""
+		options = {}
+		for name, (argument, default, read_argument, is_valid, requirement) in run_options.items():
+
+			# First, if this option is not given on the command line, use its default value.
+			if (argument is None) or (not hasattr(arguments, argument)):
+				continue
+
+			# Second, only one value can be given for each argument.
+			values = getattr(arguments, argument)
+			if len(values) != 1:
+				raise Exception('Error: '+str(argument)+' has more than one input')
+			value = values[0]
+
+			# Third, read the value of this option. Arguments that are not given on the command line have the value None.
+			if value is None:
+				options[name] = default
+				continue
+			try:
+				options[name] = read_argument(value)
+			except ValueError:
+				raise Exception('Error: '+str(argument)+' must be '+str(requirement)+'. '+str(argument)+' = '+str(value))
+
+		# Fourth, return the settings of this ACSD run.
+		return cls(**options)
+
+	def check(self):
+		"""
+		This method will check the value of every option, giving an error if an option has been given a value it can not be given.
+		"""
+		for name, (argument, default, read_argument, is_valid, requirement) in run_options.items():
+			value = getattr(self, name)
+			if not is_valid(value):
+				raise Exception('Error: '+str(name)+' must be '+str(requirement)+'. '+str(name)+' = '+str(value))
+
+	def as_dict(self):
+		"""
+		This method will return the options of this ACSD run.
+
+		Returns
+		-------
+		options : dict.
+			These are the options of this ACSD run.
+		"""
+		return {name: getattr(self, name) for name in run_options.keys()}
+
+	def replace(self, **options):
+		"""
+		This method will return a copy of these settings, with the given options changed.
+
+		Parameters
+		----------
+		options : dict.
+			These are the options to change.
+
+		Returns
+		-------
+		settings : RunSettings
+			These are the new settings.
+		"""
+		return RunSettings(**{**self.as_dict(), **options})
+
+def get_run_settings(settings=None, **options):
+	"""
+	This method will obtain the settings of an ACSD run from either a RunSettings object, the options given, or both.
+
+	The settings are only checked again if options are given, so settings given from run_ACSD to get_crystals_from_CSD are only checked once.
+
+	Parameters
+	----------
+	settings : RunSettings or None
+		These are the settings of the ACSD run. If None, the settings are made from options. Default: None
+	options : dict.
+		These are options to give the ACSD run, which are used instead of those in settings.
+
+	Returns
+	-------
+	settings : RunSettings
+		These are the settings of the ACSD run.
+	"""
+	if settings is None:
+		return RunSettings(**options)
+	if len(options) > 0:
+		return settings.replace(**options)
+	return settings
@@ -0,0 +1,194 @@
+"""
+StatusReporter.py, Geoffrey Weal, 17/10/26
+
+This class writes the status of a run to a JSON file every few seconds, so the progress of a long run can be followed without looking at the progress bar.
+"""
+import os, json, time, threading
+from array       import array
+from collections import deque
+from datetime    import datetime
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore  import ResultsStore
+from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings import get_stage_timing_summary
+from ACSD.ACSD.get_crystals_from_CSD_methods.worker_status import get_worker_statuses, is_process_running
+
+# This is the name of the status file in the crystal database folder.
+status_filename = 'ACSD_status.json'
+
+class StatusReporter:
+	"""
+	This class writes the status of a run to a JSON file every status_interval seconds, on a thread of the main process.
+
+	The status file gives:
+
+		* The number of identifiers processed, processed per second (over the whole run, and over the last rate_window seconds), and the estimated time until the run is finished.
+		* The number of identifiers given each status (recorded, not_found, no_coordinates, rejected, timeout, failed, excluded and already_processed), and the fraction of processed identifiers that were rejected.
+		* The number of entries rejected by each stage of checks (see prefilter_entry.py), and the wall time taken by each stage of converting crystals (see stage_timings.py).
+		* The number of results waiting to be written (see ResultWriter.py).
+		* The identifier each process is converting, the stage it is in, and how long it has been converted for, along with the
+		  slowest identifiers being converted (see worker_status.py).
+
+	The status file is written to a temporary file that then replaces the status file, so the status file is never only partially written.
+	The counts and reports are only copied while holding record_lock, as they are updated by the writer threads.
+	"""
+
+	def __init__(self, path_to_status_file, no_of_identifiers, counts, record_lock, status_interval=30.0, result_writer=None, worker_status_board=None, filter_stage_report=None, stage_timing_report=None, no_of_slowest_in_flight=10, rate_window=300.0):
+		"""
+		Parameters
+		----------
+		path_to_status_file : str.
+			This is the path to write the status file to.
+		no_of_identifiers : int
+			This is the number of identifiers to process in this run.
+		counts : dict. of {str: int}
+			These are the number of identifiers that have been given each status (see record_result.py).
+		record_lock : threading.Lock
+			This is the lock held while results are recorded (see ResultWriter.py).
+		status_interval : float
+			This is the time (in seconds) between writing the status file. Default: 30.0
+		result_writer : ResultWriter or None
+			This writes the xyz files of crystals. If given, the number of results waiting to be written is given. Default: None
+		worker_status_board : multiprocessing.Array or None
+			This records what each process is doing (see worker_status.py). If given, the identifiers being converted are given. Default: None
+		filter_stage_report : dict. or None
+			This is the number of entries checked and rejected by each stage of checks (see prefilter_entry.py). Default: None
+		stage_timing_report : dict. or None
+			These are the timings of each stage of converting identifiers into crystals (see stage_timings.py). Default: None
+		no_of_slowest_in_flight : int
+			This is the number of slowest identifiers being converted to give. Default: 10
+		rate_window : float
+			This is the time (in seconds) over which the recent number of identifiers processed per second is measured. Default: 300.0
+		"""
+		self.path_to_status_file     = path_to_status_file
+		self.no_of_identifiers       = no_of_identifiers
+		self.counts                  = counts
+		self.record_lock             = record_lock
+		self.status_interval         = status_interval
+		self.result_writer           = result_writer
+		self.worker_status_board     = worker_status_board
+		self.filter_stage_report     = filter_stage_report
+		self.stage_timing_report     = stage_timing_report
+		self.no_of_slowest_in_flight = no_of_slowest_in_flight
+		self.rate_window             = rate_window
+
+		# First, record when the run started, and the number of identifiers processed at times during the run (to measure the recent rate).
+		self.start_time = time.time()
+		self.samples    = deque()
+
+		# Second, create the thread that writes the status file.
+		self.stop_event = threading.Event()
+		self.thread     = threading.Thread(target=self.run, name='ACSD-status-reporter', daemon=True)
+
+	def start(self):
+		"""
+		This method will write the status file, and start the thread that writes the status file every status_interval seconds.
+		"""
+		self.write_status('running')
+		self.thread.start()
+
+	def run(self):
+		"""
+		This method is run by the status reporter thread. It writes the status file every status_interval seconds until it is closed.
+		"""
+		while not self.stop_event.wait(self.status_interval):
+			try:
+				self.write_status('running')
+			except OSError:
+				pass
+
+	def get_status(self, state):
+		"""
+		This method will give the status of the run.
+
+		Parameters
+		----------
+		state : str.
+			This is the state of the run. This is either 'running', 'finished' or 'stopped'.
+
+		Returns
+		-------
+		status : dict.
+			This is the status of the run.
+		"""
+
+		# First, obtain what each process is doing, and the slowest identifiers being converted.
+		#        * This is obtained before waiting for record_lock, which is released just after a result has been recorded (when processes have just started converting new identifiers).
+		workers = get_worker_statuses(self.worker_status_board) if (self.worker_status_board is not None) else []
+		for worker in workers:
+			worker['alive'] = is_process_running(worker['pid'])
+		in_flight = sorted((worker for worker in workers if (worker['identifier'] is not None)), key=lambda worker: worker['elapsed'], reverse=True)
+		in_flight = [{'identifier': worker['identifier'], 'pid': worker['pid'], 'stage': worker['stage'], 'elapsed': worker['elapsed']} for worker in in_flight[:self.no_of_slowest_in_flight]]
+
+		# Second, copy the counts and reports while holding the lock used by the writer threads.
+		#         * The wall times of each stage are copied (which is quick), so the writer threads do not wait while the percentiles of these are obtained.
+		with self.record_lock:
+			counts            = dict(self.counts)
+			rejected_by_stage = {stage: stage_report['rejected'] for stage, stage_report in self.filter_stage_report.items()} if (self.filter_stage_report is not None) else {}
+			wall_times        = {stage: array('d', stage_report['wall']) for stage, stage_report in self.stage_timing_report.get('stages', {}).items()} if (self.stage_timing_report is not None) else {}
+		stage_latencies = get_stage_timing_summary({'stages': {stage: {'wall': stage_wall_times} for stage, stage_wall_times in wall_times.items()}})
+
+		# Third, obtain the number of identifiers processed in this run, and the number processed per second.
+		#        * Excluded and already processed identifiers are removed before the run, so these are not included.
+		now                  = time.time()
+		elapsed_time         = now - self.start_time
+		no_of_processed      = sum(counts.get(status, 0) for status in ResultsStore.statuses_to_record)
+		no_of_remaining      = max(self.no_of_identifiers - no_of_processed, 0)
+		processed_per_second = (no_of_processed / elapsed_time) if (elapsed_time > 0.0) else 0.0
+
+		# Fourth, obtain the number of identifiers processed per second over the last rate_window seconds, and use this to estimate when the run will finish.
+		self.samples.append((now, no_of_processed))
+		while (len(self.samples) > 2) and (now - self.samples[1][0] >= self.rate_window):
+			self.samples.popleft()
+		first_time, first_no_of_processed = self.samples[0]
+		recent_processed_per_second = ((no_of_processed - first_no_of_processed) / (now - first_time)) if (now > first_time) else processed_per_second
+		rate = recent_processed_per_second if (recent_processed_per_second > 0.0) else processed_per_second
+		eta  = (no_of_remaining / rate) if (rate > 0.0) else None
+
+		# Fifth, return the status of the run.
+		status = {}
+		status['state']                       = state
+		status['time']                        = datetime.fromtimestamp(now).isoformat()
+		status['started']                     = datetime.fromtimestamp(self.start_time).isoformat()
+		status['elapsed']                     = elapsed_time
+		status['no_of_identifiers']           = self.no_of_identifiers
+		status['no_of_processed']             = no_of_processed
+		status['no_of_remaining']             = no_of_remaining
+		status['processed_per_second']        = processed_per_second
+		status['recent_processed_per_second'] = recent_processed_per_second
+		status['eta']                         = eta
+		status['estimated_finish']            = datetime.fromtimestamp(now + eta).isoformat() if (eta is not None) else None
+		status['counts']                      = counts
+		status['rejection_rate']              = (counts.get('rejected', 0) / no_of_processed) if (no_of_processed > 0) else None
+		status['rejected_by_stage']           = rejected_by_stage
+		status['stage_latencies']             = stage_latencies
+		status['write_queue']                 = self.result_writer.qsize() if (self.result_writer is not None) else None
+		status['in_flight']                   = in_flight
+		status['workers']                     = workers
+		return status
+
+	def write_status(self, state):
+		"""
+		This method will write the status of the run to the status file.
+
+		Parameters
+		----------
+		state : str.
+			This is the state of the run. This is either 'running', 'finished' or 'stopped'.
+		"""
+		path_to_temporary_file = self.path_to_status_file+'.tmp'
+		with open(path_to_temporary_file, 'w') as STATUSFILE:
+			json.dump(self.get_status(state), STATUSFILE, indent=1)
+		os.replace(path_to_temporary_file, self.path_to_status_file)
+
+	def close(self, state='finished'):
+		"""
+		This method will stop the status reporter thread, and write the final status of the run to the status file.
+
+		Parameters
+		----------
+		state : str.
+			This is the state of the run. This is either 'finished' or 'stopped'. Default: 'finished'
+		"""
+		self.stop_event.set()
+		if self.thread.is_alive():
+			self.thread.join()
+		self.write_status(state)
@@ -0,0 +1,384 @@
+"""
+add_hydrogens_to_crystal.py, Geoffrey Weal, 17/10/26
+
+These methods add the hydrogens that were added to the molecules of a crystal (by SUMELF.add_hydrogens_to_molecules) to the crystal that was
+already made, rather than making the whole crystal again.
+
+This is done by:
+
+	1. Finding the symmetry operator (and the shift by a unit cell) that gave each molecule in the crystal that was already made.
+	2. Applying these symmetry operators to only the hydrogens that were added to each molecule, all at once (see symmetry_operations_cache.expand_scaled_positions).
+	3. Adding these hydrogens (and their bonds) after the other atoms of each molecule in the crystal and crystal_graph.
+
+The crystal made this way must be the same as the crystal made by SUMELF.make_crystal. To check this, each process makes the whole crystal
+for the first crystals that have hydrogens added to them, and checks that it is the same as the crystal made by adding only the hydrogens.
+If any of these crystals are different, or the hydrogens can not be added to one of these crystals this way, this process makes the whole
+crystal again for every crystal that has hydrogens added to it from then on. After these crystals have been checked, if the hydrogens can not
+be added to a crystal this way, the whole crystal is made again for that crystal. Every time the whole crystal is made again, this is recorded in the log.
+"""
+import numpy as np
+from ACSD.ACSD.get_crystals_from_CSD_methods.symmetry_operations_cache import get_stacked_symmetry_operations, expand_scaled_positions
+
+# This is the number of crystals that each process checks, by also making the whole crystal, before it only adds the hydrogens to crystals.
+no_of_crystals_to_check = 20
+
+# This is the largest difference (in fractional coordinates) between a position in the crystal and the position given by a symmetry operator for these to be the same position.
+scaled_position_tolerance = 1e-6
+
+# This is the largest difference (in Angstroms) between the positions of atoms in two crystals for these crystals to be the same.
+position_tolerance = 1e-8
+
+# These are the errors that may be raised if the symmetry operators of a crystal can not be read (by ase.spacegroup.spacegroup.parse_sitesym),
+# or if the molecules of a crystal are not as expected. If any of these are raised, the whole crystal is made again. Any other error is not caught.
+expected_errors = (ValueError, KeyError, IndexError, ZeroDivisionError)
+
+# This records if this process is adding only the hydrogens to crystals, and how many crystals have been checked.
+_incremental_path = {'is_enabled': True, 'no_of_crystals_checked': 0}
+
+def get_molecules_before_hydrogens(molecules, molecule_graphs):
+	"""
+	This method will record the atoms and graph information of each molecule before hydrogens are added to it.
+
+	This is needed as SUMELF.add_hydrogens_to_molecules may change the molecules and molecule_graphs given to it.
+
+	Parameters
+	----------
+	molecules : dict. of ase.Atoms
+		These are the molecules in the crystal.
+	molecule_graphs : dict. of networkx.Graph
+		These are the graphs of the molecules in the crystal.
+
+	Returns
+	-------
+	molecules_before_hydrogens : dict.
+		For each molecule, this contains the 'numbers' and 'positions' of its atoms, its 'nodes', and the names of the properties of each of its nodes ('node_keys') and edges ('edge_keys').
+	"""
+	molecules_before_hydrogens = {}
+	for name, molecule in molecules.items():
+		molecule_graph = molecule_graphs[name]
+		node_keys = {node: set(node_data) for node, node_data in molecule_graph.nodes(data=True)}
+		edge_keys = {frozenset((node1, node2)): set(edge_data) for node1, node2, edge_data in molecule_graph.edges(data=True)}
+		molecules_before_hydrogens[name] = {'numbers': molecule.numbers.copy(), 'positions': molecule.positions.copy(), 'nodes': list(molecule_graph.nodes), 'node_keys': node_keys, 'edge_keys': edge_keys}
+	return molecules_before_hydrogens
+
+def remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal, logger=None):
+	"""
+	This method will give the crystal with the hydrogens that were added to its molecules.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal made before hydrogens were added to its molecules.
+	crystal_graph : networkx.Graph
+		This is the graph of the crystal made before hydrogens were added to its molecules.
+	molecules_before_hydrogens : dict.
+		This is the information about each molecule before hydrogens were added to it (see get_molecules_before_hydrogens).
+	molecules : dict. of ase.Atoms
+		These are the molecules in the crystal, with the added hydrogens.
+	molecule_graphs : dict. of networkx.Graph
+		These are the graphs of the molecules in the crystal, with the added hydrogens.
+	symmetry_operators : list of str.
+		These are the symmetry operators of the crystal from the CSD.
+	remake_crystal : callable
+		This method makes the whole crystal from the molecules with the added hydrogens (using SUMELF.make_crystal), giving the crystal and crystal_graph.
+	logger : CustomParallelLogger or None
+		This is the logger for this crystal. Default: None
+
+	Returns
+	-------
+	crystal : ase.Atoms
+		This is the crystal with the added hydrogens.
+	crystal_graph : networkx.Graph
+		This is the graph of the crystal with the added hydrogens.
+	"""
+
+	# First, if this process is not adding only the hydrogens to crystals, make the whole crystal.
+	if not _incremental_path['is_enabled']:
+		log_remaking_crystal(logger, 'This process makes the whole crystal again for every crystal that has hydrogens added to it, so the whole crystal was made again.', level='debug')
+		return remake_crystal()
+
+	# Second, add only the hydrogens to the crystal.
+	#         * If the hydrogens can not be added to the crystal this way, this gives None, and records why.
+	try:
+		rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+		incremental_crystal = add_hydrogen_images_to_crystal(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, rotations, translations)
+		reason = 'the crystal could not be read as its molecules moved by its symmetry operators'
+	except expected_errors as error:
+		incremental_crystal = None
+		reason = 'adding the hydrogens gave '+type(error).__name__+': '+str(error)
+
+	# Third, if this process is still checking crystals, make the whole crystal and check that it is the same as the crystal made by adding only the hydrogens.
+	#        * If it is not the same, this process makes the whole crystal for every crystal from now on.
+	if _incremental_path['no_of_crystals_checked'] < no_of_crystals_to_check:
+		crystal, crystal_graph = remake_crystal()
+		if incremental_crystal is None:
+			_incremental_path['is_enabled'] = False
+			log_remaking_crystal(logger, 'Could not add only the missing hydrogens to this crystal, as '+reason+', so this process will make the whole crystal again for every crystal that has hydrogens added to it.')
+		elif crystals_are_identical(incremental_crystal[0], incremental_crystal[1], crystal, crystal_graph):
+			_incremental_path['no_of_crystals_checked'] += 1
+		else:
+			_incremental_path['is_enabled'] = False
+			log_remaking_crystal(logger, 'Adding only the missing hydrogens did not give the same crystal as making the whole crystal again, so this process will make the whole crystal again for every crystal that has hydrogens added to it.')
+		return crystal, crystal_graph
+
+	# Fourth, if the hydrogens could not be added to this crystal, make the whole crystal.
+	if incremental_crystal is None:
+		log_remaking_crystal(logger, 'Could not add only the missing hydrogens to this crystal, as '+reason+', so the whole crystal was made again.')
+		return remake_crystal()
+
+	return incremental_crystal
+
+def log_remaking_crystal(logger, message, level='info'):
+	"""
+	This method will record in the log that the whole crystal was made again, rather than adding only the missing hydrogens to it.
+
+	Parameters
+	----------
+	logger : CustomParallelLogger or None
+		This is the logger for this crystal. If None, nothing is recorded.
+	message : str.
+		This is the reason the whole crystal was made again.
+	level : str.
+		This is the level to record the message at ('debug' or 'info'). Default: 'info'
+	"""
+	if logger is not None:
+		getattr(logger, level)(message, stage='make_crystal_with_added_hydrogens')
+
+def get_molecule_images(crystal, molecules_before_hydrogens, rotations, translations):
+	"""
+	This method will find the molecule, symmetry operator and shift (by a unit cell) that gave each group of atoms in the crystal.
+
+	SUMELF.make_crystal adds the atoms of each molecule to the crystal together, so the crystal is read as consecutive groups of atoms,
+	where each group is a molecule moved by one of the symmetry operators.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal made before hydrogens were added to its molecules.
+	molecules_before_hydrogens : dict.
+		This is the information about each molecule before hydrogens were added to it (see get_molecules_before_hydrogens).
+	rotations : numpy.ndarray
+		These are the rotation matrices of the symmetry operators, with shape (n_ops, 3, 3).
+	translations : numpy.ndarray
+		These are the translations of the symmetry operators (in fractional coordinates), with shape (n_ops, 3).
+
+	Returns
+	-------
+	molecule_images : list of tuple or None
+		This is (name of the molecule, index of the symmetry operator, shift, index of its first atom in the crystal) for each group of atoms in the crystal.
+		None if the crystal can not be read this way.
+	"""
+
+	# First, apply every symmetry operator to every molecule at once.
+	scaled_positions = crystal.cell.scaled_positions(crystal.positions)
+	symmetry_images  = {name: expand_scaled_positions(crystal.cell.scaled_positions(molecule['positions']), rotations, translations) for name, molecule in molecules_before_hydrogens.items()}
+
+	# Second, find the molecule and symmetry operator that gave each group of atoms in the crystal.
+	molecule_images = []
+	start_index     = 0
+	while start_index < len(crystal):
+		for name, molecule in molecules_before_hydrogens.items():
+			end_index = start_index + len(molecule['numbers'])
+			if (end_index > len(crystal)) or (not np.array_equal(crystal.numbers[start_index:end_index], molecule['numbers'])):
+				continue
+			differences = scaled_positions[np.newaxis, start_index:end_index] - symmetry_images[name]
+			shifts      = np.round(differences[:, :1, :])
+			is_image    = np.all(np.abs(differences - shifts) < scaled_position_tolerance, axis=(1, 2))
+			if np.any(is_image):
+				operator_index = int(np.argmax(is_image))
+				molecule_images.append((name, operator_index, shifts[operator_index, 0], start_index))
+				start_index = end_index
+				break
+		else:
+			return None
+
+	return molecule_images
+
+def add_hydrogen_images_to_crystal(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, rotations, translations):
+	"""
+	This method will add only the hydrogens that were added to the molecules of the crystal to the crystal and crystal_graph.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal made before hydrogens were added to its molecules.
+	crystal_graph : networkx.Graph
+		This is the graph of the crystal made before hydrogens were added to its molecules.
+	molecules_before_hydrogens : dict.
+		This is the information about each molecule before hydrogens were added to it (see get_molecules_before_hydrogens).
+	molecules : dict. of ase.Atoms
+		These are the molecules in the crystal, with the added hydrogens.
+	molecule_graphs : dict. of networkx.Graph
+		These are the graphs of the molecules in the crystal, with the added hydrogens.
+	rotations : numpy.ndarray
+		These are the rotation matrices of the symmetry operators, with shape (n_ops, 3, 3).
+	translations : numpy.ndarray
+		These are the translations of the symmetry operators (in fractional coordinates), with shape (n_ops, 3).
+
+	Returns
+	-------
+	crystal : ase.Atoms or None
+		This is the crystal with the added hydrogens. None if the hydrogens can not be added to the crystal this way.
+	crystal_graph : networkx.Graph or None
+		This is the graph of the crystal with the added hydrogens. None if the hydrogens can not be added to the crystal this way.
+	"""
+
+	# First, check that the nodes in the crystal_graph are the indices of the atoms in the crystal, and that the molecules are the same except for the added hydrogens.
+	if (sorted(molecules_before_hydrogens) != sorted(molecules)) or (set(crystal_graph.nodes) != set(range(len(crystal)))):
+		return None
+	added_hydrogens = {}
+	for name, molecule in molecules_before_hydrogens.items():
+		no_of_atoms = len(molecule['numbers'])
+		if (not np.array_equal(molecules[name].numbers[:no_of_atoms], molecule['numbers'])) or (not np.array_equal(molecules[name].positions[:no_of_atoms], molecule['positions'])):
+			return None
+		old_nodes = set(molecule['nodes'])
+		new_nodes = [node for node in molecule_graphs[name].nodes if node not in old_nodes]
+		if (len(new_nodes) != len(molecules[name]) - no_of_atoms) or (not old_nodes.issubset(molecule_graphs[name].nodes)):
+			return None
+		added_hydrogens[name] = new_nodes
+
+	# Second, find the molecule, symmetry operator and shift that gave each group of atoms in the crystal.
+	molecule_images = get_molecule_images(crystal, molecules_before_hydrogens, rotations, translations)
+	if molecule_images is None:
+		return None
+
+	# Third, apply every symmetry operator to the hydrogens added to each molecule at once.
+	hydrogen_images = {name: expand_scaled_positions(crystal.cell.scaled_positions(molecules[name].positions[len(molecule['numbers']):]), rotations, translations) for name, molecule in molecules_before_hydrogens.items()}
+
+	# Fourth, make the arrays of the crystal, with the hydrogens added after the other atoms in each molecule.
+	#         * Arrays that are not in the molecule (made by SUMELF.make_crystal) are given the value of the first atom in each molecule for the added hydrogens.
+	arrays = {array_name: [] for array_name in crystal.arrays}
+	for name, operator_index, shift, start_index in molecule_images:
+		no_of_atoms     = len(molecules_before_hydrogens[name]['numbers'])
+		no_of_hydrogens = len(added_hydrogens[name])
+		end_index       = start_index + no_of_atoms
+		for array_name, array in crystal.arrays.items():
+			arrays[array_name].append(array[start_index:end_index])
+			if array_name == 'positions':
+				arrays[array_name].append(crystal.cell.cartesian_positions(hydrogen_images[name][operator_index] + shift))
+			elif array_name in molecules[name].arrays:
+				arrays[array_name].append(molecules[name].arrays[array_name][no_of_atoms:])
+			else:
+				arrays[array_name].append(np.repeat(array[start_index:start_index+1], no_of_hydrogens, axis=0))
+	new_crystal = crystal.copy()
+	new_crystal.arrays = {array_name: np.concatenate(pieces).astype(crystal.arrays[array_name].dtype, copy=False) for array_name, pieces in arrays.items()}
+
+	# Fifth, make the crystal_graph, where the nodes of each molecule are given by the graph of the molecule with the added hydrogens.
+	#        * Node and edge properties that are not in the molecule_graph (made by SUMELF.make_crystal) are kept, and are given the values of the first atom in each molecule for the added hydrogens.
+	new_crystal_graph = crystal_graph.__class__()
+	new_crystal_graph.graph.update(crystal_graph.graph)
+	new_indices = {}
+	new_index   = 0
+	for name, operator_index, shift, start_index in molecule_images:
+		molecule       = molecules_before_hydrogens[name]
+		molecule_graph = molecule_graphs[name]
+		image_data     = {key: value for key, value in crystal_graph.nodes[start_index].items() if key not in molecule['node_keys'][molecule['nodes'][0]]}
+		crystal_indices = {}
+		graph_indices   = {}
+		for local_index, node in enumerate(molecule['nodes']):
+			node_data = {key: value for key, value in crystal_graph.nodes[start_index+local_index].items() if key not in molecule['node_keys'][node]}
+			node_data.update(molecule_graph.nodes[node])
+			new_crystal_graph.add_node(new_index, **node_data)
+			new_indices[start_index+local_index] = new_index
+			crystal_indices[node] = start_index+local_index
+			graph_indices[node]   = new_index
+			new_index += 1
+		for node in added_hydrogens[name]:
+			node_data = dict(image_data)
+			node_data.update(molecule_graph.nodes[node])
+			new_crystal_graph.add_node(new_index, **node_data)
+			graph_indices[node] = new_index
+			new_index += 1
+		for node1, node2, edge_data in molecule_graph.edges(data=True):
+			if (node1 in crystal_indices) and (node2 in crystal_indices) and crystal_graph.has_edge(crystal_indices[node1], crystal_indices[node2]):
+				old_edge_keys = molecule['edge_keys'].get(frozenset((node1, node2)), set())
+				new_edge_data = {key: value for key, value in crystal_graph.edges[crystal_indices[node1], crystal_indices[node2]].items() if key not in old_edge_keys}
+				new_edge_data.update(edge_data)
+			else:
+				new_edge_data = dict(edge_data)
+			new_crystal_graph.add_edge(graph_indices[node1], graph_indices[node2], **new_edge_data)
+
+	# Sixth, keep any bonds in the crystal_graph between atoms in different molecules.
+	for index1, index2, edge_data in crystal_graph.edges(data=True):
+		if not new_crystal_graph.has_edge(new_indices[index1], new_indices[index2]):
+			new_crystal_graph.add_edge(new_indices[index1], new_indices[index2], **edge_data)
+
+	return new_crystal, new_crystal_graph
+
+def crystals_are_identical(crystal1, crystal_graph1, crystal2, crystal_graph2):
+	"""
+	This method will check if two crystals, and their graphs, are the same.
+
+	The positions of the atoms only need to be the same to within position_tolerance, as these may be found using a different order of floating-point operations.
+	Everything else must be exactly the same, including the order of the atoms and of the nodes in the graphs.
+
+	Parameters
+	----------
+	crystal1 : ase.Atoms
+		This is the first crystal.
+	crystal_graph1 : networkx.Graph
+		This is the graph of the first crystal.
+	crystal2 : ase.Atoms
+		This is the second crystal.
+	crystal_graph2 : networkx.Graph
+		This is the graph of the second crystal.
+
+	Returns
+	-------
+	are_identical : bool.
+		True if the crystals and their graphs are the same.
+	"""
+
+	# First, check the atoms in the crystals.
+	if (len(crystal1) != len(crystal2)) or (not np.array_equal(crystal1.cell[:], crystal2.cell[:])) or (not np.array_equal(crystal1.pbc, crystal2.pbc)):
+		return False
+	if sorted(crystal1.arrays) != sorted(crystal2.arrays):
+		return False
+	for array_name, array in crystal1.arrays.items():
+		if array_name == 'positions':
+			if not np.allclose(array, crystal2.arrays[array_name], rtol=0.0, atol=position_tolerance):
+				return False
+		elif (array.dtype != crystal2.arrays[array_name].dtype) or (not np.array_equal(array, crystal2.arrays[array_name])):
+			return False
+	if not values_are_equal(crystal1.info, crystal2.info):
+		return False
+
+	# Second, check the graphs of the crystals.
+	if (type(crystal_graph1) is not type(crystal_graph2)) or (not values_are_equal(crystal_graph1.graph, crystal_graph2.graph)):
+		return False
+	if list(crystal_graph1.nodes) != list(crystal_graph2.nodes):
+		return False
+	for node, node_data in crystal_graph1.nodes(data=True):
+		if not values_are_equal(node_data, crystal_graph2.nodes[node]):
+			return False
+	if crystal_graph1.number_of_edges() != crystal_graph2.number_of_edges():
+		return False
+	for node1, node2, edge_data in crystal_graph1.edges(data=True):
+		if (not crystal_graph2.has_edge(node1, node2)) or (not values_are_equal(edge_data, crystal_graph2.edges[node1, node2])):
+			return False
+
+	return True
+
+def values_are_equal(value1, value2):
+	"""
+	This method will check if two values are the same, where these values may be (or contain) numpy arrays.
+
+	Parameters
+	----------
+	value1 : object
+		This is the first value.
+	value2 : object
+		This is the second value.
+
+	Returns
+	-------
+	are_equal : bool.
+		True if the values are the same.
+	"""
+	if isinstance(value1, np.ndarray) or isinstance(value2, np.ndarray):
+		return isinstance(value1, np.ndarray) and isinstance(value2, np.ndarray) and (value1.dtype == value2.dtype) and np.array_equal(value1, value2)
+	if isinstance(value1, dict) and isinstance(value2, dict):
+		return (sorted(value1, key=str) == sorted(value2, key=str)) and all(values_are_equal(value1[key], value2[key]) for key in value1)
+	if isinstance(value1, (list, tuple)) and isinstance(value2, (list, tuple)):
+		return (type(value1) is type(value2)) and (len(value1) == len(value2)) and all(values_are_equal(item1, item2) for item1, item2 in zip(value1, value2))
+	return (type(value1) is type(value2)) and (value1 == value2)
@@ -0,0 +1,121 @@
+"""
+crystal_database_layout.py, Geoffrey Weal, 17/10/26
+
+These methods give where the xyz file of each crystal is placed in the crystal database folder.
+
+The layouts that can be used are:
+
+	* 'flat':   Every xyz file is placed in the crystal database folder (for example, crystal_database/ABALIZ.xyz).
+	* 'hashed': Each xyz file is placed in two levels of sub-folders, named by the first four characters of the sha256 hash of the
+	            identifier (for example, crystal_database/3f/a2/ABALIZ.xyz). This spreads the crystals over 65536 sub-folders, so no
+	            folder contains too many files, which makes listing folders much quicker on shared file systems (like Lustre and NFS)
+	            when the crystal database folder contains hundreds of thousands of crystals.
+
+The location of each crystal is recorded in the results store (see ResultsStore.py), so the crystal database folder never needs
+to be listed to find which crystals have been written. For the 'hashed' layout, crystal_locations.txt also gives the location of
+every crystal in the crystal database folder.
+"""
+import os, string
+from hashlib import sha256
+
+# These are the layouts that can be used for the crystal database folder.
+layouts = ('flat', 'hashed')
+
+# This is the name of the side file that gives the location of each crystal, if the 'hashed' layout is used.
+crystal_locations_filename = 'crystal_locations.txt'
+
+def get_crystal_location(identifier, layout='flat'):
+	"""
+	This method will give the location of the xyz file of a crystal in the crystal database folder.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier of the crystal.
+	layout : str.
+		This is the layout of the crystal database folder. This is either 'flat' or 'hashed'. Default: 'flat'
+
+	Returns
+	-------
+	location : str.
+		This is the path to the xyz file of the crystal, relative to the crystal database folder.
+	"""
+	if layout == 'flat':
+		return identifier+'.xyz'
+	identifier_hash = sha256(identifier.encode()).hexdigest()
+	return identifier_hash[0:2]+'/'+identifier_hash[2:4]+'/'+identifier+'.xyz'
+
+def is_hashed_folder_name(name):
+	"""
+	This method will indicate if name is the name of a sub-folder made by the 'hashed' layout.
+
+	Parameters
+	----------
+	name : str.
+		This is the name of a folder.
+
+	Returns
+	-------
+	is_hashed_folder_name : bool.
+		True if the name is two lowercase hexadecimal characters.
+	"""
+	return (len(name) == 2) and all((character in string.hexdigits) and (not character.isupper()) for character in name)
+
+def get_written_crystal_locations(save_crystals_to):
+	"""
+	This method will obtain the location of every xyz file written to the crystal database folder, in either layout.
+
+	This lists the crystal database folder (and any sub-folders made by the 'hashed' layout), so this is only used for
+	crystal database folders that were made before the results store recorded the location of each crystal.
+
+	Parameters
+	----------
+	save_crystals_to : str.
+		This is the path to the crystal database folder.
+
+	Returns
+	-------
+	locations : dict. of {str: str}
+		This is the location of the xyz file of each crystal, relative to the crystal database folder.
+	"""
+	locations = {}
+	if not os.path.exists(save_crystals_to):
+		return locations
+	with os.scandir(save_crystals_to) as entries:
+		for entry in entries:
+			if entry.name.endswith('.xyz') and entry.is_file():
+				locations[entry.name[:-len('.xyz')]] = entry.name
+			elif is_hashed_folder_name(entry.name) and entry.is_dir():
+				with os.scandir(entry.path) as sub_entries:
+					for sub_entry in sub_entries:
+						if not (is_hashed_folder_name(sub_entry.name) and sub_entry.is_dir()):
+							continue
+						with os.scandir(sub_entry.path) as crystal_entries:
+							for crystal_entry in crystal_entries:
+								if crystal_entry.name.endswith('.xyz'):
+									locations[crystal_entry.name[:-len('.xyz')]] = entry.name+'/'+sub_entry.name+'/'+crystal_entry.name
+	return locations
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def check_layout(results_store, layout):
+	"""
+	This method will make sure the crystal database folder is only ever written in one layout, and record this layout in the results store.
+
+	Crystal database folders that already contain crystals but have no layout recorded were made before layouts could be chosen, so these are in the 'flat' layout.
+
+	Parameters
+	----------
+	results_store : ResultsStore
+		This is the results store for the crystal database folder.
+	layout : str.
+		This is the layout that this run is to use.
+	"""
+	if layout not in layouts:
+		raise Exception('Error: layout must be one of '+str(layouts)+'. layout = '+str(layout))
+	recorded_layout = results_store.get_setting('layout')
+	if (recorded_layout is None) and (len(results_store.get_crystal_locations()) > 0):
+		recorded_layout = 'flat'
+	if (recorded_layout is not None) and (recorded_layout != layout):
+		raise Exception('Error: The crystal database folder ('+str(os.path.dirname(results_store.path_to_results_store))+') has been written using the "'+str(recorded_layout)+'" layout, but the "'+str(layout)+'" layout was requested. Use the "'+str(recorded_layout)+'" layout, or write to a new crystal database folder.')
+	results_store.set_setting('layout', layout)
@@ -0,0 +1,195 @@
+"""
+estimate_cost.py, Geoffrey Weal, 17/10/26
+
+These methods are designed to estimate how long each identifier will take to process, so that the largest crystals can be given to the pool first.
+
+The 'atoms', 'components' and 'symmetry' estimators only use information stored for each entry in the CSD (its chemical formula, Z and
+symmetry operators), so the molecule of the crystal is never made. However, each entry is still looked up once in the CSD before
+crystals are converted, so these estimators add one lookup per identifier to the run. The 'previous' estimator does not look up
+any entries, as it only uses the results store of a previous run.
+"""
+import os, re
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader import get_entry_from_CSD
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore     import ResultsStore, results_store_filename
+
+# These are the methods that can be used to estimate the cost of processing an identifier.
+#   * 'atoms':      The number of atoms in the chemical formula of the entry multiplied by Z (the number of atoms in the unit cell).
+#   * 'components': The number of molecules in the chemical formula of the entry multiplied by Z (the number of molecules in the unit cell).
+#   * 'symmetry':   The number of symmetry operators.
+#   * 'previous':   The time taken to process the identifier in a previous ACSD run (recorded in the results store, see read_processing_times).
+cost_estimators = ('atoms', 'components', 'symmetry', 'previous')
+
+# These are used to read the chemical formula of an entry, like "C10 H8 N2 O4,2(H2 O1)".
+#   * moiety_pattern obtains the number of each molecule (like the 2 in "2(H2 O1)").
+#   * element_pattern obtains the number of atoms of each element (like the 10 in "C10"). Charges (like "1-") are ignored.
+moiety_pattern  = re.compile(r'^\s*(\d*\.?\d*)\s*\((.*)\)\s*$')
+element_pattern = re.compile(r'^([A-Z][a-z]?)(\d*\.?\d*)$')
+
+# This is the name of the file in the crystal database folder that records how long each identifier took to process.
+processing_times_filename = 'processing_times.txt'
+
+def estimate_cost(input_data):
+	"""
+	This method will estimate the cost of processing an identifier from its entry in the CSD.
+
+	This method is designed to be run in the processes of the pool, which have already opened their CSD reader.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier to estimate the cost of.
+	cost_estimator : str.
+		This is the method used to estimate the cost. Either 'atoms', 'components' or 'symmetry'.
+
+	Returns
+	-------
+	identifier : str.
+		This is the identifier that the cost was estimated for.
+	cost : float
+		This is the estimated cost of processing the identifier.
+	"""
+
+	# First, extract the input variables from input_data.
+	identifier, cost_estimator = input_data
+
+	# Second, obtain the entry for this identifier. If there is a problem, this identifier will quickly be recorded as not found.
+	#         * Only the information stored for the entry is used, so the molecule of the crystal is not made.
+	try:
+		entry_object   = get_entry_from_CSD(identifier)
+		crystal_object = entry_object.crystal
+		if cost_estimator in ('atoms', 'components'):
+			moieties = get_moieties_from_formula(entry_object.formula)
+			Z_value  = get_Z_value(crystal_object)
+		else:
+			no_of_symmetry_operators = len(crystal_object.symmetry_operators)
+	except Exception:
+		return identifier, 0.0
+
+	# Third, estimate the cost of processing this identifier.
+	if   cost_estimator == 'atoms':
+		cost = sum(no_of_moieties * no_of_atoms for no_of_moieties, no_of_atoms in moieties) * Z_value
+	elif cost_estimator == 'components':
+		cost = sum(no_of_moieties for no_of_moieties, no_of_atoms in moieties) * Z_value
+	elif cost_estimator == 'symmetry':
+		cost = no_of_symmetry_operators
+	else:
+		raise Exception('Error: cost_estimator must be one of '+str(cost_estimators)+'. cost_estimator = '+str(cost_estimator))
+
+	# Fourth, return the cost for this identifier.
+	return identifier, float(cost)
+
+def get_moieties_from_formula(formula):
+	"""
+	This method will obtain the number of each molecule (moiety), and the number of atoms in each molecule, from the chemical formula of an entry.
+
+	Parameters
+	----------
+	formula : str.
+		This is the chemical formula of the entry, as given by the CSD. Moieties are separated by commas, for example "C10 H8 N2 O4,2(H2 O1)".
+
+	Returns
+	-------
+	moieties : list of (float, float)
+		These are the number of each moiety in the formula, and the number of atoms in that moiety.
+	"""
+	moieties = []
+	for moiety in formula.split(','):
+
+		# First, obtain the number of this moiety, if given (as in "2(H2 O1)").
+		match = moiety_pattern.match(moiety)
+		if match is not None:
+			no_of_moieties = float(match.group(1)) if (len(match.group(1)) > 0) else 1.0
+			moiety = match.group(2)
+		else:
+			no_of_moieties = 1.0
+
+		# Second, count the atoms in this moiety.
+		no_of_atoms = 0.0
+		for element in moiety.split():
+			match = element_pattern.match(element)
+			if match is not None:
+				no_of_atoms += float(match.group(2)) if (len(match.group(2)) > 0) else 1.0
+
+		# Third, record this moiety if it contains atoms.
+		if no_of_atoms > 0:
+			moieties.append((no_of_moieties, no_of_atoms))
+
+	return moieties
+
+def get_Z_value(crystal_object):
+	"""
+	This method will obtain Z (the number of formula units in the unit cell) of a crystal.
+
+	If Z is not given for the crystal, the number of symmetry operators is used instead.
+
+	Parameters
+	----------
+	crystal_object : ccdc.crystal.Crystal
+		This is the crystal.
+
+	Returns
+	-------
+	Z_value : float
+		This is the number of formula units in the unit cell.
+	"""
+	Z_value = getattr(crystal_object, 'z_value', None)
+	if (Z_value is None) or (Z_value <= 0):
+		Z_value = len(crystal_object.symmetry_operators)
+	return float(Z_value)
+
+def sort_identifiers_by_cost(identifiers, costs):
+	"""
+	This method will sort the identifiers so that the most costly identifiers are first.
+
+	Identifiers without a cost are placed first, as they may be large. The order of identifiers with the same cost is not changed.
+
+	Parameters
+	----------
+	identifiers : list of str.
+		These are the identifiers to sort.
+	costs : dict. of {str: float}
+		These are the estimated costs of each identifier.
+
+	Returns
+	-------
+	sorted_identifiers : list of str.
+		These are the identifiers, sorted from the most to the least costly.
+	"""
+	return sorted(identifiers, key=lambda identifier: -costs.get(identifier, float('inf')))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def read_processing_times(save_crystals_to):
+	"""
+	This method will read how long each identifier took to process in previous ACSD runs.
+
+	These are read from the results store. If the crystal database folder was made before the results store was used, these are read from processing_times.txt.
+
+	Parameters
+	----------
+	save_crystals_to : str.
+		This is the path to the crystal database folder.
+
+	Returns
+	-------
+	processing_times : dict. of {str: float}
+		This is how long each identifier took to process. If an identifier was processed more than once, the latest time is used.
+	"""
+	path_to_results_store = save_crystals_to+'/'+results_store_filename
+	if os.path.exists(path_to_results_store):
+		results_store = ResultsStore(path_to_results_store)
+		try:
+			return results_store.get_processing_times()
+		finally:
+			results_store.close()
+	processing_times = {}
+	path_to_processing_times_file = save_crystals_to+'/'+processing_times_filename
+	if not os.path.exists(path_to_processing_times_file):
+		return processing_times
+	with open(path_to_processing_times_file, 'r') as processing_timesTXT:
+		for line in processing_timesTXT:
+			identifier, processing_time = line.rstrip().split('\t')
+			processing_times[identifier] = float(processing_time)
+	return processing_times
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
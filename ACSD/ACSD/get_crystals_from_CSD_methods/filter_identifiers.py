@@ -0,0 +1,81 @@
+"""
+filter_identifiers.py, Geoffrey Weal, 17/10/26
+
+This method will remove the identifiers that do not need to be processed before they are given to the processes.
+"""
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalResult           import CrystalResult
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout import get_written_crystal_locations
+
+def filter_identifiers(identifiers, save_crystals_to, overwrite_existing_crystal_files, results_store=None, retry_statuses=()):
+	"""
+	This method will remove the identifiers that do not need to be processed before they are given to the processes.
+
+	These are identifiers that have been excluded (given as "#identifier"), and (if overwrite_existing_crystal_files is False)
+	identifiers that have already been processed. If a results store is given, the identifiers that have already been processed
+	are obtained from the results store, so the crystal database folder (which may contain hundreds of thousands of files) is
+	never listed. Otherwise, the contents of save_crystals_to are only read once here, rather than for every identifier.
+
+	Identifiers that were given one of the statuses in retry_statuses in a previous run (like 'timeout') are processed again.
+
+	Parameters
+	----------
+	identifiers : list of str.
+		This is a list of the identifiers to obtain crystal files for. Excluded identifiers start with "#".
+	save_crystals_to : str.
+		This is the folder to save crystal files to.
+	overwrite_existing_crystal_files : bool.
+		This boolean indicate if you want to overwrite already existing crystal files in the crystal database folder.
+	results_store : ResultsStore or None
+		This is the results store that records the result of every identifier that has finished being processed. Default: None
+	retry_statuses : list of str.
+		These are the statuses of identifiers that were not written in a previous run that are processed again, rather than excluded (see RunSettings.py). Default: ()
+
+	Returns
+	-------
+	identifiers_to_process : list of str.
+		These are the identifiers to give to the processes.
+	skipped_results : list of CrystalResult
+		These are the results for the identifiers that were not given to the processes.
+	"""
+
+	# First, obtain the identifiers that have already been processed, and their statuses.
+	#        * The results store records every identifier that finished, including those that were not written.
+	#        * Otherwise, obtain the xyz files that have been written to save_crystals_to.
+	if overwrite_existing_crystal_files:
+		finished_identifiers = {}
+	elif results_store is not None:
+		finished_identifiers = results_store.get_finished_identifiers()
+	else:
+		finished_identifiers = dict.fromkeys(get_written_identifiers(save_crystals_to), 'recorded')
+
+	# Second, separate the identifiers that need to be processed from those that do not.
+	identifiers_to_process = []
+	skipped_results        = []
+	for identifier in identifiers:
+		if identifier.startswith('#'):
+			skipped_results.append(CrystalResult(identifier[1:], status='excluded'))
+		elif finished_identifiers.get(identifier) == 'recorded':
+			skipped_results.append(CrystalResult(identifier, status='already_processed'))
+		elif (identifier in finished_identifiers) and (finished_identifiers[identifier] not in retry_statuses):
+			skipped_results.append(CrystalResult(identifier, status='excluded'))
+		else:
+			identifiers_to_process.append(identifier)
+
+	# Third, return the identifiers to process, and the results for the identifiers that were skipped.
+	return identifiers_to_process, skipped_results
+
+def get_written_identifiers(save_crystals_to):
+	"""
+	This method will obtain the identifiers of all the crystals that have been written to save_crystals_to, in either layout (see crystal_database_layout.py).
+
+	Parameters
+	----------
+	save_crystals_to : str.
+		This is the folder that crystal files are saved to.
+
+	Returns
+	-------
+	written_identifiers : set of str.
+		These are the identifiers of the crystals that have been written to save_crystals_to.
+	"""
+	return set(get_written_crystal_locations(save_crystals_to))
@@ -3,87 +3,139 @@ get_crystal_from_CSD_single_process.py. Geoffrey Weal, 16/4/24
 
 This method will obtain a crystal associated with the given identifier from the Cambridge Structral Database.
 """
-import os
-from ase.io                                                    import write
-from SUMELF                                                    import is_solvent, get_symmetry_operations
+import time, logging, warnings
+from functools                                                 import partial
+from SUMELF                                                    import is_solvent
 from ACSD.ACSD.create_ASE_molecule_and_graph_from_CSD_molecule import create_ASE_molecule_and_graph_from_CSD_molecule
 from SUMELF                                                    import make_crystal, add_hydrogens_to_molecules, remove_node_properties_from_graph, add_graph_to_ASE_Atoms_object
-from ACSD.ACSD.check_crystal_quality                           import check_crystal_quality, save_flags_to_disk
-
-def get_crystal_from_CSD_single_process(input_data):
+from ACSD.ACSD.check_crystal_quality                           import check_crystal_quality, get_flag_values
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader  import get_entry_from_CSD
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalResult     import CrystalResult
+from ACSD.ACSD.get_crystals_from_CSD_methods.CustomParallelLogger import CustomParallelLogger
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file  import get_xyz_data
+from ACSD.ACSD.get_crystals_from_CSD_methods.ConversionCache     import get_conversion_cache
+from ACSD.ACSD.get_crystals_from_CSD_methods.prefilter_entry     import prefilter_entry, check_molecule, check_cached_crystal, record_stage_time
+from ACSD.ACSD.get_crystals_from_CSD_methods.symmetry_operations_cache import get_symmetry_operations_from_cache
+from ACSD.ACSD.get_crystals_from_CSD_methods.add_hydrogens_to_crystal  import get_molecules_before_hydrogens, remake_crystal_with_added_hydrogens
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalShards       import get_crystal_arrays
+from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings       import time_stage, profile_call, profiles_foldername
+from ACSD.ACSD.get_crystals_from_CSD_methods.worker_status       import set_current_identifier, clear_current_identifier
+
+# These are the settings that are the same for every identifier, given once to each process by set_process_settings.
+process_settings = {}
+
+def set_process_settings(save_crystals_to, path_to_cache=None, elements_to_reject=(), output_format='xyz', profile_identifiers=(), log_level='DEBUG'):
 	"""
-	This method will obtain a crystal associated with the given identifier from the Cambridge Structral Database.
+	This method will give the settings that are the same for every identifier to this process.
+
+	This allows each task given to the process to only contain the identifier, rather than all the settings.
 
 	Parameters
 	----------
-	identifier : str.
-		This is the identifier you want to obtain the crystal of from the CCDC. 
-
-	overwrite_existing_crystal_files : bool.
-		This boolean indicates if you want to overwrite already given crystals. If so, set this to True.
-
-	no_of_crystals_recorded : int object
-		This is a record of the number of crystals that have been reported.
-	no_of_excluded_crystals : int object
-		This is a record of the number of crystals that were excluded from being recorded. 
-	no_of_already_processed_crystals : int object
-		This is a record of the number of crystals that were skipped because they have already been recorded. 
-
 	save_crystals_to : str.
-		This is the path to the folder to save crystals to. 
-
-	crystals_not_written_lock : multiprocessing.Manager.lock
-		This is the lock for the file at crystals_not_written_TXT_file.
-
-	could_not_find_identifiers_lock : multiprocessing.Manager.lock
-		This is the lock for the file at could_not_find_identifiers_TXT_file.
-	no_coordinates_given_lock : multiprocessing.Manager.lock
-		This is the lock for the file at no_coordinates_given_TXT_file.
-	rejected_crystals_lock : multiprocessing.Manager.lock
-		This is the lock for the file at rejected_crystals_TXT_file.
-
-	crystal_quality_information_lock : multiprocessing.Manager.lock
-		This is the lock for recording crystal quality information.
-
-	logger : logging
-		This is the log for recording warning issues. 
-	logger_lock : FileLock.FileLock
-		This is the lock for recording logger information. 
+		This is the path to the folder to save crystals to.
+	path_to_cache : str. or None
+		This is the path to the conversion cache folder. If None, no conversion cache is used. Default: None
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain. Default: ()
+	output_format : str.
+		This is the format to write crystals in. This is either 'xyz', 'npz' or 'both' (see CrystalShards.output_formats). Default: 'xyz'
+	profile_identifiers : list of str.
+		These are the identifiers to profile using cProfile (see stage_timings.profile_call). Default: ()
+	log_level : str.
+		Only log events at or above this level are recorded (see CustomParallelLogger.log_levels). Default: 'DEBUG'
 	"""
+	process_settings['save_crystals_to']    = save_crystals_to
+	process_settings['path_to_cache']       = path_to_cache
+	process_settings['elements_to_reject']  = elements_to_reject
+	process_settings['output_format']       = output_format
+	process_settings['profile_identifiers'] = profile_identifiers
+	process_settings['log_level']           = log_level
 
-	# First, extract the input variables from input_data.
-	identifier, overwrite_existing_crystal_files, no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals, save_crystals_to, crystals_not_written_lock, could_not_find_identifiers_lock, no_coordinates_given_lock, rejected_crystals_lock, crystal_quality_information_lock, logger, logger_lock, is_parallel = input_data
+def get_crystal_from_CSD_single_process(input_data):
+	"""
+	This method will obtain a crystal associated with the given identifier from the Cambridge Structral Database.
 
-	# Second, if identifier startswith #, make a note and remove the #.
-	move_on_tag = identifier.startswith('#')
-	if move_on_tag:
-		no_of_excluded_crystals.value += 1
-		no_of_crystals_recorded.value += 1
-		return False
+	This method does not write the xyz file of the crystal, any of the side files or the log file, and does not change any shared counters.
+	Instead, it returns a CrystalResult (containing the contents of the xyz file) that the main process uses to do these tasks (see ResultWriter.py).
 
-	# Fourth, if you have chosen not to override the files in save_crystals_to, and you can find identifier.xyz in save_crystals_to, move on
-	if (not overwrite_existing_crystal_files) and (identifier+'.xyz' in os.listdir(save_crystals_to)):
-		no_of_already_processed_crystals.value += 1
-		no_of_crystals_recorded.value          += 1
-		return False
+	Excluded identifiers and identifiers that have already been processed are removed before identifiers are given
+	to this method (see filter_identifiers.py).
 
-	# Fifth, give the names of the files to write information to.
-	crystals_not_written_TXT_file       = save_crystals_to+'/'+'crystals_not_written.txt'
-	could_not_find_identifiers_TXT_file = save_crystals_to+'/'+'could_not_find_identifiers.txt'
-	no_coordinates_given_TXT_file       = save_crystals_to+'/'+'no_coordinates_given.txt'
-	rejected_crystals_TXT_file          = save_crystals_to+'/'+'rejected_crystals.txt'
+	Parameters
+	----------
+	input_data : str. or tuple
+		This is either the identifier (if the other settings have been given by set_process_settings), or a tuple of:
 
-	# Sixth, record the strings to print to files and the end of this process.
-	logger_string = ''
+	identifier : str.
+		This is the identifier you want to obtain the crystal of from the CCDC.
+	save_crystals_to : str.
+		This is the path to the folder to save crystals to.
+	path_to_cache : str. or None
+		This is the path to the conversion cache folder. If None, no conversion cache is used.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain.
+	output_format : str.
+		This is the format to write crystals in. This is either 'xyz', 'npz' or 'both'.
+	profile_identifiers : list of str.
+		These are the identifiers to profile using cProfile. The profile of each is written to the profiles folder in save_crystals_to.
+	log_level : str.
+		Only log events at or above this level are recorded.
+
+	Returns
+	-------
+	result : CrystalResult
+		This is the record of the outcome of processing this identifier.
+	"""
 
-	# Seventh, make a note in the logger for this crystal.
-	logger_string += "==========================================================\n"
+	# First, extract the input variables from input_data.
+	if isinstance(input_data, str):
+		identifier          = input_data
+		save_crystals_to    = process_settings['save_crystals_to']
+		path_to_cache       = process_settings['path_to_cache']
+		elements_to_reject  = process_settings['elements_to_reject']
+		output_format       = process_settings['output_format']
+		profile_identifiers = process_settings['profile_identifiers']
+		log_level           = process_settings['log_level']
+	else:
+		identifier, save_crystals_to, path_to_cache, elements_to_reject, output_format, profile_identifiers, log_level = input_data
+
+	# 1.1: If this identifier is to be profiled, process it again under cProfile, and write the profile to the profiles folder.
+	#      * No identifiers are given to profile in this call, so the identifier is not profiled again.
+	if identifier in profile_identifiers:
+		path_to_profile = save_crystals_to+'/'+profiles_foldername+'/'+identifier+'.prof'
+		return profile_call(path_to_profile, get_crystal_from_CSD_single_process, (identifier, save_crystals_to, path_to_cache, elements_to_reject, output_format, (), log_level))
+
+	# Second, record when this identifier started being processed, and initialise the timings for each stage (see prefilter_entry.py and stage_timings.py).
+	#         * This identifier is also recorded in the worker status board, so the main process can see which identifier this process is converting (see worker_status.py).
+	start_time    = time.perf_counter()
+	stage_timings = {}
+	set_current_identifier(identifier)
+
+	# Third, create the logger for this identifier.
+	#        * This logger only holds the log information for this identifier in memory. The main process writes it to the log file.
+	#        * Each event is tagged with this identifier and the id of this process.
+	#        * Events below log_level are not recorded.
+	logger = CustomParallelLogger(instant_write=False, identifier=identifier, level=log_level)
+
+	# Fourth, create the function for returning the result for this identifier.
+	def get_result(status, reason=None, flags=None, checksum=None, from_cache=False, rejected_by=None, crystal_arrays=None, xyz_data=None):
+		if reason is not None:
+			logger.info(reason, stage=rejected_by)
+		total_time = time.perf_counter() - start_time
+		logger.debug('Finished processing '+str(identifier)+' ('+str(status)+')', duration=total_time)
+		clear_current_identifier()
+		return CrystalResult(identifier, status=status, reason=reason, flags=flags, checksum=checksum, from_cache=from_cache, log_lines=logger.temp_information, timings=dict(stage_timings, total=total_time), rejected_by=rejected_by, crystal_arrays=crystal_arrays, xyz_data=xyz_data)
+
+	# Fifth, make a note in the logger for this crystal.
+	#        * This is given at the 'DEBUG' level, so it is not made if the log level is 'INFO' or above.
 	description = 'Processing: '+str(identifier)
-	logger_string += str(description)
-	if (logger is not None):
-		logger.info(logger_string)
+	if logger.is_enabled_for(logging.DEBUG):
+		logger_string  = "==========================================================\n"
+		logger_string += str(description)
+		logger.debug(logger_string)
 
-	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 	# Eighth, get the crystal file.
 	if identifier.isdigit():
@@ -99,19 +151,16 @@ def get_crystal_from_CSD_single_process(input_data):
 		searcher.add_ccdc_number(int(identifier))
 		hits = searcher.search()
 
-		# 8.1.3: Made sure that there is at least 1 hit from identifier. 
-		#        * If there is more than 2 hits, take the first hit but give the user a warning. 
+		# 8.1.3: Made sure that there is at least 1 hit from identifier.
+		#        * If there is more than 2 hits, take the first hit but give the user a warning.
 		if len(hits) == 0:
-			append_to_file(could_not_find_identifiers_TXT_file, str(identifier), could_not_find_identifiers_lock)
 			to_string = 'Error: Could not find an entry in the CCDC database for: '+str(identifier)
-			write_to_logger(to_string, logger, is_parallel, logger_lock, write=True)
-			append_to_file(crystals_not_written_TXT_file, str(identifier)+': '+str(to_string), crystals_not_written_lock)
-			return False
+			return get_result('not_found', to_string)
 		elif len(hits) >= 2:
 			warnings_string = 'Warning: found '+str(len(hits))+' hits for '+str(identifier)
 			warnings.warn(warnings_string)
-			write_to_logger(warnings_string, logger, is_parallel, logger_lock, write=True)
-		
+			logger.info(warnings_string)
+
 		# 8.1.4: Obtain the CCDC object for this crystal
 		entry_object = hits[0].entry
 
@@ -120,51 +169,77 @@ def get_crystal_from_CSD_single_process(input_data):
 
 	else:
 
-		# 8.2: Obtain the crystal from the CCDC database based on its identifier. 
-
-		# 8.2.1: Import the entry reader class
-		from ccdc.io import EntryReader
+		# 8.2: Obtain the crystal from the CCDC database based on its identifier.
+		#      * The CSD reader is opened once for this process and reused for every identifier (see CSD_entry_reader.py).
 
-		# 8.2.2: Import the CCDC database
-		csd_reader = EntryReader('CSD')
-
-		# 8.2.3: Obtain the entryobject for the identifier of interest from the database.
+		# 8.2.1: Obtain the entryobject for the identifier of interest from the database.
 		try:
-			entry_object = csd_reader.entry(identifier)
+			with time_stage('entry_lookup', stage_timings):
+				entry_object = get_entry_from_CSD(identifier)
 		except Exception as exception:
-			# 8.2.4: There is a problem, so return a message indicating this and move on.
-			append_to_file(could_not_find_identifiers_TXT_file, str(identifier), could_not_find_identifiers_lock)
+			# 8.2.2: There is a problem, so return a message indicating this and move on.
 			to_string = 'Error: Could not extract '+str(identifier)+' from CCDC Database --> Error Message: '+str(exception)
-			write_to_logger(to_string, logger, is_parallel, logger_lock, write=True)
-			append_to_file(crystals_not_written_TXT_file, str(identifier)+': '+str(to_string), crystals_not_written_lock)
-			return False
-
-	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
-
-	# Ninth, get the good version of the crystal without disorder issues.
+			return get_result('not_found', to_string)
+
+	# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+	# Ninth, perform the cheapest checks on the entry first, so entries that will be rejected are rejected before their crystal is made.
+	#        * These check the chemical formula and the flags stored with the entry (see prefilter_entry.py).
+	rejected_by, to_string = prefilter_entry(identifier, entry_object, elements_to_reject, stage_timings)
+	if rejected_by is not None:
+		return get_result('rejected', to_string, rejected_by=rejected_by)
+
+	# 9.1: If a conversion cache is being used and this crystal has already been converted, return the crystal from the cache.
+	#      * The key for this crystal only needs the identifier, a hash of the entry, the versions of the CSD, ACSD and SUMELF, and a hash of the code of ACSD and SUMELF,
+	#        so the crystal is obtained from the cache before the molecule of the crystal is loaded from the entry. The cached crystal is the same as the crystal that would be made here.
+	#      * A crystal is only cached if it passed the 'molecule' stage of checks. This stage only depends on the entry, except for elements_to_reject, which can be
+	#        different in each run. The elements of the cached crystal are therefore checked against elements_to_reject (see prefilter_entry.check_cached_crystal).
+	#      * Crystals cached without the arrays of the crystal are converted again if the arrays are needed.
+	#      * The log events of a cached crystal are given as they were when the crystal was converted, so they are tagged with the process that converted it.
+	#        Only the events at or above the log level of the run that converted the crystal are cached.
+	write_xyz       = output_format in ('xyz', 'both')
+	write_to_shards = output_format in ('npz', 'both')
+	conversion_cache = get_conversion_cache(path_to_cache)
+	cache_key        = None if (conversion_cache is None) else conversion_cache.get_key(identifier, entry_object)
+	if cache_key is not None:
+		with time_stage('conversion_cache_load', stage_timings):
+			cached_crystal = conversion_cache.load(cache_key)
+		if (cached_crystal is not None) and (write_to_shards or (len(elements_to_reject) > 0)) and ('crystal_arrays' not in cached_crystal):
+			cached_crystal = None
+		if cached_crystal is not None:
+			molecule_stage_start_time = time.perf_counter()
+			to_string = check_cached_crystal(identifier, cached_crystal.get('crystal_arrays', None), elements_to_reject)
+			if to_string is not None:
+				record_stage_time('molecule', molecule_stage_start_time, stage_timings)
+				return get_result('rejected', to_string, rejected_by='molecule')
+			logger.add_events(cached_crystal['log_lines'])
+			logger.info('Obtained '+str(identifier)+' from the conversion cache.', stage='conversion_cache_load', duration=stage_timings['conversion_cache_load'])
+			xyz_data       = cached_crystal['xyz_data'] if write_xyz else None
+			crystal_arrays = cached_crystal['crystal_arrays'] if write_to_shards else None
+			return get_result('recorded', flags=cached_crystal['flags'], from_cache=True, crystal_arrays=crystal_arrays, xyz_data=xyz_data)
+	no_of_log_lines_before_conversion = len(logger.temp_information)
+
+	# 9.2: Get the good version of the crystal without disorder issues.
+	#      * This is the 'molecule' stage of checks, as every atom in the crystal is checked.
+	molecule_stage_start_time = time.perf_counter()
 	crystal_object = entry_object.crystal
 	CSD_molecules = crystal_object.molecule
 
-	# Tenth, if the crystal does not contain any coordinates, do not record it.
-	if len(CSD_molecules.atoms) == 0:
-		append_to_file(no_coordinates_given_TXT_file, str(identifier), no_coordinates_given_lock)
-		to_string = 'Error: '+str(identifier)+' Contains no coordinates.'
-		write_to_logger(to_string, logger, is_parallel, logger_lock, write=True)
-		append_to_file(crystals_not_written_TXT_file, to_string, crystals_not_written_lock)
-		return False
-
-	# Seventh, if the CSD_molecules is a polymer, move on as we do not want these crystals.
-	if CSD_molecules.is_polymeric or CSD_molecules.is_organometallic or any(a.is_metal for a in CSD_molecules.atoms) or (not CSD_molecules.is_organic):
-		append_to_file(rejected_crystals_TXT_file, str(identifier), rejected_crystals_lock)
-		to_string = 'Error: '+str(identifier)+' is either polymeric, organometallic (or otherwise contains a metal), or else is not purely organic.'
-		write_to_logger(to_string, logger, is_parallel, logger_lock, write=True)
-		append_to_file(crystals_not_written_TXT_file, to_string, crystals_not_written_lock)
-		return False
+	# Tenth, check every atom in the crystal (see prefilter_entry.check_molecule).
+	#        * If the crystal does not contain any coordinates, do not record it.
+	#        * If the crystal is polymeric, organometallic (or otherwise contains a metal), is not purely organic, or contains elements that the user does not want, move on.
+	status, to_string = check_molecule(identifier, CSD_molecules, elements_to_reject)
+	record_stage_time('molecule', molecule_stage_start_time, stage_timings)
+	if status == 'no_coordinates':
+		return get_result('no_coordinates', to_string)
+	elif status == 'rejected':
+		return get_result('rejected', to_string, rejected_by='molecule')
 
 	# ---------------------------------------------------------------
 	# Eighth, obtain the molecules and graph information from the CCDC/CSD molecules object.
-	#         * Note that the CSD_molecules object contains all the molecules in the crystal, contained in CSD_molecules.components 
-	molecules, molecule_graphs, hydrogens_with_no_coordinates_in_mols = create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecules, logger)
+	#         * Note that the CSD_molecules object contains all the molecules in the crystal, contained in CSD_molecules.components
+	with time_stage('create_molecules', stage_timings):
+		molecules, molecule_graphs, hydrogens_with_no_coordinates_in_mols = create_ASE_molecule_and_graph_from_CSD_molecule(CSD_molecules, logger)
 
 	# ---------------------------------------------------------------
 	# Ninth, Identify solvents. Refer to:
@@ -191,8 +266,9 @@ def get_crystal_from_CSD_single_process(input_data):
 		return False
 	'''
 
-	# 9.1: Obtain the names of the solvents in the crystal. 
-	solvent_components = [name for name in molecule_graphs.keys() if is_solvent(molecule_graphs[name])]
+	# 9.1: Obtain the names of the solvents in the crystal.
+	with time_stage('identify_solvents', stage_timings):
+		solvent_components = [name for name in molecule_graphs.keys() if is_solvent(molecule_graphs[name])]
 
 	# ---------------------------------------------------------------
 
@@ -202,101 +278,70 @@ def get_crystal_from_CSD_single_process(input_data):
 	cellpar = cell_lengths + cell_angles
 
 	# Eleventh, obtain the symmetry_operators for the crystal.
-	symmetry_operations = get_symmetry_operations(crystal_object.symmetry_operators)
+	#           * These are only obtained from the symmetry operators once per process for each set of symmetry operators, as many crystals share the same space group.
+	with time_stage('symmetry_operations', stage_timings):
+		symmetry_operations = get_symmetry_operations_from_cache(crystal_object.symmetry_operators)
 
 	# Twelfth, create the ase crystal file.
-	crystal, crystal_graph = make_crystal(molecules, symmetry_operations=symmetry_operations, cell=cellpar, wrap=False, solvent_components=solvent_components, remove_solvent=False, molecule_graphs=molecule_graphs)
+	with time_stage('make_crystal', stage_timings):
+		crystal, crystal_graph = make_crystal(molecules, symmetry_operations=symmetry_operations, cell=cellpar, wrap=False, solvent_components=solvent_components, remove_solvent=False, molecule_graphs=molecule_graphs)
 
 	# Thirteenth, attempt to add missing hydrogens to molecules in crystal using CCDC algorithms
 	if len(hydrogens_with_no_coordinates_in_mols) > 0:
 		add_no_coord_hydrogens_message = description + ' - Adding non-coordinated hydrogens to crystal structure'
 		#pbar.set_description(add_no_coord_hydrogens_message)
-		molecules, molecule_graphs, were_hydrogens_added = add_hydrogens_to_molecules(hydrogens_with_no_coordinates_in_mols, molecules, molecule_graphs, crystal, crystal_graph, symmetry_operations=symmetry_operations, cell=cellpar, logger=logger, identifier=identifier)
+		molecules_before_hydrogens = get_molecules_before_hydrogens(molecules, molecule_graphs)
+		with time_stage('add_hydrogens', stage_timings):
+			molecules, molecule_graphs, were_hydrogens_added = add_hydrogens_to_molecules(hydrogens_with_no_coordinates_in_mols, molecules, molecule_graphs, crystal, crystal_graph, symmetry_operations=symmetry_operations, cell=cellpar, logger=logger, identifier=identifier)
 		#pbar.set_description(description)
 	else:
 		were_hydrogens_added = False
 
-	# Fourteenth, create the crystals object again with added hydrogens if these were added by the "add_hydrogens_to_molecules" method previously.
-	#            * If no hydrogen were added to the crystal, the original crystal_graph will contain the 'no_of_neighbouring_non_cord_H' property which 
-	#              should be removed. 
+	# Fourteenth, add the hydrogens to the crystal object if these were added by the "add_hydrogens_to_molecules" method previously.
+	#            * Only the symmetry images of the added hydrogens are added to the crystal that was already made, rather than making the whole crystal again.
+	#              The first crystals given hydrogens by this process are also made again in full to check that these are the same (see add_hydrogens_to_crystal.py).
+	#            * If no hydrogen were added to the crystal, the original crystal_graph will contain the 'no_of_neighbouring_non_cord_H' property which
+	#              should be removed.
 	if were_hydrogens_added:
 		to_string = 'Missing hydrogens being added to crystal file for '+str(identifier)
-		write_to_logger(to_string, logger, is_parallel, logger_lock, write=False)
-		crystal, crystal_graph = make_crystal(molecules, symmetry_operations=symmetry_operations, cell=cellpar, wrap=False, solvent_components=solvent_components, remove_solvent=False, molecule_graphs=molecule_graphs)
+		logger.info(to_string)
+		with time_stage('make_crystal_with_added_hydrogens', stage_timings):
+			remake_crystal = partial(make_crystal, molecules, symmetry_operations=symmetry_operations, cell=cellpar, wrap=False, solvent_components=solvent_components, remove_solvent=False, molecule_graphs=molecule_graphs)
+			crystal, crystal_graph = remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, crystal_object.symmetry_operators, remake_crystal, logger)
 
 	# Fifteenth, figure out if any crystals should be check or rejected cause they are a bit funny.
-	flags = check_crystal_quality(crystal, molecules, molecule_graphs, entry_object)
-	save_flags_to_disk(identifier, flags, save_crystals_to, crystal_quality_information_lock) # Save this information to disk
-
-	# Sixteenth, add the node and edge properties of the crystal from the crystal_graph into the crystal ASE object itself. 
-	add_graph_to_ASE_Atoms_object(crystal, crystal_graph)
-
-	# Seventeenth, save the xyz file for the crystal
-	crystal_filepath = save_crystals_to+'/'+identifier
-	write(crystal_filepath+'.xyz', crystal)
-
-	# Eighteenth, write the output from logger to the global logger.
-	write_to_logger(None, logger, is_parallel, logger_lock, write=True)
-
-	# Nineteenth. increment no_of_crystals_recorded as we have recorded a crystal
-	no_of_crystals_recorded.value += 1
-
-	# Twenty, we have recorded the crystal, so return True
-	return True
-
-# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
-
-def append_to_file(path_to_file, line, lock):
-	"""
-	This method is designed to allow the user to append a line to a file.
-
-	Parameters
-	----------
-	path_to_file : str.
-		This is the path to the file to add the line to
-	line : str.
-		This is the line to add to the file
-	lock : filelock.lock
-		This is the lock to prevent other processes from printing data to this file. 
-	"""
-	with lock:
-		with open(path_to_file, 'a+') as FILE:
-			FILE.write(str(line).rstrip()+'\n')
-
-def write_to_logger(message_to_write, logger, is_parallel, logger_lock, write=False):
-	"""
-	This method will write information to the logger. 
-
-	Parameters
-	----------
-	message_to_write : str. or None
-		This is the message you want to write to the logger
-	logger : logger
-		This is the logger file.
-	is_parallel : bool.
-		This indicates if ACSD is running in parallel or not. 
-	logger_lock : lock
-		THis is the lock object for the logger
-	write : bool.
-		This indicates if you want to write the information to the logger file if in parallel. 
-	"""
-
-	# First, is there is no logger, do not perform this step.
-	if (logger is None):
-		return
-
-	# Second, write the information to the logger (if there if a message to write).
-	if message_to_write is not None:
-		logger.info(message_to_write)
-
-	# Third, if ACSD is in parallel and you want to write the data to the logger file, do this.
-	if write and is_parallel:
-
-		# 3.1: Run the lock so that the logger is only being written to by one process at a time.
-		with logger_lock:
+	#            * These flags are returned to the main process, which saves them to disk.
+	with time_stage('check_crystal_quality', stage_timings):
+		flags = get_flag_values(check_crystal_quality(crystal, molecules, molecule_graphs, entry_object))
+
+	# Sixteenth, add the node and edge properties of the crystal from the crystal_graph into the crystal ASE object itself.
+	with time_stage('add_graph_to_crystal', stage_timings):
+		add_graph_to_ASE_Atoms_object(crystal, crystal_graph)
+
+	# Seventeenth, obtain the contents of the xyz file for the crystal.
+	#              * This is returned to the main process, which writes the xyz file (see ResultWriter.py), so this process does not wait for the disk.
+	#              * The contents are made here rather than in the main process, as making them takes much longer than sending them (see Benchmarks/benchmark_result_writer.py).
+	#                For example, for a crystal of 200 atoms, making the contents takes about 2.5 ms, while pickling the contents or the ase.Atoms object both take
+	#                about 0.1 ms or less and are within 15% of the same size. Making the contents in the main process would take this time for every crystal
+	#                from all processes, in the one process that also reads and records the results.
+	#              * The xyz data is also made if a conversion cache is being used, so the cached crystal can be used to write an xyz file in later runs.
+	with time_stage('xyz_data', stage_timings):
+		xyz_data = get_xyz_data(crystal) if (write_xyz or (cache_key is not None)) else None
+
+	# 17.1: Obtain the arrays of the crystal to write to a binary shard. These are returned to the main process, which writes the shards.
+	if write_to_shards or (cache_key is not None):
+		with time_stage('crystal_arrays', stage_timings):
+			crystal_arrays = get_crystal_arrays(crystal, crystal_graph)
+	else:
+		crystal_arrays = None
 
-			# 3.2: Perform the writing task.
-			logger.write()
+	# Eighteenth, save the crystal to the conversion cache, along with the flags and log information made while converting it.
+	#             * The xyz data includes the node and edge properties of the crystal_graph, which were added to the crystal above.
+	if cache_key is not None:
+		with time_stage('conversion_cache_save', stage_timings):
+			conversion_cache.save(cache_key, {'xyz_data': xyz_data, 'crystal_arrays': crystal_arrays, 'flags': flags, 'log_lines': logger.temp_information[no_of_log_lines_before_conversion:]})
 
-# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
+	# Nineteenth, we have recorded the crystal, so return this result.
+	return get_result('recorded', flags=flags, crystal_arrays=(crystal_arrays if write_to_shards else None), xyz_data=(xyz_data if write_xyz else None))
 
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -4,7 +4,7 @@ get_inputs.py. Geoffrey Weal, 16/4/24
 This generator is designed to return all the input methods required for the get_crystal_from_CSD_single_process method.  
 """
 
-def get_inputs(identifiers, overwrite_existing_crystal_files, no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals, save_crystals_to, crystals_not_written_lock, could_not_find_identifiers_lock, no_coordinates_given_lock, rejected_crystals_lock, crystal_quality_information_lock, logger, logger_lock, is_parallel):
+def get_inputs(identifiers, save_crystals_to, path_to_cache=None, settings_given_to_processes=False, elements_to_reject=(), output_format='xyz', profile_identifiers=(), log_level='DEBUG'):
 	"""
 	This generator is designed to return all the input methods required for the get_crystal_from_CSD_single_process method. 
 
@@ -13,80 +13,57 @@ def get_inputs(identifiers, overwrite_existing_crystal_files, no_of_crystals_rec
 	identifiers : list
 		This is the list of identifiers you want to obtain the crystals for from the CCDC. 
 
-	overwrite_existing_crystal_files : bool.
-		This boolean indicates if you want to overwrite already given crystals. If so, set this to True.
-
-	no_of_crystals_recorded : int object
-		This is a record of the number of crystals that have been reported.
-	no_of_excluded_crystals : int object
-		This is a record of the number of crystals that were excluded from being recorded. 
-	no_of_already_processed_crystals : int object
-		This is a record of the number of crystals that were skipped because they have already been recorded. 
-
 	save_crystals_to : str.
 		This is the path to the folder to save crystals to. 
 
-	crystals_not_written_lock : multiprocessing.Manager.lock
-		This is the lock for the file at crystals_not_written_TXT_file.
+	path_to_cache : str. or None
+		This is the path to the conversion cache folder. If None, no conversion cache is used. Default: None
+
+	settings_given_to_processes : bool.
+		If True, save_crystals_to, path_to_cache, elements_to_reject, output_format, profile_identifiers and log_level have been given once to each process (see initialise_process.py), so only the identifier is yielded. Default: False
 
-	could_not_find_identifiers_lock : multiprocessing.Manager.lock
-		This is the lock for the file at could_not_find_identifiers_TXT_file.
-	no_coordinates_given_lock : multiprocessing.Manager.lock
-		This is the lock for the file at no_coordinates_given_TXT_file.
-	rejected_crystals_lock : multiprocessing.Manager.lock
-		This is the lock for the file at rejected_crystals_TXT_file.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain. Default: ()
 
-	crystal_quality_information_lock : multiprocessing.Manager.lock
-		This is the lock for recording crystal quality information.
+	output_format : str.
+		This is the format to write crystals in (see CrystalShards.output_formats). Default: 'xyz'
 
-	logger : logging
-		This is the log for recording warning issues. 
-	logger_lock : FileLock.FileLock
-		This is the lock for recording logger information. 
+	profile_identifiers : list of str.
+		These are the identifiers to profile using cProfile (see stage_timings.py). Default: ()
+
+	log_level : str.
+		Only log events at or above this level are recorded (see CustomParallelLogger.py). Default: 'DEBUG'
 
 	Returns
 	-------
 	identifier : str.
 		This is the identifier you want to obtain the crystal of from the CCDC. 
 
-	overwrite_existing_crystal_files : bool.
-		This boolean indicates if you want to overwrite already given crystals. If so, set this to True.
-
-	no_of_crystals_recorded : int object
-		This is a record of the number of crystals that have been reported.
-	no_of_excluded_crystals : int object
-		This is a record of the number of crystals that were excluded from being recorded. 
-	no_of_already_processed_crystals : int object
-		This is a record of the number of crystals that were skipped because they have already been recorded. 
-
 	save_crystals_to : str.
 		This is the path to the folder to save crystals to. 
 
-	crystals_not_written_lock : multiprocessing.Manager.lock
-		This is the lock for the file at crystals_not_written_TXT_file.
+	path_to_cache : str. or None
+		This is the path to the conversion cache folder.
 
-	could_not_find_identifiers_lock : multiprocessing.Manager.lock
-		This is the lock for the file at could_not_find_identifiers_TXT_file.
-	no_coordinates_given_lock : multiprocessing.Manager.lock
-		This is the lock for the file at no_coordinates_given_TXT_file.
-	rejected_crystals_lock : multiprocessing.Manager.lock
-		This is the lock for the file at rejected_crystals_TXT_file.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain.
 
-	crystal_quality_information_lock : multiprocessing.Manager.lock
-		This is the lock for recording crystal quality information.
+	output_format : str.
+		This is the format to write crystals in.
 
-	logger : logging
-		This is the log for recording warning issues. 
-	logger_lock : FileLock.FileLock
-		This is the lock for recording logger information. 
+	profile_identifiers : list of str.
+		These are the identifiers to profile using cProfile.
 
-	is_parallel : bool.
-		This indicates if you are running your process in parallel or not. 
+	log_level : str.
+		Only log events at or above this level are recorded.
 	"""
 
 	# First, for each identifier in identifiers
 	for identifier in identifiers:
 
 		# Second, yield the input variables
-		yield identifier, overwrite_existing_crystal_files, no_of_crystals_recorded, no_of_excluded_crystals, no_of_already_processed_crystals, save_crystals_to, crystals_not_written_lock, could_not_find_identifiers_lock, no_coordinates_given_lock, rejected_crystals_lock, crystal_quality_information_lock, logger, logger_lock, is_parallel
+		if settings_given_to_processes:
+			yield identifier
+		else:
+			yield identifier, save_crystals_to, path_to_cache, elements_to_reject, output_format, profile_identifiers, log_level
 
@@ -0,0 +1,34 @@
+"""
+initialise_process.py, Geoffrey Weal, 17/10/26
+
+This method is given as the initializer of the process pool, and is run once in each process before it is given any identifiers.
+"""
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader                    import initialise_CSD_reader
+from ACSD.ACSD.get_crystals_from_CSD_methods.get_crystal_from_CSD_single_process import set_process_settings
+from ACSD.ACSD.get_crystals_from_CSD_methods.worker_status                       import claim_worker_status_slot
+
+def initialise_process(reader_factory, path_to_timings_file, process_settings=None, worker_status_board=None):
+	"""
+	This method is run once in each process before it is given any identifiers.
+
+	Parameters
+	----------
+	reader_factory : callable
+		This method returns the reader to obtain entries from.
+	path_to_timings_file : str. or None
+		This is the path to the file to record the timings for the reader of this process to.
+	process_settings : tuple or None
+		These are the settings that are the same for every identifier, given as the tuple (save_crystals_to, path_to_cache, elements_to_reject, output_format, profile_identifiers, log_level). If None, these settings are given with each identifier instead. Default: None
+	worker_status_board : multiprocessing.Array or None
+		This is where each process records which identifier it is converting (see worker_status.py). If None, this is not recorded. Default: None
+	"""
+
+	# First, open the CSD reader for this process.
+	initialise_CSD_reader(reader_factory, path_to_timings_file)
+
+	# Second, give the settings that are the same for every identifier to this process.
+	if process_settings is not None:
+		set_process_settings(*process_settings)
+
+	# Third, claim a slot of the worker status board for this process.
+	claim_worker_status_slot(worker_status_board)
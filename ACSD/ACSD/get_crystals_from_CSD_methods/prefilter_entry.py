@@ -0,0 +1,228 @@
+"""
+prefilter_entry.py, Geoffrey Weal, 17/10/26
+
+These methods check if an entry from the CSD should be rejected before its crystal is made, using the cheapest checks first.
+
+The stages of checks are (in the order they are performed):
+
+	* 'formula':     The elements in the chemical formula of the entry are checked for any elements the user has asked to reject.
+	* 'entry_flags': The polymeric, organometallic and organic flags stored with the entry are checked.
+	* 'molecule':    The molecule of the crystal is made, and every atom is checked (see check_molecule).
+
+An entry is rejected at the first stage it fails, so later (more costly) stages are not performed for it.
+
+The 'formula' and 'entry_flags' stages only reject entries that the 'molecule' stage would also reject, so they do not change which entries are recorded:
+
+	* Whether an entry contains a metal is decided by the CSD (using the organometallic and organic flags of the entry, and the is_metal property of each atom),
+	  rather than from the elements in the formula.
+	* Entries that the CSD does not give 3D coordinates for skip the 'formula' and 'entry_flags' stages, so these are still given as 'no_coordinates' by the 'molecule' stage.
+"""
+import re, time
+import numpy as np
+from ase.data import chemical_symbols
+
+# These are the stages of checks, in the order they are performed.
+filter_stages = ('formula', 'entry_flags', 'molecule')
+
+# This is the pattern for obtaining the elements from a chemical formula given by the CSD (for example, "C10 H8 Cu1 2+,2(H2 O1)").
+element_pattern = re.compile(r'[A-Z][a-z]?')
+
+def get_elements_from_formula(formula):
+	"""
+	This method will obtain the elements in a chemical formula given by the CSD.
+
+	Parameters
+	----------
+	formula : str.
+		This is the chemical formula of the entry.
+
+	Returns
+	-------
+	elements : set of str.
+		These are the elements in the chemical formula.
+	"""
+	return set(element_pattern.findall(formula))
+
+def prefilter_entry(identifier, entry_object, elements_to_reject=(), timings=None):
+	"""
+	This method will check if an entry should be rejected before its crystal is made, using the 'formula' and 'entry_flags' stages.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier of the entry.
+	entry_object : ccdc.entry.Entry
+		This is the entry from the CSD.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain. Default: ()
+	timings : dict. or None
+		If given, the time taken for each stage is added to this dictionary as "filter_<stage>". Default: None
+
+	Returns
+	-------
+	rejected_by : str. or None
+		This is the stage that rejected the entry. None if the entry was not rejected.
+	reason : str. or None
+		This is the message that explains why the entry was rejected. None if the entry was not rejected.
+	"""
+
+	# First, if the CSD does not give 3D coordinates for this entry, do not perform these stages.
+	#        * The 'molecule' stage checks for coordinates before it checks anything else, so this entry is given as 'no_coordinates' rather than rejected by these stages.
+	if not getattr(entry_object, 'has_3d_structure', False):
+		return None, None
+
+	# Second, check the elements in the chemical formula of the entry.
+	#         * If the entry does not have a formula, this stage is skipped.
+	#         * Metals are not checked here, as whether an atom is a metal is decided by the CSD (see the 'entry_flags' and 'molecule' stages).
+	start_time = time.perf_counter()
+	formula    = getattr(entry_object, 'formula', None)
+	if formula:
+		unwanted = sorted(get_elements_from_formula(formula).intersection(elements_to_reject))
+		if len(unwanted) > 0:
+			return get_rejection('formula', 'Error: '+str(identifier)+' contains elements that were asked to be rejected ('+', '.join(unwanted)+') in its formula ('+str(formula)+').', start_time, timings)
+	record_stage_time('formula', start_time, timings)
+
+	# Third, check the flags stored with the entry.
+	#         * Only flags given by the entry are checked, so this stage does not make the crystal.
+	start_time = time.perf_counter()
+	if getattr(entry_object, 'is_polymeric', False) or getattr(entry_object, 'is_organometallic', False) or (getattr(entry_object, 'is_organic', True) is False):
+		return get_rejection('entry_flags', 'Error: '+str(identifier)+' is either polymeric, organometallic, or else is not purely organic (as given by its entry in the CSD).', start_time, timings)
+	record_stage_time('entry_flags', start_time, timings)
+
+	# Fourth, the entry was not rejected.
+	return None, None
+
+def check_molecule(identifier, CSD_molecules, elements_to_reject=()):
+	"""
+	This method will check every atom in the molecule of a crystal from the CSD. This is the 'molecule' stage of checks.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier of the entry.
+	CSD_molecules : ccdc.molecule.Molecule
+		This is the molecule of the crystal, containing all the molecules in the crystal.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain. Default: ()
+
+	Returns
+	-------
+	status : str. or None
+		This is 'no_coordinates' if the crystal does not contain any coordinates, 'rejected' if the crystal is rejected, or None if the crystal passes.
+	reason : str. or None
+		This is the message that explains the status. None if the crystal passes.
+	"""
+
+	# First, if the crystal does not contain any coordinates, do not record it.
+	if len(CSD_molecules.atoms) == 0:
+		return 'no_coordinates', 'Error: '+str(identifier)+' Contains no coordinates.'
+
+	# Second, if the CSD_molecules is a polymer, move on as we do not want these crystals.
+	if CSD_molecules.is_polymeric or CSD_molecules.is_organometallic or any(a.is_metal for a in CSD_molecules.atoms) or (not CSD_molecules.is_organic):
+		return 'rejected', 'Error: '+str(identifier)+' is either polymeric, organometallic (or otherwise contains a metal), or else is not purely organic.'
+
+	# Third, if the crystal contains any elements that the user does not want, move on.
+	#        * These are usually found from the chemical formula of the entry, but are checked here in case the entry does not have a formula.
+	unwanted_elements = sorted(set(atom.atomic_symbol for atom in CSD_molecules.atoms).intersection(elements_to_reject))
+	if len(unwanted_elements) > 0:
+		return 'rejected', 'Error: '+str(identifier)+' contains elements that were asked to be rejected ('+', '.join(unwanted_elements)+').'
+
+	# Fourth, the crystal passes.
+	return None, None
+
+def check_cached_crystal(identifier, crystal_arrays, elements_to_reject=()):
+	"""
+	This method will check the elements of a crystal obtained from the conversion cache against the elements the user does not want crystals to contain.
+
+	Crystals are obtained from the conversion cache before the 'molecule' stage of checks (see ConversionCache.py). A crystal is only cached if it passed
+	this stage, which only depends on the entry, except for elements_to_reject. This means that only the elements of a cached crystal need to be checked.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier of the entry.
+	crystal_arrays : dict. or None
+		These are the arrays of the cached crystal (see CrystalShards.get_crystal_arrays). This is only None if elements_to_reject is empty.
+	elements_to_reject : list of str.
+		These are the elements that the user does not want crystals to contain. Default: ()
+
+	Returns
+	-------
+	reason : str. or None
+		This is the message that explains why the crystal was rejected. None if the crystal passes.
+	"""
+	if len(elements_to_reject) == 0:
+		return None
+	unwanted_elements = sorted(set(chemical_symbols[number] for number in np.unique(crystal_arrays['numbers'])).intersection(elements_to_reject))
+	if len(unwanted_elements) > 0:
+		return 'Error: '+str(identifier)+' contains elements that were asked to be rejected ('+', '.join(unwanted_elements)+').'
+	return None
+
+def get_rejection(stage, reason, start_time, timings):
+	"""
+	This method will record the time taken for a stage that rejected an entry, and return the stage and reason.
+	"""
+	record_stage_time(stage, start_time, timings)
+	return stage, reason
+
+def record_stage_time(stage, start_time, timings):
+	"""
+	This method will record the time taken for a stage in timings.
+
+	Parameters
+	----------
+	stage : str.
+		This is the name of the stage.
+	start_time : float
+		This is the time (from time.perf_counter) that the stage started.
+	timings : dict. or None
+		This is the dictionary to record the time taken for the stage in. If None, the time is not recorded.
+	"""
+	if timings is not None:
+		timings['filter_'+stage] = time.perf_counter() - start_time
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def record_filter_stages(result, filter_stage_report):
+	"""
+	This method will add the stages performed for an identifier to the report of the number of entries checked and rejected, and the time taken, by each stage.
+
+	Parameters
+	----------
+	result : CrystalResult
+		This is the result of processing an identifier.
+	filter_stage_report : dict. of {str: dict.}
+		This is the number of entries checked ("checked") and rejected ("rejected"), and the total time taken ("time"), by each stage. This is updated by this method.
+	"""
+	for stage in filter_stages:
+		if 'filter_'+stage not in result.timings:
+			continue
+		stage_report = filter_stage_report.setdefault(stage, {'checked': 0, 'rejected': 0, 'time': 0.0})
+		stage_report['checked'] += 1
+		stage_report['time']    += result.timings['filter_'+stage]
+		if result.rejected_by == stage:
+			stage_report['rejected'] += 1
+
+def get_filter_stage_report_lines(filter_stage_report):
+	"""
+	This method will give the lines that report the number of entries checked and rejected, and the time taken, by each stage.
+
+	Parameters
+	----------
+	filter_stage_report : dict. of {str: dict.}
+		This is the number of entries checked and rejected, and the total time taken, by each stage (see record_filter_stages).
+
+	Returns
+	-------
+	lines : list of str.
+		These are the lines of the report.
+	"""
+	lines = []
+	for stage in filter_stages:
+		if stage not in filter_stage_report:
+			continue
+		stage_report = filter_stage_report[stage]
+		lines.append(f"Filter stage '{stage}': {stage_report['rejected']} of {stage_report['checked']} entries rejected, taking {stage_report['time']:.3f} s in total")
+	return lines
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -0,0 +1,69 @@
+"""
+record_result.py, Geoffrey Weal, 17/10/26
+
+This method will record the result of processing an identifier. This is only performed by the main process, so no locks are needed.
+"""
+from ACSD.ACSD.get_crystals_from_CSD_methods.prefilter_entry import record_filter_stages
+from ACSD.ACSD.get_crystals_from_CSD_methods.stage_timings   import record_stage_timings
+
+def record_result(result, counts, logger, results_store=None, filter_stage_report=None, shard_writer=None, stage_timing_report=None):
+	"""
+	This method will record the result of processing an identifier.
+
+	This includes updating the counts, recording the result (including its crystal quality flags) in the results store, 
+	and writing the log information for this identifier to the log file. The side files (like crystals_not_written.txt and
+	crystal_quality_information.csv) are written from the results store at the end of the run (see write_side_files.py).
+
+	Parameters
+	----------
+	result : CrystalResult
+		This is the result of processing an identifier.
+	counts : dict. of {str: int}
+		These are the number of identifiers that have been given each status. This is updated by this method.
+	logger : CustomParallelLogger
+		This is the logger for the ACSD program.
+	results_store : ResultsStore or None
+		This is the results store that records the result of every identifier. If None, the result is not recorded in a results store. Default: None
+	filter_stage_report : dict. or None
+		This is the number of entries checked and rejected, and the time taken, by each stage of checks (see prefilter_entry.py). This is updated by this method. If None, this is not recorded. Default: None
+	shard_writer : CrystalShardWriter or None
+		This writes crystals to binary shards. If None, crystals are not written to binary shards. Default: None
+	stage_timing_report : dict. or None
+		These are the timings of each stage of converting identifiers into crystals (see stage_timings.py). This is updated by this method. If None, this is not recorded. Default: None
+	"""
+
+	# First, update the count for this status, and the number of crystals obtained from the conversion cache.
+	counts[result.status] = counts.get(result.status, 0) + 1
+	if result.from_cache:
+		counts['from_cache'] = counts.get('from_cache', 0) + 1
+
+	# 1.1: Record the stages of checks that were performed for this identifier.
+	if filter_stage_report is not None:
+		record_filter_stages(result, filter_stage_report)
+
+	# 1.2: Record the timings of each stage of converting this identifier into a crystal.
+	if stage_timing_report is not None:
+		record_stage_timings(result, stage_timing_report)
+
+	# Second, give the log information for this identifier to the log sink, which writes it to the log file (see CustomParallelLogger.py).
+	logger.write(result.log_lines)
+
+	# Third, add the crystal to the next binary shard.
+	if (shard_writer is not None) and (result.crystal_arrays is not None):
+		shard_writer.add(result.identifier, result.crystal_arrays)
+
+	# Fourth, record the result of this identifier in the results store, and commit the results store to disk if it is time to do so.
+	#         * This is done last, so that an identifier is only seen as finished once everything about it has been written to disk.
+	#         * If crystals are being written to binary shards, the results store is committed straight after each shard is written, 
+	#           and is not committed while there are crystals waiting to be written to a shard.
+	if results_store is not None:
+		results_store.record(result)
+		if shard_writer is None:
+			results_store.commit_if_needed()
+		elif shard_writer.is_full():
+			shard_writer.flush()
+			results_store.commit()
+		elif len(shard_writer.crystals_to_write) == 0:
+			results_store.commit_if_needed()
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -0,0 +1,210 @@
+"""
+stage_timings.py, Geoffrey Weal, 17/10/26
+
+These methods time each stage of converting an identifier into a crystal, and report where the time of a run was spent.
+
+For each identifier, get_crystal_from_CSD_single_process records (in the timings of its CrystalResult) the wall time ("<stage>"),
+the cpu time ("<stage>_cpu"), and the peak memory used by the process so far ("<stage>_peak_rss", in MB) for each stage in
+pipeline_stages. The main process adds the time taken to write the xyz file ("write_xyz"). These are collected by
+record_stage_timings, and reported at the end of the run by get_stage_timing_report_lines.
+"""
+import os, sys, time, heapq, cProfile
+from array      import array
+from contextlib import contextmanager
+import numpy as np
+from ACSD.ACSD.get_crystals_from_CSD_methods.worker_status import set_current_stage
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+# These are the stages of converting an identifier into a crystal, in the order they are performed.
+pipeline_stages = ('entry_lookup', 'create_molecules', 'identify_solvents', 'symmetry_operations', 'make_crystal', 'add_hydrogens', 'make_crystal_with_added_hydrogens', 'check_crystal_quality', 'add_graph_to_crystal', 'xyz_data', 'crystal_arrays', 'conversion_cache_load', 'conversion_cache_save', 'write_xyz')
+
+# These are the percentiles of the wall time of each stage that are reported.
+reported_percentiles = (50, 90, 99)
+
+# This is the name of the folder in the crystal database folder that profiles of identifiers are written to.
+profiles_foldername = 'profiles'
+
+@contextmanager
+def time_stage(stage, timings, cpu_clock=time.process_time, report_stage=True):
+	"""
+	This context manager will record the wall time, cpu time and peak memory of a stage in timings.
+
+	The stage is also recorded in the worker status board of this process (see worker_status.py), so the main process can see which stage each process is in.
+
+	Parameters
+	----------
+	stage : str.
+		This is the name of the stage (see pipeline_stages).
+	timings : dict.
+		This is the dictionary to record the timings of the stage in.
+	cpu_clock : callable
+		This is the clock used to measure the cpu time. This is time.process_time in the processes, and time.thread_time
+		in the writer threads of the main process (so the time of other threads is not included). Default: time.process_time
+	report_stage : bool.
+		If True, the stage is recorded in the worker status board of this process. This is False for the writer threads of the main process. Default: True
+	"""
+	if report_stage:
+		set_current_stage(stage)
+	start_wall_time = time.perf_counter()
+	start_cpu_time  = cpu_clock()
+	try:
+		yield
+	finally:
+		timings[stage]          = time.perf_counter() - start_wall_time
+		timings[stage+'_cpu']   = cpu_clock() - start_cpu_time
+		peak_rss = get_peak_rss()
+		if peak_rss is not None:
+			timings[stage+'_peak_rss'] = peak_rss
+
+def get_peak_rss():
+	"""
+	This method will give the largest amount of memory used by this process so far.
+
+	Returns
+	-------
+	peak_rss : float or None
+		This is the peak resident set size of this process (in MB). None if this can not be obtained on this operating system.
+	"""
+	if resource is None:
+		return None
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak_rss / (1024.0 ** 2) if (sys.platform == 'darwin') else peak_rss / 1024.0
+
+def profile_call(path_to_profile, method, *arguments):
+	"""
+	This method will run a method under cProfile, and write the profile to disk.
+
+	The profile can be viewed by typing "python -m pstats path_to_profile" into the terminal, or with a viewer like snakeviz.
+
+	Parameters
+	----------
+	path_to_profile : str.
+		This is the path to write the profile to.
+	method : callable
+		This is the method to profile.
+	arguments : tuple
+		These are the arguments to give to the method.
+
+	Returns
+	-------
+	output :
+		This is the output of the method.
+	"""
+	profiler = cProfile.Profile()
+	try:
+		return profiler.runcall(method, *arguments)
+	finally:
+		os.makedirs(os.path.dirname(path_to_profile), exist_ok=True)
+		profiler.dump_stats(path_to_profile)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def record_stage_timings(result, stage_timing_report, no_of_slowest_identifiers=10):
+	"""
+	This method will add the timings of each stage for an identifier to the report of where the time of the run was spent.
+
+	Parameters
+	----------
+	result : CrystalResult
+		This is the result of processing an identifier.
+	stage_timing_report : dict.
+		This contains the wall times ("wall") and cpu times ("cpu") of each stage, the peak memory of any process ("peak_rss"),
+		and the slowest identifiers ("slowest"). This is updated by this method.
+	no_of_slowest_identifiers : int
+		This is the number of slowest identifiers to keep. Default: 10
+	"""
+
+	# First, only identifiers that were processed have timings.
+	if 'total' not in result.timings:
+		return
+
+	# Second, record the timings of each stage performed for this identifier.
+	#         * The times are held in arrays of floats, so a run of hundreds of thousands of identifiers uses little memory.
+	for stage in pipeline_stages:
+		if stage not in result.timings:
+			continue
+		stage_report = stage_timing_report.setdefault('stages', {}).setdefault(stage, {'wall': array('d'), 'cpu': array('d'), 'peak_rss': 0.0})
+		stage_report['wall'].append(result.timings[stage])
+		stage_report['cpu'].append(result.timings.get(stage+'_cpu', 0.0))
+		stage_report['peak_rss'] = max(stage_report['peak_rss'], result.timings.get(stage+'_peak_rss', 0.0))
+
+	# Third, keep the slowest identifiers, along with the stage that took the longest for each.
+	#        * The xyz file is written by the main process after the process has finished with the identifier, so the time taken to write it is added to the total time.
+	total_time    = result.timings['total'] + result.timings.get('write_xyz', 0.0)
+	slowest_stage = max((stage for stage in pipeline_stages if stage in result.timings), key=lambda stage: result.timings[stage], default=None)
+	slowest = stage_timing_report.setdefault('slowest', [])
+	entry   = (total_time, result.identifier, slowest_stage, result.timings.get(slowest_stage, 0.0))
+	if len(slowest) < no_of_slowest_identifiers:
+		heapq.heappush(slowest, entry)
+	elif entry > slowest[0]:
+		heapq.heapreplace(slowest, entry)
+
+def get_stage_timing_summary(stage_timing_report):
+	"""
+	This method will give the number of identifiers, and the mean, percentiles and maximum of the wall time, for each stage.
+
+	Parameters
+	----------
+	stage_timing_report : dict.
+		This contains the timings of each stage, and the slowest identifiers (see record_stage_timings).
+
+	Returns
+	-------
+	summary : dict. of {str: dict.}
+		This gives the number of identifiers ("count"), and the mean ("mean"), percentiles (for example, "p90") and maximum ("max") of the wall time (in seconds), for each stage.
+	"""
+	summary = {}
+	stages  = stage_timing_report.get('stages', {})
+	for stage in pipeline_stages:
+		if stage not in stages:
+			continue
+		wall_times = np.array(stages[stage]['wall'], dtype=np.float64)
+		summary[stage] = {'count': len(wall_times), 'mean': float(wall_times.mean())}
+		for percentile, value in zip(reported_percentiles, np.percentile(wall_times, reported_percentiles)):
+			summary[stage]['p'+str(percentile)] = float(value)
+		summary[stage]['max'] = float(wall_times.max())
+	return summary
+
+def get_stage_timing_report_lines(stage_timing_report):
+	"""
+	This method will give the lines that report where the time of the run was spent.
+
+	Parameters
+	----------
+	stage_timing_report : dict.
+		This contains the timings of each stage, and the slowest identifiers (see record_stage_timings).
+
+	Returns
+	-------
+	lines : list of str.
+		These are the lines of the report.
+	"""
+
+	# First, report the timings of each stage.
+	lines = []
+	stages = stage_timing_report.get('stages', {})
+	if len(stages) == 0:
+		return lines
+	total_wall_time = sum(sum(stage_report['wall']) for stage_report in stages.values())
+	percentile_names = ' '.join(f"{'p'+str(percentile)+' (s)':>9}" for percentile in reported_percentiles)
+	lines.append(f"{'Stage':<34} {'count':>8} {'wall (s)':>10} {'%':>6} {'cpu (s)':>10} {percentile_names} {'max (s)':>9} {'peak RSS (MB)':>14}")
+	for stage in pipeline_stages:
+		if stage not in stages:
+			continue
+		wall_times  = np.frombuffer(stages[stage]['wall'], dtype=np.float64)
+		percentiles = ' '.join(f'{value:>9.4f}' for value in np.percentile(wall_times, reported_percentiles))
+		fraction    = 100.0 * wall_times.sum() / total_wall_time if (total_wall_time > 0.0) else 0.0
+		lines.append(f"{stage:<34} {len(wall_times):>8} {wall_times.sum():>10.3f} {fraction:>6.1f} {sum(stages[stage]['cpu']):>10.3f} {percentiles} {wall_times.max():>9.4f} {stages[stage]['peak_rss']:>14.1f}")
+
+	# Second, report the slowest identifiers.
+	slowest = sorted(stage_timing_report.get('slowest', []), reverse=True)
+	if len(slowest) > 0:
+		lines.append(f'Slowest {len(slowest)} identifiers:')
+		for total_time, identifier, slowest_stage, slowest_stage_time in slowest:
+			lines.append(f'  {identifier:<20} {total_time:>10.3f} s (slowest stage: {slowest_stage}, {slowest_stage_time:.3f} s)')
+
+	return lines
@@ -0,0 +1,125 @@
+"""
+symmetry_operations_cache.py, Geoffrey Weal, 17/10/26
+
+These methods obtain the symmetry operations of a crystal, reusing the symmetry operations already obtained by this process for other crystals with the same symmetry operators.
+
+For each set of symmetry operators, the cache holds:
+
+	* The symmetry operations given by SUMELF.get_symmetry_operations, which are given to SUMELF.make_crystal.
+	* The rotations and translations of every symmetry operator stacked into numpy arrays of shape (n_ops, 3, 3) and (n_ops, 3),
+	  so that every symmetry operator can be applied to a set of atoms at once (see expand_scaled_positions).
+"""
+import copy
+import numpy as np
+from collections               import OrderedDict
+from ase.spacegroup.spacegroup import parse_sitesym
+from SUMELF                    import get_symmetry_operations
+
+# This is the maximum number of sets of symmetry operators held in the cache of each process.
+#   * The CSD only contains about 230 space groups, given in a limited number of settings, so this is rarely reached.
+#   * If it is reached, the set of symmetry operators that was used least recently is removed from the cache.
+max_symmetry_operations_cache_size = 512
+
+# These are the symmetry operations that have been obtained by this process, given as {symmetry_operators: cached_symmetry_operations}.
+_symmetry_operations_cache = OrderedDict()
+
+def get_symmetry_operations_from_cache(symmetry_operators):
+	"""
+	This method will obtain the symmetry operations for the given symmetry operators, as given by SUMELF.get_symmetry_operations.
+
+	The symmetry operators are only converted into symmetry operations the first time this process sees them.
+	After this, a copy of the same symmetry operations is given to every crystal with these symmetry operators.
+
+	A copy is given, rather than the cached symmetry operations themselves, as these belong to SUMELF, which may change them while
+	making a crystal. This way, a change made while making one crystal is never given to another crystal.
+
+	Parameters
+	----------
+	symmetry_operators : list of str.
+		These are the symmetry operators of the crystal from the CSD (for example, ('x,y,z', '-x,-y,-z')).
+
+	Returns
+	-------
+	symmetry_operations : list
+		These are the symmetry operations for the given symmetry operators (see SUMELF.get_symmetry_operations).
+	"""
+	return copy.deepcopy(get_cached_symmetry_operations(symmetry_operators)['symmetry_operations'])
+
+def get_stacked_symmetry_operations(symmetry_operators):
+	"""
+	This method will obtain the rotations and translations of the given symmetry operators, stacked into numpy arrays.
+
+	These arrays are made by this module, and are read-only, so the same arrays are given to every crystal with these symmetry operators.
+
+	Parameters
+	----------
+	symmetry_operators : list of str.
+		These are the symmetry operators of the crystal from the CSD (for example, ('x,y,z', '-x,-y,-z')).
+
+	Returns
+	-------
+	rotations : numpy.ndarray
+		These are the rotation matrices of the symmetry operators, with shape (n_ops, 3, 3).
+	translations : numpy.ndarray
+		These are the translations of the symmetry operators (in fractional coordinates), with shape (n_ops, 3).
+	"""
+	cached_symmetry_operations = get_cached_symmetry_operations(symmetry_operators)
+	return cached_symmetry_operations['rotations'], cached_symmetry_operations['translations']
+
+def get_cached_symmetry_operations(symmetry_operators):
+	"""
+	This method will obtain the cached symmetry operations for the given symmetry operators, adding them to the cache if they are not already in it.
+
+	Parameters
+	----------
+	symmetry_operators : list of str.
+		These are the symmetry operators of the crystal from the CSD.
+
+	Returns
+	-------
+	cached_symmetry_operations : dict.
+		This contains the symmetry operations given by SUMELF ('symmetry_operations'), and the stacked 'rotations' and 'translations' of the symmetry operators.
+	"""
+
+	# First, if these symmetry operators are in the cache, mark them as the most recently used and return them.
+	key = tuple(symmetry_operators)
+	if key in _symmetry_operations_cache:
+		_symmetry_operations_cache.move_to_end(key)
+		return _symmetry_operations_cache[key]
+
+	# Second, obtain the symmetry operations, and stack the rotations and translations of the symmetry operators.
+	rotations, translations = parse_sitesym(list(key))
+	rotations    = np.array(rotations,    dtype=float)
+	translations = np.array(translations, dtype=float)
+	rotations.flags.writeable    = False
+	translations.flags.writeable = False
+	cached_symmetry_operations = {'symmetry_operations': get_symmetry_operations(symmetry_operators), 'rotations': rotations, 'translations': translations}
+
+	# Third, add these to the cache, removing the least recently used symmetry operators if the cache is full.
+	_symmetry_operations_cache[key] = cached_symmetry_operations
+	while len(_symmetry_operations_cache) > max_symmetry_operations_cache_size:
+		_symmetry_operations_cache.popitem(last=False)
+
+	return cached_symmetry_operations
+
+def expand_scaled_positions(scaled_positions, rotations, translations):
+	"""
+	This method will apply every symmetry operator to every position at once.
+
+	Parameters
+	----------
+	scaled_positions : numpy.ndarray
+		These are the positions to apply the symmetry operators to (in fractional coordinates), with shape (n_atoms, 3).
+	rotations : numpy.ndarray
+		These are the rotation matrices of the symmetry operators, with shape (n_ops, 3, 3).
+	translations : numpy.ndarray
+		These are the translations of the symmetry operators (in fractional coordinates), with shape (n_ops, 3).
+
+	Returns
+	-------
+	symmetry_images : numpy.ndarray
+		These are the positions given by each symmetry operator (in fractional coordinates), with shape (n_ops, n_atoms, 3).
+		These are not wrapped into the unit cell.
+	"""
+	scaled_positions = np.asarray(scaled_positions, dtype=float).reshape(-1, 3)
+	return np.matmul(scaled_positions, rotations.transpose(0, 2, 1)) + translations[:, np.newaxis, :]
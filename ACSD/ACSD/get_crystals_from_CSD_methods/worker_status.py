@@ -0,0 +1,195 @@
+"""
+worker_status.py, Geoffrey Weal, 17/10/26
+
+These methods record what each process is doing in shared memory, so the main process can see which identifiers are being
+converted, which stage each one is in, and how long each one has taken so far, without the processes sending any messages.
+
+The main process creates the worker status board (using create_worker_status_board) before creating the pool, and gives it to
+each process using initialise_process. Each process claims one slot of the board, and records in it the identifier it is
+converting, when it started converting it, and the stage it is in (see stage_timings.time_stage).
+
+* Each slot is only written by the process that claimed it, so no locks are needed after a slot has been claimed.
+* The main process reads the slots without a lock, so a slot may be read while it is being written. This is fine, as
+  the board is only used to report progress.
+"""
+import os, time, ctypes
+import multiprocessing as mp
+
+# These are the largest number of characters recorded for an identifier and for a stage.
+max_identifier_length = 64
+max_stage_length      = 48
+
+class WorkerStatus(ctypes.Structure):
+	"""
+	This is one slot of the worker status board, which records what one process is doing.
+
+	pid : int
+		This is the id of the process that claimed this slot. 0 if this slot has not been claimed.
+	identifier : bytes
+		This is the identifier that the process is converting. Empty if the process is not converting an identifier.
+	started : float
+		This is when the process started converting the identifier (from time.time()).
+	stage : bytes
+		This is the stage of converting the identifier that the process is in (see stage_timings.pipeline_stages).
+	no_of_identifiers : int
+		This is the number of identifiers that the process has finished converting.
+	"""
+	_fields_ = [('pid', ctypes.c_int), ('identifier', ctypes.c_char * max_identifier_length), ('started', ctypes.c_double), ('stage', ctypes.c_char * max_stage_length), ('no_of_identifiers', ctypes.c_long)]
+
+def create_worker_status_board(no_of_slots, context=None):
+	"""
+	This method will create the worker status board, which is shared between the main process and the processes in the pool.
+
+	Parameters
+	----------
+	no_of_slots : int
+		This is the number of slots in the board. This should be larger than the number of processes, so that processes
+		that replace processes that have ended can also claim a slot.
+	context : multiprocessing.context.BaseContext or None
+		This is the multiprocessing context used to start the processes in the pool (see RecyclingPool.get_pool_context). If None, the default context is used. Default: None
+
+	Returns
+	-------
+	worker_status_board : multiprocessing.Array
+		This is the worker status board.
+	"""
+	return (mp if (context is None) else context).Array(WorkerStatus, no_of_slots)
+
+# This is the slot of the worker status board claimed by this process. None if this process has not been given a worker status board.
+worker_status = None
+
+def claim_worker_status_slot(worker_status_board):
+	"""
+	This method will claim a slot of the worker status board for this process.
+
+	A slot is free if it has not been claimed, or if the process that claimed it has ended.
+
+	Parameters
+	----------
+	worker_status_board : multiprocessing.Array or None
+		This is the worker status board. If None, no slot is claimed.
+	"""
+	global worker_status
+	worker_status = None
+	if worker_status_board is None:
+		return
+	with worker_status_board.get_lock():
+		for slot in worker_status_board.get_obj():
+			if (slot.pid == 0) or (not is_process_running(slot.pid)):
+				slot.pid               = os.getpid()
+				slot.identifier        = b''
+				slot.stage             = b''
+				slot.started           = 0.0
+				slot.no_of_identifiers = 0
+				worker_status          = slot
+				return
+
+def is_process_running(pid):
+	"""
+	This method will indicate if a process is running.
+
+	Parameters
+	----------
+	pid : int
+		This is the id of the process.
+
+	Returns
+	-------
+	is_process_running : bool.
+		True if the process is running.
+	"""
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		return True
+	return True
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def set_current_identifier(identifier):
+	"""
+	This method will record that this process has started converting an identifier.
+
+	Parameters
+	----------
+	identifier : str.
+		This is the identifier that this process has started converting.
+	"""
+	if worker_status is None:
+		return
+	worker_status.started    = time.time()
+	worker_status.stage      = b''
+	worker_status.identifier = identifier.encode()[:max_identifier_length]
+
+def set_current_stage(stage):
+	"""
+	This method will record the stage of converting an identifier that this process is in.
+
+	Parameters
+	----------
+	stage : str.
+		This is the stage that this process is in (see stage_timings.pipeline_stages).
+	"""
+	if worker_status is None:
+		return
+	worker_status.stage = stage.encode()[:max_stage_length]
+
+def clear_current_identifier():
+	"""
+	This method will record that this process has finished converting its identifier.
+	"""
+	if worker_status is None:
+		return
+	worker_status.identifier         = b''
+	worker_status.stage              = b''
+	worker_status.no_of_identifiers += 1
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def get_worker_statuses(worker_status_board):
+	"""
+	This method will give what each process is doing. This is used by the main process.
+
+	Parameters
+	----------
+	worker_status_board : multiprocessing.Array
+		This is the worker status board.
+
+	Returns
+	-------
+	worker_statuses : list of dict.
+		These give the id ("pid"), the identifier being converted ("identifier", None if the process is not converting an
+		identifier), the stage it is in ("stage"), how long it has been converted for ("elapsed", in seconds), and the number
+		of identifiers the process has finished converting ("no_of_identifiers") for each process that has claimed a slot.
+	"""
+	now = time.time()
+	worker_statuses = []
+	for slot in worker_status_board.get_obj():
+		if slot.pid == 0:
+			continue
+		identifier = slot.identifier.decode(errors='replace')
+		worker_statuses.append({'pid': slot.pid, 'identifier': (identifier if (identifier != '') else None), 'stage': (slot.stage.decode(errors='replace') or None), 'elapsed': ((now - slot.started) if (identifier != '') else None), 'no_of_identifiers': slot.no_of_identifiers})
+	return worker_statuses
+
+def get_worker_status(worker_status_board, pid):
+	"""
+	This method will give what one process is doing. This is used by the main process.
+
+	Parameters
+	----------
+	worker_status_board : multiprocessing.Array
+		This is the worker status board.
+	pid : int
+		This is the id of the process.
+
+	Returns
+	-------
+	process_status : dict. or None
+		This is what the process is doing (see get_worker_statuses). None if the process has not claimed a slot.
+	"""
+	for process_status in get_worker_statuses(worker_status_board):
+		if process_status['pid'] == pid:
+			return process_status
+	return None
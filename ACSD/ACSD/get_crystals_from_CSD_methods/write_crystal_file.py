@@ -0,0 +1,139 @@
+"""
+write_crystal_file.py, Geoffrey Weal, 17/10/26
+
+These methods are designed to write crystal files to disk so that a half-written crystal file is never left in the crystal database folder.
+"""
+import os
+from io      import StringIO
+from hashlib import sha256
+from ase.io  import write
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout import get_crystal_location
+
+# This is the suffix given to files while they are being written.
+temporary_suffix = '.tmp'
+
+def write_crystal_file(crystal, path_to_xyz_file):
+	"""
+	This method will write the crystal to an xyz file.
+
+	The crystal is written to a temporary file first, which is then renamed to path_to_xyz_file. This means that if the
+	ACSD program is killed, there is either a complete xyz file at path_to_xyz_file or no xyz file at all.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal to write to disk.
+	path_to_xyz_file : str.
+		This is the path to write the xyz file to.
+
+	Returns
+	-------
+	checksum : str.
+		This is the sha256 checksum of the xyz file.
+	"""
+	return write_xyz_data(get_xyz_data(crystal), path_to_xyz_file)
+
+def get_xyz_data(crystal):
+	"""
+	This method will obtain the contents of the xyz file for the crystal.
+
+	Parameters
+	----------
+	crystal : ase.Atoms
+		This is the crystal to write to disk.
+
+	Returns
+	-------
+	data : bytes
+		These are the contents of the xyz file for the crystal.
+	"""
+	xyz_file = StringIO()
+	write(xyz_file, crystal, format='extxyz')
+	return xyz_file.getvalue().encode()
+
+def write_xyz_data(data, path_to_xyz_file, path_to_temporary_file=None):
+	"""
+	This method will write the contents of an xyz file to disk, using a temporary file that is then renamed to path_to_xyz_file.
+
+	Parameters
+	----------
+	data : bytes
+		These are the contents of the xyz file.
+	path_to_xyz_file : str.
+		This is the path to write the xyz file to.
+	path_to_temporary_file : str. or None
+		This is the path to the temporary file. If None, this is path_to_xyz_file with temporary_suffix added to the end. Default: None
+
+	Returns
+	-------
+	checksum : str.
+		This is the sha256 checksum of the xyz file.
+	"""
+	write_file_atomically(path_to_xyz_file, data, path_to_temporary_file)
+	return sha256(data).hexdigest()
+
+def write_xyz_data_to_crystal_database(data, save_crystals_to, identifier, layout='flat'):
+	"""
+	This method will write the contents of the xyz file of a crystal to its location in the crystal database folder (see crystal_database_layout.py).
+
+	The temporary file is always written in the crystal database folder itself (rather than in the sub-folder of the crystal),
+	so remove_temporary_files only needs to look in one folder for temporary files left by a run that was killed.
+
+	Parameters
+	----------
+	data : bytes
+		These are the contents of the xyz file.
+	save_crystals_to : str.
+		This is the path to the crystal database folder.
+	identifier : str.
+		This is the identifier of the crystal.
+	layout : str.
+		This is the layout of the crystal database folder. This is either 'flat' or 'hashed'. Default: 'flat'
+
+	Returns
+	-------
+	checksum : str.
+		This is the sha256 checksum of the xyz file.
+	location : str.
+		This is the path to the xyz file, relative to the crystal database folder.
+	"""
+	location = get_crystal_location(identifier, layout)
+	if '/' in location:
+		os.makedirs(save_crystals_to+'/'+os.path.dirname(location), exist_ok=True)
+	checksum = write_xyz_data(data, save_crystals_to+'/'+location, save_crystals_to+'/'+identifier+'.xyz'+temporary_suffix)
+	return checksum, location
+
+def write_file_atomically(path_to_file, data, path_to_temporary_file=None):
+	"""
+	This method will write data to a temporary file, and then rename it to path_to_file.
+
+	Parameters
+	----------
+	path_to_file : str.
+		This is the path to write the file to.
+	data : bytes
+		This is the data to write to the file.
+	path_to_temporary_file : str. or None
+		This is the path to the temporary file. If None, this is path_to_file with temporary_suffix added to the end. Default: None
+	"""
+	if path_to_temporary_file is None:
+		path_to_temporary_file = path_to_file+temporary_suffix
+	with open(path_to_temporary_file, 'wb') as FILE:
+		FILE.write(data)
+		FILE.flush()
+		os.fsync(FILE.fileno())
+	os.replace(path_to_temporary_file, path_to_file)
+
+def remove_temporary_files(folder):
+	"""
+	This method will remove any temporary files left in the folder by a run that was killed while writing a file.
+
+	Parameters
+	----------
+	folder : str.
+		This is the folder to remove temporary files from.
+	"""
+	with os.scandir(folder) as entries:
+		for entry in entries:
+			if entry.name.endswith(temporary_suffix) and entry.is_file():
+				os.remove(entry.path)
@@ -0,0 +1,142 @@
+"""
+write_side_files.py, Geoffrey Weal, 17/10/26
+
+These methods will write the side files (like crystals_not_written.txt and crystal_quality_information.csv) from the results store,
+and read the side files of crystal database folders that were made before the results store was used.
+"""
+import os, csv
+from ACSD.ACSD.check_crystal_quality                            import save_flags_to_disk, flag_filename, smiles_filenameTXT
+from ACSD.ACSD.get_crystals_from_CSD_methods.estimate_cost      import processing_times_filename
+from ACSD.ACSD.get_crystals_from_CSD_methods.crystal_database_layout import get_written_crystal_locations, crystal_locations_filename
+
+# These are the names of the side files that list the identifiers that were not written, for each status.
+status_filenames = {'not_found': 'could_not_find_identifiers.txt', 'no_coordinates': 'no_coordinates_given.txt', 'rejected': 'rejected_crystals.txt', 'timeout': 'timed_out_crystals.txt', 'failed': 'failed_crystals.txt'}
+
+# This is the name of the side file that gives the reason each identifier was not written.
+crystals_not_written_filename = 'crystals_not_written.txt'
+
+def write_side_files(results_store, save_crystals_to):
+	"""
+	This method will write the side files from the results store.
+
+	Each side file is rewritten from scratch, so the side files always agree with the results store.
+
+	Parameters
+	----------
+	results_store : ResultsStore
+		This is the results store for the crystal database folder.
+	save_crystals_to : str.
+		This is the path to the crystal database folder.
+	"""
+
+	# First, write the identifiers that were not written for each status, and the reason why they were not written.
+	#        * crystals_not_written.txt is written as "identifier: reason", so that this file can be read by get_list_of_crystals_to_exclude.
+	not_written_results = results_store.get_results(status=tuple(status_filenames.keys()))
+	for status, filename in status_filenames.items():
+		write_lines(save_crystals_to+'/'+filename, [result['identifier'] for result in not_written_results if (result['status'] == status)])
+	write_lines(save_crystals_to+'/'+crystals_not_written_filename, [str(result['identifier'])+': '+str(result['reason']) for result in not_written_results])
+
+	# Second, write how long each identifier took to process.
+	write_lines(save_crystals_to+'/'+processing_times_filename, [str(result['identifier'])+'\t'+f"{result['processing_time']:.6f}" for result in results_store.get_results() if (result['processing_time'] is not None)])
+
+	# Third, write the crystal quality flags for the recorded crystals.
+	save_flags_to_disk(results_store.get_results(status='recorded'), save_crystals_to)
+
+	# Fourth, if xyz files are placed in hashed sub-folders, write the location of each crystal, so crystals can be found without looking through every sub-folder.
+	locations = results_store.get_crystal_locations() if (results_store.get_setting('layout') == 'hashed') else {}
+	write_lines(save_crystals_to+'/'+crystal_locations_filename, [str(identifier)+'\t'+str(location) for identifier, location in sorted(locations.items())])
+
+def write_lines(path_to_file, lines):
+	"""
+	This method will write lines to a file. If there are no lines, any existing file is removed rather than written.
+
+	Parameters
+	----------
+	path_to_file : str.
+		This is the path to the file.
+	lines : list of str.
+		These are the lines to write to the file.
+	"""
+	if len(lines) == 0:
+		if os.path.exists(path_to_file):
+			os.remove(path_to_file)
+		return
+	with open(path_to_file, 'w') as FILE:
+		FILE.write(''.join(str(line).rstrip()+'\n' for line in lines))
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def import_side_files(results_store, save_crystals_to):
+	"""
+	This method will record the results given in the side files of a crystal database folder that was made before the results store was used.
+
+	This means that the side files written from the results store still contain the information from these previous runs.
+
+	Parameters
+	----------
+	results_store : ResultsStore
+		This is the results store for the crystal database folder.
+	save_crystals_to : str.
+		This is the path to the crystal database folder.
+	"""
+
+	# First, obtain the reasons that identifiers were not written.
+	reasons = {}
+	for line in read_lines(save_crystals_to+'/'+crystals_not_written_filename):
+		identifier, _, reason = line.partition(': ')
+		reasons[identifier] = reason
+
+	# Second, obtain the identifiers that were not written for each status.
+	results = {}
+	for status, filename in status_filenames.items():
+		for identifier in read_lines(save_crystals_to+'/'+filename):
+			results[identifier] = {'identifier': identifier, 'status': status, 'reason': reasons.get(identifier, None)}
+
+	# Third, obtain the identifiers whose xyz files were written, and where they were written.
+	for identifier, location in get_written_crystal_locations(save_crystals_to).items():
+		results[identifier] = {'identifier': identifier, 'status': 'recorded', 'location': location}
+
+	# Fourth, obtain the crystal quality flags of the recorded crystals.
+	if os.path.exists(save_crystals_to+'/'+flag_filename):
+		with open(save_crystals_to+'/'+flag_filename, 'r') as flagCSV:
+			rows = csv.reader(flagCSV)
+			next(rows, None)
+			for row in rows:
+				if row[0] not in results:
+					continue
+				results[row[0]].update(zip(('has_disorder', 'different_to_user_with_H', 'different_to_user_without_H', 'is_charge_zero', 'is_mult_one'), [(value == 'True') for value in row[1:]]))
+				results[row[0]]['same_as_SMILES'] = True
+	for line in read_lines(save_crystals_to+'/'+smiles_filenameTXT):
+		identifier, _, SMILES_difference = line.partition('\t')
+		if identifier in results:
+			results[identifier].update({'same_as_SMILES': False, 'SMILES_difference': SMILES_difference})
+
+	# Fifth, obtain how long each identifier took to process.
+	for line in read_lines(save_crystals_to+'/'+processing_times_filename):
+		identifier, processing_time = line.split('\t')
+		if identifier in results:
+			results[identifier]['processing_time'] = float(processing_time)
+
+	# Sixth, record these results in the results store.
+	results_store.import_results(results.values())
+
+def read_lines(path_to_file):
+	"""
+	This method will read the lines of a file.
+
+	Parameters
+	----------
+	path_to_file : str.
+		This is the path to the file.
+
+	Returns
+	-------
+	lines : list of str.
+		These are the non-empty lines in the file. This is empty if the file does not exist.
+	"""
+	if not os.path.exists(path_to_file):
+		return []
+	with open(path_to_file, 'r') as FILE:
+		return [line.rstrip('\n') for line in FILE if line.strip()]
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
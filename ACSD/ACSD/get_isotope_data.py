@@ -4,12 +4,16 @@ get_isotope_data.py, Geoffrey Weal, 24/1/2024
 This method will provide isotope data to the ACSD from ASE
 """
 import os
-from ase.data.isotopes import download_isotope_data
+
+# This is the isotope data, which is only read the first time get_isotope_data is called.
+_isotopes = None
 
 def get_isotope_data():
 	"""
 	This method will provide isotope data to the ACSD from ASE.
 
+	The isotope data is only read (or downloaded) the first time this method is called, and is then reused.
+
 	Returns
 	-------
 	isotopes : dict.
@@ -17,22 +21,29 @@ def get_isotope_data():
 
 	"""
 
-	# First, make a folder to place this isotope data into.
+	global _isotopes
+
+	# First, if the isotope data has already been read, return it.
+	if _isotopes is not None:
+		return _isotopes
+
+	# Second, make a folder to place this isotope data into.
 	path_to_isotope_data  = os.path.dirname(__file__)+'/'+'isotope_data'
 	if not os.path.exists(path_to_isotope_data):
 		os.makedirs(path_to_isotope_data)
 
-	# Second, if the isotope_data.txt file down not exist, download the isotoe data.
+	# Third, if the isotope_data.txt file down not exist, download the isotoe data.
 	isotope_data_filename = 'isotope_data.txt'
 	if not os.path.exists(path_to_isotope_data+'/'+isotope_data_filename):
 		print('Getting isotope information from ASE')
+		from ase.data.isotopes import download_isotope_data
 		isotopes = download_isotope_data()
 		with open(path_to_isotope_data+'/'+isotope_data_filename, 'w') as isotopedataTXT:
 			isotopedataTXT.write(str(isotopes))
 
-	# Third, obtain the isotope data from isotope_data.txt
+	# Fourth, obtain the isotope data from isotope_data.txt
 	with open(path_to_isotope_data+'/'+isotope_data_filename, 'r') as isotopedataTXT:
-		isotopes = eval(isotopedataTXT.readline().rstrip())
+		_isotopes = eval(isotopedataTXT.readline().rstrip())
 
-	# Fourth, return isotopes dictionary.
-	return isotopes
\ No newline at end of file
+	# Fifth, return isotopes dictionary.
+	return _isotopes
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+query_results.py, Geoffrey Weal, 17/10/26
+
+This program will obtain the identifiers of the crystals in a crystal database folder that have a given status and crystal quality flags.
+"""
+import os
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore import ResultsStore, results_store_filename
+
+class CLICommand:
+	"""Query the results of the crystals processed by ACSD run.
+	"""
+
+	@staticmethod
+	def add_arguments(parser):
+		parser.add_argument('crystal_database',   nargs='?', help='This is the crystal database folder to query.', default='crystal_database')
+		parser.add_argument('--status',           nargs=1,   help='Only give identifiers with this status. This can be "recorded", "not_found", "no_coordinates", "rejected", "timeout" or "failed".', default=[None])
+		for flag_column in ResultsStore.flag_columns:
+			parser.add_argument('--'+flag_column, nargs=1,   help='Only give identifiers where '+flag_column+' is True or False.', default=[None])
+		parser.add_argument('--locations',        nargs=1,   help='Indicates if you want to give the location of the xyz file of each identifier (relative to the crystal database folder) after its identifier.', default=['False'])
+		parser.add_argument('--write_side_files', nargs=1,   help='Indicates if you want to write the side files (like crystals_not_written.txt and crystal_quality_information.csv) from the results store.', default=['False'])
+
+	@staticmethod
+	def run(arguments):
+
+		# First, obtain the status to filter identifiers by.
+		status = arguments.status
+		if len(status) != 1:
+			raise Exception('Error: status has more than one input')
+		status = status[0]
+		if (status is not None) and (status not in ResultsStore.statuses_to_record):
+			raise Exception('Error: status must be one of '+str(ResultsStore.statuses_to_record)+'. status = '+str(status))
+
+		# Second, obtain the crystal quality flags to filter identifiers by.
+		flags = {}
+		for flag_column in ResultsStore.flag_columns:
+			flag = getattr(arguments, flag_column)
+			if len(flag) != 1:
+				raise Exception('Error: '+str(flag_column)+' has more than one input')
+			if flag[0] is not None:
+				flags[flag_column] = get_bool(flag_column, flag[0])
+
+		# Third, determine if you want to write the side files from the results store.
+		write_side_files_to_disk = arguments.write_side_files
+		if len(write_side_files_to_disk) != 1:
+			raise Exception('Error: write_side_files has more than one input')
+		write_side_files_to_disk = get_bool('write_side_files', write_side_files_to_disk[0])
+
+		# 3.1: Determine if you want to give the location of the xyz file of each identifier.
+		show_locations = arguments.locations
+		if len(show_locations) != 1:
+			raise Exception('Error: locations has more than one input')
+		show_locations = get_bool('locations', show_locations[0])
+
+		# Fourth, query the results store.
+		query_results(arguments.crystal_database, status=status, write_side_files_to_disk=write_side_files_to_disk, show_locations=show_locations, **flags)
+
+def get_bool(name, value):
+	"""
+	This method will convert the input given by the user into a boolean.
+
+	Parameters
+	----------
+	name : str.
+		This is the name of the input.
+	value : str.
+		This is the input given by the user.
+
+	Returns
+	-------
+	value : bool.
+		This is the input as a boolean.
+	"""
+	if   value.lower() in ['t', 'true']:
+		return True
+	elif value.lower() in ['f', 'false']:
+		return False
+	to_string  = f'Error: your "{name}" input must be either True or False.\n'
+	to_string += f'Your "{name}" input: {value}\n'
+	to_string += 'Check this.'
+	raise Exception(to_string)
+
+def query_results(crystals_database_folder_name, status=None, write_side_files_to_disk=False, show_locations=False, **flags):
+	"""
+	This method will print the identifiers of the crystals in a crystal database folder that have a given status and crystal quality flags.
+
+	Parameters
+	----------
+	crystals_database_folder_name : str.
+		This is the crystal database folder to query.
+	status : str. or None
+		Only print identifiers with this status. If None, identifiers with any status are printed. Default: None
+	write_side_files_to_disk : bool.
+		If True, the side files (like crystals_not_written.txt and crystal_quality_information.csv) are written from the results store. Default: False
+	show_locations : bool.
+		If True, the location of the xyz file of each identifier (relative to the crystal database folder) is printed after its identifier. Default: False
+	flags : bool.
+		Only print identifiers with these crystal quality flags. These can be any of ResultsStore.flag_columns.
+	"""
+
+	# First, make sure the crystal database folder contains a results store.
+	path_to_results_store = crystals_database_folder_name+'/'+results_store_filename
+	if not os.path.exists(path_to_results_store):
+		raise Exception('Error: Could not find '+str(path_to_results_store)+'. Run "ACSD run" to create this crystal database folder.')
+
+	# Second, open the results store.
+	results_store = ResultsStore(path_to_results_store)
+	try:
+
+		# Third, write the side files from the results store if desired.
+		if write_side_files_to_disk:
+			from ACSD.ACSD.get_crystals_from_CSD_methods.write_side_files import write_side_files
+			write_side_files(results_store, crystals_database_folder_name)
+
+		# Fourth, print the identifiers that have this status and these crystal quality flags.
+		locations = results_store.get_crystal_locations() if show_locations else {}
+		for identifier in results_store.query(status, **flags):
+			print((identifier+'\t'+locations[identifier]) if (identifier in locations) else identifier)
+
+	finally:
+		results_store.close()
+
+# ------------------------------------------------------------------------------------------------------------
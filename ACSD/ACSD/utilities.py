@@ -32,22 +32,20 @@ def get_paths_to_identifiers(paths_to_identifiers=None):
 
 # ------------------------------------------------------------------------------------------------
 
-def get_list_of_identifiers(identifiers_filenames=None):
+def read_identifiers(identifiers_filenames):
 	"""
-	This method will extract all identifers from the file
+	This method will read the identifiers from the files one line at a time, so the files do not need to be read into memory.
 
 	Parameters
 	----------
 	identifiers_filenames : list of str.
-		These are the names of the files that contain identifier names. If None, read all .gcd files in the current folder. Default: None
+		These are the names of the files that contain identifier names.
 
-	Return
+	Yields
 	------
-	identifiers : list
-		This is a list of the identifiers to obtain crystal files for from the CSD.
+	identifier : str.
+		This is an identifier given in the files. Identifiers given more than once in the files are yielded more than once.
 	"""
-
-	identifiers = []
 	for identifiers_filename in identifiers_filenames:
 		with open(identifiers_filename,'r') as identifiers_FILE:
 			for line in identifiers_FILE:
@@ -56,14 +54,27 @@ def get_list_of_identifiers(identifiers_filenames=None):
 				if line.startswith('#'):
 					continue
 
-				# Second, get the identifier from the line
-				identifier = line.rstrip()
+				# Second, yield the identifier from the line
+				yield line.rstrip()
+
+def get_list_of_identifiers(identifiers_filenames=None):
+	"""
+	This method will extract all identifers from the file
+
+	Identifiers are recorded in a set as they are read, so checking if an identifier has already been recorded takes the same 
+	time however many identifiers have been read, and each identifier is only held in memory once.
 
-				# Third, record the identifier if it has not already been recorded
-				if identifier not in identifiers:
-					identifiers.append(identifier)
+	Parameters
+	----------
+	identifiers_filenames : list of str.
+		These are the names of the files that contain identifier names. If None, read all .gcd files in the current folder. Default: None
 
-	return sorted(set(identifiers))
+	Return
+	------
+	identifiers : list
+		This is a sorted list of the identifiers to obtain crystal files for from the CSD.
+	"""
+	return sorted(set(read_identifiers(identifiers_filenames)))
 
 # ------------------------------------------------------------------------------------------------
 
@@ -78,29 +89,15 @@ def get_list_of_crystals_to_exclude(crystals_to_exclude_filename=None):
 
 	Return
 	------
-	identifiers_to_exclude : list
-		This is a list of the identifiers that we do not want to obtain crystal files for. 
+	identifiers_to_exclude : set
+		This is a set of the identifiers that we do not want to obtain crystal files for. 
 	"""
 
 	if crystals_to_exclude_filename is None:
-		return []
-
-	identifiers_to_exclude = []
-	with open(crystals_to_exclude_filename,'r') as crystals_to_exclude_FILE:
-		for line in crystals_to_exclude_FILE:
-
-			# First, if line starts with #, do not read the line
-			if line.startswith('#'):
-				continue
-
-			# Second, get the identifier from the line
-			crystal_to_exclude = line.rstrip().split(':')[0]
-
-			# Third, record the identifier if it has not already been recorded
-			if crystal_to_exclude not in identifiers_to_exclude:
-				identifiers_to_exclude.append(crystal_to_exclude)
+		return set()
 
-	return sorted(set(identifiers_to_exclude))
+	# Get the identifier from each line. Lines can be given as "identifier: reason" (as in crystals_not_written.txt).
+	return set(identifier.split(':')[0] for identifier in read_identifiers([crystals_to_exclude_filename]))
 
 # ------------------------------------------------------------------------------------------------
 
@@ -58,12 +58,18 @@ if not ase_found:
 	toString += '================================================'+'\n'
 	raise ImportError(toString)	
 
-import ase
+# The version of ASE is obtained from its package metadata rather than by importing ase, as importing ase is slow.
+from importlib.metadata import version as get_installed_version, PackageNotFoundError
+try:
+	ase_version = get_installed_version('ase')
+except PackageNotFoundError:
+	import ase
+	ase_version = ase.__version__
 ase_version_minimum = '3.19.0'
 from packaging import version
 #from distutils.version import StrictVersion
 #if StrictVersion(ase.__version__) < StrictVersion(ase_version_minimum):
-if version.parse(ase.__version__) < version.parse(ase_version_minimum):
+if version.parse(ase_version) < version.parse(ase_version_minimum):
 	toString = ''
 	toString += '\n'
 	toString += '================================================'+'\n'
@@ -71,7 +77,7 @@ if version.parse(ase.__version__) < version.parse(ase_version_minimum):
 	toString += 'Version: '+str(__version__)+'\n'
 	toString += '\n'
 	toString += 'The Access Cambridge Structural Database program requires ASE greater than or equal to '+str(ase_version_minimum)+'.'+'\n'
-	toString += 'The current version of ASE you are using is '+str(ase.__version__)+'.'+'\n'
+	toString += 'The current version of ASE you are using is '+str(ase_version)+'.'+'\n'
 	toString += '\n'
 	toString += 'Install ASE through pip by following the instruction in https://github.com/GardenGroupUO/ACSD'+'\n'
 	toString += 'These instructions will ask you to install ase by typing the following into your terminal\n'
@@ -11,7 +11,8 @@ class CLIError(Exception):
 # Important: Following any change to command-line parameters, use
 # python3 -m ase.cli.completion to update autocompletion.
 commands = [
-    ('run', 'ACSD.ACSD.ACSD')
+    ('run', 'ACSD.ACSD.ACSD'),
+    ('query', 'ACSD.ACSD.query_results')
 ]
 
 def main(prog='ACSD', description='ACSD command line tool.',version=__version__, commands=commands, hook=None, args=None):
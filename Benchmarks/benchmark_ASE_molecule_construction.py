@@ -0,0 +1,130 @@
+"""
+benchmark_ASE_molecule_construction.py, Geoffrey Weal, 17/10/26
+
+This script will compare creating the ASE object of a molecule by appending one atom at a time (as was done previously)
+against creating it from arrays in one call (as is done by create_ASE_molecule_and_graph_from_CSD_molecule).
+
+This script also checks that the ASE objects made by create_ASE_molecule_and_graph_from_CSD_molecule are identical to those made by appending one atom at a time.
+
+Run this script by typing into the terminal:
+
+	python benchmark_ASE_molecule_construction.py
+"""
+import sys, time
+import numpy as np
+from ase                                                       import Atom, Atoms
+from synthetic_CSD_molecules                                   import make_synthetic_component
+from ACSD.ACSD.create_ASE_molecule_and_graph_from_CSD_molecule import create_ASE_molecule_and_graph_from_CSD_molecule, get_ASE_symbol
+
+# These are the number of carbon atoms in each synthetic component. Each component contains three times as many atoms.
+no_of_carbons_to_benchmark = (1000, 2000, 4000, 8000)
+
+# This is the number of times to repeat each timing. The fastest time is reported.
+no_of_repeats = 3
+
+def make_molecule_by_appending(CSD_atoms):
+	"""
+	This method will create the ASE object of a molecule by appending one atom at a time.
+
+	Parameters
+	----------
+	CSD_atoms : list of SyntheticAtom
+		These are the atoms in the molecule.
+
+	Returns
+	-------
+	ASE_molecule : ase.Atoms
+		This is the ASE object of the molecule.
+	"""
+	ASE_molecule = Atoms()
+	for atom in CSD_atoms:
+		if atom.coordinates is None:
+			continue
+		ASE_molecule.append(Atom(symbol=get_ASE_symbol(atom.atomic_symbol), position=atom.coordinates, charge=atom.formal_charge))
+	return ASE_molecule
+
+def make_molecule_from_arrays(CSD_atoms):
+	"""
+	This method will create the ASE object of a molecule from arrays of the elements, positions and charges of its atoms.
+
+	Parameters
+	----------
+	CSD_atoms : list of SyntheticAtom
+		These are the atoms in the molecule.
+
+	Returns
+	-------
+	ASE_molecule : ase.Atoms
+		This is the ASE object of the molecule.
+	"""
+	symbols   = []
+	positions = np.empty((len(CSD_atoms), 3))
+	charges   = np.empty(len(CSD_atoms))
+	for atom in CSD_atoms:
+		if atom.coordinates is None:
+			continue
+		positions[len(symbols)] = atom.coordinates
+		charges  [len(symbols)] = atom.formal_charge
+		symbols.append(get_ASE_symbol(atom.atomic_symbol))
+	return Atoms(symbols=symbols, positions=positions[:len(symbols)], charges=charges[:len(symbols)])
+
+def are_identical(atoms1, atoms2):
+	"""
+	This method will check that two ASE objects contain exactly the same arrays, cell and periodic boundary conditions.
+
+	Parameters
+	----------
+	atoms1 : ase.Atoms
+		This is the first ASE object.
+	atoms2 : ase.Atoms
+		This is the second ASE object.
+
+	Returns
+	-------
+	are_identical : bool.
+		True if the two ASE objects are identical.
+	"""
+	if sorted(atoms1.arrays.keys()) != sorted(atoms2.arrays.keys()):
+		return False
+	for name in atoms1.arrays.keys():
+		if (atoms1.arrays[name].dtype != atoms2.arrays[name].dtype) or (atoms1.arrays[name].tobytes() != atoms2.arrays[name].tobytes()):
+			return False
+	return (atoms1.cell.array.tobytes() == atoms2.cell.array.tobytes()) and (atoms1.pbc.tobytes() == atoms2.pbc.tobytes()) and (atoms1.info == atoms2.info)
+
+def get_fastest_time(method, CSD_atoms):
+	"""
+	This method will return the fastest time taken to run method on CSD_atoms.
+	"""
+	times = []
+	for _ in range(no_of_repeats):
+		start_time = time.perf_counter()
+		method(CSD_atoms)
+		times.append(time.perf_counter() - start_time)
+	return min(times)
+
+if __name__ == '__main__':
+
+	print(f"{'atoms':>8} {'append (s)':>12} {'arrays (s)':>12} {'speed up':>10} {'identical':>10}")
+	for no_of_carbons in no_of_carbons_to_benchmark:
+
+		# First, make the synthetic component, including some deuterium, tritium and charged atoms.
+		component = make_synthetic_component(no_of_carbons)
+		for index, atom in enumerate(component.atoms):
+			if   index % 7  == 2:
+				atom.atomic_symbol = 'D'
+			elif index % 11 == 1:
+				atom.atomic_symbol = 'T'
+			if   index % 13 == 0:
+				atom.formal_charge = 1
+			elif index % 17 == 0:
+				atom.formal_charge = -1
+
+		# Second, check that create_ASE_molecule_and_graph_from_CSD_molecule gives the same ASE object as appending one atom at a time.
+		ASE_molecules, _, _ = create_ASE_molecule_and_graph_from_CSD_molecule([component])
+		identical = are_identical(ASE_molecules[1], make_molecule_by_appending(component.atoms))
+
+		# Third, time both methods of creating the ASE object.
+		append_time = get_fastest_time(make_molecule_by_appending, component.atoms)
+		arrays_time = get_fastest_time(make_molecule_from_arrays,  component.atoms)
+		print(f'{len(component.atoms):>8} {append_time:>12.3f} {arrays_time:>12.3f} {append_time/arrays_time:>10.1f} {str(identical):>10}')
+		sys.stdout.flush()
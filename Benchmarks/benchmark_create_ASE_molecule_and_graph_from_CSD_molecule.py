@@ -0,0 +1,59 @@
+"""
+benchmark_create_ASE_molecule_and_graph_from_CSD_molecule.py, Geoffrey Weal, 17/10/26
+
+This script will time how long create_ASE_molecule_and_graph_from_CSD_molecule takes to convert synthetic components of increasing size.
+
+If the conversion scales linearly with the number of atoms, the time per atom should stay about the same as the components get larger.
+
+Run this script by typing into the terminal:
+
+	python benchmark_create_ASE_molecule_and_graph_from_CSD_molecule.py
+"""
+import sys, time, math
+from synthetic_CSD_molecules                                   import make_synthetic_component
+from ACSD.ACSD.create_ASE_molecule_and_graph_from_CSD_molecule import create_ASE_molecule_and_graph_from_CSD_molecule
+
+# These are the number of carbon atoms in each synthetic component. Each component contains three times as many atoms.
+no_of_carbons_to_benchmark = (1000, 2000, 4000, 8000)
+
+# This is the number of times to repeat each timing. The fastest time is reported.
+no_of_repeats = 3
+
+def benchmark(no_of_carbons):
+	"""
+	This method will time the conversion of a synthetic component.
+
+	Parameters
+	----------
+	no_of_carbons : int
+		This is the number of carbon atoms in the synthetic component.
+
+	Returns
+	-------
+	no_of_atoms : int
+		This is the number of atoms in the synthetic component.
+	time_taken : float
+		This is the fastest time taken (in seconds) to convert the synthetic component.
+	"""
+	component = make_synthetic_component(no_of_carbons)
+	times = []
+	for _ in range(no_of_repeats):
+		start_time = time.perf_counter()
+		create_ASE_molecule_and_graph_from_CSD_molecule([component])
+		times.append(time.perf_counter() - start_time)
+	return len(component.atoms), min(times)
+
+if __name__ == '__main__':
+
+	# First, time the conversion of each synthetic component.
+	results = []
+	print(f"{'atoms':>8} {'time (s)':>10} {'time per atom (us)':>20}")
+	for no_of_carbons in no_of_carbons_to_benchmark:
+		no_of_atoms, time_taken = benchmark(no_of_carbons)
+		results.append((no_of_atoms, time_taken))
+		print(f'{no_of_atoms:>8} {time_taken:>10.3f} {1e6 * time_taken / no_of_atoms:>20.2f}')
+		sys.stdout.flush()
+
+	# Second, estimate how the time taken scales with the number of atoms (1 is linear, 2 is quadratic).
+	(no_of_atoms_1, time_taken_1), (no_of_atoms_2, time_taken_2) = results[0], results[-1]
+	print(f'Scaling exponent: {math.log(time_taken_2 / time_taken_1) / math.log(no_of_atoms_2 / no_of_atoms_1):.2f}')
@@ -0,0 +1,86 @@
+"""
+benchmark_crystal_output_formats.py, Geoffrey Weal, 17/10/26
+
+This script will compare writing and reading crystals as extended xyz files (one file for each crystal) against
+writing and reading crystals as binary shards (see CrystalShards.py).
+
+This script also checks that both formats give the same crystals.
+
+Run this script by typing into the terminal:
+
+	python benchmark_crystal_output_formats.py
+"""
+import os, sys, time, tempfile
+import numpy as np
+import networkx as nx
+from ase import Atoms
+from ase.io import write, read
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalShards import get_crystal_arrays, CrystalShardWriter, CrystalShardReader
+
+# These are the number of crystals to benchmark.
+no_of_crystals_to_benchmark = (100, 1000, 5000)
+
+# This is the number of atoms in each crystal.
+no_of_atoms_in_crystal = 200
+
+# This is the number of crystals to write to each shard.
+crystals_per_shard = 1000
+
+def make_crystal(index):
+	"""
+	This method will make a random crystal, and a graph where each atom is bonded to the next atom.
+	"""
+	random_state = np.random.RandomState(index)
+	crystal = Atoms(numbers=random_state.choice([1, 6, 7, 8], no_of_atoms_in_crystal), positions=random_state.rand(no_of_atoms_in_crystal, 3)*20.0, cell=np.eye(3)*20.0, pbc=True)
+	crystal.set_initial_charges(random_state.rand(no_of_atoms_in_crystal))
+	crystal_graph = nx.path_graph(no_of_atoms_in_crystal)
+	return crystal, crystal_graph
+
+def get_folder_size(folder):
+	"""
+	This method will give the size of all the files in a folder (in MB).
+	"""
+	return sum(os.path.getsize(os.path.join(root, filename)) for root, dirs, filenames in os.walk(folder) for filename in filenames) / (1024.0 ** 2)
+
+if __name__ == '__main__':
+
+	print(f"{'crystals':>9} {'xyz write (s)':>14} {'npz write (s)':>14} {'xyz read (s)':>13} {'npz read (s)':>13} {'xyz (MB)':>9} {'npz (MB)':>9} {'identical':>10}")
+	for no_of_crystals in no_of_crystals_to_benchmark:
+		with tempfile.TemporaryDirectory() as folder:
+
+			# First, make the crystals.
+			crystals = {f'X{index:08d}': make_crystal(index) for index in range(no_of_crystals)}
+			os.makedirs(folder+'/xyz'); os.makedirs(folder+'/npz')
+
+			# Second, time writing the crystals as xyz files.
+			start_time = time.perf_counter()
+			for identifier, (crystal, crystal_graph) in crystals.items():
+				write(folder+'/xyz/'+identifier+'.xyz', crystal, format='extxyz')
+			xyz_write_time = time.perf_counter() - start_time
+
+			# Third, time writing the crystals to shards.
+			start_time = time.perf_counter()
+			shard_writer = CrystalShardWriter(folder+'/npz', crystals_per_shard)
+			for identifier, (crystal, crystal_graph) in crystals.items():
+				shard_writer.add(identifier, get_crystal_arrays(crystal, crystal_graph))
+				if shard_writer.is_full():
+					shard_writer.flush()
+			shard_writer.flush()
+			npz_write_time = time.perf_counter() - start_time
+
+			# Fourth, time reading the positions of every crystal from the xyz files.
+			start_time = time.perf_counter()
+			xyz_positions = {identifier: read(folder+'/xyz/'+identifier+'.xyz').get_positions() for identifier in crystals}
+			xyz_read_time = time.perf_counter() - start_time
+
+			# Fifth, time reading the positions of every crystal from the shards.
+			start_time = time.perf_counter()
+			shards = CrystalShardReader(folder+'/npz')
+			npz_positions = {identifier: np.array(shards[identifier]['positions']) for identifier in crystals}
+			npz_read_time = time.perf_counter() - start_time
+
+			# Sixth, check both formats give the same crystals.
+			identical = all(np.allclose(xyz_positions[identifier], npz_positions[identifier]) for identifier in crystals)
+
+			print(f'{no_of_crystals:>9} {xyz_write_time:>14.3f} {npz_write_time:>14.3f} {xyz_read_time:>13.3f} {npz_read_time:>13.3f} {get_folder_size(folder+"/xyz"):>9.1f} {get_folder_size(folder+"/npz"):>9.1f} {str(identical):>10}')
+			sys.stdout.flush()
@@ -0,0 +1,101 @@
+"""
+benchmark_identifier_ingestion.py, Geoffrey Weal, 17/10/26
+
+This script will compare reading identifiers from gcd files by checking each identifier against a list (as was done previously)
+against recording identifiers in a set (as is done by get_list_of_identifiers and get_list_of_crystals_to_exclude).
+
+This script also checks that both methods give the same identifiers.
+
+Run this script by typing into the terminal:
+
+	python benchmark_identifier_ingestion.py
+"""
+import os, sys, time, tempfile
+from ACSD.ACSD.utilities import get_list_of_identifiers, get_list_of_crystals_to_exclude
+
+# These are the number of lines in the gcd files to benchmark. One in every ten lines is a repeated identifier.
+no_of_lines_to_benchmark = (5000, 10000, 20000, 40000, 1000000)
+
+# Above this number of lines, only the set method is timed, as the list method takes too long.
+max_no_of_lines_for_list_method = 40000
+
+def get_list_of_identifiers_using_list(identifiers_filenames):
+	"""
+	This method will read identifiers from the gcd files, checking each identifier against a list (as was done previously).
+	"""
+	identifiers = []
+	for identifiers_filename in identifiers_filenames:
+		with open(identifiers_filename,'r') as identifiers_FILE:
+			for line in identifiers_FILE:
+				if line.startswith('#'):
+					continue
+				identifier = line.rstrip()
+				if identifier not in identifiers:
+					identifiers.append(identifier)
+	return sorted(set(identifiers))
+
+def exclude_identifiers_using_list(identifiers, identifiers_to_exclude):
+	"""
+	This method will mark the excluded identifiers with "#", removing each excluded identifier from a list (as was done previously).
+	"""
+	identifiers = sorted(set(identifiers))
+	identifiers_to_exclude = sorted(set(identifiers_to_exclude))
+	for index in range(len(identifiers)):
+		identifier = identifiers[index]
+		if identifier in identifiers_to_exclude:
+			identifiers[index] = '#'+identifiers[index]
+			identifiers_to_exclude.remove(identifier)
+	return identifiers
+
+def exclude_identifiers_using_set(identifiers, identifiers_to_exclude):
+	"""
+	This method will mark the excluded identifiers with "#", checking each identifier against a set (as is done by run_ACSD).
+	"""
+	return [('#'+identifier if (identifier in identifiers_to_exclude) else identifier) for identifier in identifiers]
+
+def write_gcd_file(path_to_file, no_of_lines):
+	"""
+	This method will write a gcd file with no_of_lines identifiers, where one in every ten lines is a repeated identifier.
+	"""
+	with open(path_to_file, 'w') as FILE:
+		for index in range(no_of_lines):
+			FILE.write(f'X{(index if (index % 10) else index // 2):08d}\n')
+
+def write_exclude_file(path_to_file, no_of_lines):
+	"""
+	This method will write a file of identifiers to exclude (given as "identifier: reason"), excluding one in every five identifiers.
+	"""
+	with open(path_to_file, 'w') as FILE:
+		for index in range(0, no_of_lines, 5):
+			FILE.write(f'X{index:08d}: Rejected\n')
+
+if __name__ == '__main__':
+
+	print(f"{'lines':>8} {'list (s)':>10} {'set (s)':>10} {'speed up':>10} {'identical':>10}")
+	with tempfile.TemporaryDirectory() as folder:
+		for no_of_lines in no_of_lines_to_benchmark:
+
+			# First, write the gcd file and the file of identifiers to exclude.
+			path_to_gcd_file     = folder+'/identifiers.gcd'
+			path_to_exclude_file = folder+'/crystals_not_written.txt'
+			write_gcd_file(path_to_gcd_file, no_of_lines)
+			write_exclude_file(path_to_exclude_file, no_of_lines)
+
+			# Second, time reading and excluding identifiers using sets.
+			start_time  = time.perf_counter()
+			identifiers = exclude_identifiers_using_set(get_list_of_identifiers([path_to_gcd_file]), get_list_of_crystals_to_exclude(path_to_exclude_file))
+			set_time    = time.perf_counter() - start_time
+
+			# Third, time reading and excluding identifiers using lists, and check both methods give the same identifiers.
+			if no_of_lines <= max_no_of_lines_for_list_method:
+				start_time = time.perf_counter()
+				identifiers_to_exclude = [line.split(':')[0] for line in open(path_to_exclude_file).read().split('\n') if line]
+				identifiers_using_list = exclude_identifiers_using_list(get_list_of_identifiers_using_list([path_to_gcd_file]), identifiers_to_exclude)
+				list_time  = time.perf_counter() - start_time
+				print(f'{no_of_lines:>8} {list_time:>10.3f} {set_time:>10.3f} {list_time/set_time:>10.1f} {str(identifiers == identifiers_using_list):>10}')
+			else:
+				print(f"{no_of_lines:>8} {'-':>10} {set_time:>10.3f} {'-':>10} {'-':>10}")
+			sys.stdout.flush()
+
+			os.remove(path_to_gcd_file)
+			os.remove(path_to_exclude_file)
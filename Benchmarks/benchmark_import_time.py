@@ -0,0 +1,77 @@
+"""
+benchmark_import_time.py, Geoffrey Weal, 17/10/26
+
+This script will time how long it takes to start the ACSD command line program, and check that starting it does not import
+the slow packages (like ase, networkx and SUMELF) that are only needed once crystals are being obtained from the CSD.
+
+Run this script by typing into the terminal:
+
+	python benchmark_import_time.py
+
+This script exits with an error if any of the slow packages are imported when the ACSD command line program starts.
+"""
+import sys, time, subprocess
+
+# These are the packages that should not be imported when the ACSD command line program starts.
+slow_packages = ('ase', 'networkx', 'SUMELF', 'ccdc', 'numpy', 'tqdm')
+
+# This is the number of times to repeat each timing. The fastest time is reported.
+no_of_repeats = 5
+
+# This is the code to run in a new python process to start the ACSD command line program, and report which slow packages were imported.
+startup_code = """
+import sys
+from ACSD.cli.main import main
+try:
+	main(args=['run', '--help'])
+except SystemExit:
+	pass
+print('IMPORTED:'+','.join(package for package in {slow_packages} if package in sys.modules))
+"""
+
+def time_startup():
+	"""
+	This method will time how long it takes to start the ACSD command line program in a new python process.
+
+	Returns
+	-------
+	time_taken : float
+		This is the time taken (in seconds) to start the ACSD command line program.
+	imported_slow_packages : list of str.
+		These are the slow packages that were imported when the ACSD command line program started.
+	"""
+	start_time = time.perf_counter()
+	output     = subprocess.run([sys.executable, '-c', startup_code.format(slow_packages=slow_packages)], capture_output=True, text=True, check=True).stdout
+	time_taken = time.perf_counter() - start_time
+	imported_slow_packages = [package for package in output.split('IMPORTED:')[-1].strip().split(',') if package]
+	return time_taken, imported_slow_packages
+
+def time_python_startup():
+	"""
+	This method will time how long it takes to start a new python process that does nothing, for comparison.
+
+	Returns
+	-------
+	time_taken : float
+		This is the time taken (in seconds) to start a new python process.
+	"""
+	start_time = time.perf_counter()
+	subprocess.run([sys.executable, '-c', 'pass'], check=True)
+	return time.perf_counter() - start_time
+
+if __name__ == '__main__':
+
+	# First, time how long it takes to start python, and to start the ACSD command line program.
+	python_time = min(time_python_startup() for _ in range(no_of_repeats))
+	results     = [time_startup() for _ in range(no_of_repeats)]
+	ACSD_time   = min(time_taken for time_taken, _ in results)
+	imported_slow_packages = results[-1][1]
+
+	# Second, print the results.
+	print(f'Python startup:            {python_time:.3f} s')
+	print(f'"ACSD run --help" startup: {ACSD_time:.3f} s ({ACSD_time - python_time:.3f} s more than python)')
+	print(f'Slow packages imported:    {imported_slow_packages if imported_slow_packages else "none"}')
+
+	# Third, exit with an error if any slow packages were imported.
+	if len(imported_slow_packages) > 0:
+		sys.exit('Error: The ACSD command line program imports '+str(imported_slow_packages)+' when it starts. Import these where they are used instead.')
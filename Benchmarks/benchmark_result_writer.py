@@ -0,0 +1,141 @@
+"""
+benchmark_result_writer.py, Geoffrey Weal, 17/10/26
+
+This script will compare writing each xyz file straight after its crystal has been converted (as was done previously)
+against giving each xyz file to the writer threads of a ResultWriter, so that converting crystals and writing xyz files overlap.
+
+A shared file system is imitated by waiting write_latency seconds before each xyz file is written, and converting a crystal
+is imitated by keeping the cpu busy for conversion_time seconds.
+
+This script also compares where the contents of each xyz file are made. Each process makes the contents of the xyz file and sends
+these (as bytes) to the main process. The alternative is to send the arrays of the crystal (as an ase.Atoms object) and make the
+contents of the xyz file in the main process. For each size of crystal, this gives the time taken to make the contents of the xyz
+file, and the size and time taken to pickle and unpickle the bytes and the ase.Atoms object.
+
+Run this script by typing into the terminal:
+
+	python benchmark_result_writer.py
+"""
+import sys, time, pickle, tempfile
+import numpy as np
+from ase                                                        import Atoms
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalResult      import CrystalResult
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultWriter       import ResultWriter
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file import write_xyz_data_to_crystal_database, get_xyz_data
+import ACSD.ACSD.get_crystals_from_CSD_methods.ResultWriter as ResultWriter_module
+
+# This is the number of crystals to write.
+no_of_crystals = 200
+
+# This is the time taken to convert each crystal (in seconds).
+conversion_time = 0.005
+
+# These are the times taken to start writing each xyz file (in seconds).
+write_latencies = (0.0, 0.005, 0.02)
+
+# These are the number of writer threads to benchmark.
+no_of_writer_threads_to_benchmark = (1, 4)
+
+# This is the contents of each xyz file.
+xyz_data = b'2\nLattice="10 0 0 0 10 0 0 0 10"\nC 0.0 0.0 0.0\nC 1.5 0.0 0.0\n'
+
+# These are the number of atoms in the crystals used to compare where the contents of each xyz file are made.
+no_of_atoms_to_benchmark = (50, 200, 1000)
+
+# This is the number of times each crystal is formatted and pickled.
+no_of_repeats = 200
+
+def convert_crystal():
+	"""
+	This method will keep the cpu busy for conversion_time seconds.
+	"""
+	end_time = time.perf_counter() + conversion_time
+	while time.perf_counter() < end_time:
+		pass
+
+def get_write_method(write_latency):
+	"""
+	This method will give a method that writes an xyz file after waiting write_latency seconds.
+	"""
+	def write_with_latency(*arguments, **keyword_arguments):
+		time.sleep(write_latency)
+		return write_xyz_data_to_crystal_database(*arguments, **keyword_arguments)
+	return write_with_latency
+
+def make_crystal(no_of_atoms):
+	"""
+	This method will make a crystal with random positions, and the per-atom arrays that the graph of a crystal adds to it (see SUMELF.add_graph_to_ASE_Atoms_object).
+	"""
+	random  = np.random.default_rng(0)
+	crystal = Atoms(numbers=random.integers(1, 9, no_of_atoms), positions=random.random((no_of_atoms, 3))*20.0, charges=np.zeros(no_of_atoms), cell=[20.0, 20.0, 20.0], pbc=True)
+	for name in ('E', 'hybridisation', 'bonds'):
+		crystal.set_array(name, np.array(['sp3']*no_of_atoms))
+	for name in ('is_H_donor', 'is_H_acceptor', 'is_spiro_atom', 'added_or_modified'):
+		crystal.set_array(name, np.zeros(no_of_atoms, dtype=bool))
+	crystal.set_array('involved_in_no_of_rings', np.zeros(no_of_atoms, dtype=int))
+	return crystal
+
+def get_average_time(method, *arguments):
+	"""
+	This method will give the average time taken to run method(*arguments) no_of_repeats times.
+	"""
+	start_time = time.perf_counter()
+	for _ in range(no_of_repeats):
+		method(*arguments)
+	return (time.perf_counter() - start_time) / no_of_repeats
+
+def pickle_round_trip(data):
+	"""
+	This method will pickle and unpickle data, as is done when a result is sent from a process to the main process.
+	"""
+	return pickle.loads(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+def benchmark_xyz_transfer():
+	"""
+	This method will compare sending the contents of each xyz file to the main process against sending the arrays of each crystal.
+	"""
+	print(f"{'atoms':>6} {'format (ms)':>12} {'xyz pickle (B)':>15} {'xyz pickle (ms)':>16} {'Atoms pickle (B)':>17} {'Atoms pickle (ms)':>18}")
+	for no_of_atoms in no_of_atoms_to_benchmark:
+		crystal  = make_crystal(no_of_atoms)
+		xyz_data = get_xyz_data(crystal)
+		format_time       = get_average_time(get_xyz_data, crystal)
+		xyz_pickle_time   = get_average_time(pickle_round_trip, xyz_data)
+		atoms_pickle_time = get_average_time(pickle_round_trip, crystal)
+		xyz_pickle_size   = len(pickle.dumps(xyz_data, protocol=pickle.HIGHEST_PROTOCOL))
+		atoms_pickle_size = len(pickle.dumps(crystal,  protocol=pickle.HIGHEST_PROTOCOL))
+		print(f'{no_of_atoms:>6} {format_time*1000.0:>12.3f} {xyz_pickle_size:>15} {xyz_pickle_time*1000.0:>16.3f} {atoms_pickle_size:>17} {atoms_pickle_time*1000.0:>18.3f}')
+		sys.stdout.flush()
+
+if __name__ == '__main__':
+
+	print(f"{'latency (s)':>12} {'synchronous (s)':>16} " + ' '.join(f"{str(no_of_threads)+' thread(s) (s)':>16}" for no_of_threads in no_of_writer_threads_to_benchmark))
+	for write_latency in write_latencies:
+		write_method = get_write_method(write_latency)
+		ResultWriter_module.write_xyz_data_to_crystal_database = write_method
+		with tempfile.TemporaryDirectory() as folder:
+
+			# First, time converting each crystal and then writing its xyz file.
+			start_time = time.perf_counter()
+			for index in range(no_of_crystals):
+				convert_crystal()
+				write_method(xyz_data, folder, f'X{index:08d}')
+			synchronous_time = time.perf_counter() - start_time
+
+			# Second, time converting each crystal and giving its xyz file to the writer threads.
+			writer_times = []
+			for no_of_threads in no_of_writer_threads_to_benchmark:
+				recorded = []
+				start_time = time.perf_counter()
+				result_writer = ResultWriter(recorded.append, folder, max_queue_size=100, no_of_threads=no_of_threads)
+				for index in range(no_of_crystals):
+					convert_crystal()
+					result_writer.put(CrystalResult(f'X{index:08d}', status='recorded', xyz_data=xyz_data))
+				result_writer.close()
+				writer_times.append(time.perf_counter() - start_time)
+				assert len(recorded) == no_of_crystals
+
+		print(f'{write_latency:>12.3f} {synchronous_time:>16.3f} ' + ' '.join(f'{writer_time:>16.3f}' for writer_time in writer_times))
+		sys.stdout.flush()
+
+	print()
+	benchmark_xyz_transfer()
@@ -0,0 +1,75 @@
+"""
+benchmark_symmetry_operations_cache.py, Geoffrey Weal, 17/10/26
+
+This script will compare obtaining the symmetry operations of each crystal by converting its symmetry operators every time (as was
+done previously) against giving each crystal a copy of the symmetry operations held in the cache (as is done by
+get_symmetry_operations_from_cache).
+
+The cache gives each crystal a deep copy of the symmetry operations, as these are given to SUMELF.make_crystal, which belongs to
+SUMELF and may change them. SUMELF.make_crystal still applies one symmetry operator at a time, so this script checks that the cache
+is still faster than converting the symmetry operators, even with this copy. Only the hydrogens added to a crystal are expanded by
+every symmetry operator at once (see expand_scaled_positions), so this is also timed against applying one symmetry operator at a time.
+
+Run this script by typing into the terminal:
+
+	python benchmark_symmetry_operations_cache.py
+"""
+import sys, time
+import numpy as np
+from SUMELF                    import get_symmetry_operations
+from ase.spacegroup            import Spacegroup
+from ACSD.ACSD.get_crystals_from_CSD_methods.symmetry_operations_cache import get_symmetry_operations_from_cache, get_stacked_symmetry_operations, expand_scaled_positions
+
+# These are the space groups to benchmark: P1, P-1, P2_1/c, C2/c, Pbca, R-3 and Fd-3m.
+space_groups_to_benchmark = (1, 2, 14, 15, 61, 148, 227)
+
+# This is the number of crystals to obtain the symmetry operations of for each space group.
+no_of_crystals = 2000
+
+# This is the number of atoms given to each symmetry operator when comparing expand_scaled_positions against applying one symmetry operator at a time.
+no_of_atoms = 50
+
+def get_symmetry_operators(space_group_number):
+	"""
+	This method will write the symmetry operators of a space group as strings, as given by the CSD (for example, '-x,1/2+y,1/2-z').
+	"""
+	symmetry_operators = []
+	for rotation, translation in Spacegroup(space_group_number).get_symop():
+		symmetry_operator = []
+		for row, shift in zip(rotation, translation):
+			term = ''.join(('+' if (value > 0) else '-')+axis for value, axis in zip(row, 'xyz') if (value != 0)).lstrip('+')
+			if round(shift*12) % 12 != 0:
+				term = f'{int(round(shift*12)) % 12}/12+'+term
+			symmetry_operator.append(term)
+		symmetry_operators.append(','.join(symmetry_operator))
+	return tuple(symmetry_operators)
+
+def time_method(method, no_of_repeats):
+	"""
+	This method will time how long it takes to run method no_of_repeats times.
+	"""
+	start_time = time.perf_counter()
+	for _ in range(no_of_repeats):
+		method()
+	return time.perf_counter() - start_time
+
+if __name__ == '__main__':
+
+	print(f'Times are for {no_of_crystals} crystals of each space group ({no_of_atoms} atoms expanded per crystal).')
+	print(f"{'space group':>12} {'n_ops':>6} {'convert (s)':>12} {'cache (s)':>10} {'speed up':>9} {'loop (s)':>9} {'expand (s)':>11} {'speed up':>9}")
+	for space_group_number in space_groups_to_benchmark:
+		symmetry_operators = get_symmetry_operators(space_group_number)
+
+		# First, time converting the symmetry operators for every crystal against giving every crystal a copy of the cached symmetry operations.
+		convert_time = time_method(lambda: get_symmetry_operations(symmetry_operators), no_of_crystals)
+		get_symmetry_operations_from_cache(symmetry_operators)
+		cache_time   = time_method(lambda: get_symmetry_operations_from_cache(symmetry_operators), no_of_crystals)
+
+		# Second, time applying one symmetry operator at a time to a set of atoms against applying every symmetry operator at once.
+		rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+		scaled_positions = np.random.default_rng(0).random((no_of_atoms, 3))
+		loop_time   = time_method(lambda: [np.dot(scaled_positions, rotation.T) + translation for rotation, translation in zip(rotations, translations)], no_of_crystals)
+		expand_time = time_method(lambda: expand_scaled_positions(scaled_positions, rotations, translations), no_of_crystals)
+
+		print(f'{space_group_number:>12} {len(symmetry_operators):>6} {convert_time:>12.3f} {cache_time:>10.3f} {convert_time/cache_time:>9.1f} {loop_time:>9.3f} {expand_time:>11.3f} {loop_time/expand_time:>9.1f}')
+		sys.stdout.flush()
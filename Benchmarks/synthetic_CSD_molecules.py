@@ -0,0 +1,71 @@
+"""
+synthetic_CSD_molecules.py, Geoffrey Weal, 17/10/26
+
+These classes mimic the atoms, bonds and components of molecules from the CSD Python API, so that the ACSD program can be benchmarked on very large molecules without needing access to the CSD.
+"""
+
+class SyntheticAtom:
+	"""
+	This class mimics a ccdc.molecule.Atom object.
+	"""
+	def __init__(self, index, atomic_symbol, coordinates, sybyl_type):
+		self.index         = index
+		self.atomic_symbol = atomic_symbol
+		self.coordinates   = coordinates
+		self.sybyl_type    = sybyl_type
+		self.formal_charge = 0
+		self.is_donor      = False
+		self.is_acceptor   = False
+		self.is_spiro      = False
+		self.is_metal      = False
+		self.rings         = []
+
+class SyntheticBond:
+	"""
+	This class mimics a ccdc.molecule.Bond object.
+	"""
+	def __init__(self, atom1, atom2):
+		self.atoms         = (atom1, atom2)
+		self.bond_type     = 'Single'
+		self.sybyl_type    = '1'
+		self.is_conjugated = False
+		self.is_cyclic     = False
+		self.rings         = []
+
+class SyntheticComponent:
+	"""
+	This class mimics a component of a ccdc.molecule.Molecule object.
+	"""
+	def __init__(self, atoms, bonds):
+		self.atoms = atoms
+		self.bonds = bonds
+
+def make_synthetic_component(no_of_carbons, no_coordinates_every=50):
+	"""
+	This method will make an alkane chain containing no_of_carbons carbon atoms, where every carbon is bonded to two hydrogens.
+
+	Parameters
+	----------
+	no_of_carbons : int
+		This is the number of carbon atoms in the chain. The component will contain 3 * no_of_carbons atoms.
+	no_coordinates_every : int
+		Every no_coordinates_every'th hydrogen is not given coordinates. Default: 50
+
+	Returns
+	-------
+	component : SyntheticComponent
+		This is the alkane chain.
+	"""
+	atoms = []; bonds = []
+	for carbon_index in range(no_of_carbons):
+		carbon = SyntheticAtom(len(atoms), 'C', (1.5 * carbon_index, 0.0, 0.0), 'C.3')
+		atoms.append(carbon)
+		if carbon_index > 0:
+			bonds.append(SyntheticBond(atoms[len(atoms) - 4], carbon))
+		for direction in (1.0, -1.0):
+			hydrogen_index = len(atoms)
+			coordinates    = None if (hydrogen_index % no_coordinates_every == 0) else (1.5 * carbon_index, direction, 0.0)
+			hydrogen       = SyntheticAtom(hydrogen_index, 'H', coordinates, 'H')
+			atoms.append(hydrogen)
+			bonds.append(SyntheticBond(carbon, hydrogen))
+	return SyntheticComponent(atoms, bonds)
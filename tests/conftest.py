@@ -0,0 +1,61 @@
+"""
+conftest.py, Geoffrey Weal, 17/10/26
+
+The ACSD program needs the CSD Python API (ccdc) and SUMELF. The CSD Python API needs a licence, so these can not be installed
+everywhere the tests are run (for example, in CI). If they are not installed, stand-in packages are given here, so that the ACSD
+program can be imported. The tests give their own fake readers, entries and molecules, so the stand-ins are never used to convert
+a crystal: any method obtained from a stand-in package raises an ImportError if it is called.
+
+The stand-in packages are written to a temporary folder that is added to sys.path and PYTHONPATH, so they can also be imported
+by the processes started by the tests (see RecyclingPool.get_pool_context), which do not run this file.
+"""
+import os, sys, shutil, tempfile
+from importlib.util import find_spec
+
+# These are the modules of ccdc and SUMELF that are imported by the ACSD program, given as {package: submodules}.
+stand_in_packages = {'ccdc': ('io', 'search'), 'SUMELF': ()}
+
+# This is the contents of each stand-in module.
+stand_in_module_contents = '''
+def __getattr__(attribute):
+	if attribute.startswith('__'):
+		raise AttributeError(attribute)
+	def stand_in_method(*args, **kwargs):
+		raise ImportError(__name__+' is not installed, so '+__name__+'.'+attribute+' can not be used in the tests')
+	return stand_in_method
+'''
+
+# This is the folder that the stand-in packages are written to. None if ccdc and SUMELF are both installed.
+path_to_stand_ins = None
+
+def write_stand_in_packages(packages):
+	"""
+	This method will write the stand-in packages to a temporary folder, and add this folder to sys.path and PYTHONPATH.
+
+	Parameters
+	----------
+	packages : dict.
+		These are the packages to write, given as {package: submodules}.
+
+	Returns
+	-------
+	path_to_stand_ins : str.
+		This is the path to the temporary folder.
+	"""
+	path_to_stand_ins = tempfile.mkdtemp(prefix='ACSD_stand_ins_')
+	for package, submodules in packages.items():
+		os.makedirs(os.path.join(path_to_stand_ins, package))
+		for module in ('__init__',) + tuple(submodules):
+			with open(os.path.join(path_to_stand_ins, package, module+'.py'), 'w') as FILE:
+				FILE.write(stand_in_module_contents)
+	sys.path.insert(0, path_to_stand_ins)
+	os.environ['PYTHONPATH'] = os.pathsep.join([path_to_stand_ins] + ([os.environ['PYTHONPATH']] if ('PYTHONPATH' in os.environ) else []))
+	return path_to_stand_ins
+
+missing_packages = {package: submodules for package, submodules in stand_in_packages.items() if (find_spec(package) is None)}
+if len(missing_packages) > 0:
+	path_to_stand_ins = write_stand_in_packages(missing_packages)
+
+def pytest_unconfigure(config):
+	if path_to_stand_ins is not None:
+		shutil.rmtree(path_to_stand_ins, ignore_errors=True)
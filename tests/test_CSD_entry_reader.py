@@ -0,0 +1,73 @@
+"""
+test_CSD_entry_reader.py, Geoffrey Weal, 17/10/26
+
+These tests check that each process in a pool opens exactly one CSD reader, and that the reader is closed when the process exits.
+"""
+import os
+import multiprocessing as mp
+from functools import partial
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader import initialise_CSD_reader, get_entry_from_CSD, read_CSD_reader_timings
+
+class CountingReader:
+	"""
+	This is a fake CSD reader that records when it is opened and closed.
+	"""
+	def __init__(self, path_to_events_file):
+		self.path_to_events_file = path_to_events_file
+		self.record('open')
+
+	def record(self, event):
+		with open(self.path_to_events_file, 'a') as eventsTXT:
+			eventsTXT.write(str(os.getpid())+'\t'+event+'\n')
+
+	def entry(self, identifier):
+		return identifier
+
+	def close(self):
+		self.record('close')
+
+def counting_reader_factory(path_to_events_file):
+	return CountingReader(path_to_events_file)
+
+def get_entry(identifier):
+	return (os.getpid(), get_entry_from_CSD(identifier))
+
+def read_events(path_to_events_file):
+	events = {}
+	with open(path_to_events_file, 'r') as eventsTXT:
+		for line in eventsTXT:
+			pid, event = line.rstrip().split('\t')
+			events.setdefault(int(pid), []).append(event)
+	return events
+
+def test_each_process_opens_and_closes_one_reader(tmp_path):
+	path_to_events_file  = str(tmp_path/'events.txt')
+	path_to_timings_file = str(tmp_path/'timings.txt')
+	identifiers = ['ID'+str(index) for index in range(40)]
+
+	# First, obtain entries with a small pool, where each process opens its reader in the initializer.
+	reader_factory = partial(counting_reader_factory, path_to_events_file)
+	pool = mp.get_context('fork').Pool(2, initializer=initialise_CSD_reader, initargs=(reader_factory, path_to_timings_file))
+	results = pool.map(get_entry, identifiers, chunksize=1)
+	pool.close()
+	pool.join()
+
+	# Second, check every entry was obtained.
+	assert [entry for pid, entry in results] == identifiers
+
+	# Third, check each process opened one reader, and that the finalizer closed it when the process exited.
+	events = read_events(path_to_events_file)
+	assert len(events) == 2
+	for pid, pid_events in events.items():
+		assert pid_events == ['open', 'close']
+
+	# Fourth, check the timings written when each reader was closed account for every lookup.
+	all_timings = read_CSD_reader_timings(path_to_timings_file)
+	assert sorted(timings['pid'] for timings in all_timings) == sorted(events.keys())
+	assert sum(timings['no_of_lookups'] for timings in all_timings) == len(identifiers)
+	lookups_per_process = {}
+	for pid, entry in results:
+		lookups_per_process[pid] = lookups_per_process.get(pid, 0) + 1
+	for timings in all_timings:
+		assert timings['no_of_lookups'] == lookups_per_process.get(timings['pid'], 0)
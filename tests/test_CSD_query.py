@@ -0,0 +1,180 @@
+"""
+test_CSD_query.py, Geoffrey Weal, 17/10/26
+
+These tests check that query files are read, that the settings of a query are given to the CCDC search, and that the identifiers
+that match a query are streamed from the search and merged with the identifiers given in gcd files.
+
+The CCDC search API is replaced by fake ccdc.search and ccdc.io modules, which search a few entries held in memory rather than
+the CSD. The fake search settings only pass the entries that meet the criteria given to them, so the identifiers found by
+CSDQueryBackend depend on the criteria set by CSDQueryBackend.apply_settings.
+"""
+import sys
+import pytest
+from types import ModuleType
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_query import CSDQueryBackend, read_query, get_identifiers_from_query, merge_identifiers
+
+class Entry:
+	def __init__(self, identifier, formula, substructures=(), is_organic=True, is_polymeric=False, has_metals=False, has_disorder=False, r_factor=3.0, has_3d_structure=True):
+		self.identifier       = identifier
+		self.formula          = formula
+		self.elements         = set(element.rstrip('0123456789') for element in formula.split())
+		self.substructures    = substructures
+		self.is_organic       = is_organic
+		self.is_polymeric     = is_polymeric
+		self.has_metals       = has_metals
+		self.has_disorder     = has_disorder
+		self.r_factor         = r_factor
+		self.has_3d_structure = has_3d_structure
+
+entries = [Entry('BENZEN', 'C6 H6'), Entry('ACETAC', 'C2 H4 O2', substructures=('C(=O)[OH]',)), Entry('DISORD', 'C2 H4 O2', substructures=('C(=O)[OH]',), has_disorder=True),
+           Entry('HIGHR', 'C2 H4 O2', substructures=('C(=O)[OH]',), r_factor=8.0), Entry('BROMO', 'C6 H5 Br1'), Entry('POLYMR', 'C2 H4', is_polymeric=True),
+           Entry('FERROC', 'C10 H10 Fe1', is_organic=False, has_metals=True), Entry('NOCOORD', 'C2 H4 O2', has_3d_structure=False)]
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# These are the fakes of the parts of the CCDC search API used by CSDQueryBackend.
+
+class FakeSettings:
+	"""
+	This is a fake of ccdc.search.Search.Settings. Only the entries that meet the criteria set on these settings pass test.
+	"""
+	def test(self, entry):
+		criteria = vars(self)
+		if criteria.get('has_3d_coordinates', False) and (not entry.has_3d_structure):
+			return False
+		if criteria.get('no_disorder', False) and entry.has_disorder:
+			return False
+		if criteria.get('only_organic', False) and (not entry.is_organic):
+			return False
+		if criteria.get('not_polymeric', False) and entry.is_polymeric:
+			return False
+		if criteria.get('no_metals', False) and entry.has_metals:
+			return False
+		if ('max_r_factor' in criteria) and (entry.r_factor > criteria['max_r_factor']):
+			return False
+		if ('must_have_elements' in criteria) and (not set(criteria['must_have_elements']).issubset(entry.elements)):
+			return False
+		if ('must_not_have_elements' in criteria) and (len(set(criteria['must_not_have_elements']) & entry.elements) > 0):
+			return False
+		return True
+
+class FakeSearch:
+	Settings = FakeSettings
+
+class FakeSMARTSSubstructure:
+	def __init__(self, SMARTS):
+		self.SMARTS = SMARTS
+
+class FakeHit:
+	def __init__(self, entry):
+		self.entry      = entry
+		self.identifier = entry.identifier
+
+class FakeSubstructureSearch:
+	"""
+	This is a fake of ccdc.search.SubstructureSearch, which gives a hit for each entry that contains the substructure and passes the settings of the search.
+	"""
+	def __init__(self):
+		self.settings      = FakeSettings()
+		self.substructures = []
+
+	def add_substructure(self, substructure):
+		self.substructures.append(substructure)
+
+	def search(self, max_hits_per_structure=None):
+		assert max_hits_per_structure == 1
+		for entry in read_entries():
+			if all((substructure.SMARTS in entry.substructures) for substructure in self.substructures) and self.settings.test(entry):
+				yield FakeHit(entry)
+
+def read_entries():
+	"""
+	This generator gives the entries above, recording how many entries have been read, so tests can check that identifiers are streamed.
+	"""
+	for entry in entries:
+		fake_CSD['no_of_entries_read'] += 1
+		yield entry
+
+def FakeEntryReader(database):
+	assert database == 'CSD'
+	return read_entries()
+
+# This records the number of entries read from the fake CSD.
+fake_CSD = {'no_of_entries_read': 0}
+
+@pytest.fixture(autouse=True)
+def fake_ccdc(monkeypatch):
+	"""
+	This fixture replaces the ccdc.search and ccdc.io modules with fakes, for every test in this file.
+	"""
+	ccdc_search = ModuleType('ccdc.search')
+	ccdc_search.Search, ccdc_search.SubstructureSearch, ccdc_search.SMARTSSubstructure = FakeSearch, FakeSubstructureSearch, FakeSMARTSSubstructure
+	ccdc_io = ModuleType('ccdc.io')
+	ccdc_io.EntryReader = FakeEntryReader
+	monkeypatch.setitem(sys.modules, 'ccdc.search', ccdc_search)
+	monkeypatch.setitem(sys.modules, 'ccdc.io', ccdc_io)
+	fake_CSD['no_of_entries_read'] = 0
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def write_query(tmp_path, text):
+	path_to_query = str(tmp_path/'test.query')
+	with open(path_to_query, 'w') as queryTXT:
+		queryTXT.write(text)
+	return path_to_query
+
+def test_query_file_is_read(tmp_path):
+	path_to_query = write_query(tmp_path, '# A comment\n\nSMARTS: C(=O)[OH]\nno_disorder: True\nmax_R_factor: 5.0\nmust_not_have_elements: Br I\nonly_organic: none\n')
+	query = read_query(path_to_query)
+	assert query['SMARTS'] == 'C(=O)[OH]'
+	assert query['no_disorder'] is True
+	assert query['max_R_factor'] == 5.0
+	assert query['must_not_have_elements'] == ['Br', 'I']
+	assert query['only_organic'] is None
+	assert query['has_3d_coordinates'] is True
+	assert query['formula'] is None
+
+@pytest.mark.parametrize('text', ['colour: blue\n', 'no_disorder: maybe\n', 'max_R_factor: low\n'])
+def test_invalid_query_files_give_an_error(tmp_path, text):
+	with pytest.raises(Exception, match='Error: '):
+		read_query(write_query(tmp_path, text))
+
+def test_settings_are_given_to_the_search(tmp_path):
+	query = read_query(write_query(tmp_path, 'no_disorder: True\nmax_R_factor: 5.0\nmust_have_elements: C H\nmust_not_have_elements: Br I\n'))
+	settings = FakeSettings()
+	CSDQueryBackend().apply_settings(settings, query)
+	assert vars(settings) == {'has_3d_coordinates': True, 'no_disorder': True, 'only_organic': True, 'not_polymeric': True, 'no_metals': True, 'max_r_factor': 5.0, 'must_have_elements': ['C', 'H'], 'must_not_have_elements': ['Br', 'I']}
+
+	# Criteria that are not given in the query are not given to the search.
+	settings = FakeSettings()
+	CSDQueryBackend().apply_settings(settings, read_query(write_query(tmp_path, 'only_organic: False\nhas_3d_coordinates: False\n')))
+	assert vars(settings) == {'has_3d_coordinates': False, 'no_disorder': False}
+
+def test_query_is_searched_and_merged(tmp_path):
+	path_to_query = write_query(tmp_path, 'no_disorder: True\nmax_R_factor: 5.0\nmust_not_have_elements: Br\n')
+
+	# First, the search is not started until the identifiers are read, and identifiers are given as they are found.
+	query_identifiers = get_identifiers_from_query(path_to_query)
+	assert fake_CSD['no_of_entries_read'] == 0
+	assert next(query_identifiers) == 'BENZEN'
+	assert fake_CSD['no_of_entries_read'] == 1
+
+	# Second, the identifiers that match the query are added to those given in gcd files, sorted and given once each.
+	#         * Entries that are disordered, have a high R-factor, contain Br, are polymeric, contain metals, are not organic or have no coordinates are not given.
+	identifiers, no_of_query_identifiers = merge_identifiers(['ACETAC', 'ZZZZZZ'], query_identifiers)
+	assert identifiers == ['ACETAC', 'ZZZZZZ']
+	assert no_of_query_identifiers == 1
+	identifiers, no_of_query_identifiers = merge_identifiers(['ACETAC', 'ZZZZZZ'], get_identifiers_from_query(path_to_query))
+	assert identifiers == ['ACETAC', 'BENZEN', 'ZZZZZZ']
+	assert no_of_query_identifiers == 2
+
+def test_query_by_formula(tmp_path):
+	path_to_query = write_query(tmp_path, 'formula: O2 C2 H4\n')
+	assert list(get_identifiers_from_query(path_to_query)) == ['ACETAC', 'DISORD', 'HIGHR']
+
+def test_query_by_substructure(tmp_path):
+	path_to_query = write_query(tmp_path, 'SMARTS: C(=O)[OH]\nmax_R_factor: 5.0\n')
+	query_identifiers = get_identifiers_from_query(path_to_query)
+	assert next(query_identifiers) == 'ACETAC'
+	assert fake_CSD['no_of_entries_read'] == 2
+	assert list(query_identifiers) == ['DISORD']
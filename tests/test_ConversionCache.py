@@ -0,0 +1,85 @@
+"""
+test_ConversionCache.py, Geoffrey Weal, 17/10/26
+
+These tests check that crystals are stored in the conversion cache without pickles, are only reused if the code that converted them has not changed,
+and are obtained from the cache without loading the molecule of the entry.
+"""
+import os
+import pytest
+import numpy as np
+
+from ACSD.ACSD.get_crystals_from_CSD_methods import ConversionCache as conversion_cache_module
+from ACSD.ACSD.get_crystals_from_CSD_methods import get_crystal_from_CSD_single_process as single_process_module
+from ACSD.ACSD.get_crystals_from_CSD_methods.ConversionCache import ConversionCache, get_code_hash
+
+class Entry:
+	has_3d_structure = True
+	formula          = ''
+
+	def to_string(self, file_format):
+		return 'data_AAA'
+
+	@property
+	def crystal(self):
+		raise AssertionError('The molecule of the entry was loaded')
+
+def get_cached_crystal():
+	crystal_arrays = {'numbers': np.array([6, 1], dtype=np.int16), 'positions': np.arange(6.0).reshape(2, 3), 'pbc': np.array([True, True, False]), 'bond_indptr': np.array([0, 1, 2]), 'bond_indices': np.array([1, 0], dtype=np.int32)}
+	flags = {'has_disorder': False, 'different_to_user_with_H': False, 'different_to_user_without_H': False, 'is_charge_zero': True, 'is_mult_one': True, 'same_as_SMILES': False, 'SMILES_difference': "([Counter({('C', 1, 0.0, 3): 2})], [])"}
+	log_lines = [(1.5, 20, 'AAA', 123, 'make_crystal', 0.25, 'Made crystal')]
+	return {'xyz_data': b'2\nLattice="5 0 0"\nC 0 0 0\nH 0 0 1\n', 'crystal_arrays': crystal_arrays, 'flags': flags, 'log_lines': log_lines}
+
+def test_crystals_are_stored_without_pickles(tmp_path, monkeypatch):
+	monkeypatch.setattr(conversion_cache_module, 'get_versions', lambda: ('2', 'CSD', '0.18', 'code', '1.0', 'code'))
+	conversion_cache = ConversionCache(str(tmp_path))
+	key = conversion_cache.get_key('AAA', Entry())
+	cached_crystal = get_cached_crystal()
+	conversion_cache.save(key, cached_crystal)
+
+	# First, the crystal is loaded as it was saved.
+	loaded_crystal = conversion_cache.load(key)
+	assert loaded_crystal['xyz_data']  == cached_crystal['xyz_data']
+	assert loaded_crystal['flags']     == cached_crystal['flags']
+	assert loaded_crystal['log_lines'] == cached_crystal['log_lines']
+	for name, array in cached_crystal['crystal_arrays'].items():
+		assert loaded_crystal['crystal_arrays'][name].dtype == array.dtype
+		assert np.array_equal(loaded_crystal['crystal_arrays'][name], array)
+
+	# Second, a file containing a pickle is not loaded (and so can not run code), and is removed from the cache.
+	path_to_file = conversion_cache.get_path(key)
+	with open(path_to_file, 'wb') as FILE:
+		np.savez(FILE, information=np.array([{'flags': None}], dtype=object))
+	assert conversion_cache.load(key) is None
+	assert not os.path.exists(path_to_file)
+
+def test_key_changes_with_the_code(tmp_path, monkeypatch):
+	monkeypatch.setattr(conversion_cache_module, 'get_versions', lambda: ('2', 'CSD', '0.18', 'code', '1.0', 'code'))
+	key_before = ConversionCache(str(tmp_path)).get_key('AAA', Entry())
+	monkeypatch.setattr(conversion_cache_module, 'get_versions', lambda: ('2', 'CSD', '0.18', 'changed code', '1.0', 'code'))
+	key_after  = ConversionCache(str(tmp_path)).get_key('AAA', Entry())
+	assert key_before != key_after
+
+def test_code_hash(tmp_path):
+	(tmp_path/'module.py').write_text('x = 1\n')
+	code_hash = get_code_hash(str(tmp_path))
+	(tmp_path/'notes.txt').write_text('not code\n')
+	assert get_code_hash(str(tmp_path)) == code_hash
+	(tmp_path/'module.py').write_text('x = 2\n')
+	assert get_code_hash(str(tmp_path)) != code_hash
+
+@pytest.mark.parametrize('elements_to_reject, status', [((), 'recorded'), (('Cl',), 'recorded'), (('C',), 'rejected')])
+def test_cached_crystals_are_obtained_without_loading_the_molecule(tmp_path, monkeypatch, elements_to_reject, status):
+	monkeypatch.setattr(conversion_cache_module, 'get_versions', lambda: ('2', 'CSD', '0.18', 'code', '1.0', 'code'))
+	monkeypatch.setattr(single_process_module, 'get_entry_from_CSD', lambda identifier: Entry())
+	path_to_cache = str(tmp_path/'cache')
+	conversion_cache = ConversionCache(path_to_cache)
+	conversion_cache.save(conversion_cache.get_key('AAA', Entry()), get_cached_crystal())
+
+	# The elements of the cached crystal are still checked against the elements to reject, which can change between runs.
+	result = single_process_module.get_crystal_from_CSD_single_process(('AAA', str(tmp_path), path_to_cache, elements_to_reject, 'xyz', (), 'DEBUG'))
+	assert result.status == status
+	assert result.from_cache == (status == 'recorded')
+	if status == 'recorded':
+		assert result.xyz_data == get_cached_crystal()['xyz_data']
+	else:
+		assert result.rejected_by == 'molecule'
@@ -0,0 +1,94 @@
+"""
+test_CrystalShards.py, Geoffrey Weal, 17/10/26
+
+These tests check that crystals written to shards by CrystalShardWriter are read back the same by CrystalShardReader, including their bond graphs.
+"""
+import os
+import numpy as np
+from ase      import Atoms
+from networkx import Graph
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalShards import get_crystal_arrays, CrystalShardWriter, CrystalShardReader, shards_foldername
+
+def make_crystal(no_of_atoms, bonds, seed):
+	"""
+	This method will make a crystal with random positions and charges, and a graph containing the given bonds.
+	"""
+	random  = np.random.default_rng(seed)
+	crystal = Atoms(numbers=random.integers(1, 10, no_of_atoms), positions=random.random((no_of_atoms, 3))*10.0, charges=random.random(no_of_atoms), cell=[10.0, 11.0, 12.0, 90.0, 95.0, 90.0], pbc=[True, True, seed%2 == 0])
+	crystal_graph = Graph()
+	crystal_graph.add_nodes_from(range(no_of_atoms))
+	crystal_graph.add_edges_from(bonds)
+	return crystal, crystal_graph
+
+def get_bonds(crystal_arrays):
+	"""
+	This method will give the bonds of a crystal from its CSR bond arrays.
+	"""
+	bond_indptr, bond_indices = crystal_arrays['bond_indptr'], crystal_arrays['bond_indices']
+	return {frozenset((int(atom_index), int(neighbour))) for atom_index in range(len(bond_indptr)-1) for neighbour in bond_indices[bond_indptr[atom_index]:bond_indptr[atom_index+1]]}
+
+# These are the crystals to write, given as (number of atoms, bonds).
+#   * The third crystal has no bonds, and the fourth crystal has an atom with no bonds.
+crystals_to_write = {
+	'AAAAAA': (4, [(0, 1), (1, 2), (2, 3)]),
+	'BBBBBB': (6, [(0, 5), (1, 4), (2, 3), (0, 2)]),
+	'CCCCCC': (2, []),
+	'DDDDDD': (5, [(0, 1), (3, 4)]),
+	'EEEEEE': (3, [(0, 1), (0, 2), (1, 2)]),
+}
+
+def test_shard_round_trip(tmp_path):
+	save_crystals_to = str(tmp_path)
+
+	# First, write the crystals to shards of two crystals each.
+	crystals = {identifier: make_crystal(no_of_atoms, bonds, seed) for seed, (identifier, (no_of_atoms, bonds)) in enumerate(crystals_to_write.items())}
+	writer   = CrystalShardWriter(save_crystals_to, crystals_per_shard=2)
+	for identifier, (crystal, crystal_graph) in crystals.items():
+		writer.add(identifier, get_crystal_arrays(crystal, crystal_graph))
+		if writer.is_full():
+			writer.flush()
+	writer.flush()
+	assert sorted(os.listdir(save_crystals_to+'/'+shards_foldername)) == ['shard_00000', 'shard_00001', 'shard_00002']
+
+	# Second, check every crystal is read back the same, including its bonds.
+	reader = CrystalShardReader(save_crystals_to)
+	assert len(reader) == len(crystals_to_write)
+	assert sorted(reader) == sorted(crystals_to_write)
+	for identifier, (crystal, crystal_graph) in crystals.items():
+		crystal_arrays = reader[identifier]
+		assert np.array_equal(crystal_arrays['numbers'],   crystal.numbers)
+		assert np.array_equal(crystal_arrays['positions'], crystal.positions)
+		assert np.array_equal(crystal_arrays['charges'],   crystal.get_initial_charges())
+		assert np.array_equal(crystal_arrays['cell'],      crystal.cell.array)
+		assert np.array_equal(crystal_arrays['pbc'],       crystal.pbc)
+		assert crystal_arrays['bond_indptr'][0] == 0
+		assert len(crystal_arrays['bond_indptr']) == len(crystal)+1
+		assert get_bonds(crystal_arrays) == {frozenset(bond) for bond in crystal_graph.edges}
+
+		atoms = reader.get_atoms(identifier)
+		assert np.array_equal(atoms.numbers, crystal.numbers)
+		assert np.array_equal(atoms.positions, crystal.positions)
+
+def test_latest_shard_is_read_and_temporary_shards_are_removed(tmp_path):
+	save_crystals_to = str(tmp_path)
+
+	# First, write a crystal in one run, and leave a half-written shard behind.
+	first_crystal, first_crystal_graph = make_crystal(3, [(0, 1)], seed=0)
+	writer = CrystalShardWriter(save_crystals_to)
+	writer.add('AAAAAA', get_crystal_arrays(first_crystal, first_crystal_graph))
+	writer.flush()
+	os.makedirs(save_crystals_to+'/'+shards_foldername+'/shard_00001.tmp')
+
+	# Second, write the same crystal again in a later run.
+	second_crystal, second_crystal_graph = make_crystal(4, [(0, 3), (1, 2)], seed=1)
+	writer = CrystalShardWriter(save_crystals_to)
+	assert not os.path.exists(save_crystals_to+'/'+shards_foldername+'/shard_00001.tmp')
+	writer.add('AAAAAA', get_crystal_arrays(second_crystal, second_crystal_graph))
+	writer.flush()
+
+	# Third, the crystal from the later run is read.
+	reader = CrystalShardReader(save_crystals_to)
+	assert len(reader) == 1
+	assert np.array_equal(reader['AAAAAA']['positions'], second_crystal.positions)
+	assert get_bonds(reader['AAAAAA']) == {frozenset((0, 3)), frozenset((1, 2))}
@@ -0,0 +1,72 @@
+"""
+test_CustomParallelLogger.py, Geoffrey Weal, 17/10/26
+
+These tests check that the log sink writes every event to the log file, and that it rotates the log file once it becomes too large.
+"""
+import os, gzip, json, logging
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.CustomParallelLogger import CustomParallelLogger, LogSink
+
+def make_event(index):
+	return (1700000000.0 + index, logging.INFO, 'ID'+str(index), 1234, 'make_crystal', 0.5, 'Message '+str(index))
+
+def read_log_lines(path_to_log_file, no_of_log_backups):
+	"""
+	This method will give the lines of the compressed log files (oldest first) and then of the log file.
+	"""
+	lines = []
+	for index in range(no_of_log_backups, 0, -1):
+		path_to_backup = path_to_log_file+'.'+str(index)+'.gz'
+		if os.path.exists(path_to_backup):
+			with gzip.open(path_to_backup, 'rt') as BACKUPFILE:
+				lines += BACKUPFILE.read().splitlines()
+	with open(path_to_log_file, 'r') as LOGFILE:
+		lines += LOGFILE.read().splitlines()
+	return lines
+
+def test_log_sink_rotates_log_file(tmp_path):
+	path_to_log_file = str(tmp_path/'ACSD_logfile.jsonl')
+
+	# First, leave a compressed log file from an earlier run, which is removed when a new log file is started.
+	with gzip.open(path_to_log_file+'.4.gz', 'wt') as BACKUPFILE:
+		BACKUPFILE.write('old\n')
+
+	# Second, write many events, one at a time, to a log file that is rotated every 1000 bytes.
+	log_sink = LogSink(path_to_log_file, 'w', log_format='json', max_log_size=1000, no_of_log_backups=2, flush_interval=60.0)
+	events = [make_event(index) for index in range(100)]
+	for event in events:
+		log_sink.put([event])
+	log_sink.close()
+
+	# Third, only two compressed log files are kept, and no temporary files are left.
+	assert sorted(os.listdir(tmp_path)) == ['ACSD_logfile.jsonl', 'ACSD_logfile.jsonl.1.gz', 'ACSD_logfile.jsonl.2.gz']
+	for index in (1, 2):
+		with gzip.open(path_to_log_file+'.'+str(index)+'.gz', 'rb') as BACKUPFILE:
+			assert len(BACKUPFILE.read()) >= 1000
+	assert os.path.getsize(path_to_log_file) < 1000
+
+	# Fourth, the kept log files contain the latest events, in order, with none missing.
+	lines = read_log_lines(path_to_log_file, 2)
+	messages = [json.loads(line)['message'] for line in lines]
+	assert messages == ['Message '+str(index) for index in range(100-len(messages), 100)]
+	last_event = json.loads(lines[-1])
+	del last_event['time']
+	assert last_event == {'level': 'INFO', 'identifier': 'ID99', 'pid': 1234, 'stage': 'make_crystal', 'duration': 0.5, 'message': 'Message 99'}
+
+def test_log_sink_without_rotation(tmp_path):
+	path_to_log_file = str(tmp_path/'ACSD_logfile.log')
+	log_sink = LogSink(path_to_log_file, 'w', log_format='text', flush_interval=60.0)
+	log_sink.put([make_event(index) for index in range(100)])
+	log_sink.close()
+	assert os.listdir(tmp_path) == ['ACSD_logfile.log']
+	lines = read_log_lines(path_to_log_file, 0)
+	assert len(lines) == 100
+	assert lines[-1].endswith(' - ID99 (pid 1234) - Message 99')
+
+def test_logger_only_records_events_at_its_level(tmp_path):
+	logger = CustomParallelLogger(identifier='ABALIZ', level='INFO')
+	logger.debug('Processing: ABALIZ')
+	logger.info('Obtained ABALIZ', stage='entry_lookup', duration=0.1)
+	logger.add_events([(1700000000.0, logging.DEBUG, 'ABALIZ', 1, None, None, 'debug'), (1700000000.0, logging.WARNING, 'ABALIZ', 1, None, None, 'warning')])
+	assert [event[-1] for event in logger.temp_information] == ['Obtained ABALIZ', 'warning']
+	assert logger.temp_information[0][2:6] == ('ABALIZ', os.getpid(), 'entry_lookup', 0.1)
@@ -0,0 +1,82 @@
+"""
+test_RecyclingPool.py, Geoffrey Weal, 17/10/26
+
+These tests check that the RecyclingPool gives the result of every input, in order or as soon as each is finished, and that
+a process that takes longer than the timeout or ends unexpectedly is replaced, with the result of its input given by
+on_timeout or on_failure, while the other inputs are still processed.
+"""
+import os, time, signal
+import pytest
+from ACSD.ACSD.get_crystals_from_CSD_methods.RecyclingPool import RecyclingPool
+
+# These methods are given to the processes of the pool. They are defined at the top of this file, so they can be pickled.
+
+def square(value):
+	# Inputs that are multiples of 3 take longer, so results are not finished in the order they were given.
+	time.sleep(0.05 if (value % 3 == 0) else 0.0)
+	return value * value
+
+def square_or_sleep(value):
+	if value < 0:
+		time.sleep(60)
+	return value * value
+
+def square_or_crash(value):
+	if value < 0:
+		os.kill(os.getpid(), signal.SIGKILL)
+	return value * value
+
+def on_timeout(input_data, elapsed_time, pid):
+	return ('timeout', input_data)
+
+def on_failure(input_data, elapsed_time, pid, exitcode):
+	return ('failed', input_data, exitcode)
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def run_pool(func, inputs, ordered, chunksize=1, timeout=None):
+	pool = RecyclingPool(2, timeout=timeout)
+	try:
+		pool_imap = pool.imap if ordered else pool.imap_unordered
+		results = list(pool_imap(func, inputs, chunksize=chunksize, on_timeout=on_timeout, on_failure=on_failure))
+		pool.close()
+		pool.join()
+	except BaseException:
+		pool.terminate()
+		raise
+	return results, pool
+
+@pytest.mark.parametrize('chunksize', [1, 4])
+def test_imap_gives_results_in_order(chunksize):
+	results, pool = run_pool(square, range(20), ordered=True, chunksize=chunksize)
+	assert results == [value * value for value in range(20)]
+	assert pool.no_of_processes_replaced == 0
+
+@pytest.mark.parametrize('chunksize', [1, 4])
+def test_imap_unordered_gives_every_result(chunksize):
+	results, pool = run_pool(square, range(20), ordered=False, chunksize=chunksize)
+	assert sorted(results) == [value * value for value in range(20)]
+	assert pool.no_of_processes_replaced == 0
+
+def test_process_that_takes_too_long_is_replaced():
+	# The inputs given to the process with the input that took too long (in the same chunk) are given to the other processes.
+	results, pool = run_pool(square_or_sleep, [1, 2, -3, 4, 5, 6], ordered=True, chunksize=3, timeout=1.0)
+	assert results == [1, 4, ('timeout', -3), 16, 25, 36]
+	assert (pool.no_of_processes_timed_out, pool.no_of_processes_ended, pool.no_of_processes_replaced) == (1, 0, 1)
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_process_that_ends_unexpectedly_is_replaced(ordered):
+	# The inputs given to the process with the input that crashed it (in the same chunk) are given to the other processes.
+	inputs = [1, -2, 3, 4, 5, -6, 7, 8]
+	results, pool = run_pool(square_or_crash, inputs, ordered=ordered, chunksize=2)
+	expected_results = [('failed', value, -signal.SIGKILL) if (value < 0) else value * value for value in inputs]
+	assert (results if ordered else sorted(results, key=str)) == (expected_results if ordered else sorted(expected_results, key=str))
+	assert (pool.no_of_processes_timed_out, pool.no_of_processes_ended, pool.no_of_processes_replaced) == (0, 2, 2)
+
+def test_process_that_ends_unexpectedly_raises_without_on_failure():
+	pool = RecyclingPool(1)
+	try:
+		with pytest.raises(Exception, match='ended unexpectedly'):
+			list(pool.imap(square_or_crash, [1, -2, 3]))
+	finally:
+		pool.terminate()
@@ -0,0 +1,110 @@
+"""
+test_ResultsStore.py, Geoffrey Weal, 17/10/26
+
+These tests check that results are recorded in the results store and read back after it is reopened, and that a run
+is resumed from the identifiers recorded in the results store.
+"""
+from ACSD.ACSD.get_crystals_from_CSD_methods.ResultsStore       import ResultsStore
+from ACSD.ACSD.get_crystals_from_CSD_methods.CrystalResult      import CrystalResult
+from ACSD.ACSD.get_crystals_from_CSD_methods.filter_identifiers import filter_identifiers
+
+def get_flags(has_disorder=False, is_charge_zero=True, same_as_SMILES=True):
+	return {'has_disorder': has_disorder, 'different_to_user_with_H': False, 'different_to_user_without_H': False, 'is_charge_zero': is_charge_zero, 'is_mult_one': True, 'same_as_SMILES': same_as_SMILES, 'SMILES_difference': None if same_as_SMILES else '([], [])'}
+
+def get_results():
+	return [CrystalResult('AAA', status='recorded', flags=get_flags(), checksum='a'*64, location='AAA.xyz', timings={'total': 1.5}),
+	        CrystalResult('BBB', status='recorded', flags=get_flags(has_disorder=True, is_charge_zero=False, same_as_SMILES=False), checksum='b'*64, location='B/BB/BBB.xyz', timings={'total': 0.5}),
+	        CrystalResult('CCC', status='rejected', reason='CCC is polymeric'),
+	        CrystalResult('DDD', status='not_found', reason='DDD not found'),
+	        CrystalResult('EEE', status='excluded'),
+	        CrystalResult('FFF', status='already_processed')]
+
+def test_results_are_read_back_after_reopening(tmp_path):
+	path_to_results_store = str(tmp_path/'ACSD_results.db')
+
+	# First, record the results and close the results store.
+	results_store = ResultsStore(path_to_results_store)
+	assert not results_store.existed
+	for result in get_results():
+		results_store.record(result)
+	results_store.set_setting('layout', 'hashed')
+	results_store.close()
+
+	# Second, reopen the results store and read the results back.
+	#         * Excluded and already processed identifiers are not recorded.
+	results_store = ResultsStore(path_to_results_store)
+	try:
+		assert results_store.existed
+		assert results_store.get_finished_identifiers() == {'AAA': 'recorded', 'BBB': 'recorded', 'CCC': 'rejected', 'DDD': 'not_found'}
+		assert results_store.query(status='recorded') == ['AAA', 'BBB']
+		assert results_store.query(status=['rejected', 'not_found']) == ['CCC', 'DDD']
+		assert results_store.query(status='recorded', has_disorder=True, is_charge_zero=False) == ['BBB']
+		assert results_store.get_processing_times() == {'AAA': 1.5, 'BBB': 0.5}
+		assert results_store.get_crystal_locations() == {'AAA': 'AAA.xyz', 'BBB': 'B/BB/BBB.xyz'}
+		assert results_store.get_checksum('BBB') == 'b'*64
+		assert results_store.get_checksum('CCC') is None
+		assert results_store.get_setting('layout') == 'hashed'
+		result = results_store.get_results(status='rejected')[0]
+		assert (result['reason'], result['has_disorder'], result['location']) == ('CCC is polymeric', None, None)
+		result = results_store.get_results(status='recorded', same_as_SMILES=False)[0]
+		assert (result['identifier'], result['SMILES_difference']) == ('BBB', '([], [])')
+	finally:
+		results_store.close()
+
+def test_results_are_committed_in_batches(tmp_path):
+	path_to_results_store = str(tmp_path/'ACSD_results.db')
+
+	# First, only commit after two results have been recorded.
+	results_store = ResultsStore(path_to_results_store, commit_every=2, commit_interval=3600.0)
+	for result in get_results()[:3]:
+		results_store.record(result)
+		results_store.commit_if_needed()
+
+	# Second, stop without closing the results store, as if the ACSD program was killed. The results that were not committed are lost.
+	results_store.connection.close()
+	results_store = ResultsStore(path_to_results_store)
+	try:
+		assert sorted(results_store.get_finished_identifiers()) == ['AAA', 'BBB']
+	finally:
+		results_store.close()
+
+def test_resume_skips_identifiers_in_the_results_store(tmp_path):
+	results_store = ResultsStore(str(tmp_path/'ACSD_results.db'))
+	try:
+		for result in get_results():
+			results_store.record(result)
+		results_store.commit()
+		identifiers = ['AAA', 'CCC', 'DDD', '#GGG', 'HHH']
+
+		# First, when resuming, recorded identifiers are already processed, identifiers that were not written are excluded, and only new identifiers are processed.
+		identifiers_to_process, skipped_results = filter_identifiers(identifiers, str(tmp_path), False, results_store)
+		assert identifiers_to_process == ['HHH']
+		assert [(result.identifier, result.status) for result in skipped_results] == [('AAA', 'already_processed'), ('CCC', 'excluded'), ('DDD', 'excluded'), ('GGG', 'excluded')]
+
+		# Second, when overwriting, every identifier that was not excluded is processed again.
+		identifiers_to_process, skipped_results = filter_identifiers(identifiers, str(tmp_path), True, results_store)
+		assert identifiers_to_process == ['AAA', 'CCC', 'DDD', 'HHH']
+		assert [(result.identifier, result.status) for result in skipped_results] == [('GGG', 'excluded')]
+	finally:
+		results_store.close()
+
+def test_resume_retries_identifiers_that_timed_out_or_failed(tmp_path):
+	results_store = ResultsStore(str(tmp_path/'ACSD_results.db'))
+	try:
+		for result in get_results() + [CrystalResult('III', status='timeout', reason='Took longer than 1.0 s to convert'), CrystalResult('JJJ', status='failed', reason='exitcode -9')]:
+			results_store.record(result)
+		results_store.commit()
+		identifiers = ['AAA', 'CCC', 'III', 'JJJ']
+
+		# First, identifiers that timed out or failed are processed again, while identifiers given other statuses are still excluded.
+		identifiers_to_process, skipped_results = filter_identifiers(identifiers, str(tmp_path), False, results_store, retry_statuses=('timeout', 'failed'))
+		assert identifiers_to_process == ['III', 'JJJ']
+		assert [(result.identifier, result.status) for result in skipped_results] == [('AAA', 'already_processed'), ('CCC', 'excluded')]
+
+		# Second, the result of an identifier that is processed again replaces its previous result.
+		results_store.record(CrystalResult('III', status='recorded', flags=get_flags(), checksum='i'*64, location='III.xyz', timings={'total': 2.0}))
+		results_store.commit()
+		assert results_store.get_finished_identifiers()['III'] == 'recorded'
+		assert results_store.query(status='timeout') == []
+	finally:
+		results_store.close()
@@ -0,0 +1,42 @@
+"""
+test_RunSettings.py, Geoffrey Weal, 17/10/26
+
+These tests check that the settings of an ACSD run are read from the command line and checked in one place.
+"""
+import argparse
+import pytest
+
+from ACSD.ACSD.ACSD                                     import CLICommand
+from ACSD.ACSD.get_crystals_from_CSD_methods.RunSettings import RunSettings, get_run_settings
+
+def parse_arguments(arguments):
+	parser = argparse.ArgumentParser()
+	CLICommand.add_arguments(parser)
+	return parser.parse_args(['ids.gcd']+arguments)
+
+def test_settings_are_read_from_the_command_line():
+	settings = RunSettings.from_arguments(parse_arguments(['--no_cpus', '4', '--chunksize', 'AUTO', '--ordered', 'T', '--log_level', 'info', '--max_log_size', '2', '--reject_elements', 'Br,I Cl', '--timeout', '30']))
+	assert settings.no_cpus            == 4
+	assert settings.chunksize          == 'auto'
+	assert settings.ordered            is True
+	assert settings.log_level          == 'INFO'
+	assert settings.max_log_size       == 2000000
+	assert settings.max_cache_size     == 10000000000
+	assert settings.elements_to_reject == ('Br', 'I', 'Cl')
+	assert settings.timeout            == 30.0
+	assert settings.status_interval    is None
+
+@pytest.mark.parametrize('arguments', [['--no_cpus', 'x'], ['--chunksize', '0'], ['--layout', 'weird'], ['--timeout', '-1'], ['--ordered', 'maybe'], ['--cost_estimator', 'bogus']])
+def test_invalid_command_line_settings_give_an_error(arguments):
+	with pytest.raises(Exception, match='Error: '):
+		RunSettings.from_arguments(parse_arguments(arguments))
+
+def test_settings_given_from_python():
+	settings = get_run_settings(no_cpus=2, output_format='npz')
+	assert (settings.no_cpus, settings.output_format, settings.layout) == (2, 'npz', 'flat')
+	assert get_run_settings(settings) is settings
+	assert get_run_settings(settings, ordered=True).ordered is True
+	with pytest.raises(Exception, match='not options of an ACSD run'):
+		RunSettings(no_of_cpus=2)
+	with pytest.raises(Exception, match='output_format must be'):
+		RunSettings(output_format='pdb')
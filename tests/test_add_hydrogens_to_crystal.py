@@ -0,0 +1,219 @@
+"""
+test_add_hydrogens_to_crystal.py, Geoffrey Weal, 17/10/26
+
+These tests check that adding only the symmetry images of the added hydrogens to a crystal gives the same crystal as making the whole crystal again.
+
+The crystals are made here by make_reference_crystal, which places the molecules like SUMELF.make_crystal:
+the atoms of each molecule are added together for each symmetry operator, and symmetry images that are the same as a molecule already in the crystal are not added.
+"""
+import numpy as np
+import pytest
+from ase      import Atoms
+from networkx import Graph
+
+from ACSD.ACSD.get_crystals_from_CSD_methods import add_hydrogens_to_crystal as add_hydrogens_module
+from ACSD.ACSD.get_crystals_from_CSD_methods import symmetry_operations_cache as cache_module
+from ACSD.ACSD.get_crystals_from_CSD_methods.add_hydrogens_to_crystal  import get_molecules_before_hydrogens, add_hydrogen_images_to_crystal, remake_crystal_with_added_hydrogens, crystals_are_identical
+from ACSD.ACSD.get_crystals_from_CSD_methods.symmetry_operations_cache import get_stacked_symmetry_operations
+
+# These are the symmetry operators of P2_1/c, and the cell of the crystal.
+symmetry_operators = ('x,y,z', '-x,1/2+y,1/2-z', '-x,-y,-z', 'x,1/2-y,1/2+z')
+cellpar = [7.0, 8.0, 9.0, 90.0, 100.0, 90.0]
+
+@pytest.fixture(autouse=True)
+def reset_incremental_path(monkeypatch):
+	# Only the stacked symmetry operations are used here, so the symmetry operations given by SUMELF are not needed.
+	monkeypatch.setattr(cache_module, 'get_symmetry_operations', lambda symmetry_operators: list(symmetry_operators))
+	cache_module._symmetry_operations_cache.clear()
+	add_hydrogens_module._incremental_path.update({'is_enabled': True, 'no_of_crystals_checked': 0})
+	yield
+	cache_module._symmetry_operations_cache.clear()
+	add_hydrogens_module._incremental_path.update({'is_enabled': True, 'no_of_crystals_checked': 0})
+
+def make_reference_crystal(molecules, molecule_graphs):
+	"""
+	This method will make a crystal from its molecules.
+	"""
+	rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+	crystal = Atoms(cell=cellpar, pbc=True)
+	crystal.set_array('molecule_image', np.zeros(0, dtype=int))
+	crystal_graph  = Graph()
+	recorded_images = []
+	for name in sorted(molecules):
+		molecule       = molecules[name]
+		molecule_graph = molecule_graphs[name]
+		scaled_positions = crystal.cell.scaled_positions(molecule.positions)
+		for rotation, translation in zip(rotations, translations):
+			image = scaled_positions @ rotation.T + translation
+			image = image - np.floor(image.mean(axis=0))
+			image_key = sorted(map(tuple, np.round(image, 6)))
+			if image_key in recorded_images:
+				continue
+			recorded_images.append(image_key)
+			image_atoms = molecule.copy()
+			image_atoms.set_cell(crystal.cell)
+			image_atoms.pbc = True
+			image_atoms.set_scaled_positions(image)
+			image_atoms.set_array('molecule_image', np.full(len(image_atoms), len(recorded_images)-1))
+			start_index = len(crystal)
+			crystal += image_atoms
+			indices = {}
+			for local_index, (node, node_data) in enumerate(molecule_graph.nodes(data=True)):
+				crystal_graph.add_node(start_index+local_index, molecule_image=len(recorded_images)-1, **node_data)
+				indices[node] = start_index+local_index
+			for node1, node2, edge_data in molecule_graph.edges(data=True):
+				crystal_graph.add_edge(indices[node1], indices[node2], **edge_data)
+	return crystal, crystal_graph
+
+def get_molecule(centre):
+	"""
+	This method will give a molecule with two missing hydrogens, and the same molecule with these hydrogens added.
+	"""
+	positions = np.array([[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [2.2, 1.1, 0.0]]) + centre
+	molecule  = Atoms('CCO', positions=positions, charges=[0.0, 0.0, -1.0])
+	molecule_graph = Graph()
+	molecule_graph.add_node(0, E='C', added_or_modified=False, no_of_neighbouring_non_cord_H=2)
+	molecule_graph.add_node(2, E='C', added_or_modified=False)
+	molecule_graph.add_node(3, E='O', added_or_modified=False)
+	molecule_graph.add_edge(0, 2, bond_type='Single')
+	molecule_graph.add_edge(2, 3, bond_type='Double')
+
+	hydrogen_positions = np.array([[-0.5, 0.9, 0.3], [-0.5, -0.9, 0.3]]) + centre
+	molecule_with_hydrogens = molecule + Atoms('HH', positions=hydrogen_positions)
+	molecule_with_hydrogens_graph = molecule_graph.copy()
+	del molecule_with_hydrogens_graph.nodes[0]['no_of_neighbouring_non_cord_H']
+	molecule_with_hydrogens_graph.nodes[0]['added_or_modified'] = True
+	molecule_with_hydrogens_graph.add_node(1, E='H', added_or_modified=True)
+	molecule_with_hydrogens_graph.add_node(4, E='H', added_or_modified=True)
+	molecule_with_hydrogens_graph.add_edge(0, 1, bond_type='Single')
+	molecule_with_hydrogens_graph.add_edge(0, 4, bond_type='Single')
+
+	return (molecule, molecule_graph), (molecule_with_hydrogens, molecule_with_hydrogens_graph)
+
+def get_crystals(centres):
+	"""
+	This method will give the crystal before hydrogens are added, and everything needed to add the hydrogens to it.
+	"""
+	molecules, molecule_graphs, molecules_with_hydrogens, molecule_with_hydrogens_graphs = {}, {}, {}, {}
+	for name, centre in enumerate(centres, start=1):
+		(molecules[name], molecule_graphs[name]), (molecules_with_hydrogens[name], molecule_with_hydrogens_graphs[name]) = get_molecule(np.array(centre))
+	crystal, crystal_graph = make_reference_crystal(molecules, molecule_graphs)
+	molecules_before_hydrogens = get_molecules_before_hydrogens(molecules, molecule_graphs)
+	return crystal, crystal_graph, molecules_before_hydrogens, molecules_with_hydrogens, molecule_with_hydrogens_graphs
+
+class CountingRemake:
+	"""
+	This makes the whole crystal, and records how many times it was made.
+	"""
+	def __init__(self, molecules, molecule_graphs):
+		self.molecules       = molecules
+		self.molecule_graphs = molecule_graphs
+		self.no_of_calls     = 0
+
+	def __call__(self):
+		self.no_of_calls += 1
+		return make_reference_crystal(self.molecules, self.molecule_graphs)
+
+class RemakeWithChargedHydrogens(CountingRemake):
+	"""
+	This makes the whole crystal, but gives the added hydrogens a charge, so this crystal is different to the crystal made by adding only the hydrogens.
+	"""
+	def __call__(self):
+		crystal, crystal_graph = super().__call__()
+		charges = crystal.get_initial_charges()
+		charges[crystal.numbers == 1] = 0.5
+		crystal.set_initial_charges(charges)
+		return crystal, crystal_graph
+
+class RecordingLogger:
+	"""
+	This records the messages given to the logger, as (level, message, stage).
+	"""
+	def __init__(self):
+		self.messages = []
+
+	def debug(self, message, stage=None):
+		self.messages.append(('debug', message, stage))
+
+	def info(self, message, stage=None):
+		self.messages.append(('info', message, stage))
+
+def test_adding_hydrogens_gives_the_same_crystal_as_remaking_it():
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5), (3.0, 5.0, 6.0)])
+	rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+	incremental_crystal, incremental_crystal_graph = add_hydrogen_images_to_crystal(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, rotations, translations)
+	remade_crystal, remade_crystal_graph = make_reference_crystal(molecules, molecule_graphs)
+	assert len(incremental_crystal) == len(crystal) + 2*4*2
+	assert crystals_are_identical(incremental_crystal, incremental_crystal_graph, remade_crystal, remade_crystal_graph)
+
+def test_crystals_are_checked_before_only_hydrogens_are_added(monkeypatch):
+	monkeypatch.setattr(add_hydrogens_module, 'no_of_crystals_to_check', 1)
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5)])
+	remake_crystal = CountingRemake(molecules, molecule_graphs)
+
+	# First, the first crystal is made in full to check the crystal made by adding only the hydrogens.
+	first_crystal = remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal)
+	assert remake_crystal.no_of_calls == 1
+
+	# Second, after this, only the hydrogens are added.
+	second_crystal = remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal)
+	assert remake_crystal.no_of_calls == 1
+	assert crystals_are_identical(*first_crystal, *second_crystal)
+
+def test_different_crystals_turn_off_adding_only_hydrogens(monkeypatch):
+	monkeypatch.setattr(add_hydrogens_module, 'no_of_crystals_to_check', 1)
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5)])
+	remake_crystal = RemakeWithChargedHydrogens(molecules, molecule_graphs)
+
+	# First, the crystal made again is given, and the process stops adding only the hydrogens.
+	remade_crystal = remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal)
+	assert np.all(remade_crystal[0].get_initial_charges()[remade_crystal[0].numbers == 1] == 0.5)
+	assert add_hydrogens_module._incremental_path['is_enabled'] is False
+
+	# Second, every crystal after this is made in full.
+	remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal)
+	assert remake_crystal.no_of_calls == 2
+
+def test_crystals_that_can_not_be_read_are_made_in_full():
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5)])
+	rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+
+	# If an atom in the crystal is not given by any symmetry operator, the hydrogens can not be added to the crystal.
+	crystal.positions[5] += 0.3
+	assert add_hydrogen_images_to_crystal(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, rotations, translations) is None
+
+def test_making_the_whole_crystal_again_is_logged(monkeypatch):
+	monkeypatch.setattr(add_hydrogens_module, 'no_of_crystals_to_check', 0)
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5)])
+	remake_crystal = CountingRemake(molecules, molecule_graphs)
+	logger = RecordingLogger()
+
+	# First, after the crystals have been checked, a crystal that can not be read is made in full, and this is logged.
+	crystal.positions[5] += 0.3
+	remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal, logger)
+	assert remake_crystal.no_of_calls == 1
+	assert logger.messages == [('info', 'Could not add only the missing hydrogens to this crystal, as the crystal could not be read as its molecules moved by its symmetry operators, so the whole crystal was made again.', 'make_crystal_with_added_hydrogens')]
+
+	# Second, an expected error is also logged, and the whole crystal is made again.
+	def raise_value_error(*args):
+		raise ValueError('bad symmetry operator')
+	monkeypatch.setattr(add_hydrogens_module, 'add_hydrogen_images_to_crystal', raise_value_error)
+	remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal, logger)
+	assert remake_crystal.no_of_calls == 2
+	assert 'ValueError: bad symmetry operator' in logger.messages[-1][1]
+
+	# Third, once this process is making the whole crystal for every crystal, each crystal made again is logged.
+	add_hydrogens_module._incremental_path['is_enabled'] = False
+	remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal, logger)
+	assert remake_crystal.no_of_calls == 3
+	assert logger.messages[-1][0] == 'debug'
+
+def test_unexpected_errors_are_raised(monkeypatch):
+	crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs = get_crystals([(1.0, 2.0, 1.5)])
+	remake_crystal = CountingRemake(molecules, molecule_graphs)
+	def raise_type_error(*args):
+		raise TypeError('bug')
+	monkeypatch.setattr(add_hydrogens_module, 'add_hydrogen_images_to_crystal', raise_type_error)
+	with pytest.raises(TypeError, match='bug'):
+		remake_crystal_with_added_hydrogens(crystal, crystal_graph, molecules_before_hydrogens, molecules, molecule_graphs, symmetry_operators, remake_crystal, RecordingLogger())
+	assert remake_crystal.no_of_calls == 0
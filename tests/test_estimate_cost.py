@@ -0,0 +1,54 @@
+"""
+test_estimate_cost.py, Geoffrey Weal, 17/10/26
+
+These tests check that the cost of identifiers is estimated from the information stored for each entry, without making the molecule of the crystal.
+"""
+import pytest
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.CSD_entry_reader import initialise_CSD_reader, close_CSD_reader
+from ACSD.ACSD.get_crystals_from_CSD_methods.estimate_cost    import estimate_cost, get_moieties_from_formula, sort_identifiers_by_cost
+
+class Crystal:
+	def __init__(self, z_value, symmetry_operators):
+		self.z_value            = z_value
+		self.symmetry_operators = symmetry_operators
+
+	@property
+	def molecule(self):
+		raise AssertionError('The molecule of the crystal should not be made to estimate its cost')
+
+class Entry:
+	def __init__(self, formula, z_value, symmetry_operators):
+		self.formula = formula
+		self.crystal = Crystal(z_value, symmetry_operators)
+
+entries = {'ACID': Entry('C10 H8 N2 O4,2(H2 O1)', 4, ('x,y,z', '-x,-y,-z', 'x,1/2-y,1/2+z', '-x,1/2+y,1/2-z')), 'BENZEN': Entry('C6 H6', None, ('x,y,z', '-x,-y,-z'))}
+
+class Reader:
+	def entry(self, identifier):
+		return entries[identifier]
+
+@pytest.fixture
+def reader():
+	initialise_CSD_reader(Reader)
+	yield
+	close_CSD_reader()
+
+def test_moieties_are_read_from_the_formula():
+	assert get_moieties_from_formula('C10 H8 N2 O4,2(H2 O1)') == [(1.0, 24.0), (2.0, 3.0)]
+	assert get_moieties_from_formula('Cl1 1-,0.5(C2 H6 O1)')  == [(1.0, 1.0), (0.5, 9.0)]
+	assert get_moieties_from_formula('') == []
+
+def test_cost_is_estimated_from_formula_and_Z(reader):
+	assert estimate_cost(('ACID', 'atoms'))      == ('ACID', (24 + 2*3) * 4.0)
+	assert estimate_cost(('ACID', 'components')) == ('ACID', 3 * 4.0)
+	assert estimate_cost(('ACID', 'symmetry'))   == ('ACID', 4.0)
+
+	# If Z is not given, the number of symmetry operators is used instead.
+	assert estimate_cost(('BENZEN', 'atoms'))    == ('BENZEN', 12 * 2.0)
+
+	# Identifiers that can not be found are given no cost.
+	assert estimate_cost(('MISSING', 'atoms'))   == ('MISSING', 0.0)
+
+def test_most_costly_identifiers_are_first():
+	assert sort_identifiers_by_cost(['A', 'B', 'C', 'D'], {'A': 1.0, 'B': 5.0, 'D': 1.0}) == ['C', 'B', 'A', 'D']
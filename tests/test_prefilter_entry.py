@@ -0,0 +1,93 @@
+"""
+test_prefilter_entry.py, Geoffrey Weal, 17/10/26
+
+These tests check that the cheap checks in prefilter_entry.py give the same decision for each entry as checking every atom in the crystal.
+"""
+import pytest
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.prefilter_entry import prefilter_entry, check_molecule
+
+class FakeAtom:
+	def __init__(self, atomic_symbol, is_metal=False):
+		self.atomic_symbol = atomic_symbol
+		self.is_metal      = is_metal
+
+class FakeMolecule:
+	def __init__(self, atoms, is_polymeric=False, is_organometallic=False, is_organic=True):
+		self.atoms             = atoms
+		self.is_polymeric      = is_polymeric
+		self.is_organometallic = is_organometallic
+		self.is_organic        = is_organic
+
+class FakeCrystal:
+	def __init__(self, molecule):
+		self.molecule = molecule
+
+class FakeEntry:
+	"""
+	This is a fake CSD entry, where the flags of the entry are the same as the flags of its molecule, as they are in the CSD.
+	"""
+	def __init__(self, formula, atoms, **flags):
+		molecule = FakeMolecule(atoms, **flags)
+		self.formula           = formula
+		self.has_3d_structure  = len(atoms) > 0
+		self.is_polymeric      = molecule.is_polymeric
+		self.is_organometallic = molecule.is_organometallic
+		self.is_organic        = molecule.is_organic
+		self.crystal           = FakeCrystal(molecule)
+
+def organic_atoms(*extra_atoms):
+	return [FakeAtom('C'), FakeAtom('C'), FakeAtom('H'), FakeAtom('H')] + list(extra_atoms)
+
+# These are representative entries, given as (formula, atoms, flags).
+representative_entries = {
+	'organic':               ('C2 H2',             organic_atoms(), {}),
+	'organic_no_formula':    ('',                  organic_atoms(), {}),
+	'solvate':               ('C2 H2,2(H2 O1)',    organic_atoms(FakeAtom('O')), {}),
+	'metal':                 ('C2 H2 Cu1',         organic_atoms(FakeAtom('Cu', is_metal=True)), {'is_organometallic': True, 'is_organic': False}),
+	'metal_salt':            ('C2 H2 1-,Na1 1+',   organic_atoms(FakeAtom('Na', is_metal=True)), {'is_organic': False}),
+	'metalloid':             ('C2 H2 B1',          organic_atoms(FakeAtom('B')), {}),
+	'polymer':               ('C2 H2',             organic_atoms(), {'is_polymeric': True}),
+	'not_organic':           ('Cl1 H1',            [FakeAtom('Cl'), FakeAtom('H')], {'is_organic': False}),
+	'rejected_element':      ('C2 H2 Br1',         organic_atoms(FakeAtom('Br')), {}),
+	'metal_no_coordinates':  ('C2 H2 Cu1',         [], {'is_organometallic': True, 'is_organic': False}),
+	'polymer_no_coordinates':('C2 H2',             [], {'is_polymeric': True}),
+	'element_no_coordinates':('C2 H2 Br1',         [], {}),
+	'no_coordinates':        ('C2 H2',             [], {}),
+}
+
+def get_decision(identifier, entry_object, elements_to_reject, use_prefilter):
+	"""
+	This method will give the status of an entry, in the same order as get_crystal_from_CSD_single_process.
+	"""
+	if use_prefilter:
+		rejected_by, reason = prefilter_entry(identifier, entry_object, elements_to_reject)
+		if rejected_by is not None:
+			return 'rejected'
+	status, reason = check_molecule(identifier, entry_object.crystal.molecule, elements_to_reject)
+	return 'recorded' if (status is None) else status
+
+@pytest.mark.parametrize('identifier', sorted(representative_entries))
+def test_prefiltered_decision_matches_full_check(identifier):
+	formula, atoms, flags = representative_entries[identifier]
+	entry_object = FakeEntry(formula, atoms, **flags)
+	elements_to_reject = ('Br',)
+	assert get_decision(identifier, entry_object, elements_to_reject, use_prefilter=True) == get_decision(identifier, entry_object, elements_to_reject, use_prefilter=False)
+
+def test_entries_without_coordinates_are_not_prefiltered():
+	timings = {}
+	formula, atoms, flags = representative_entries['metal_no_coordinates']
+	assert prefilter_entry('metal_no_coordinates', FakeEntry(formula, atoms, **flags), ('Br',), timings) == (None, None)
+	assert timings == {}
+
+def test_cheap_stages_reject_entries():
+	timings = {}
+	formula, atoms, flags = representative_entries['rejected_element']
+	rejected_by, reason = prefilter_entry('rejected_element', FakeEntry(formula, atoms, **flags), ('Br',), timings)
+	assert rejected_by == 'formula'
+	assert 'Br' in reason
+	assert 'filter_formula' in timings
+
+	formula, atoms, flags = representative_entries['metal']
+	rejected_by, reason = prefilter_entry('metal', FakeEntry(formula, atoms, **flags), ('Br',))
+	assert rejected_by == 'entry_flags'
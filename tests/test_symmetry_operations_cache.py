@@ -0,0 +1,58 @@
+"""
+test_symmetry_operations_cache.py, Geoffrey Weal, 17/10/26
+
+These tests check the cache of symmetry operations, and that applying every symmetry operator at once gives the same positions as applying each symmetry operator in turn.
+"""
+import numpy as np
+import pytest
+
+from ACSD.ACSD.get_crystals_from_CSD_methods import symmetry_operations_cache as cache_module
+from ACSD.ACSD.get_crystals_from_CSD_methods.symmetry_operations_cache import get_symmetry_operations_from_cache, get_stacked_symmetry_operations, expand_scaled_positions
+
+# These are the symmetry operators of P2_1/c, as given by the CSD.
+symmetry_operators = ('x,y,z', '-x,1/2+y,1/2-z', '-x,-y,-z', 'x,1/2-y,1/2+z')
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+	# These tests check the cache, rather than SUMELF, so the symmetry operations given by SUMELF are replaced by a list of the symmetry operators.
+	monkeypatch.setattr(cache_module, 'get_symmetry_operations', lambda symmetry_operators: [list(symmetry_operator.split(',')) for symmetry_operator in symmetry_operators])
+	cache_module._symmetry_operations_cache.clear()
+	yield
+	cache_module._symmetry_operations_cache.clear()
+
+def test_stacked_symmetry_operations():
+	rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+	assert rotations.shape    == (4, 3, 3)
+	assert translations.shape == (4, 3)
+	assert np.array_equal(rotations[1], np.diag([-1.0, 1.0, -1.0]))
+	assert np.allclose(translations[1], [0.0, 0.5, 0.5])
+
+	# The stacked arrays are shared between crystals, so they can not be changed.
+	with pytest.raises(ValueError):
+		rotations[0, 0, 0] = 2.0
+	assert get_stacked_symmetry_operations(list(symmetry_operators))[0] is rotations
+
+def test_expand_scaled_positions_matches_each_symmetry_operator():
+	rotations, translations = get_stacked_symmetry_operations(symmetry_operators)
+	scaled_positions = np.random.default_rng(0).random((7, 3))
+	symmetry_images  = expand_scaled_positions(scaled_positions, rotations, translations)
+	assert symmetry_images.shape == (4, 7, 3)
+	for index in range(len(symmetry_operators)):
+		expected = scaled_positions @ rotations[index].T + translations[index]
+		assert np.allclose(symmetry_images[index], expected)
+
+def test_symmetry_operations_are_copies():
+	symmetry_operations = get_symmetry_operations_from_cache(symmetry_operators)
+	assert symmetry_operations == get_symmetry_operations_from_cache(symmetry_operators)
+	assert symmetry_operations is not get_symmetry_operations_from_cache(symmetry_operators)
+	assert symmetry_operations is not cache_module._symmetry_operations_cache[symmetry_operators]['symmetry_operations']
+
+def test_cache_is_bounded(monkeypatch):
+	monkeypatch.setattr(cache_module, 'max_symmetry_operations_cache_size', 2)
+	get_stacked_symmetry_operations(('x,y,z',))
+	get_stacked_symmetry_operations(('x,y,z', '-x,-y,-z'))
+	get_stacked_symmetry_operations(('x,y,z',))
+	get_stacked_symmetry_operations(symmetry_operators)
+
+	# The least recently used symmetry operators are removed from the cache.
+	assert list(cache_module._symmetry_operations_cache) == [('x,y,z',), symmetry_operators]
@@ -0,0 +1,57 @@
+"""
+test_write_crystal_file.py, Geoffrey Weal, 17/10/26
+
+These tests check that crystal files are written atomically, so a half-written crystal file is never left in the crystal database folder.
+"""
+import os
+import pytest
+from hashlib import sha256
+from ase     import Atoms
+from ase.io  import read
+
+from ACSD.ACSD.get_crystals_from_CSD_methods.write_crystal_file import write_crystal_file, write_xyz_data, write_xyz_data_to_crystal_database, remove_temporary_files, temporary_suffix
+
+def test_write_crystal_file(tmp_path):
+	crystal = Atoms('H2O', positions=[(0.0, 0.0, 0.0), (0.0, 0.0, 1.0), (0.0, 1.0, 0.0)], cell=(5.0, 5.0, 5.0), pbc=True)
+	path_to_xyz_file = str(tmp_path/'H2O.xyz')
+	checksum = write_crystal_file(crystal, path_to_xyz_file)
+	with open(path_to_xyz_file, 'rb') as xyzFILE:
+		assert sha256(xyzFILE.read()).hexdigest() == checksum
+	assert read(path_to_xyz_file).get_chemical_symbols() == ['H', 'H', 'O']
+	assert os.listdir(tmp_path) == ['H2O.xyz']
+
+def test_failed_write_leaves_existing_file_unchanged(tmp_path, monkeypatch):
+	path_to_xyz_file = str(tmp_path/'AAA.xyz')
+	write_xyz_data(b'old contents\n', path_to_xyz_file)
+
+	# First, make the write fail after the temporary file was opened, as if the ACSD program was killed.
+	def fsync(fileno):
+		raise OSError('Disk full')
+	monkeypatch.setattr(os, 'fsync', fsync)
+	with pytest.raises(OSError):
+		write_xyz_data(b'new contents that were only partly written\n', path_to_xyz_file)
+	monkeypatch.undo()
+
+	# Second, the xyz file still has its old contents, and only the temporary file was left behind.
+	with open(path_to_xyz_file, 'rb') as xyzFILE:
+		assert xyzFILE.read() == b'old contents\n'
+	assert sorted(os.listdir(tmp_path)) == ['AAA.xyz', 'AAA.xyz'+temporary_suffix]
+
+	# Third, the temporary file is removed when the run is resumed.
+	remove_temporary_files(str(tmp_path))
+	assert os.listdir(tmp_path) == ['AAA.xyz']
+
+def test_hashed_layout_writes_temporary_files_to_the_crystal_database_folder(tmp_path, monkeypatch):
+	temporary_files = []
+	original_replace = os.replace
+	def replace(source, destination):
+		temporary_files.append(source)
+		original_replace(source, destination)
+	monkeypatch.setattr(os, 'replace', replace)
+
+	checksum, location = write_xyz_data_to_crystal_database(b'contents\n', str(tmp_path), 'ABCDEF', layout='hashed')
+	assert '/' in location
+	assert temporary_files == [str(tmp_path)+'/ABCDEF.xyz'+temporary_suffix]
+	with open(str(tmp_path)+'/'+location, 'rb') as xyzFILE:
+		assert xyzFILE.read() == b'contents\n'
+	assert checksum == sha256(b'contents\n').hexdigest()